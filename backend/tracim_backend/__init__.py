@@ -23,6 +23,7 @@ from tracim_backend.lib.utils.authentification import BASIC_AUTH_WEBUI_REALM
 from tracim_backend.lib.utils.authorization import AcceptAllAuthorizationPolicy
 from tracim_backend.lib.utils.authorization import TRACIM_DEFAULT_PERM
 from tracim_backend.lib.utils.cors import add_cors_support
+from tracim_backend.lib.utils.translation import load_translation_catalogs
 from tracim_backend.lib.webdav import WebdavAppFactory
 from tracim_backend.views import BASE_API_V2
 from tracim_backend.views.contents_api.html_document_controller import HTMLDocumentController  # nopep8
@@ -63,6 +64,7 @@ def web(global_config, **local_settings):
     # set CFG object
     app_config = CFG(settings)
     app_config.configure_filedepot()
+    load_translation_catalogs(app_config)
     settings['CFG'] = app_config
     configurator = Configurator(settings=settings, autocommit=True)
     # Add AuthPolicy
@@ -125,6 +125,26 @@ class CFG(object):
         #     'content.update.allowed.duration',
         #     0,
         # ))
+        self.CONTENT_TREE_OPERATION_BACKGROUND_THRESHOLD = int(settings.get(
+            'content.tree_operation.background_threshold',
+            1000,
+        ))
+        self.CONTENT_TREE_OPERATION_PROCESSING_MODE = settings.get(
+            'content.tree_operation.processing_mode',
+            'sync',
+        ).upper()
+        if self.CONTENT_TREE_OPERATION_PROCESSING_MODE not in (
+                self.CST.ASYNC,
+                self.CST.SYNC,
+        ):
+            raise Exception(
+                'content.tree_operation.processing_mode '
+                'can be "{}" or "{}", not "{}"'.format(
+                    self.CST.ASYNC,
+                    self.CST.SYNC,
+                    self.CONTENT_TREE_OPERATION_PROCESSING_MODE,
+                )
+            )
 
         self.API_KEY = settings.get(
             'api.key',
@@ -326,6 +346,22 @@ class CFG(object):
         self.EMAIL_NOTIFICATION_SMTP_PASSWORD = settings.get(
             'email.notification.smtp.password',
         )
+        # INFO - G.M - 2018-12-13 - SMTP connections are kept open in a pool
+        # of at most pool_size idle connections by process. A connection is
+        # checked (NOOP) before reuse if unused for keepalive seconds, and
+        # closed after max_messages_per_connection messages.
+        self.EMAIL_NOTIFICATION_SMTP_POOL_SIZE = int(settings.get(
+            'email.notification.smtp.pool_size',
+            2,
+        ))
+        self.EMAIL_NOTIFICATION_SMTP_KEEPALIVE = int(settings.get(
+            'email.notification.smtp.keepalive',
+            30,
+        ))
+        self.EMAIL_NOTIFICATION_SMTP_MAX_MESSAGES_PER_CONNECTION = int(settings.get(  # nopep8
+            'email.notification.smtp.max_messages_per_connection',
+            100,
+        ))
         self.EMAIL_NOTIFICATION_LOG_FILE_PATH = settings.get(
             'email.notification.log_file_path',
             None,
@@ -455,6 +491,28 @@ class CFG(object):
         # if not self.WSGIDAV_CLIENT_BASE_URL.endswith('/'):
         #     self.WSGIDAV_CLIENT_BASE_URL += '/'
 
+        # INFO - G.M - 2018-12-10 - WebDAV uploaded files are kept in memory
+        # up to this size (in bytes), bigger files are spooled to a temporary
+        # file on disk.
+        self.WSGIDAV_UPLOAD_SPOOL_MAX_SIZE = int(settings.get(
+            'wsgidav.upload.spool_max_size',
+            1024 * 1024,
+        ))
+        # INFO - G.M - 2018-12-11 - Valid WebDAV credentials are cached
+        # during this time (in seconds) to avoid password check on each
+        # WebDAV request, 0 disable cache.
+        self.WSGIDAV_AUTH_CACHE_TTL = int(settings.get(
+            'wsgidav.auth_cache.ttl',
+            60,
+        ))
+        # INFO - G.M - 2018-12-12 - WebDAV locks are stored in database,
+        # expired locks are purged every lock.sweep_interval seconds,
+        # 0 disable purge.
+        self.WSGIDAV_LOCK_SWEEP_INTERVAL = int(settings.get(
+            'wsgidav.lock.sweep_interval',
+            300,
+        ))
+
         # TODO - G.M - 27-03-2018 - [Caldav] Restore radicale config
         ###
         # RADICALE (Caldav server)
@@ -548,6 +606,26 @@ class CFG(object):
 
         self.PREVIEW_JPG_ALLOWED_DIMS = allowed_dims
 
+        self.PREVIEW_PROCESSING_MODE = settings.get(
+            'preview.processing_mode',
+            'sync',
+        ).upper()
+
+        if self.PREVIEW_PROCESSING_MODE not in (
+                self.CST.ASYNC,
+                self.CST.LOCAL,
+                self.CST.SYNC,
+        ):
+            raise Exception(
+                'preview.processing_mode '
+                'can be "{}", "{}" or "{}", not "{}"'.format(
+                    self.CST.ASYNC,
+                    self.CST.LOCAL,
+                    self.CST.SYNC,
+                    self.PREVIEW_PROCESSING_MODE,
+                )
+            )
+
         self.FRONTEND_SERVE = asbool(settings.get(
             'frontend.serve', False
         ))
@@ -567,6 +645,11 @@ class CFG(object):
                 'please set backend.i8n_folder_path'
                 'with a correct value'.format(self.BACKEND_I18N_FOLDER)
             )
+        # INFO - G.M - 2018-12-12 - Translation files are loaded once by
+        # process, set this to reload them when they change (development).
+        self.BACKEND_I18N_RELOAD = asbool(settings.get(
+            'backend.i18n_reload', False
+        ))
 
         frontend_dist_folder = os.path.join(tracim_v2_folder, 'frontend', 'dist')  # nopep8
         self.FRONTEND_DIST_FOLDER_PATH = settings.get(
@@ -714,6 +797,7 @@ class CFG(object):
 
     class CST(object):
         ASYNC = 'ASYNC'
+        LOCAL = 'LOCAL'
         SYNC = 'SYNC'
 
         TREEVIEW_FOLDERS = 'folders'
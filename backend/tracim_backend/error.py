@@ -17,6 +17,7 @@ USER_ROLE_NOT_FOUND = 1005
 UNAVAILABLE_PREVIEW_TYPE = 1011
 PAGE_OF_PREVIEW_NOT_FOUND = 1012
 UNAIVALABLE_PREVIEW = 1013
+PREVIEW_NOT_READY = 1014
 
 # Validation Error
 GENERIC_SCHEMA_VALIDATION_ERROR = 2001
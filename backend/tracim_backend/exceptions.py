@@ -123,6 +123,15 @@ class NotificationSendingFailed(TracimException):
     error_code = error.NOTIFICATION_SENDING_FAILED
 
 
+class EmailsSendingFailed(NotificationSendingFailed):
+    """
+    Some emails of a batch were not sent: they are kept in failed_messages.
+    """
+    def __init__(self, msg: str, failed_messages: list) -> None:
+        super().__init__(msg)
+        self.failed_messages = failed_messages
+
+
 class NotificationDisabledCantCreateUserWithInvitation(TracimException):
     error_code = error.NOTIFICATION_DISABLED_CANT_NOTIFY_NEW_USER
 
@@ -334,6 +343,10 @@ class UnavailablePreview(TracimException):
     error_code = error.UNAIVALABLE_PREVIEW
 
 
+class PreviewNotReady(TracimException):
+    error_code = error.PREVIEW_NOT_READY
+
+
 class EmptyNotificationError(TracimException):
     pass
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import datetime
+import json
 import os
 import re
 import traceback
@@ -13,11 +14,17 @@ from depot.manager import DepotManager
 from preview_generator.exception import UnavailablePreviewType
 from preview_generator.exception import UnsupportedMimeType
 from preview_generator.manager import PreviewManager
+from sqlalchemy import DateTime
+from sqlalchemy import Integer
+from sqlalchemy import case
 from sqlalchemy import desc
 from sqlalchemy import func
+from sqlalchemy import inspect
 from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from sqlalchemy.orm import Query
 from sqlalchemy.orm import aliased
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.attributes import QueryableAttribute
 from sqlalchemy.orm.attributes import get_history
@@ -39,6 +46,7 @@ from tracim_backend.exceptions import EmptyCommentContentNotAllowed
 from tracim_backend.exceptions import EmptyLabelNotAllowed
 from tracim_backend.exceptions import PageOfPreviewNotFound
 from tracim_backend.exceptions import PreviewDimNotAllowed
+from tracim_backend.exceptions import PreviewNotReady
 from tracim_backend.exceptions import RevisionDoesNotMatchThisContent
 from tracim_backend.exceptions import \
     RevisionFilePathSearchFailedDepotCorrupted
@@ -47,10 +55,14 @@ from tracim_backend.exceptions import TracimUnavailablePreviewType
 from tracim_backend.exceptions import UnallowedSubContent
 from tracim_backend.exceptions import UnavailablePreview
 from tracim_backend.exceptions import WorkspacesDoNotMatch
+from tracim_backend.lib.core.content_tree import schedule_content_tree_operation
 from tracim_backend.lib.core.notifications import NotifierFactory
+from tracim_backend.lib.preview.generator import schedule_revision_previews
 from tracim_backend.lib.utils.logger import logger
 from tracim_backend.lib.utils.translation import DEFAULT_FALLBACK_LANG
 from tracim_backend.lib.utils.translation import Translator
+from tracim_backend.lib.utils.utils import LRUCache
+from tracim_backend.lib.utils.utils import call_after_commit
 from tracim_backend.lib.utils.utils import cmp_to_key
 from tracim_backend.lib.utils.utils import current_date_for_filename
 from tracim_backend.lib.utils.utils import preview_manager_page_format
@@ -62,10 +74,20 @@ from tracim_backend.models.data import ActionDescription
 from tracim_backend.models.data import Content
 from tracim_backend.models.data import ContentRevisionRO
 from tracim_backend.models.data import NodeTreeItem
+from tracim_backend.models.data import RevisionPreviewMetadata
 from tracim_backend.models.data import RevisionReadStatus
 from tracim_backend.models.data import UserRoleInWorkspace
 from tracim_backend.models.data import Workspace
+from tracim_backend.models.depot import increment_depot_blobs_ref_count
+from tracim_backend.models.meta import has_insert_returning
+from tracim_backend.models.meta import has_recursive_cte
+from tracim_backend.models.meta import has_upsert
+from tracim_backend.models.meta import has_window_functions
+from tracim_backend.models.revision_protection import increment_workspaces_content_tree_generation  # nopep8
 from tracim_backend.models.revision_protection import new_revision
+from tracim_backend.models.search import get_content_search_index
+from tracim_backend.models.search import get_search_terms
+from tracim_backend.models.search import reindex_contents
 
 __author__ = 'damien'
 
@@ -117,6 +139,16 @@ def compare_tree_items_for_sorting_by_type_and_name(
     return compare_content_for_sorting_by_type_and_name(item1.node, item2.node)
 
 
+# INFO - G.M - 2018-12-10 - Revision files never change, so their preview
+# metadata can be kept in process memory, by revision_id.
+PREVIEW_METADATA_CACHE_SIZE = 10000
+# INFO - G.M - 2018-12-27 - Copies of content tree are inserted by batch of
+# this size, where databases return ids of inserted rows.
+CONTENT_COPY_BATCH_SIZE = 500
+PREVIEW_METADATA_WRITTEN_SESSION_KEY = 'tracim_preview_metadata_written'
+preview_metadata_cache = LRUCache(maxsize=PREVIEW_METADATA_CACHE_SIZE)
+
+
 class ContentApi(object):
 
     SEARCH_SEPARATORS = ',| '
@@ -156,7 +188,7 @@ class ContentApi(object):
         self._show_all_type_of_contents_in_treeview = all_content_in_treeview
         self._force_show_all_types = force_show_all_types
         self._disable_user_workspaces_filter = disable_user_workspaces_filter
-        self.preview_manager = PreviewManager(self._config.PREVIEW_CACHE_DIR, create_folder=True)  # nopep8
+        self._preview_manager = None  # type: PreviewManager
         default_lang = None
         if self._user:
             default_lang = self._user.lang
@@ -164,6 +196,14 @@ class ContentApi(object):
             default_lang = DEFAULT_FALLBACK_LANG
         self.translator = Translator(app_config=self._config, default_lang=default_lang)  # nopep8
 
+    @property
+    def preview_manager(self) -> PreviewManager:
+        # INFO - G.M - 2018-12-10 - PreviewManager creation is costly and most
+        # ContentApi instances never use it, so create it only when needed.
+        if not self._preview_manager:
+            self._preview_manager = PreviewManager(self._config.PREVIEW_CACHE_DIR, create_folder=True)  # nopep8
+        return self._preview_manager
+
     @contextmanager
     def show(
             self,
@@ -192,25 +232,252 @@ class ContentApi(object):
             self._show_deleted = previous_show_deleted
             self._show_temporary = previous_show_temporary
 
-    def get_content_in_context(self, content: Content) -> ContentInContext:
-        return ContentInContext(content, self._session, self._config, self._user)  # nopep8
+    def get_content_in_context(
+            self,
+            content: Content,
+            read_by_user: typing.Optional[bool] = None,
+    ) -> ContentInContext:
+        return ContentInContext(
+            content,
+            self._session,
+            self._config,
+            self._user,
+            read_by_user=read_by_user,
+        )
+
+    def get_contents_in_context_with_read_status(
+            self,
+            contents: typing.List[Content],
+    ) -> typing.List[ContentInContext]:
+        """
+        Same as get_content_in_context for a list of contents, but with read
+        status of all contents computed at once.
+        :param contents: contents to return in context
+        :return: list of ContentInContext with read_by_user precomputed
+        """
+        read_status_map = self.get_read_status_map(
+            self._user,
+            [content.content_id for content in contents],
+        )
+        return [
+            self.get_content_in_context(
+                content,
+                read_by_user=read_status_map[content.content_id],
+            )
+            for content in contents
+        ]
 
     def get_revision_in_context(self, revision: ContentRevisionRO) -> RevisionInContext:  # nopep8
         # TODO - G.M - 2018-06-173 - create revision in context object
         return RevisionInContext(revision, self._session, self._config, self._user) # nopep8
-    
+
+    def get_revisions_in_context(
+            self,
+            content: Content,
+            limit: typing.Optional[int]=None,
+            after_revision_id: typing.Optional[int]=None,
+    ) -> typing.List[RevisionInContext]:
+        """
+        Get revisions of content, oldest first, with data needed by revision
+        serialization computed for all revisions at once: one query for
+        revisions (with authors and preview metadata), one query for
+        comments of all revisions, whatever the number of revisions.
+        :param content: content whose revisions are listed
+        :param limit: if set, return at most limit revisions
+        :param after_revision_id: if set, return only revisions after this
+        one (revision_id of last revision of previous page)
+        :return: revisions in context
+        """
+        revisions_query = self._session.query(
+            ContentRevisionRO,
+            RevisionPreviewMetadata,
+        ).outerjoin(
+            RevisionPreviewMetadata,
+            RevisionPreviewMetadata.revision_id == ContentRevisionRO.revision_id,  # nopep8
+        ).filter(
+            ContentRevisionRO.content_id == content.content_id
+        ).options(
+            joinedload(ContentRevisionRO.owner)
+        ).order_by(ContentRevisionRO.revision_id)
+        if after_revision_id:
+            revisions_query = revisions_query.filter(
+                ContentRevisionRO.revision_id > after_revision_id
+            )
+        next_revision = None
+        if limit:
+            # INFO - G.M - 2018-12-27 - revision after the page is loaded
+            # too: comments of last revision of page are older than it.
+            revisions_query = revisions_query.limit(limit + 1)
+        revisions = revisions_query.all()
+        if limit and len(revisions) > limit:
+            next_revision = revisions.pop()[0]
+        if not revisions:
+            return []
+
+        comment_ids = self._get_revisions_comment_ids(
+            content,
+            [revision for revision, preview_metadata in revisions],
+            next_revision,
+        )
+        # INFO - G.M - 2018-11-02 - Only last revision can be editable
+        current_revision_id = content.revision_id
+        is_content_editable = self.is_editable(content)
+        return [
+            RevisionInContext(
+                revision,
+                self._session,
+                self._config,
+                self._user,
+                comment_ids=comment_ids.get(revision.revision_id, []),
+                is_editable=is_content_editable
+                and revision.revision_id == current_revision_id,
+                preview_metadata=preview_metadata,
+            )
+            for revision, preview_metadata in revisions
+        ]
+
+    def _get_revisions_comment_ids(
+            self,
+            content: Content,
+            revisions: typing.List[ContentRevisionRO],
+            next_revision: typing.Optional[ContentRevisionRO]=None,
+    ) -> typing.Dict[int, typing.List[int]]:
+        """
+        Get ids of comments of content related to each of its revisions
+        (see RevisionInContext.comment_ids) with one query: next revision
+        of each revision is given by a window function, comments are joined
+        to the interval between revision and next revision.
+        :param revisions: revisions to get comments for, sorted by
+        revision_id, without gap
+        :param next_revision: revision following last of revisions, if any
+        and not in revisions
+        :return: dict of revision_id: comment ids, sorted by comment
+        revision
+        """
+        if not has_window_functions(self._session.bind.dialect):
+            return self._get_revisions_comment_ids_without_window(
+                content,
+                revisions,
+                next_revision,
+            )
+        revision_window = self._session.query(
+            ContentRevisionRO.revision_id.label('revision_id'),
+            ContentRevisionRO.updated.label('updated'),
+            func.lead(ContentRevisionRO.revision_id).over(
+                order_by=ContentRevisionRO.revision_id,
+            ).label('next_revision_id'),
+            func.lead(ContentRevisionRO.updated).over(
+                order_by=ContentRevisionRO.revision_id,
+            ).label('next_updated'),
+        ).filter(
+            ContentRevisionRO.content_id == content.content_id
+        ).subquery('revision_window')
+        comment_revision = aliased(ContentRevisionRO)
+        comment = aliased(Content)
+        rows = self._session.query(
+            revision_window.c.revision_id,
+            comment_revision.content_id,
+        ).join(
+            comment_revision,
+            and_(
+                comment_revision.parent_id == content.content_id,
+                comment_revision.type == content_type_list.Comment.slug,
+                comment_revision.is_deleted == False,
+                comment_revision.is_archived == False,
+                # INFO - G.M - 2018-06-177 - comments more recent than
+                # revision and, if there is a more recent revision, older
+                # than it.
+                or_(
+                    comment_revision.created > revision_window.c.updated,
+                    comment_revision.revision_id > revision_window.c.revision_id,  # nopep8
+                ),
+                or_(
+                    revision_window.c.next_revision_id == None,
+                    comment_revision.created < revision_window.c.next_updated,  # nopep8
+                    comment_revision.revision_id < revision_window.c.next_revision_id,  # nopep8
+                ),
+            )
+        ).join(
+            comment,
+            comment.cached_revision_id == comment_revision.revision_id,
+        ).filter(
+            revision_window.c.revision_id >= revisions[0].revision_id
+        ).filter(
+            revision_window.c.revision_id <= revisions[-1].revision_id
+        ).order_by(
+            revision_window.c.revision_id,
+            comment_revision.revision_id,
+        )
+        comment_ids = {}  # type: typing.Dict[int, typing.List[int]]
+        for revision_id, comment_id in rows:
+            comment_ids.setdefault(revision_id, []).append(comment_id)
+        return comment_ids
+
+    def _get_revisions_comment_ids_without_window(
+            self,
+            content: Content,
+            revisions: typing.List[ContentRevisionRO],
+            next_revision: typing.Optional[ContentRevisionRO],
+    ) -> typing.Dict[int, typing.List[int]]:
+        """
+        Like _get_revisions_comment_ids() for databases without window
+        functions (MySQL < 8.0): intervals between revisions are computed
+        from given sorted revisions, comments are loaded with one query
+        and dispatched to intervals.
+        """
+        comment_revision = aliased(ContentRevisionRO)
+        comment = aliased(Content)
+        first_revision = revisions[0]
+        comments_query = self._session.query(
+            comment_revision.revision_id,
+            comment_revision.created,
+            comment_revision.content_id,
+        ).join(
+            comment,
+            comment.cached_revision_id == comment_revision.revision_id,
+        ).filter(
+            comment_revision.parent_id == content.content_id,
+            comment_revision.type == content_type_list.Comment.slug,
+            comment_revision.is_deleted == False,
+            comment_revision.is_archived == False,
+            or_(
+                comment_revision.created > first_revision.updated,
+                comment_revision.revision_id > first_revision.revision_id,
+            ),
+        ).order_by(comment_revision.revision_id)
+        if next_revision:
+            comments_query = comments_query.filter(or_(
+                comment_revision.created < next_revision.updated,
+                comment_revision.revision_id < next_revision.revision_id,
+            ))
+        intervals = list(zip(revisions, revisions[1:] + [next_revision]))
+        comment_ids = {}  # type: typing.Dict[int, typing.List[int]]
+        for comment_revision_id, created, comment_id in comments_query:
+            # INFO - G.M - 2018-12-27 - same conditions as the join of
+            # _get_revisions_comment_ids()
+            for revision, following_revision in intervals:
+                if created <= revision.updated \
+                        and comment_revision_id <= revision.revision_id:
+                    continue
+                if following_revision \
+                        and created >= following_revision.updated \
+                        and comment_revision_id >= following_revision.revision_id:  # nopep8
+                    continue
+                comment_ids.setdefault(revision.revision_id, []).append(
+                    comment_id
+                )
+        return comment_ids
+
     def _get_revision_join(self) -> sqlalchemy.sql.elements.BooleanClauseList:
         """
         Return the Content/ContentRevision query join condition
         :return: Content/ContentRevision query join condition
         """
+        # INFO - G.M - 2018-12-03 - Join on materialized current revision
+        # pointer instead of searching last revision with a correlated
+        # subquery, this allow database to use primary key index.
         return and_(Content.id == ContentRevisionRO.content_id,
-                    ContentRevisionRO.revision_id == self._session.query(
-                        ContentRevisionRO.revision_id)
-                    .filter(ContentRevisionRO.content_id == Content.id)
-                    .order_by(ContentRevisionRO.revision_id.desc())
-                    .limit(1)
-                    .correlate(Content))
+                    Content.cached_revision_id == ContentRevisionRO.revision_id)
 
     def get_canonical_query(self) -> Query:
         """
@@ -337,6 +604,7 @@ class ContentApi(object):
     def _hard_filtered_base_query(
         self,
         workspace: Workspace=None,
+        content_ids: typing.Optional[sqlalchemy.sql.expression.Selectable]=None,  # nopep8
     ) -> Query:
         """
         If set to True, then filterign on is_deleted and is_archived will also
@@ -344,30 +612,40 @@ class ContentApi(object):
         also search in comments (for example) which may be 'not deleted' while
         the associated content is deleted
 
-        :param hard_filtering:
+        :param workspace: only contents of this workspace if given
+        :param content_ids: ids of candidate contents (as select), ancestors
+        are checked from them. All contents if not given.
         :return:
         """
         result = self.__real_base_query(workspace)
-
+        if self._show_deleted and self._show_archived and self._show_temporary:  # nopep8
+            return result
+
+        # INFO - G.M - 2018-12-21 - Content.is_* expressions are attributes
+        # of current revision, so filters apply to content itself.
+        if content_ids is None:
+            content_ids = self.__real_base_query(workspace)\
+                .with_entities(Content.id)\
+                .subquery()
+        ancestors = self._get_content_ancestors_query(content_ids)
+        unavailable_conditions = []
         if not self._show_deleted:
-            parent = aliased(Content)
-            result = result.join(parent, Content.parent).\
-                filter(Content.is_deleted==False).\
-                filter(parent.is_deleted==False)
-
+            result = result.filter(Content.is_deleted == False)
+            unavailable_conditions.append(ancestors.c.is_deleted == True)
         if not self._show_archived:
-            parent = aliased(Content)
-            result = result.join(parent, Content.parent).\
-                filter(Content.is_archived==False).\
-                filter(parent.is_archived==False)
-
+            result = result.filter(Content.is_archived == False)
+            unavailable_conditions.append(ancestors.c.is_archived == True)
         if not self._show_temporary:
-            parent = aliased(Content)
-            result = result.join(parent, Content.parent). \
-                filter(Content.is_temporary == False). \
-                filter(parent.is_temporary == False)
+            result = result.filter(Content.is_temporary == False)
+            unavailable_conditions.append(ancestors.c.is_temporary == True)
 
-        return result
+        # INFO - G.M - 2018-12-27 - Contents with a deleted, archived or
+        # temporary ancestor are excluded too. Ancestors are walked up from
+        # candidate contents only, contents at workspace root have none and
+        # are kept.
+        unavailable_ids = self._session.query(ancestors.c.content_id)\
+            .filter(or_(*unavailable_conditions))
+        return result.filter(Content.id.notin_(unavailable_ids.subquery()))
 
     def get_base_query(
         self,
@@ -963,6 +1241,7 @@ class ContentApi(object):
         :param file_extension: file extension of the file
         :return: preview_path as string
         """
+        self._check_revision_preview_ready(revision_id)
         try:
             file_path = self.get_one_revision_filepath(revision_id)
             page_number = preview_manager_page_format(page_number)
@@ -1015,6 +1294,7 @@ class ContentApi(object):
                 :param file_extension: file extension of the file
         :return: path of the full pdf preview of this revision
         """
+        self._check_revision_preview_ready(revision_id)
         try:
             file_path = self.get_one_revision_filepath(revision_id)
             pdf_preview_path = self.preview_manager.get_pdf_preview(file_path, file_ext=file_extension)  # nopep8
@@ -1073,6 +1353,7 @@ class ContentApi(object):
         :param height: height in pixel
         :return: preview_path as string
         """
+        self._check_revision_preview_ready(revision_id)
         try:
             file_path = self.get_one_revision_filepath(revision_id)
             page_number = preview_manager_page_format(page_number)
@@ -1239,24 +1520,99 @@ class ContentApi(object):
         order_by_properties = order_by_properties or []  # FDV
         return self._get_all_query(parent_ids, content_type, workspace, label, order_by_properties, complete_path_to_id).all()
 
-    # TODO - G.M - 2018-07-17 - [Cleanup] Drop this method if unneeded
-    # def get_children(self, parent_id: int, content_types: list, workspace: Workspace=None) -> typing.List[Content]:
-    #     """
-    #     Return parent_id childs of given content_types
-    #     :param parent_id: parent id
-    #     :param content_types: list of types
-    #     :param workspace: workspace filter
-    #     :return: list of content
-    #     """
-    #     resultset = self._base_query(workspace)
-    #     resultset = resultset.filter(Content.type.in_(content_types))
-    #
-    #     if parent_id:
-    #         resultset = resultset.filter(Content.parent_id==parent_id)
-    #     if parent_id is False:
-    #         resultset = resultset.filter(Content.parent_id == None)
-    #
-    #     return resultset.all()
+    def get_all_with_file_size(
+            self,
+            parent_ids: typing.List[int]=None,
+            content_type: str=content_type_list.Any_SLUG,
+            workspace: Workspace=None,
+    ) -> typing.List[typing.Tuple[Content, typing.Optional[int]]]:
+        """
+        Return all content using some filters, like get_all(), with their
+        current revision already loaded and the size of their file (None if
+        not known yet from preview metadata), all in one query.
+        Useful to list many contents without one query (or one depot access)
+        by content.
+        :param parent_ids: filter by parent_id
+        :param content_type: filter by content_type slug
+        :param workspace: filter by workspace
+        :return: List of (content, file size) tuples
+        """
+        return self._get_all_query(parent_ids, content_type, workspace)\
+            .options(contains_eager(Content.current_revision))\
+            .outerjoin(
+                RevisionPreviewMetadata,
+                RevisionPreviewMetadata.revision_id == ContentRevisionRO.revision_id,  # nopep8
+            )\
+            .add_columns(RevisionPreviewMetadata.size)\
+            .all()
+
+    def get_last_comment_revision_ids(
+            self,
+            content_ids: typing.List[int],
+    ) -> typing.Dict[int, int]:
+        """
+        Return id of the most recent comment revision of each given content,
+        in one query. Any comment creation or modification change it.
+        Contents without comment are not in result.
+        :param content_ids: ids of commented contents
+        :return: dict of content_id: last comment revision_id
+        """
+        if not content_ids:
+            return {}
+        query = self._session.query(
+            ContentRevisionRO.parent_id,
+            func.max(ContentRevisionRO.revision_id),
+        ).filter(
+            ContentRevisionRO.parent_id.in_(content_ids),
+            ContentRevisionRO.type == content_type_list.Comment.slug,
+        ).group_by(ContentRevisionRO.parent_id)
+        return dict(query.all())
+
+    def get_children(
+            self,
+            parent_ids: typing.List[int],
+            content_types: typing.Optional[typing.List[str]] = None,
+            content_statuses: typing.Optional[typing.List[str]] = None,
+            only_active: bool = False,
+            order_by_properties: typing.Optional[typing.List[typing.Union[str, QueryableAttribute]]] = None,  # nopep8
+    ) -> typing.List[Content]:
+        """
+        Return direct children of given contents, according to current
+        revision only: old revisions of children are never loaded. Current
+        revision of children and its owner (needed by content serializers)
+        are loaded by the same query.
+        :param parent_ids: ids of parent contents
+        :param content_types: filter by content type slugs
+        :param content_statuses: filter by content status slugs
+        :param only_active: exclude deleted and archived children even if
+        api show them
+        :param order_by_properties: sort children, by current revision if
+        not given
+        :return: list of children contents
+        """
+        if not parent_ids:
+            return []
+        query = self._base_query().filter(
+            ContentRevisionRO.parent_id.in_(parent_ids),
+        ).options(
+            contains_eager(Content.current_revision)
+            .joinedload(ContentRevisionRO.owner),
+        )
+        if content_types:
+            query = query.filter(ContentRevisionRO.type.in_(content_types))
+        if content_statuses:
+            query = query.filter(
+                ContentRevisionRO.status.in_(content_statuses),
+            )
+        if only_active:
+            query = query.filter(
+                ContentRevisionRO.is_deleted == False,
+                ContentRevisionRO.is_archived == False,
+            )
+        order_by_properties = order_by_properties or [ContentRevisionRO.revision_id]  # nopep8
+        for _property in order_by_properties:
+            query = query.order_by(_property)
+        return query.all()
 
     # TODO - G.M - 2018-07-17 - [Cleanup] Drop this method if unneeded
     # TODO find an other name to filter on is_deleted / is_archived
@@ -1348,39 +1704,60 @@ class ContentApi(object):
                 )
             )
 
-        resultset = resultset.order_by(desc(ContentRevisionRO.updated), desc(ContentRevisionRO.revision_id), desc(ContentRevisionRO.content_id))
-
-        active_contents = []
-        too_recent_content = []
-        before_content_find = False
-        for content in resultset:
-            related_active_content = None
-            if content_type_list.Comment.slug == content.type:
-                related_active_content = content.parent
-            else:
-                related_active_content = content
-
-            # INFO - G.M - 2018-08-10 - re-apply general filters here to avoid
-            # issue with comments
-            if not self._show_deleted and related_active_content.is_deleted:
-                continue
-            if not self._show_archived and related_active_content.is_archived:
-                continue
-
-            if related_active_content not in active_contents and related_active_content not in too_recent_content:  # nopep8
-
-                if not before_content or before_content_find:
-                    active_contents.append(related_active_content)
-                else:
-                    too_recent_content.append(related_active_content)
-
-                if before_content and related_active_content == before_content:
-                    before_content_find = True
+        # INFO - G.M - 2018-12-05 - Comments activity is activity of their
+        # parent content: group revisions by "active content" (parent of
+        # comment or content itself) and keep most recent update date.
+        active_content_id = case(
+            [(Content.type == content_type_list.Comment.slug, Content.parent_id)],  # nopep8
+            else_=Content.content_id,
+        )
+        last_active_subquery = resultset.with_entities(
+            active_content_id.label('active_content_id'),
+            func.max(ContentRevisionRO.updated).label('last_updated'),
+        ).group_by(active_content_id).subquery()
+
+        active_contents_query = self.get_canonical_query().join(
+            last_active_subquery,
+            last_active_subquery.c.active_content_id == Content.id,
+        )
+        # INFO - G.M - 2018-08-10 - re-apply general filters here to avoid
+        # issue with comments
+        if not self._show_deleted:
+            active_contents_query = active_contents_query.filter(
+                Content.is_deleted == False
+            )
+        if not self._show_archived:
+            active_contents_query = active_contents_query.filter(
+                Content.is_archived == False
+            )
 
-            if limit and len(active_contents) >= limit:
-                break
+        # INFO - G.M - 2018-12-05 - Keyset pagination on
+        # (last_updated, content_id): only return contents less recently
+        # active than before_content.
+        if before_content:
+            before_content_last_updated = active_contents_query\
+                .with_entities(last_active_subquery.c.last_updated)\
+                .filter(Content.id == before_content.content_id)\
+                .scalar()
+            if before_content_last_updated is None:
+                return []
+            active_contents_query = active_contents_query.filter(
+                or_(
+                    last_active_subquery.c.last_updated < before_content_last_updated,  # nopep8
+                    and_(
+                        last_active_subquery.c.last_updated == before_content_last_updated,  # nopep8
+                        Content.id < before_content.content_id,
+                    )
+                )
+            )
 
-        return active_contents
+        active_contents_query = active_contents_query.order_by(
+            desc(last_active_subquery.c.last_updated),
+            desc(Content.id),
+        )
+        if limit:
+            active_contents_query = active_contents_query.limit(limit)
+        return active_contents_query.all()
 
     # TODO - G.M - 2018-07-19 - Find a way to update this method to something
     # usable and efficient for tracim v2 to get content with read/unread status
@@ -1565,31 +1942,514 @@ class ContentApi(object):
             rev.workspace = workspace
             rev.file_name = filename
             rev.revision_type = ActionDescription.COPY
-            rev.properties['origin'] = {
+            # INFO - G.M - 2018-12-27 - properties are decoded from json on
+            # each access: changed dict must be set back to be saved.
+            properties = rev.properties
+            properties['origin'] = {
                 'content': item.id,
                 'revision': item.last_revision.revision_id,
             }
+            rev.properties = properties
         if do_save:
             self.save(content, ActionDescription.COPY, do_notify=do_notify)
         return content
 
     def copy_children(self, origin_content: Content, new_content: Content):
-        for child in origin_content.children:
-            self.copy(child, new_content)
+        """
+        Copy all descendants of origin_content into new_content, see
+        copy_descendants(). Large trees are copied by content tree operation
+        daemon once transaction is committed, see
+        _run_content_tree_operation().
+        """
+        self._run_content_tree_operation(
+            'copy_descendants',
+            origin_content,
+            new_content,
+        )
 
     def move_recursively(self, item: Content,
                          new_parent: Content, new_workspace: Workspace):
-        self.move(item, new_parent, False, new_workspace)
+        """
+        Move item to new_workspace, with all its descendants, see
+        move_tree(). Large trees are moved by content tree operation daemon
+        once transaction is committed: until then, item and its descendants
+        stay in place, in the same workspace.
+        """
+        if self._is_content_tree_operation_in_background(item):
+            # INFO - G.M - 2018-12-27 - Check move now, errors are reported
+            # to user instead of failing job.
+            if new_parent and \
+                    new_parent.workspace_id != new_workspace.workspace_id:
+                raise WorkspacesDoNotMatch(
+                    'new parent workspace and new workspace should be the same.'  # nopep8
+                )
+            self._is_filename_available_or_raise(
+                item.file_name,
+                new_workspace,
+                new_parent,
+                exclude_content_id=item.content_id
+            )
+            self._schedule_content_tree_operation(
+                'move_tree',
+                [item, new_parent],
+                new_workspace,
+            )
+            return
+        self.move_tree(item, new_parent, new_workspace)
+
+    def move_tree(
+            self,
+            item: Content,
+            new_parent: typing.Optional[Content],
+            new_workspace: Workspace,
+    ) -> None:
+        """
+        Move item to new_workspace with a new revision, then all its
+        descendants, see move_descendants().
+        """
+        with new_revision(
+            session=self._session,
+            tm=transaction.manager,
+            content=item,
+        ):
+            self.move(item, new_parent, False, new_workspace)
         self.save(item, do_notify=False)
+        self.move_descendants(item)
+
+    def _is_content_tree_operation_in_background(self, content: Content) -> bool:  # nopep8
+        """
+        Content tree operations are run by content tree operation daemon if
+        processing mode is async and content has more than
+        CONTENT_TREE_OPERATION_BACKGROUND_THRESHOLD descendants.
+        """
+        threshold = self._config.CONTENT_TREE_OPERATION_BACKGROUND_THRESHOLD
+        return self._config.CONTENT_TREE_OPERATION_PROCESSING_MODE == self._config.CST.ASYNC \
+            and threshold \
+            and self.get_descendants_count(content) > threshold  # nopep8
+
+    def _run_content_tree_operation(
+            self,
+            operation: str,
+            content: Content,
+            *other_contents: Content
+    ) -> None:
+        """
+        Run content tree operation on content, now or by content tree
+        operation daemon, see _is_content_tree_operation_in_background().
+        :param operation: copy_descendants
+        :param content: content whose descendants are copied
+        :param other_contents: other parameters of operation
+        """
+        if self._is_content_tree_operation_in_background(content):
+            self._schedule_content_tree_operation(
+                operation,
+                [content] + list(other_contents),
+            )
+            return
+        getattr(self, operation)(content, *other_contents)
+
+    def _schedule_content_tree_operation(
+            self,
+            operation: str,
+            contents: typing.List[typing.Optional[Content]],
+            workspace: typing.Optional[Workspace]=None,
+    ) -> None:
+        """
+        Run operation with given contents (then workspace) by content tree
+        operation daemon, once transaction is committed.
+        """
+        # INFO - G.M - 2018-12-17 - contents must be in database
+        # for the daemon.
+        self._session.flush()
+        schedule_content_tree_operation(
+            self._config,
+            self._session,
+            operation,
+            self._user.user_id if self._user else None,
+            [content.content_id if content else None for content in contents],
+            workspace.workspace_id if workspace else None,
+        )
+
+    def get_descendants_count(self, content: Content) -> int:
+        """
+        Get number of descendants of content, deleted and archived ones
+        included, with one recursive query.
+        """
+        # INFO - G.M - 2018-12-17 - Pending changes must be in database
+        # before running set-based statements
+        self._session.flush()
+        content_tree = self._get_content_tree_query(
+            [content.content_id],
+            only_active=False,
+        )
+        return self._session.query(
+            func.count(content_tree.c.content_id)
+        ).filter(
+            content_tree.c.content_id != content.content_id
+        ).scalar()
+
+    def move_descendants(self, content: Content) -> None:
+        """
+        Move all descendants of content, deleted and archived ones included,
+        to the workspace of content, with set-based statements instead of
+        one new_revision() by descendant: one "move" revision by descendant
+        is inserted with one INSERT ... SELECT. New revisions share file
+        (and preview metadata) of previous revisions.
+        :param content: content already moved, see move_tree()
+        """
+        self._session.flush()
+        revision_table = ContentRevisionRO.__table__
+        content_tree = self._get_content_tree_query(
+            [content.content_id],
+            only_active=False,
+        )
+        descendants = self._session.query(
+            content_tree.c.content_id,
+            ContentRevisionRO.workspace_id,
+            ContentRevisionRO.depot_file,
+        ).join(
+            ContentRevisionRO,
+            ContentRevisionRO.revision_id == content_tree.c.revision_id,
+        ).filter(
+            content_tree.c.content_id != content.content_id
+        ).all()
+        if not descendants:
+            return
+
+        previous_revision = revision_table.alias('previous_revision')
+        names, columns = self._get_revision_clone_columns(
+            previous_revision,
+            workspace_id=content.workspace_id,
+            revision_type=ActionDescription.MOVE,
+            updated=datetime.datetime.utcnow(),
+        )
+        self._session.execute(revision_table.insert().from_select(
+            names,
+            sqlalchemy.select(columns).select_from(
+                content_tree.join(
+                    previous_revision,
+                    previous_revision.c.revision_id == content_tree.c.revision_id,  # nopep8
+                )
+            ).where(
+                content_tree.c.content_id != content.content_id
+            ).order_by(content_tree.c.content_id)
+        ))
+        # INFO - G.M - 2018-12-17 - content tree query use current revisions
+        # (cached_revision_id): it must be used before they are updated.
+        new_revision = revision_table.alias('new_revision')
+        self._copy_revisions_preview_metadata(
+            sqlalchemy.select([
+                content_tree.c.revision_id.label('source_revision_id'),
+                new_revision.c.revision_id.label('revision_id'),
+            ]).select_from(
+                content_tree.join(
+                    new_revision,
+                    and_(
+                        new_revision.c.content_id == content_tree.c.content_id,  # nopep8
+                        new_revision.c.revision_id > content_tree.c.revision_id,  # nopep8
+                    )
+                )
+            ).where(
+                content_tree.c.content_id != content.content_id
+            )
+        )
+        descendant_ids = [descendant.content_id for descendant in descendants]
+        self._update_cached_revision_ids(descendant_ids)
+        increment_depot_blobs_ref_count(
+            self._session,
+            [descendant.depot_file for descendant in descendants],
+        )
+        increment_workspaces_content_tree_generation(
+            self._session,
+            [content.workspace_id] + [
+                descendant.workspace_id for descendant in descendants
+            ],
+        )
+        if self._user:
+            self._mark_read_content_ids([content.content_id])
+        self._expire_contents(descendant_ids)
+        self._session.expire(content, ['children_revisions'])
 
-        for child in item.children:
-            with new_revision(
-                session=self._session,
-                tm=transaction.manager,
-                content=child
-            ):
-                self.move_recursively(child, item, new_workspace)
-        return
+    def copy_descendants(
+            self,
+            origin_content: Content,
+            new_content: Content,
+    ) -> None:
+        """
+        Copy all descendants of origin_content, deleted and archived ones
+        included, into new_content, with set-based statements instead of
+        one copy() by descendant. Like copy(), all revisions of descendants
+        are copied, then a "copy" revision is added to each copy. Copied
+        revisions share files (and preview metadata) of origin revisions.
+        :param origin_content: copied content
+        :param new_content: copy of origin_content, see copy()
+        """
+        self._session.flush()
+        revision_table = ContentRevisionRO.__table__
+        origin_id = origin_content.content_id
+        content_tree = self._get_content_tree_query(
+            [origin_id],
+            only_active=False,
+        )
+        current_revision = revision_table.alias('current_revision')
+        origins = self._session.execute(
+            sqlalchemy.select([
+                content_tree.c.content_id,
+                current_revision.c.revision_id,
+                current_revision.c.parent_id,
+                current_revision.c.properties,
+                current_revision.c.depot_file,
+            ]).select_from(
+                content_tree.join(
+                    current_revision,
+                    current_revision.c.revision_id == content_tree.c.revision_id,  # nopep8
+                )
+            ).where(
+                content_tree.c.content_id != origin_id
+            ).order_by(content_tree.c.content_id)
+        ).fetchall()
+        if not origins:
+            return
+        history_revision = revision_table.alias('history_revision')
+        depot_files = [
+            row.depot_file for row in self._session.execute(
+                sqlalchemy.select([history_revision.c.depot_file]).select_from(
+                    content_tree.join(
+                        history_revision,
+                        history_revision.c.content_id == content_tree.c.content_id,  # nopep8
+                    )
+                ).where(
+                    content_tree.c.content_id != origin_id
+                ).where(history_revision.c.depot_file != None)
+            )
+        ] + [origin.depot_file for origin in origins if origin.depot_file]
+
+        # INFO - G.M - 2018-12-27 - Origin -> copy mapping is kept from
+        # ids of inserted copies, next statements are run once by copy
+        # (executemany) with it.
+        copy_ids = self._insert_content_copies(
+            [origin.revision_id for origin in origins]
+        )
+        copy_id_by_origin_id = {origin_id: new_content.content_id}
+        for origin, copy_id in zip(origins, copy_ids):
+            copy_id_by_origin_id[origin.content_id] = copy_id
+        copies = []
+        for origin, copy_id in zip(origins, copy_ids):
+            # INFO - G.M - 2018-12-27 - Like copy(), "copy" revision keep
+            # origin of copy in its properties. Json properties can't be
+            # changed in sql on all supported databases.
+            properties = json.loads(origin.properties) \
+                if origin.properties else {}
+            properties['origin'] = {
+                'content': origin.content_id,
+                'revision': origin.revision_id,
+            }
+            copies.append({
+                'b_origin_id': origin.content_id,
+                'b_origin_revision_id': origin.revision_id,
+                'b_content_id': copy_id,
+                'b_parent_id': copy_id_by_origin_id[origin.parent_id],
+                'b_properties': json.dumps(properties),
+            })
+
+        # INFO - G.M - 2018-12-17 - Like Content.copy(), all revisions are
+        # copied into current parent copy.
+        names, columns = self._get_revision_clone_columns(
+            history_revision,
+            content_id=sqlalchemy.bindparam('b_content_id', type_=Integer),
+            parent_id=sqlalchemy.bindparam('b_parent_id', type_=Integer),
+        )
+        self._session.execute(
+            revision_table.insert().from_select(
+                names,
+                sqlalchemy.select(columns).where(
+                    history_revision.c.content_id == sqlalchemy.bindparam('b_origin_id', type_=Integer)  # nopep8
+                ).order_by(history_revision.c.revision_id)
+            ),
+            copies,
+        )
+        names, columns = self._get_revision_clone_columns(
+            current_revision,
+            content_id=sqlalchemy.bindparam('b_content_id', type_=Integer),
+            parent_id=sqlalchemy.bindparam('b_parent_id', type_=Integer),
+            workspace_id=new_content.workspace_id,
+            revision_type=ActionDescription.COPY,
+            updated=datetime.datetime.utcnow(),
+            properties=sqlalchemy.bindparam(
+                'b_properties',
+                type_=current_revision.c.properties.type,
+            ),
+        )
+        self._session.execute(
+            revision_table.insert().from_select(
+                names,
+                sqlalchemy.select(columns).where(
+                    current_revision.c.revision_id == sqlalchemy.bindparam('b_origin_revision_id', type_=Integer)  # nopep8
+                )
+            ),
+            copies,
+        )
+        self._copy_revisions_preview_metadata(
+            sqlalchemy.select([
+                sqlalchemy.bindparam('b_origin_revision_id', type_=Integer)
+                .label('source_revision_id'),
+                sqlalchemy.select([
+                    func.max(revision_table.c.revision_id)
+                ]).where(
+                    revision_table.c.content_id == sqlalchemy.bindparam('b_content_id', type_=Integer)  # nopep8
+                ).as_scalar().label('revision_id'),
+            ]),
+            copies,
+        )
+        self._update_cached_revision_ids(copy_ids)
+        reindex_contents(self._session, copy_ids)
+        increment_depot_blobs_ref_count(self._session, depot_files)
+        increment_workspaces_content_tree_generation(
+            self._session,
+            [new_content.workspace_id],
+        )
+        if self._user:
+            self._mark_read_content_ids([new_content.content_id])
+        self._session.expire(new_content, ['children_revisions'])
+
+    def _insert_content_copies(
+            self,
+            origin_revision_ids: typing.List[int],
+    ) -> typing.List[int]:
+        """
+        Insert one content by given revision, pointing to this revision
+        until its own revisions are inserted, see copy_descendants().
+        :param origin_revision_ids: current revision ids of copied contents
+        :return: ids of inserted contents, in same order
+        """
+        content_table = Content.__table__
+        if not has_insert_returning(self._session.bind.dialect):
+            return [
+                self._session.execute(
+                    content_table.insert().values(cached_revision_id=revision_id)  # nopep8
+                ).inserted_primary_key[0]
+                for revision_id in origin_revision_ids
+            ]
+        # INFO - G.M - 2018-12-27 - Origin revisions are current revisions
+        # of distinct contents: they identify inserted contents of a batch.
+        copy_ids = []  # type: typing.List[int]
+        for start in range(0, len(origin_revision_ids), CONTENT_COPY_BATCH_SIZE):  # nopep8
+            batch = origin_revision_ids[start:start + CONTENT_COPY_BATCH_SIZE]
+            copy_id_by_revision_id = {
+                row.cached_revision_id: row.id
+                for row in self._session.execute(
+                    content_table.insert().values([
+                        {'cached_revision_id': revision_id}
+                        for revision_id in batch
+                    ]).returning(
+                        content_table.c.id,
+                        content_table.c.cached_revision_id,
+                    )
+                )
+            }
+            copy_ids.extend(
+                copy_id_by_revision_id[revision_id] for revision_id in batch
+            )
+        return copy_ids
+
+    @staticmethod
+    def _get_revision_clone_columns(
+            revision: sqlalchemy.sql.expression.FromClause,
+            **values: typing.Any
+    ) -> typing.Tuple[typing.List[str], typing.List[sqlalchemy.sql.expression.ColumnElement]]:  # nopep8
+        """
+        Get column names and columns to insert copies of revision rows with
+        insert().from_select(). revision_id is generated by database,
+        depot_file is copied as is: copies share file of revision.
+        :param revision: content_revisions table or alias
+        :param values: new values of columns, as python values or sql
+        expressions
+        :return: column names and select columns
+        """
+        names = []  # type: typing.List[str]
+        columns = []  # type: typing.List[sqlalchemy.sql.expression.ColumnElement]  # nopep8
+        for column in revision.c:
+            if column.name == 'revision_id':
+                continue
+            value = values.get(column.name, column)
+            if not isinstance(value, sqlalchemy.sql.expression.ClauseElement):
+                value = sqlalchemy.literal(value, column.type)
+            names.append(column.name)
+            columns.append(value.label(column.name))
+        return names, columns
+
+    def _copy_revisions_preview_metadata(
+            self,
+            revision_ids: sqlalchemy.sql.expression.Select,
+            params: typing.Optional[typing.List[typing.Dict[str, typing.Any]]]=None,  # nopep8
+    ) -> None:
+        """
+        Copy preview metadata of revisions to new revisions sharing their
+        file, with one INSERT ... SELECT.
+        :param revision_ids: select of (source_revision_id, revision_id)
+        rows.
+        :param params: if given, statement is executed once by parameters
+        of this list (executemany).
+        """
+        self._mark_preview_metadata_written()
+        metadata_table = RevisionPreviewMetadata.__table__
+        revision_ids = revision_ids.alias('revision_ids')
+        self._session.execute(metadata_table.insert().from_select(
+            [
+                'revision_id',
+                'page_nb',
+                'has_pdf_preview',
+                'has_jpeg_preview',
+                'size',
+                'mimetype',
+                'created',
+            ],
+            sqlalchemy.select([
+                revision_ids.c.revision_id,
+                metadata_table.c.page_nb,
+                metadata_table.c.has_pdf_preview,
+                metadata_table.c.has_jpeg_preview,
+                metadata_table.c.size,
+                metadata_table.c.mimetype,
+                sqlalchemy.literal(datetime.datetime.utcnow(), DateTime),
+            ]).select_from(
+                revision_ids.join(
+                    metadata_table,
+                    metadata_table.c.revision_id == revision_ids.c.source_revision_id,  # nopep8
+                )
+            )
+        ), params)
+
+    def _update_cached_revision_ids(self, content_ids: typing.List[int]) -> None:  # nopep8
+        """
+        Point contents to their last revision after revisions were inserted
+        with set-based statements, with one executemany update.
+        """
+        content_table = Content.__table__
+        revision_table = ContentRevisionRO.__table__
+        self._session.execute(
+            content_table.update().where(
+                content_table.c.id == sqlalchemy.bindparam('b_content_id')
+            ).values(
+                cached_revision_id=sqlalchemy.select([
+                    func.max(revision_table.c.revision_id)
+                ]).where(
+                    revision_table.c.content_id == content_table.c.id
+                ).as_scalar()
+            ),
+            [{'b_content_id': content_id} for content_id in content_ids],
+        )
+
+    def _expire_contents(self, content_ids: typing.List[int]) -> None:
+        """
+        Expire loaded contents changed by set-based statements.
+        """
+        for content_id in content_ids:
+            content = self._session.identity_map.get(
+                self._session.identity_key(Content, content_id)
+            )
+            if content is not None:
+                self._session.expire(content)
 
     def is_editable(self, item: Content) -> bool:
         return not item.is_readonly \
@@ -1810,6 +2670,556 @@ class ContentApi(object):
             logger.warning(self, traceback.format_exc())
             return False
 
+    def get_revision_file_size(
+            self,
+            revision: ContentRevisionRO,
+    ) -> typing.Optional[int]:
+        """
+        :return: size of revision file if available, None if unavailable
+        """
+        if not revision.depot_file:
+            return None
+        try:
+            return revision.depot_file.file.content_length
+        except IOError as e:
+            logger.warning(
+                self,
+                "IO Exception Occured when trying to get content size  : {}".format(str(e))  # nopep8
+            )
+            logger.warning(self, traceback.format_exc())
+        except Exception as e:
+            logger.warning(
+                self,
+                "Unknown Exception Occured when trying to get content size  : {}".format(str(e))  # nopep8
+            )
+            logger.warning(self, traceback.format_exc())
+        return None
+
+    def get_revision_preview_metadata(
+            self,
+            revision: ContentRevisionRO,
+    ) -> RevisionPreviewMetadata:
+        """
+        Get preview metadata (page number, preview availability, size and
+        mimetype) of a revision file. Metadata are read from process cache,
+        else from database. In sync mode, they are computed on save() of
+        revision, so computation (using depot and preview generator) is done
+        here only as a backfill, for revisions saved without metadata
+        (before this computation or when it failed).
+        :param revision: revision with a file
+        :return: preview metadata of revision
+        """
+        assert revision.revision_id is not None
+        metadata = preview_metadata_cache.get(revision.revision_id)
+        if metadata:
+            return metadata
+
+        metadata = self._session.query(RevisionPreviewMetadata)\
+            .get(revision.revision_id)
+        if not metadata and self._config.PREVIEW_PROCESSING_MODE != self._config.CST.SYNC:  # nopep8
+            # INFO - G.M - 2018-12-11 - previews are generated in background,
+            # do not block, return pending metadata without previews.
+            schedule_revision_previews(
+                self._config,
+                self._session,
+                revision.revision_id,
+            )
+            return RevisionPreviewMetadata(
+                revision_id=revision.revision_id,
+                page_nb=None,
+                has_pdf_preview=False,
+                has_jpeg_preview=False,
+                size=self.get_revision_file_size(revision),
+                mimetype=revision.file_mimetype,
+            )
+        if not metadata:
+            try:
+                metadata = self._compute_revision_preview_metadata(revision)
+            except Exception as exc:
+                # INFO - G.M - 2018-12-26 - Failure may be temporary (preview
+                # generator or depot error), do not store nor cache this
+                # result so it is computed again next time.
+                logger.warning(
+                    self,
+                    'Unable to compute preview metadata of revision {}: {}'.format(  # nopep8
+                        revision.revision_id,
+                        str(exc),
+                    )
+                )
+                logger.warning(self, traceback.format_exc())
+                return RevisionPreviewMetadata(
+                    revision_id=revision.revision_id,
+                    page_nb=None,
+                    has_pdf_preview=False,
+                    has_jpeg_preview=False,
+                    size=self.get_revision_file_size(revision),
+                    mimetype=revision.file_mimetype,
+                )
+            self._store_revision_preview_metadata(metadata)
+            return metadata
+        self._cache_revision_preview_metadata(metadata)
+        return metadata
+
+    def _save_revision_preview_metadata(
+            self,
+            revision: ContentRevisionRO,
+    ) -> None:
+        """
+        Compute and store preview metadata of a new revision. Failure is
+        only logged: saving the revision must not fail because of previews,
+        metadata are then computed on first read, see
+        get_revision_preview_metadata().
+        """
+        try:
+            metadata = self._compute_revision_preview_metadata(revision)
+        except Exception as exc:
+            logger.warning(
+                self,
+                'Unable to compute preview metadata of revision {}: {}'.format(  # nopep8
+                    revision.revision_id,
+                    str(exc),
+                )
+            )
+            logger.warning(self, traceback.format_exc())
+            return
+        self._store_revision_preview_metadata(metadata)
+
+    def _store_revision_preview_metadata(
+            self,
+            metadata: RevisionPreviewMetadata,
+    ) -> None:
+        """
+        Store computed preview metadata in database and, once transaction is
+        committed, in process cache.
+        """
+        self._session.add(metadata)
+        self._mark_preview_metadata_written()
+        self._cache_revision_preview_metadata(metadata)
+
+    def _cache_revision_preview_metadata(
+            self,
+            metadata: RevisionPreviewMetadata,
+    ) -> None:
+        # INFO - G.M - 2018-12-26 - Cache is filled only with committed
+        # metadata: a rolled back revision id may be reused by database.
+        if self._session.info.get(PREVIEW_METADATA_WRITTEN_SESSION_KEY):
+            call_after_commit(
+                self._session,
+                preview_metadata_cache.set,
+                metadata.revision_id,
+                metadata.copy(),
+            )
+        else:
+            preview_metadata_cache.set(metadata.revision_id, metadata.copy())
+
+    def _mark_preview_metadata_written(self) -> None:
+        """
+        Remember preview metadata were written in current transaction of
+        session, until it is committed: until then, metadata read from
+        database may not be committed and must not be cached yet.
+        """
+        if self._session.info.get(PREVIEW_METADATA_WRITTEN_SESSION_KEY):
+            return
+        self._session.info[PREVIEW_METADATA_WRITTEN_SESSION_KEY] = True
+        call_after_commit(
+            self._session,
+            self._session.info.pop,
+            PREVIEW_METADATA_WRITTEN_SESSION_KEY,
+            None,
+        )
+
+    def generate_revision_previews(
+            self,
+            revision: ContentRevisionRO,
+    ) -> RevisionPreviewMetadata:
+        """
+        Generate previews of a revision file: full pdf preview and jpg
+        preview of first page for each allowed dimension. Then store preview
+        metadata of the revision, which mark its previews as ready.
+        This is done by preview generator (local thread or daemon), out of
+        http requests. Errors are raised and nothing is stored, so
+        generation is tried again on next preview request.
+        :param revision: revision with a file
+        :return: preview metadata of revision
+        """
+        metadata = self._compute_revision_preview_metadata(revision)
+        if revision.depot_file:
+            file_path = self.get_one_revision_filepath(revision.revision_id)
+            if metadata.has_pdf_preview:
+                self.preview_manager.get_pdf_preview(
+                    file_path,
+                    file_ext=revision.file_extension,
+                )
+            if metadata.has_jpeg_preview:
+                for preview_dim in self._config.PREVIEW_JPG_ALLOWED_DIMS:
+                    self.preview_manager.get_jpeg_preview(
+                        file_path,
+                        page=0,
+                        width=preview_dim.width,
+                        height=preview_dim.height,
+                        file_ext=revision.file_extension,
+                    )
+        self._session.add(metadata)
+        return metadata
+
+    def _check_revision_preview_ready(self, revision_id: int) -> None:
+        """
+        When previews are generated in background, raise PreviewNotReady
+        if previews of revision are not generated yet.
+        """
+        if self._config.PREVIEW_PROCESSING_MODE == self._config.CST.SYNC:
+            return
+        if preview_metadata_cache.get(revision_id):
+            return
+        if self._session.query(RevisionPreviewMetadata).get(revision_id):
+            return
+        # INFO - G.M - 2018-12-11 - Schedule generation again in case it was
+        # never done (file uploaded before background generation was enabled
+        # for example), preview generator ignore already generated previews.
+        schedule_revision_previews(self._config, self._session, revision_id)
+        raise PreviewNotReady(
+            'Preview of revision {} is not ready yet'.format(revision_id)
+        )
+
+    def _compute_revision_preview_metadata(
+            self,
+            revision: ContentRevisionRO,
+    ) -> RevisionPreviewMetadata:
+        """
+        Compute preview metadata of revision file. Unlike
+        get_preview_page_nb(), has_pdf_preview() and has_jpeg_preview(),
+        errors (other than unsupported file type) are raised: a result
+        computed from a failure must not be stored.
+        """
+        if not revision.depot_file:
+            return RevisionPreviewMetadata(
+                revision_id=revision.revision_id,
+                page_nb=None,
+                has_pdf_preview=False,
+                has_jpeg_preview=False,
+                size=None,
+                mimetype=revision.file_mimetype,
+            )
+        file_path = self.get_one_revision_filepath(revision.revision_id)
+        file_extension = revision.file_extension
+        try:
+            page_nb = self.preview_manager.get_page_nb(
+                file_path,
+                file_ext=file_extension,
+            )
+        except UnsupportedMimeType:
+            page_nb = None
+        try:
+            has_pdf_preview = self.preview_manager.has_pdf_preview(
+                file_path,
+                file_ext=file_extension,
+            )
+        except UnsupportedMimeType:
+            has_pdf_preview = False
+        try:
+            has_jpeg_preview = self.preview_manager.has_jpeg_preview(
+                file_path,
+                file_ext=file_extension,
+            )
+        except UnsupportedMimeType:
+            has_jpeg_preview = False
+        return RevisionPreviewMetadata(
+            revision_id=revision.revision_id,
+            page_nb=page_nb,
+            has_pdf_preview=has_pdf_preview,
+            has_jpeg_preview=has_jpeg_preview,
+            size=revision.depot_file.file.content_length,
+            mimetype=revision.file_mimetype,
+        )
+
+    def _get_content_tree_query(
+            self,
+            content_ids: typing.List[int],
+            recursive: bool=True,
+            only_active: bool=True,
+    ) -> sqlalchemy.sql.expression.FromClause:
+        """
+        Get a (recursive) query on given contents and all their valid
+        (not deleted, not archived) descendants.
+        Columns of the query are:
+        - root_id: id of the given content the row descends from
+        - content_id: id of the content or of one of its descendants
+        - revision_id: current revision id of content_id
+        :param content_ids: ids of root contents
+        :param recursive: include descendants of contents
+        :param only_active: if False, deleted and archived descendants (and
+        their descendants) are included too
+        :return: query usable as a table
+        """
+        if not has_recursive_cte(self._session.bind.dialect):
+            return self._get_content_tree_levels_query(
+                content_ids,
+                recursive=recursive,
+                only_active=only_active,
+            )
+        child_revision = aliased(ContentRevisionRO)
+        child = aliased(Content)
+        content_tree = self._session.query(
+            Content.id.label('root_id'),
+            Content.id.label('content_id'),
+            Content.cached_revision_id.label('revision_id'),
+        ).filter(
+            Content.id.in_(content_ids)
+        ).cte(name='content_tree', recursive=recursive)
+        if not recursive:
+            return content_tree
+        children = self._session.query(
+            content_tree.c.root_id,
+            child.id,
+            child.cached_revision_id,
+        ).join(
+            child_revision,
+            child_revision.parent_id == content_tree.c.content_id,
+        ).join(
+            child,
+            and_(
+                child.id == child_revision.content_id,
+                child.cached_revision_id == child_revision.revision_id,
+            )
+        )
+        if only_active:
+            children = children.filter(
+                child_revision.is_deleted == False
+            ).filter(
+                child_revision.is_archived == False
+            )
+        return content_tree.union_all(children)
+
+    def _get_content_tree_levels_query(
+            self,
+            content_ids: typing.List[int],
+            recursive: bool=True,
+            only_active: bool=True,
+    ) -> sqlalchemy.sql.expression.Alias:
+        """
+        Same as _get_content_tree_query() for databases without recursive
+        common table expressions (MySQL < 8.0): descendants are found with
+        one query by tree level, then the query selects them by id.
+        """
+        # INFO - G.M - 2018-12-26 - A content is in tree of each given
+        # content it descends from, keep (root_id, content_id) pairs.
+        level = [
+            (content_id, content_id) for content_id, in
+            self._session.query(Content.id).filter(Content.id.in_(content_ids))  # nopep8
+        ]
+        tree = list(level)
+        while recursive and level:
+            children = self._session.query(
+                Content.id,
+                ContentRevisionRO.parent_id,
+            ).join(
+                ContentRevisionRO,
+                Content.cached_revision_id == ContentRevisionRO.revision_id,
+            ).filter(
+                ContentRevisionRO.parent_id.in_(
+                    set(content_id for _, content_id in level)
+                )
+            )
+            if only_active:
+                children = children.filter(
+                    ContentRevisionRO.is_deleted == False
+                ).filter(
+                    ContentRevisionRO.is_archived == False
+                )
+            children_ids = {}  # type: typing.Dict[int, typing.List[int]]
+            for child_id, parent_id in children:
+                children_ids.setdefault(parent_id, []).append(child_id)
+            level = [
+                (root_id, child_id)
+                for root_id, content_id in level
+                for child_id in children_ids.get(content_id, [])
+            ]
+            tree.extend(level)
+
+        tree_content_ids = {}  # type: typing.Dict[int, typing.List[int]]
+        for root_id, content_id in tree:
+            tree_content_ids.setdefault(root_id, []).append(content_id)
+        roots = [
+            sqlalchemy.select([
+                sqlalchemy.literal(root_id, Integer).label('root_id'),
+                Content.id.label('content_id'),
+                Content.cached_revision_id.label('revision_id'),
+            ]).where(Content.id.in_(root_content_ids))
+            for root_id, root_content_ids in tree_content_ids.items()
+        ] or [
+            sqlalchemy.select([
+                Content.id.label('root_id'),
+                Content.id.label('content_id'),
+                Content.cached_revision_id.label('revision_id'),
+            ]).where(sqlalchemy.false())
+        ]
+        return sqlalchemy.union_all(*roots).alias('content_tree')
+
+    def _get_content_ancestors_query(
+            self,
+            content_ids: typing.Union[typing.List[int], sqlalchemy.sql.expression.Selectable],  # nopep8
+    ) -> sqlalchemy.sql.expression.FromClause:
+        """
+        Get query of ancestors of given contents (parent, parent of parent,
+        and so on up to workspace root). Rows are:
+        - content_id: id of the given content
+        - ancestor_id: id of one of its ancestors
+        - is_deleted, is_archived, is_temporary: state of current revision
+        of the ancestor
+        Ancestors are walked up from given contents with primary keys only.
+        :param content_ids: ids of contents
+        """
+        if not has_recursive_cte(self._session.bind.dialect):
+            return self._get_content_ancestors_levels_query(content_ids)
+        content_revision = aliased(ContentRevisionRO)
+        parent = aliased(Content)
+        parent_revision = aliased(ContentRevisionRO)
+        ancestors = self._session.query(
+            Content.id.label('content_id'),
+            parent.id.label('ancestor_id'),
+            parent_revision.parent_id.label('ancestor_parent_id'),
+            parent_revision.is_deleted.label('is_deleted'),
+            parent_revision.is_archived.label('is_archived'),
+            parent_revision.is_temporary.label('is_temporary'),
+        ).join(
+            content_revision,
+            content_revision.revision_id == Content.cached_revision_id,
+        ).join(
+            parent,
+            parent.id == content_revision.parent_id,
+        ).join(
+            parent_revision,
+            parent_revision.revision_id == parent.cached_revision_id,
+        ).filter(
+            Content.id.in_(content_ids)
+        ).cte(name='content_ancestors', recursive=True)
+        parents = self._session.query(
+            ancestors.c.content_id,
+            parent.id,
+            parent_revision.parent_id,
+            parent_revision.is_deleted,
+            parent_revision.is_archived,
+            parent_revision.is_temporary,
+        ).join(
+            parent,
+            parent.id == ancestors.c.ancestor_parent_id,
+        ).join(
+            parent_revision,
+            parent_revision.revision_id == parent.cached_revision_id,
+        )
+        return ancestors.union_all(parents)
+
+    def _get_content_ancestors_levels_query(
+            self,
+            content_ids: typing.Union[typing.List[int], sqlalchemy.sql.expression.Selectable],  # nopep8
+    ) -> sqlalchemy.sql.expression.Alias:
+        """
+        Same as _get_content_ancestors_query() for databases without
+        recursive common table expressions (MySQL < 8.0): ancestors are
+        found with one query by tree level, then the query selects them by
+        id.
+        """
+        def get_parent_ids(
+                ids: typing.Union[typing.Iterable[int], sqlalchemy.sql.expression.Selectable],  # nopep8
+        ) -> typing.Dict[int, int]:
+            return dict(self._session.query(
+                Content.id,
+                ContentRevisionRO.parent_id,
+            ).join(
+                ContentRevisionRO,
+                ContentRevisionRO.revision_id == Content.cached_revision_id,
+            ).filter(
+                Content.id.in_(ids)
+            ).filter(
+                ContentRevisionRO.parent_id != None
+            ))
+
+        # INFO - G.M - 2018-12-27 - keep (content_id, ancestor_id) pairs
+        level = list(get_parent_ids(content_ids).items())
+        ancestors = list(level)
+        while level:
+            parent_ids = get_parent_ids(
+                set(ancestor_id for _, ancestor_id in level)
+            )
+            level = [
+                (content_id, parent_ids[ancestor_id])
+                for content_id, ancestor_id in level
+                if ancestor_id in parent_ids
+            ]
+            ancestors.extend(level)
+
+        ancestor_ids = {}  # type: typing.Dict[int, typing.List[int]]
+        for content_id, ancestor_id in ancestors:
+            ancestor_ids.setdefault(content_id, []).append(ancestor_id)
+        ancestor_columns = [
+            Content.id.label('ancestor_id'),
+            ContentRevisionRO.is_deleted.label('is_deleted'),
+            ContentRevisionRO.is_archived.label('is_archived'),
+            ContentRevisionRO.is_temporary.label('is_temporary'),
+        ]
+        ancestor_revisions = sqlalchemy.join(
+            Content,
+            ContentRevisionRO,
+            ContentRevisionRO.revision_id == Content.cached_revision_id,
+        )
+        contents = [
+            sqlalchemy.select([
+                sqlalchemy.literal(content_id, Integer).label('content_id'),
+            ] + ancestor_columns).select_from(
+                ancestor_revisions
+            ).where(Content.id.in_(content_ancestor_ids))
+            for content_id, content_ancestor_ids in ancestor_ids.items()
+        ] or [
+            sqlalchemy.select([
+                Content.id.label('content_id'),
+            ] + ancestor_columns).select_from(
+                ancestor_revisions
+            ).where(sqlalchemy.false())
+        ]
+        return sqlalchemy.union_all(*contents).alias('content_ancestors')
+
+    def get_read_status_map(
+            self,
+            user: typing.Optional[User],
+            content_ids: typing.List[int],
+    ) -> typing.Dict[int, bool]:
+        """
+        Get read status of many contents at once. A content is read by the
+        user if he did read current revision of the content and of all its
+        valid (not deleted, not archived) children, comments included.
+        This is the bulk equivalent of
+        not Content.has_new_information_for(user)
+        :param user: user who read (or not) contents
+        :param content_ids: ids of contents to check
+        :return: dict of content_id: read_by_user
+        """
+        if not content_ids:
+            return {}
+        if not user:
+            return {content_id: True for content_id in content_ids}
+
+        content_tree = self._get_content_tree_query(content_ids)
+        # INFO - G.M - 2018-12-06 - Content has new information for user if
+        # one of these revisions has no read status for user.
+        unread_content_ids = self._session.query(
+            content_tree.c.root_id
+        ).outerjoin(
+            RevisionReadStatus,
+            and_(
+                RevisionReadStatus.revision_id == content_tree.c.revision_id,
+                RevisionReadStatus.user_id == user.user_id,
+            )
+        ).filter(
+            RevisionReadStatus.user_id == None
+        ).distinct()
+        unread_content_ids = set(
+            content_id for content_id, in unread_content_ids
+        )
+        return {
+            content_id: content_id not in unread_content_ids
+            for content_id in content_ids
+        }
+
     def mark_read__all(
             self,
             read_datetime: datetime=None,
@@ -1839,9 +3249,21 @@ class ContentApi(object):
         :return: nothing
         """
         itemset = self.get_last_active(workspace)
-        for item in itemset:
-            if item.has_new_information_for(self._user):
-                self.mark_read(item, read_datetime, do_flush, recursive)
+        read_status_map = self.get_read_status_map(
+            self._user,
+            [item.content_id for item in itemset],
+        )
+        unread_content_ids = [
+            content_id for content_id, read in read_status_map.items()
+            if not read
+        ]
+        self._mark_read_content_ids(
+            unread_content_ids,
+            read_datetime=read_datetime,
+            recursive=recursive,
+        )
+        if do_flush:
+            self.flush()
 
     def mark_read(
             self,
@@ -1860,39 +3282,11 @@ class ContentApi(object):
         assert self._user
         assert content
 
-        # The algorithm is:
-        # 1. define the read datetime
-        # 2. update all revisions related to current Content
-        # 3. do the same for all child revisions
-        #    (ie parent_id is content_id of current content)
-
-        if not read_datetime:
-            read_datetime = datetime.datetime.now()
-
-        viewed_revisions = self._session.query(ContentRevisionRO) \
-            .filter(ContentRevisionRO.content_id==content.content_id).all()
-
-        for revision in viewed_revisions:
-            revision.read_by[self._user] = read_datetime
-
-        if recursive:
-            # mark read :
-            # - all children
-            # - parent stuff (if you mark a comment as read,
-            #                 then you have seen the parent)
-            # - parent comments
-            for child in content.get_valid_children():
-                self.mark_read(child, read_datetime=read_datetime,
-                               do_flush=False)
-
-            if content_type_list.Comment.slug == content.type:
-                self.mark_read(content.parent, read_datetime=read_datetime,
-                               do_flush=False, recursive=False)
-                for comment in content.parent.get_comments():
-                    if comment != content:
-                        self.mark_read(comment, read_datetime=read_datetime,
-                                       do_flush=False, recursive=False)
-
+        self._mark_read_content_ids(
+            [content.content_id],
+            read_datetime=read_datetime,
+            recursive=recursive,
+        )
         if do_flush:
             self.flush()
 
@@ -1902,23 +3296,184 @@ class ContentApi(object):
         assert self._user
         assert content
 
-        revisions = self._session.query(ContentRevisionRO) \
-            .filter(ContentRevisionRO.content_id==content.content_id).all()
-
-        for revision in revisions:
-            try:
-                del revision.read_by[self._user]
-            except KeyError:
-                pass
-
-        for child in content.get_valid_children():
-            self.mark_unread(child, do_flush=False)
+        # INFO - G.M - 2018-12-07 - Pending changes must be in database
+        # before running set-based statements
+        self._session.flush()
+        content_tree = self._get_content_tree_query([content.content_id])
+        revision_ids = self._session.query(
+            ContentRevisionRO.revision_id
+        ).filter(
+            ContentRevisionRO.content_id.in_(
+                self._session.query(content_tree.c.content_id)
+            )
+        )
+        self._session.execute(
+            RevisionReadStatus.__table__.delete().where(
+                RevisionReadStatus.user_id == self._user.user_id
+            ).where(
+                RevisionReadStatus.revision_id.in_(revision_ids.subquery())
+            )
+        )
+        self._expire_read_statuses()
 
         if do_flush:
             self.flush()
 
         return content
 
+    def _get_mark_read_content_ids_query(
+            self,
+            content_ids: typing.List[int],
+            recursive: bool=True,
+    ) -> Query:
+        """
+        Get query of ids of all contents read when reading given contents:
+        - the contents themselves
+        - if recursive, all their valid descendants
+        - if recursive and content is a comment, the commented content
+          and all its comments (if you read a comment, then you have seen
+          the parent)
+        :param content_ids: ids of read contents
+        :param recursive: include related contents
+        :return: query of content ids
+        """
+        content_tree = self._get_content_tree_query(
+            content_ids,
+            recursive=recursive,
+        )
+        read_content_ids = self._session.query(content_tree.c.content_id)
+        if not recursive:
+            return read_content_ids
+
+        commented_content_ids = self._session.query(
+            ContentRevisionRO.parent_id
+        ).join(
+            Content,
+            Content.cached_revision_id == ContentRevisionRO.revision_id,
+        ).filter(
+            Content.id.in_(content_ids)
+        ).filter(
+            ContentRevisionRO.type == content_type_list.Comment.slug
+        )
+        sibling_comment_ids = self._session.query(
+            ContentRevisionRO.content_id
+        ).join(
+            Content,
+            Content.cached_revision_id == ContentRevisionRO.revision_id,
+        ).filter(
+            ContentRevisionRO.parent_id.in_(commented_content_ids.subquery())
+        ).filter(
+            ContentRevisionRO.type == content_type_list.Comment.slug
+        ).filter(
+            ContentRevisionRO.is_deleted == False
+        ).filter(
+            ContentRevisionRO.is_archived == False
+        )
+        return read_content_ids.union(
+            commented_content_ids,
+            sibling_comment_ids,
+        )
+
+    def _mark_read_content_ids(
+            self,
+            content_ids: typing.List[int],
+            read_datetime: datetime=None,
+            recursive: bool=True,
+    ) -> None:
+        """
+        Mark all revisions of given contents (and related contents if
+        recursive) as read by the user, using set-based statements instead
+        of one insert by revision.
+        :param content_ids: ids of read contents
+        :param read_datetime: date of reading
+        :param recursive: mark read related contents too,
+        see _get_mark_read_content_ids_query()
+        """
+        assert self._user
+        if not content_ids:
+            return
+        if not read_datetime:
+            read_datetime = datetime.datetime.now()
+
+        # INFO - G.M - 2018-12-07 - Pending changes (new revisions
+        # included) must be in database before running set-based statements
+        self._session.flush()
+        read_content_ids = self._get_mark_read_content_ids_query(
+            content_ids,
+            recursive=recursive,
+        ).subquery()
+        revision_ids = self._session.query(
+            ContentRevisionRO.revision_id
+        ).filter(
+            ContentRevisionRO.content_id.in_(read_content_ids)
+        )
+        read_status_table = RevisionReadStatus.__table__
+        user_id = sqlalchemy.literal(self._user.user_id, Integer)
+        view_datetime = sqlalchemy.literal(read_datetime, DateTime)
+        if has_upsert(self._session.bind.dialect):
+            insert_read_status = postgresql_insert(read_status_table)\
+                .from_select(
+                    ['revision_id', 'user_id', 'view_datetime'],
+                    revision_ids.add_columns(
+                        user_id,
+                        view_datetime,
+                    ).statement,
+                )
+            self._session.execute(insert_read_status.on_conflict_do_update(
+                index_elements=['revision_id', 'user_id'],
+                set_={
+                    'view_datetime': insert_read_status.excluded.view_datetime,
+                },
+            ))
+        else:
+            # INFO - G.M - 2018-12-07 - No upsert available (PostgreSQL < 9.5,
+            # MySQL, SQLite), update already read revisions then insert
+            # missing ones.
+            self._session.execute(read_status_table.update().where(
+                RevisionReadStatus.user_id == self._user.user_id
+            ).where(
+                RevisionReadStatus.revision_id.in_(revision_ids.subquery())
+            ).values(view_datetime=read_datetime))
+            already_read_revision_ids = self._session.query(
+                RevisionReadStatus.revision_id
+            ).filter(
+                RevisionReadStatus.user_id == self._user.user_id
+            )
+            unread_revision_ids = revision_ids.filter(
+                ContentRevisionRO.revision_id.notin_(
+                    already_read_revision_ids.subquery()
+                )
+            )
+            self._session.execute(read_status_table.insert().from_select(
+                ['revision_id', 'user_id', 'view_datetime'],
+                unread_revision_ids.add_columns(
+                    user_id,
+                    view_datetime,
+                ).statement,
+            ))
+        self._expire_read_statuses()
+
+    def _expire_read_statuses(self) -> None:
+        """
+        Read statuses are updated with set-based statements out of the ORM,
+        expire loaded ones so they are reloaded from database. Updated
+        revision ids are not known without running their query again, so
+        loaded read statuses of the user are found in session identity map:
+        - read statuses of user are expired
+        - loaded read statuses collections of revisions are expired, not
+          loaded ones will be loaded from database anyway
+        """
+        for instance in list(self._session.identity_map.values()):
+            if isinstance(instance, RevisionReadStatus):
+                # INFO - G.M - 2018-12-28 - user id is read from identity,
+                # read status may be already expired.
+                revision_id, user_id = inspect(instance).identity
+                if user_id == self._user.user_id:
+                    self._session.expire(instance)
+            elif isinstance(instance, ContentRevisionRO):
+                if 'revision_read_statuses' not in inspect(instance).unloaded:
+                    self._session.expire(instance, ['revision_read_statuses'])  # nopep8
+
     def flush(self):
         self._session.flush()
 
@@ -1940,6 +3495,7 @@ class ContentApi(object):
         if action_description:
             content.revision_type = action_description
 
+        is_new_revision = not inspect(content.revision).has_identity
         if do_flush:
             # INFO - 2015-09-03 - D.A.
             # There are 2 flush because of the use
@@ -1955,8 +3511,25 @@ class ContentApi(object):
             # TODO - 2015-09-03 - D.A. - Do not use triggers
             # We should create a new ContentRevisionRO object instead of Content
             # This would help managing view/not viewed status
+            # INFO - G.M - 2018-12-07 - mark_read is now a single
+            # INSERT ... SELECT upsert, not one insert by revision.
             self.mark_read(content, do_flush=True)
 
+            # INFO - G.M - 2018-12-11 - This is where new file revisions
+            # (from create() or update_file_data()) get an id, so previews
+            # generation in background is scheduled here. In sync mode,
+            # preview metadata are computed here, once by revision, instead
+            # of on first read.
+            if content.depot_file \
+                    and self._config.PREVIEW_PROCESSING_MODE != self._config.CST.SYNC:  # nopep8
+                schedule_revision_previews(
+                    self._config,
+                    self._session,
+                    content.revision_id,
+                )
+            elif content.depot_file and is_new_revision:
+                self._save_revision_preview_metadata(content.revision)
+
         if do_notify:
             self.do_notify(content)
 
@@ -1987,22 +3560,39 @@ class ContentApi(object):
 
         return keywords
 
-    def search(self, keywords: [str]) -> Query:
-        """
-        :return: a sorted list of Content items
+    def search(
+            self,
+            keywords: [str],
+            limit: typing.Optional[int] = None,
+            offset: typing.Optional[int] = None,
+    ) -> Query:
         """
-
-        if len(keywords)<=0:
+        Search contents whose label or description contain a word starting
+        with one of keywords, using full-text search index of database (see
+        tracim_backend.models.search).
+        :param keywords: searched keywords
+        :param limit: max number of contents to return
+        :param offset: number of best ranked contents to skip
+        :return: Query of Content, best ranked first
+        """
+        terms = []  # type: typing.List[str]
+        for keyword in keywords:
+            terms.extend(get_search_terms(keyword))
+        if not terms:
             return None
 
-        filter_group_label = list(Content.label.ilike('%{}%'.format(keyword)) for keyword in keywords)
-        filter_group_desc = list(Content.description.ilike('%{}%'.format(keyword)) for keyword in keywords)
-        title_keyworded_items = self._hard_filtered_base_query().\
-            filter(or_(*(filter_group_label+filter_group_desc))).\
-            options(joinedload('children_revisions')).\
-            options(joinedload('parent'))
-
-        return title_keyworded_items
+        matches = get_content_search_index(self._session.connection())\
+            .get_matches(sorted(set(terms)))
+        query = self._hard_filtered_base_query(
+            content_ids=sqlalchemy.select([matches.c.content_id]),
+        ).join(matches, matches.c.content_id == Content.id)\
+            .options(contains_eager(Content.current_revision))\
+            .order_by(matches.c.rank.desc(), Content.id)
+        if offset:
+            query = query.offset(offset)
+        if limit:
+            query = query.limit(limit)
+        return query
 
     def get_all_types(self) -> typing.List[ContentType]:
         labels = content_type_list.endpoint_allowed_types_slug()
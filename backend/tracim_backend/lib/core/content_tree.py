@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import typing
+
+import transaction
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from zope.sqlalchemy import mark_changed
+
+from tracim_backend.config import CFG
+from tracim_backend.lib.utils.logger import logger
+from tracim_backend.lib.utils.utils import DatabaseJob
+from tracim_backend.lib.utils.utils import call_after_commit
+from tracim_backend.lib.utils.utils import get_redis_connection
+from tracim_backend.lib.utils.utils import get_rq_queue
+from tracim_backend.models import get_session_factory
+from tracim_backend.models import get_tm_session
+from tracim_backend.models.auth import User
+from tracim_backend.models.data import Content
+from tracim_backend.models.data import Workspace
+
+CONTENT_TREE_OPERATION_QUEUE_NAME = 'content_tree_operation'
+# INFO - G.M - 2018-12-17 - ContentApi methods allowed to run in background
+CONTENT_TREE_OPERATIONS = ('move_tree', 'copy_descendants')
+
+
+class ContentTreeOperationRunner(DatabaseJob):
+    """
+    Run a content tree operation (see ContentApi.move_tree() and
+    ContentApi.copy_descendants()) out of http requests, in its own
+    session and transaction.
+    """
+
+    def __init__(self, config: CFG, engine: Engine) -> None:
+        super().__init__(engine)
+        self.config = config
+
+    def run(
+            self,
+            operation: str,
+            user_id: typing.Optional[int],
+            content_ids: typing.List[typing.Optional[int]],
+            workspace_id: typing.Optional[int]=None,
+    ) -> None:
+        """
+        :param operation: name of ContentApi method, one of
+        CONTENT_TREE_OPERATIONS
+        :param user_id: id of user doing operation
+        :param content_ids: ids of contents given to operation (None for
+        no content)
+        :param workspace_id: id of workspace given to operation after
+        contents, if any
+        """
+        assert operation in CONTENT_TREE_OPERATIONS
+        # TODO - G.M - 2018-12-17 - Fix circular import better
+        from tracim_backend.lib.core.content import ContentApi
+        # INFO - G.M - 2018-12-27 - Session has same flush hooks than
+        # request sessions (depot blobs, search index, content tree
+        # generation), with its own transaction manager: it is not shared
+        # with other jobs of the worker.
+        transaction_manager = transaction.TransactionManager()
+        session = get_tm_session(
+            get_session_factory(self._get_engine()),
+            transaction_manager,
+        )
+        try:
+            with transaction_manager:
+                user = session.query(User).get(user_id) if user_id else None
+                args = [
+                    session.query(Content).get(content_id)
+                    if content_id else None
+                    for content_id in content_ids
+                ]
+                if workspace_id:
+                    args.append(session.query(Workspace).get(workspace_id))
+                content_api = ContentApi(
+                    current_user=user,
+                    session=session,
+                    config=self.config,
+                    show_archived=True,
+                    show_deleted=True,
+                    show_temporary=True,
+                )
+                getattr(content_api, operation)(*args)
+                # INFO - G.M - 2018-12-27 - Operations use sql statements,
+                # which are not seen by zope.sqlalchemy.
+                mark_changed(session)
+        except Exception as exc:
+            # INFO - G.M - 2018-12-27 - Session is kept by transaction
+            # manager abort: rollback it explicitly, connection may be
+            # returned to pool without being reset.
+            session.rollback()
+            logger.error(
+                self,
+                'Content tree operation {} of contents {} failed: {}'.format(
+                    operation,
+                    content_ids,
+                    str(exc),
+                ),
+                exc_info=True,
+            )
+            # INFO - G.M - 2018-12-27 - Operation is done in one transaction:
+            # nothing is changed, and failed job is kept by rq in its failed
+            # queue, where it can be requeued.
+            raise
+        finally:
+            session.close()
+
+
+def schedule_content_tree_operation(
+        config: CFG,
+        session: Session,
+        operation: str,
+        user_id: typing.Optional[int],
+        content_ids: typing.List[typing.Optional[int]],
+        workspace_id: typing.Optional[int]=None,
+) -> None:
+    """
+    Send content tree operation to content tree operation daemon once
+    current transaction of session is committed: contents have to be
+    visible for the daemon.
+    """
+    # INFO - G.M - 2018-12-27 - Check redis server before commit: if it is
+    # not available, request fails instead of committing a half done
+    # operation.
+    get_redis_connection(config).ping()
+    # INFO - G.M - 2018-12-27 - Operation may be the whole change of request
+    # (move of a large tree): session has to be committed for callback to
+    # be called.
+    mark_changed(session)
+    call_after_commit(
+        session,
+        send_content_tree_operation_to_daemon,
+        config,
+        session.bind,
+        operation,
+        user_id,
+        content_ids,
+        workspace_id,
+    )
+
+
+def send_content_tree_operation_to_daemon(
+        config: CFG,
+        engine: Engine,
+        operation: str,
+        user_id: typing.Optional[int],
+        content_ids: typing.List[typing.Optional[int]],
+        workspace_id: typing.Optional[int]=None,
+) -> None:
+    runner = ContentTreeOperationRunner(config, engine)
+    redis_connection = get_redis_connection(config)
+    queue = get_rq_queue(redis_connection, CONTENT_TREE_OPERATION_QUEUE_NAME)
+    queue.enqueue(runner.run, operation, user_id, content_ids, workspace_id)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from tracim_backend.lib.core.content_tree import CONTENT_TREE_OPERATION_QUEUE_NAME  # nopep8
+from tracim_backend.lib.utils.daemon import RQWorkerDaemon
+
+
+class ContentTreeOperationDaemon(RQWorkerDaemon):
+    """
+    Daemon moving or copying descendants of large content trees, see
+    ContentTreeOperationRunner.
+    """
+    def __init__(self, config: 'CFG', burst=True, *args, **kwargs):
+        """
+        :param config: tracim config
+        :param burst: if true, run one time, if false, run continously
+        """
+        super().__init__(config, CONTENT_TREE_OPERATION_QUEUE_NAME, burst, *args, **kwargs)  # nopep8
@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import hmac
+import os
+import time
 import typing as typing
 from smtplib import SMTPException
 from smtplib import SMTPRecipientsRefused
@@ -37,12 +41,75 @@ from tracim_backend.exceptions import WrongUserPassword
 from tracim_backend.lib.core.group import GroupApi
 from tracim_backend.lib.mail_notifier.notifier import get_email_manager
 from tracim_backend.lib.utils.logger import logger
+from tracim_backend.lib.utils.utils import LRUCache
+from tracim_backend.lib.utils.utils import call_after_commit
 from tracim_backend.models.auth import Group
 from tracim_backend.models.auth import User
 from tracim_backend.models.context_models import TypeUser
 from tracim_backend.models.context_models import UserInContext
 from tracim_backend.models.data import UserRoleInWorkspace
 
+CREDENTIAL_CACHE_SIZE = 1000
+
+
+class CredentialCache(object):
+    """
+    Bounded cache of valid credentials with expiration:
+    (login, password digest) -> (user_id, expiration).
+    Clear password is never kept, only a keyed digest of it, with a key
+    which only exist in this process memory.
+    Credentials of a user are invalidated by UserApi when its password,
+    email or state change.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._items = LRUCache(maxsize)
+        self._digest_key = os.urandom(32)
+
+    def _get_key(self, login: str, password: str) -> typing.Tuple[str, str]:
+        digest = hmac.new(
+            self._digest_key,
+            password.encode('utf-8'),
+            hashlib.sha256,
+        ).hexdigest()
+        return login, digest
+
+    def get_user_id(self, login: str, password: str) -> typing.Optional[int]:
+        """
+        Return user_id of credentials if they are cached and not expired,
+        None otherwise.
+        """
+        key = self._get_key(login, password)
+        item = self._items.get(key)
+        if item is None:
+            return None
+        user_id, expiration = item
+        if expiration < time.monotonic():
+            self._items.delete(key)
+            return None
+        return user_id
+
+    def set_user_id(
+            self,
+            login: str,
+            password: str,
+            user_id: int,
+            ttl: int,
+    ) -> None:
+        self._items.set(
+            self._get_key(login, password),
+            (user_id, time.monotonic() + ttl),
+        )
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._items.delete_values(lambda item: item[0] == user_id)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+credential_cache = CredentialCache(CREDENTIAL_CACHE_SIZE)
+
 
 class UserApi(object):
 
@@ -230,6 +297,10 @@ class UserApi(object):
         """
         try:
             user = self.get_one_by_email(email)
+            # INFO - G.M - 2018-12-26 - deleted users may be returned if
+            # api show deleted users, they can't authenticate anyway.
+            if user.is_deleted:
+                raise UserDoesNotExist('User "{}" is deleted'.format(email))
             if not user.is_active:
                 raise UserAuthenticatedIsNotActive('User "{}" is not active'.format(email))
             if user.validate_password(password):
@@ -389,9 +460,11 @@ class UserApi(object):
         if email is not None and email != user.email:
             self._check_email(email)
             user.email = email
+            self._invalidate_credentials(user)
 
         if password is not None:
             user.password = password
+            self._invalidate_credentials(user)
 
         if timezone is not None:
             user.timezone = timezone
@@ -541,6 +614,7 @@ class UserApi(object):
             )
 
         user.is_active = False
+        self._invalidate_credentials(user)
         if do_save:
             self.save(user)
 
@@ -550,6 +624,7 @@ class UserApi(object):
                 "User {} can't delete himself".format(user.user_id)
             )
         user.is_deleted = True
+        self._invalidate_credentials(user)
         if do_save:
             self.save(user)
 
@@ -561,6 +636,21 @@ class UserApi(object):
     def save(self, user: User):
         self._session.flush()
 
+    def _invalidate_credentials(self, user: User) -> None:
+        """
+        Invalidate cached credentials of user, see CredentialCache. They are
+        invalidated again once transaction is committed: until then, old
+        credentials may be cached again by other requests.
+        """
+        if user.user_id is None:
+            return
+        credential_cache.invalidate_user(user.user_id)
+        call_after_commit(
+            self._session,
+            credential_cache.invalidate_user,
+            user.user_id,
+        )
+
     def execute_created_user_actions(self, created_user: User) -> None:
         """
         Execute actions when user just been created
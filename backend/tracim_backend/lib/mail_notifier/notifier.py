@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import datetime
+import os
 import typing
+from collections import OrderedDict
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formataddr
@@ -8,6 +10,8 @@ from smtplib import SMTPRecipientsRefused
 
 from lxml.html.diff import htmldiff
 from mako.template import Template
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
 from tracim_backend.app_models.contents import content_type_list
@@ -15,22 +19,85 @@ from tracim_backend.config import CFG
 from tracim_backend.exceptions import EmptyNotificationError
 from tracim_backend.lib.core.notifications import INotifier
 from tracim_backend.lib.core.workspace import WorkspaceApi
+from tracim_backend.lib.mail_notifier.sender import MAIL_SENDER_QUEUE_NAME
 from tracim_backend.lib.mail_notifier.sender import EmailSender
 from tracim_backend.lib.mail_notifier.sender import send_email_through
+from tracim_backend.lib.mail_notifier.sender import send_emails_through
 from tracim_backend.lib.mail_notifier.utils import EST
 from tracim_backend.lib.mail_notifier.utils import SmtpConfiguration
 from tracim_backend.lib.utils.logger import logger
 from tracim_backend.lib.utils.translation import Translator
+from tracim_backend.lib.utils.utils import DatabaseJob
+from tracim_backend.lib.utils.utils import LRUCache
+from tracim_backend.lib.utils.utils import call_after_commit
 from tracim_backend.lib.utils.utils import get_email_logo_frontend_url
 from tracim_backend.lib.utils.utils import get_login_frontend_url
+from tracim_backend.lib.utils.utils import get_redis_connection
 from tracim_backend.lib.utils.utils import get_reset_password_frontend_url
+from tracim_backend.lib.utils.utils import get_rq_queue
+from tracim_backend.models import get_session_factory
 from tracim_backend.models.auth import User
 from tracim_backend.models.context_models import ContentInContext
 from tracim_backend.models.context_models import WorkspaceInContext
 from tracim_backend.models.data import ActionDescription
 from tracim_backend.models.data import Content
+from tracim_backend.models.data import ContentRevisionRO
 from tracim_backend.models.data import UserRoleInWorkspace
 
+# INFO - G.M - 2018-12-12 - Process wide cache of compiled mako templates:
+# template file path -> (template file mtime, compiled template)
+compiled_template_cache = LRUCache(100)
+
+
+def get_compiled_template(mako_template_filepath: str) -> Template:
+    """
+    Return compiled mako template of file, compiling it only if not
+    already done since last modification of file.
+    :param mako_template_filepath: file path of mako template
+    :return: compiled mako template
+    """
+    mtime = os.stat(mako_template_filepath).st_mtime
+    cached = compiled_template_cache.get(mako_template_filepath)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    template = Template(filename=mako_template_filepath)
+    compiled_template_cache.set(mako_template_filepath, (mtime, template))
+    return template
+
+
+# INFO - G.M - 2018-12-14 - Content update bodies are rendered once for all
+# recipients of a language: recipient related values are rendered as
+# placeholders, replaced for each recipient.
+RECIPIENT_DISPLAY_NAME_PLACEHOLDER = '{{tracim_recipient_display_name}}'
+RECIPIENT_ROLE_LABEL_PLACEHOLDER = '{{tracim_recipient_role_label}}'
+
+
+class NotifiedUserPlaceholder(object):
+    """
+    Stand-in of notified user in content update email templates, only
+    recipient display name is available.
+    """
+    display_name = RECIPIENT_DISPLAY_NAME_PLACEHOLDER
+
+
+def fill_recipient_placeholders(
+        body: str,
+        role: UserRoleInWorkspace,
+) -> str:
+    """
+    Return content update email body of role user
+    :param body: body rendered with recipient placeholders
+    :param role: role of the recipient in workspace
+    :return: body of recipient
+    """
+    return body.replace(
+        RECIPIENT_DISPLAY_NAME_PLACEHOLDER,
+        role.user.display_name,
+    ).replace(
+        RECIPIENT_ROLE_LABEL_PLACEHOLDER,
+        role.role_as_label(),
+    )
+
 
 class EmailNotifier(INotifier):
     """
@@ -116,18 +183,41 @@ class EmailNotifier(INotifier):
         # (SQLA objects are related to a given thread/session)
         #
         try:
+            # INFO - G.M - 2018-12-20 - Emails are rendered from the revision
+            # of the event, not from the content as it is when emails are
+            # built: content may have been updated again in the meantime.
+            revision_id = content.revision_id
+            previous_revision_id = get_previous_revision_id(
+                self.session,
+                content.content_id,
+                revision_id,
+            )
             if self.config.EMAIL_NOTIFICATION_PROCESSING_MODE.lower() == self.config.CST.ASYNC.lower():
                 logger.info(self, 'Sending email in ASYNC mode')
-                # TODO - D.A - 2014-11-06
-                # This feature must be implemented in order to be able to scale to large communities
-                raise NotImplementedError('Sending emails through ASYNC mode is not working yet')
+                # INFO - G.M - 2018-12-12 - Only ids are sent to mail sender
+                # daemon, which build and send all emails: request time
+                # does not depend on number of notified users.
+                schedule_content_update_notification(
+                    self.config,
+                    self.session,
+                    self._user.user_id,
+                    content.content_id,
+                    content.get_last_action().id,
+                    revision_id,
+                    previous_revision_id,
+                )
             else:
                 logger.info(self, 'Sending email in SYNC mode')
                 EmailManager(
                     self._smtp_config,
                     self.config,
                     self.session,
-                ).notify_content_update(self._user.user_id, content.content_id)
+                ).notify_content_update(
+                    self._user.user_id,
+                    content.content_id,
+                    revision_id=revision_id,
+                    previous_revision_id=previous_revision_id,
+                )
         except Exception as e:
             # TODO - G.M - 2018-08-27 - Do Better catching for exception here
             logger.error(self, 'Exception catched during email notification: {}'.format(e.__str__()))
@@ -210,13 +300,23 @@ class EmailManager(object):
     def notify_content_update(
             self,
             event_actor_id: int,
-            event_content_id: int
+            event_content_id: int,
+            email_sender: EmailSender=None,
+            revision_id: typing.Optional[int]=None,
+            previous_revision_id: typing.Optional[int]=None,
     ) -> None:
         """
         Look for all users to be notified about the new content and send them an
         individual email
         :param event_actor_id: id of the user that has triggered the event
         :param event_content_id: related content_id
+        :param email_sender: if given, emails are sent directly with it
+        instead of according to email processing mode (already in mail
+        sender daemon for example).
+        :param revision_id: revision created by the event, emails are
+        rendered from it. Current revision of content if not given.
+        :param previous_revision_id: revision before the event, used to show
+        changes. Previous revision of content if not given.
         :return:
         """
         # FIXME - D.A. - 2014-11-05
@@ -241,13 +341,21 @@ class EmailManager(object):
             show_archived=True,
             show_deleted=True,
         ).get_one(event_content_id, content_type_list.Any_SLUG)
+        revision = self._get_content_revision(content, revision_id)
+        if revision_id is not None:
+            previous_revision = self._get_content_revision(
+                content,
+                previous_revision_id,
+            ) if previous_revision_id is not None else None
+        else:
+            previous_revision = content.get_previous_revision()
         workspace_api = WorkspaceApi(
             session=self.session,
             current_user=user,
             config=self.config,
         )
         workpace_in_context = workspace_api.get_workspace_with_context(workspace_api.get_one(content.workspace_id))  # nopep8
-        main_content = content.parent if content.type == content_type_list.Comment.slug else content  # nopep8
+        main_content = content.parent if content.type == content_type_list.Comment.slug else revision  # nopep8
         notifiable_roles = WorkspaceApi(
             current_user=user,
             session=self.session,
@@ -271,90 +379,129 @@ class EmailManager(object):
             self._smtp_config,
             self.config.EMAIL_NOTIFICATION_ACTIVATED
         )
+        # INFO - G.M - 2018-12-14 - Everything not related to recipient is
+        # built once by event. Bodies are rendered once by language, with
+        # placeholders for recipient data, then filled for each recipient.
+        content_in_context = content_api.get_content_in_context(content)
+        parent_in_context = None
+        if content.parent_id:
+            parent_in_context = content_api.get_content_in_context(content.parent) # nopep8
+        sender = self._get_sender(user)
+        # INFO - G.M - 2017-11-15 - set content_id in header to permit reply
+        # references can have multiple values, but only one in this case.
+        replyto_addr = self.config.EMAIL_NOTIFICATION_REPLY_TO_EMAIL.replace( # nopep8
+            '{content_id}', str(main_content.content_id)
+        )
+
+        reference_addr = self.config.EMAIL_NOTIFICATION_REFERENCES_EMAIL.replace( #nopep8
+            '{content_id}',str(main_content.content_id)
+         )
+        #
+        #  INFO - D.A. - 2014-11-06
+        # We do not use .format() here because the subject defined in the .ini file
+        # may not include all required labels. In order to avoid partial format() (which result in an exception)
+        # we do use replace and force the use of .__str__() in order to process LazyString objects
+        #
+        subject = self.config.EMAIL_NOTIFICATION_CONTENT_UPDATE_SUBJECT
+        subject = subject.replace(EST.WEBSITE_TITLE, self.config.WEBSITE_TITLE.__str__())
+        subject = subject.replace(EST.WORKSPACE_LABEL, content.workspace.label.__str__())
+        subject = subject.replace(EST.CONTENT_LABEL, main_content.label.__str__())
+        subject = subject.replace(EST.CONTENT_STATUS_LABEL, main_content.get_status().label.__str__())
+
+        roles_by_lang = OrderedDict()  # type: typing.Dict[str, typing.List[UserRoleInWorkspace]]  # nopep8
         for role in notifiable_roles:
-            logger.info(self, 'Sending email to {}'.format(role.user.email))
-            translator = Translator(app_config=self.config, default_lang=role.user.lang)  # nopep8
-            _ = translator.get_translation
-            to_addr = formataddr((role.user.display_name, role.user.email))
-            # INFO - G.M - 2017-11-15 - set content_id in header to permit reply
-            # references can have multiple values, but only one in this case.
-            replyto_addr = self.config.EMAIL_NOTIFICATION_REPLY_TO_EMAIL.replace( # nopep8
-                '{content_id}', str(main_content.content_id)
-            )
+            roles_by_lang.setdefault(role.user.lang, []).append(role)
 
-            reference_addr = self.config.EMAIL_NOTIFICATION_REFERENCES_EMAIL.replace( #nopep8
-                '{content_id}',str(main_content.content_id)
-             )
-            #
-            #  INFO - D.A. - 2014-11-06
-            # We do not use .format() here because the subject defined in the .ini file
-            # may not include all required labels. In order to avoid partial format() (which result in an exception)
-            # we do use replace and force the use of .__str__() in order to process LazyString objects
-            #
-            subject = self.config.EMAIL_NOTIFICATION_CONTENT_UPDATE_SUBJECT
-            subject = subject.replace(EST.WEBSITE_TITLE, self.config.WEBSITE_TITLE.__str__())
-            subject = subject.replace(EST.WORKSPACE_LABEL, main_content.workspace.label.__str__())
-            subject = subject.replace(EST.CONTENT_LABEL, main_content.label.__str__())
-            subject = subject.replace(EST.CONTENT_STATUS_LABEL, main_content.get_status().label.__str__())
+        messages = []
+        for lang, roles in roles_by_lang.items():
+            translator = Translator(app_config=self.config, default_lang=lang)  # nopep8
+            _ = translator.get_translation
             reply_to_label = _('{username} & all members of {workspace}').format(  # nopep8
                 username=user.display_name,
-                workspace=main_content.workspace.label)
-
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = self._get_sender(user)
-            message['To'] = to_addr
-            message['Reply-to'] = formataddr((reply_to_label, replyto_addr))
-            # INFO - G.M - 2017-11-15
-            # References can theorically have label, but in pratice, references
-            # contains only message_id from parents post in thread.
-            # To link this email to a content we create a virtual parent
-            # in reference who contain the content_id.
-            message['References'] = formataddr(('', reference_addr))
-            content_in_context = content_api.get_content_in_context(content)
-            parent_in_context = None
-            if content.parent_id:
-                parent_in_context = content_api.get_content_in_context(content.parent) # nopep8
-            body_text = self._build_email_body_for_content(
+                workspace=content.workspace.label)
+            body_text_template = self._build_email_body_for_content(
                 self.config.EMAIL_NOTIFICATION_CONTENT_UPDATE_TEMPLATE_TEXT,
-                role,
+                roles[0],
                 content_in_context,
                 parent_in_context,
                 workpace_in_context,
                 user,
                 translator,
+                revision,
+                previous_revision,
             )
-            body_html = self._build_email_body_for_content(
+            body_html_template = self._build_email_body_for_content(
                 self.config.EMAIL_NOTIFICATION_CONTENT_UPDATE_TEMPLATE_HTML,
-                role,
+                roles[0],
                 content_in_context,
                 parent_in_context,
                 workpace_in_context,
                 user,
                 translator,
+                revision,
+                previous_revision,
             )
 
-            part1 = MIMEText(body_text, 'plain', 'utf-8')
-            part2 = MIMEText(body_html, 'html', 'utf-8')
-            # Attach parts into message container.
-            # According to RFC 2046, the last part of a multipart message, in this case
-            # the HTML message, is best and preferred.
-            message.attach(part1)
-            message.attach(part2)
-
-            self.log_notification(
-                action='CREATED',
-                recipient=message['To'],
-                subject=message['Subject'],
-                config=self.config,
-            )
+            for role in roles:
+                logger.info(self, 'Sending email to {}'.format(role.user.email))
+                message = MIMEMultipart('alternative')
+                message['Subject'] = subject
+                message['From'] = sender
+                message['To'] = formataddr((role.user.display_name, role.user.email))  # nopep8
+                message['Reply-to'] = formataddr((reply_to_label, replyto_addr))
+                # INFO - G.M - 2017-11-15
+                # References can theorically have label, but in pratice, references
+                # contains only message_id from parents post in thread.
+                # To link this email to a content we create a virtual parent
+                # in reference who contain the content_id.
+                message['References'] = formataddr(('', reference_addr))
+                body_text = fill_recipient_placeholders(body_text_template, role)  # nopep8
+                body_html = fill_recipient_placeholders(body_html_template, role)  # nopep8
+
+                part1 = MIMEText(body_text, 'plain', 'utf-8')
+                part2 = MIMEText(body_html, 'html', 'utf-8')
+                # Attach parts into message container.
+                # According to RFC 2046, the last part of a multipart message, in this case
+                # the HTML message, is best and preferred.
+                message.attach(part1)
+                message.attach(part2)
+
+                self.log_notification(
+                    action='CREATED',
+                    recipient=message['To'],
+                    subject=message['Subject'],
+                    config=self.config,
+                )
 
-            send_email_through(
+                messages.append(message)
+
+        # INFO - G.M - 2018-12-13 - All emails are sent as one batch, through
+        # one smtp connection.
+        if email_sender:
+            email_sender.send_mails(messages)
+        else:
+            send_emails_through(
                 self.config,
-                async_email_sender.send_mail,
-                message
+                async_email_sender.send_mails,
+                messages,
             )
 
+    def _get_content_revision(
+            self,
+            content: Content,
+            revision_id: typing.Optional[int],
+    ) -> ContentRevisionRO:
+        """
+        Return given revision of content, current revision if no
+        revision_id given.
+        """
+        if revision_id is None:
+            return content.revision
+        return self.session.query(ContentRevisionRO).filter(
+            ContentRevisionRO.content_id == content.content_id,
+            ContentRevisionRO.revision_id == revision_id,
+        ).one()
+
     def notify_created_account(
             self,
             user: User,
@@ -508,7 +655,7 @@ class EmailManager(object):
         :return: template rendered string
         """
 
-        template = Template(filename=mako_template_filepath)
+        template = get_compiled_template(mako_template_filepath)
         return template.render(
             _=translator.get_translation,
             config=self.config,
@@ -522,11 +669,15 @@ class EmailManager(object):
             parent_in_context: typing.Optional[ContentInContext],
             workspace_in_context: WorkspaceInContext,
             actor: User,
-            translator: Translator
+            translator: Translator,
+            revision: ContentRevisionRO,
+            previous_revision: typing.Optional[ContentRevisionRO],
     ):
 
         _ = translator.get_translation
-        content = content_in_context.content
+        # INFO - G.M - 2018-12-20 - label, description, status and action
+        # come from revision of event, not from current content.
+        content = revision
         action = content.get_last_action().id
 
         # default values
@@ -549,8 +700,9 @@ class EmailManager(object):
             content_intro = _('<span id="content-intro-username">{}</span> create a content:').format(actor.display_name)  # nopep8
 
             if content_type_list.Thread.slug == content.type:
-                if content.get_last_comment_from(actor):
-                    content_text = content.get_last_comment_from(actor).description  # nopep8
+                last_comment = content_in_context.content.get_last_comment_from(actor)  # nopep8
+                if last_comment:
+                    content_text = last_comment.description
 
                 call_to_action_text = _('Answer')
                 content_intro = _('<span id="content-intro-username">{}</span> started a thread entitled:').format(actor.display_name)
@@ -584,18 +736,17 @@ class EmailManager(object):
 
             elif content_type_list.Thread.slug == content.type:
                 content_intro = _('<span id="content-intro-username">{}</span> updated the thread description.').format(actor.display_name)
-                previous_revision = content.get_previous_revision()
                 title_diff = ''
                 if previous_revision.label != content.label:
                     title_diff = htmldiff(previous_revision.label, content.label)
-                content_text = str('<p id="content-body-intro">{}</p> {text} {title_diff} {content_diff}').format(
+                content_text = str('<p id="content-body-intro">{}</p> {text} {title_diff} {content_diff}').format(  # nopep8
+                    actor.display_name,
                     text=_('Here is an overview of the changes:'),
                     title_diff=title_diff,
                     content_diff=htmldiff(previous_revision.description, content.description)
                 )
             elif content_type_list.Page.slug == content.type:
                 content_intro = _('<span id="content-intro-username">{}</span> updated this page.').format(actor.display_name)
-                previous_revision = content.get_previous_revision()
                 title_diff = ''
                 if previous_revision.label != content.label:
                     title_diff = htmldiff(previous_revision.label, content.label)  # nopep8
@@ -676,7 +827,9 @@ class EmailManager(object):
             parent_in_context: typing.Optional[ContentInContext],
             workspace_in_context: WorkspaceInContext,
             actor: User,
-            translator: Translator
+            translator: Translator,
+            revision: ContentRevisionRO,
+            previous_revision: typing.Optional[ContentRevisionRO],
     ) -> str:
         """
         Build an email body and return it as a string
@@ -690,7 +843,11 @@ class EmailManager(object):
         notification
         :param actor: the user at the origin of the action / notification
         (for example the one who wrote a comment
-        :return: the built email body as string. In case of multipart email,
+        :param revision: revision of content created by the event
+        :param previous_revision: revision of content before the event
+        :return: the built email body as string, with recipient placeholders
+         to fill with fill_recipient_placeholders(): it is shared by all
+         recipients using same language. In case of multipart email,
          this method must be called one time for text and one time for html
         """
         logger.debug(self, 'Building email content from MAKO template {}'.format(mako_template_filepath))  # nopep8
@@ -700,8 +857,12 @@ class EmailManager(object):
             parent_in_context=parent_in_context,
             workspace_in_context=workspace_in_context,
             actor=actor,
-            translator=translator
+            translator=translator,
+            revision=revision,
+            previous_revision=previous_revision,
         )
+        context['user'] = NotifiedUserPlaceholder()
+        context['role_label'] = RECIPIENT_ROLE_LABEL_PLACEHOLDER
         body_content = self._render_template(
             mako_template_filepath=mako_template_filepath,
             context=context,
@@ -724,3 +885,138 @@ def get_email_manager(config: CFG, session: Session):
     )
 
     return EmailManager(config=config, smtp_config=smtp_config, session=session)
+
+
+class ContentUpdateNotificationSender(DatabaseJob):
+    """
+    Build and send content update emails to all notified users out of http
+    requests, see EmailNotifier.notify_content_update().
+    """
+
+    def __init__(self, config: CFG, engine: Engine) -> None:
+        super().__init__(engine)
+        self.config = config
+
+    def notify(
+            self,
+            event_actor_id: int,
+            event_content_id: int,
+            event: str,
+            revision_id: typing.Optional[int]=None,
+            previous_revision_id: typing.Optional[int]=None,
+    ) -> None:
+        """
+        Send emails of a content update event, all through one smtp
+        connection.
+        :param event_actor_id: id of the user that has triggered the event
+        :param event_content_id: related content_id
+        :param event: action of event (see ActionDescription)
+        :param revision_id: revision created by the event
+        :param previous_revision_id: revision before the event
+        """
+        logger.info(
+            self,
+            'Sending emails of event {} of content {} by user {}'.format(
+                event,
+                event_content_id,
+                event_actor_id,
+            )
+        )
+        session = get_session_factory(self._get_engine())()
+        email_manager = get_email_manager(self.config, session)
+        email_sender = EmailSender(
+            self.config,
+            email_manager._smtp_config,
+            self.config.EMAIL_NOTIFICATION_ACTIVATED,
+        )
+        try:
+            email_manager.notify_content_update(
+                event_actor_id,
+                event_content_id,
+                email_sender=email_sender,
+                revision_id=revision_id,
+                previous_revision_id=previous_revision_id,
+            )
+        except Exception as exc:
+            logger.error(
+                self,
+                'Email notification of content {} failed: {}'.format(
+                    event_content_id,
+                    str(exc),
+                ),
+                exc_info=True,
+            )
+            # INFO - G.M - 2018-12-28 - failed job is kept by rq in its
+            # failed queue: if some emails were sent, other ones are
+            # already sent again by their own job, see
+            # EmailSender.send_mails().
+            raise
+        finally:
+            session.close()
+
+
+def schedule_content_update_notification(
+        config: CFG,
+        session: Session,
+        event_actor_id: int,
+        event_content_id: int,
+        event: str,
+        revision_id: typing.Optional[int]=None,
+        previous_revision_id: typing.Optional[int]=None,
+) -> None:
+    """
+    Send content update event to mail sender daemon once current transaction
+    of session is committed: content has to be visible for the daemon.
+    """
+    call_after_commit(
+        session,
+        send_content_update_notification_to_daemon,
+        config,
+        session.bind,
+        event_actor_id,
+        event_content_id,
+        event,
+        revision_id,
+        previous_revision_id,
+    )
+
+
+def send_content_update_notification_to_daemon(
+        config: CFG,
+        engine: Engine,
+        event_actor_id: int,
+        event_content_id: int,
+        event: str,
+        revision_id: typing.Optional[int]=None,
+        previous_revision_id: typing.Optional[int]=None,
+) -> None:
+    notification_sender = ContentUpdateNotificationSender(config, engine)
+    redis_connection = get_redis_connection(config)
+    queue = get_rq_queue(redis_connection, MAIL_SENDER_QUEUE_NAME)
+    queue.enqueue(
+        notification_sender.notify,
+        event_actor_id,
+        event_content_id,
+        event,
+        revision_id,
+        previous_revision_id,
+    )
+
+
+def get_previous_revision_id(
+        session: Session,
+        content_id: int,
+        revision_id: typing.Optional[int],
+) -> typing.Optional[int]:
+    """
+    Return id of revision of content just before given one, None if given
+    revision is the first one (or has no id yet).
+    """
+    if revision_id is None:
+        return None
+    return session.query(
+        func.max(ContentRevisionRO.revision_id),
+    ).filter(
+        ContentRevisionRO.content_id == content_id,
+        ContentRevisionRO.revision_id < revision_id,
+    ).scalar()
@@ -1,15 +1,43 @@
 # -*- coding: utf-8 -*-
 import smtplib
+import threading
+import time
 import typing
 from email.message import Message
 from email.mime.multipart import MIMEMultipart
 
 from tracim_backend.config import CFG
+from tracim_backend.exceptions import EmailsSendingFailed
 from tracim_backend.lib.utils.logger import logger
 from tracim_backend.lib.utils.utils import get_rq_queue
 from tracim_backend.lib.utils.utils import get_redis_connection
 from tracim_backend.lib.mail_notifier.utils import SmtpConfiguration
 
+MAIL_SENDER_QUEUE_NAME = 'mail_sender'
+# INFO - G.M - 2018-12-13 - Errors meaning that smtp connection is not usable
+# anymore: message is sent again with a new connection.
+SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+def _send_through(
+        config: CFG,
+        callable_: typing.Callable,
+        *args
+) -> None:
+    if config.EMAIL_PROCESSING_MODE == config.CST.SYNC:
+        callable_(*args)
+    elif config.EMAIL_PROCESSING_MODE == config.CST.ASYNC:
+        redis_connection = get_redis_connection(config)
+        queue = get_rq_queue(redis_connection, MAIL_SENDER_QUEUE_NAME)
+        queue.enqueue(callable_, *args)
+    else:
+        raise NotImplementedError(
+            'Mail sender processing mode {} is not implemented'.format(
+                config.EMAIL_PROCESSING_MODE,
+            )
+        )
+
+
 def send_email_through(
         config: CFG,
         sendmail_callable: typing.Callable[[Message], None],
@@ -24,19 +52,230 @@ def send_email_through(
     :param sendmail_callable: A callable who get message on first parameter
     :param message: The message who have to be sent
     """
+    _send_through(config, sendmail_callable, message)
 
-    if config.EMAIL_PROCESSING_MODE == config.CST.SYNC:
-        sendmail_callable(message)
-    elif config.EMAIL_PROCESSING_MODE == config.CST.ASYNC:
-        redis_connection = get_redis_connection(config)
-        queue = get_rq_queue(redis_connection, 'mail_sender')
-        queue.enqueue(sendmail_callable, message)
-    else:
-        raise NotImplementedError(
-            'Mail sender processing mode {} is not implemented'.format(
-                config.EMAIL_PROCESSING_MODE,
-            )
+
+def send_emails_through(
+        config: CFG,
+        sendmails_callable: typing.Callable[[typing.List[Message]], None],
+        messages: typing.List[Message],
+) -> None:
+    """
+    Like send_email_through() for a batch of messages: in async mode, all
+    messages are sent by one job of mail sender daemon, so through one smtp
+    connection.
+    :param config: system configuration
+    :param sendmails_callable: A callable who get messages list on first
+    parameter, like EmailSender.send_mails
+    :param messages: The messages who have to be sent
+    """
+    if not messages:
+        return
+    _send_through(config, sendmails_callable, messages)
+
+
+class DataTrackingSMTP(smtplib.SMTP):
+    """
+    smtplib.SMTP remembering if DATA command of current message was sent:
+    once it is, server may have accepted message even if connection is lost
+    before its reply.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.data_sent = False
+        super().__init__(*args, **kwargs)
+
+    def mail(self, *args, **kwargs):
+        self.data_sent = False
+        return super().mail(*args, **kwargs)
+
+    def data(self, *args, **kwargs):
+        self.data_sent = True
+        return super().data(*args, **kwargs)
+
+
+class SmtpConnection(object):
+    """
+    Authenticated connection to smtp server, managed by SmtpConnectionPool.
+    """
+
+    def __init__(self, smtp_config: SmtpConfiguration) -> None:
+        self._smtp_config = smtp_config
+        self.message_count = 0
+        self.last_used = time.monotonic()
+        log = 'Connecting from SMTP server {}'
+        logger.info(self, log.format(self._smtp_config.server))
+        self.smtp = DataTrackingSMTP(
+            self._smtp_config.server,
+            self._smtp_config.port
         )
+        self.smtp.ehlo()
+
+        if self._smtp_config.login:
+            try:
+                starttls_result = self.smtp.starttls()
+                log = 'SMTP start TLS result: {}'
+                logger.debug(self, log.format(starttls_result))
+            except Exception as e:
+                log = 'SMTP start TLS error: {}'
+                logger.debug(self, log.format(e.__str__()))
+
+        if self._smtp_config.login:
+            try:
+                login_res = self.smtp.login(
+                    self._smtp_config.login,
+                    self._smtp_config.password
+                )
+                log = 'SMTP login result: {}'
+                logger.debug(self, log.format(login_res))
+            except Exception as e:
+                log = 'SMTP login error: {}'
+                logger.debug(self, log.format(e.__str__()))
+        logger.info(self, 'Connection OK')
+
+    def is_alive(self, keepalive: int) -> bool:
+        """
+        Check connection with a NOOP command if connection was not used
+        since keepalive seconds.
+        """
+        if time.monotonic() - self.last_used < keepalive:
+            return True
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @property
+    def message_may_be_sent(self) -> bool:
+        """
+        True if last message reached DATA command: sending it again after a
+        connection error may send it twice.
+        """
+        return self.smtp.data_sent
+
+    def send_message(self, message: Message) -> None:
+        self.smtp.send_message(message)
+        self.message_count += 1
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        log = 'Disconnecting from SMTP server {}'
+        logger.info(self, log.format(self._smtp_config.server))
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        logger.info(self, 'Connection closed.')
+
+
+class SmtpConnectionPool(object):
+    """
+    Thread safe pool of idle smtp connections to one smtp server, so that
+    emails sent one after another (in a fan-out, or by successive requests)
+    reuse the same authenticated smtp session.
+    """
+
+    def __init__(
+            self,
+            smtp_config: SmtpConfiguration,
+            pool_size: int,
+            keepalive: int,
+            max_messages_per_connection: int,
+    ) -> None:
+        """
+        :param pool_size: max number of idle connections kept open
+        :param keepalive: idle connections unused for keepalive seconds are
+        checked before reuse
+        :param max_messages_per_connection: connections are closed after
+        sending this number of messages.
+        """
+        self._smtp_config = smtp_config
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.max_messages_per_connection = max_messages_per_connection
+        self._idle_connections = []  # type: typing.List[SmtpConnection]
+        self._lock = threading.Lock()
+
+    def acquire(self) -> SmtpConnection:
+        """
+        Return an idle connection of pool if a valid one exist, a new
+        connection otherwise.
+        """
+        while True:
+            with self._lock:
+                if not self._idle_connections:
+                    break
+                connection = self._idle_connections.pop()
+            if connection.is_alive(self.keepalive):
+                return connection
+            connection.close()
+        return SmtpConnection(self._smtp_config)
+
+    def release(
+            self,
+            connection: SmtpConnection,
+            discard: bool=False,
+    ) -> None:
+        """
+        Give back connection to pool, or close it if it should not be
+        reused.
+        :param discard: connection is not usable anymore
+        """
+        if not discard \
+                and connection.message_count < self.max_messages_per_connection:  # nopep8
+            with self._lock:
+                if len(self._idle_connections) < self.pool_size:
+                    self._idle_connections.append(connection)
+                    return
+        connection.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            connections = self._idle_connections
+            self._idle_connections = []
+        for connection in connections:
+            connection.close()
+
+
+_smtp_connection_pools = {}  # type: typing.Dict[typing.Tuple, SmtpConnectionPool]  # nopep8
+_smtp_connection_pools_lock = threading.Lock()
+
+
+def get_smtp_connection_pool(
+        config: CFG,
+        smtp_config: SmtpConfiguration,
+) -> SmtpConnectionPool:
+    """
+    Return process wide smtp connection pool of smtp server.
+    """
+    key = (
+        smtp_config.server,
+        smtp_config.port,
+        smtp_config.login,
+        smtp_config.password,
+    )
+    with _smtp_connection_pools_lock:
+        pool = _smtp_connection_pools.get(key)
+        if not pool:
+            pool = SmtpConnectionPool(
+                smtp_config,
+                pool_size=config.EMAIL_NOTIFICATION_SMTP_POOL_SIZE,
+                keepalive=config.EMAIL_NOTIFICATION_SMTP_KEEPALIVE,
+                max_messages_per_connection=config.EMAIL_NOTIFICATION_SMTP_MAX_MESSAGES_PER_CONNECTION,  # nopep8
+            )
+            _smtp_connection_pools[key] = pool
+    return pool
+
+
+def clear_smtp_connection_pools() -> None:
+    """
+    Close all idle smtp connections.
+    """
+    with _smtp_connection_pools_lock:
+        pools = list(_smtp_connection_pools.values())
+        _smtp_connection_pools.clear()
+    for pool in pools:
+        pool.clear()
 
 
 class EmailSender(object):
@@ -45,6 +284,11 @@ class EmailSender(object):
 
     To allow its use in any thread, as an asyncjob_perform() call for
     example, it has no dependencies on SQLAlchemy nor tg HTTP request.
+
+    Smtp connections come from process wide SmtpConnectionPool: connect()
+    take a connection from pool, disconnect() give it back. Connection is
+    given back after each message sent by send_mail(), and after the whole
+    batch sent by send_mails().
     """
 
     def __init__(
@@ -55,60 +299,123 @@ class EmailSender(object):
     ) -> None:
         self._smtp_config = smtp_config
         self.config = config
-        self._smtp_connection = None
+        self._smtp_connection = None  # type: typing.Optional[SmtpConnection]
         self._is_active = really_send_messages
 
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # INFO - G.M - 2018-12-13 - smtp connection can't be sent to mail
+        # sender daemon.
+        state = self.__dict__.copy()
+        state['_smtp_connection'] = None
+        return state
+
+    def _get_connection_pool(self) -> SmtpConnectionPool:
+        return get_smtp_connection_pool(self.config, self._smtp_config)
+
     def connect(self):
         if not self._smtp_connection:
-            log = 'Connecting from SMTP server {}'
-            logger.info(self, log.format(self._smtp_config.server))
-            self._smtp_connection = smtplib.SMTP(
-                self._smtp_config.server,
-                self._smtp_config.port
-            )
-            self._smtp_connection.ehlo()
+            self._smtp_connection = self._get_connection_pool().acquire()
 
-            if self._smtp_config.login:
-                try:
-                    starttls_result = self._smtp_connection.starttls()
-                    log = 'SMTP start TLS result: {}'
-                    logger.debug(self, log.format(starttls_result))
-                except Exception as e:
-                    log = 'SMTP start TLS error: {}'
-                    logger.debug(self, log.format(e.__str__()))
-
-            if self._smtp_config.login:
-                try:
-                    login_res = self._smtp_connection.login(
-                        self._smtp_config.login,
-                        self._smtp_config.password
-                    )
-                    log = 'SMTP login result: {}'
-                    logger.debug(self, log.format(login_res))
-                except Exception as e:
-                    log = 'SMTP login error: {}'
-                    logger.debug(self, log.format(e.__str__()))
-            logger.info(self, 'Connection OK')
-
-    def disconnect(self):
+    def disconnect(self, discard: bool=False):
         if self._smtp_connection:
-            log = 'Disconnecting from SMTP server {}'
-            logger.info(self, log.format(self._smtp_config.server))
-            self._smtp_connection.quit()
-            logger.info(self, 'Connection closed.')
+            self._get_connection_pool().release(
+                self._smtp_connection,
+                discard=discard,
+            )
+            self._smtp_connection = None
+
+    def _get_pool_connection(self) -> SmtpConnection:
+        """
+        Return connection of sender, taken from pool if needed. Connection
+        is renewed once it sent max messages allowed by pool.
+        """
+        pool = self._get_connection_pool()
+        if self._smtp_connection and self._smtp_connection.message_count \
+                >= pool.max_messages_per_connection:
+            self.disconnect()
+        self.connect()  # Actually, this connects to SMTP only if required
+        return self._smtp_connection
+
+    def _send_message(self, message: MIMEMultipart) -> None:
+        logger.info(self, 'Sending email to {}'.format(message['To']))
+        # INFO - G.M - 2018-12-13 - pooled connection may have been
+        # closed by server: retry once with a new connection, but only if
+        # message did not reach DATA command. Otherwise, server may have
+        # accepted it and it would be sent twice.
+        for attempt in range(2):
+            connection = self._get_pool_connection()
+            try:
+                connection.send_message(message)
+                break
+            except SMTP_CONNECTION_ERRORS as exc:
+                self.disconnect(discard=True)
+                if attempt or connection.message_may_be_sent:
+                    raise
+                log = 'SMTP connection lost ({}), reconnecting'
+                logger.info(self, log.format(str(exc)))
+        from tracim_backend.lib.mail_notifier.notifier import EmailManager
+        EmailManager.log_notification(
+            action='   SENT',
+            recipient=message['To'],
+            subject=message['Subject'],
+            config=self.config,
+        )
 
     def send_mail(self, message: MIMEMultipart):
         if not self._is_active:
             log = 'Not sending email to {} (service disabled)'
             logger.info(self, log.format(message['To']))
-        else:
-            self.connect()  # Actually, this connects to SMTP only if required
-            logger.info(self, 'Sending email to {}'.format(message['To']))
-            self._smtp_connection.send_message(message)
-            from tracim_backend.lib.mail_notifier.notifier import EmailManager
-            EmailManager.log_notification(
-                action='   SENT',
-                recipient=message['To'],
-                subject=message['Subject'],
-                config=self.config,
-            )
+            return
+        try:
+            self._send_message(message)
+        finally:
+            # INFO - G.M - 2018-12-13 - connection is given back to pool
+            # after each message: next message, from this sender or from
+            # another one, reuse it.
+            self.disconnect()
+
+    def send_mails(self, messages: typing.List[MIMEMultipart]):
+        """
+        Send a batch of messages, all through the same pooled smtp
+        connection. A message which can't be sent does not prevent other
+        recipients from receiving theirs. Failed messages are then:
+        - sent again by a new job of mail sender daemon, in async mode, if
+        some messages were sent: once failed, this job can be requeued
+        without sending any message twice.
+        - raised otherwise, with EmailsSendingFailed.
+        """
+        if not self._is_active:
+            for message in messages:
+                log = 'Not sending email to {} (service disabled)'
+                logger.info(self, log.format(message['To']))
+            return
+        failed_messages = []  # type: typing.List[MIMEMultipart]
+        try:
+            for message in messages:
+                try:
+                    self._send_message(message)
+                except Exception as exc:
+                    log = 'Email to {} not sent: {}'
+                    logger.error(
+                        self,
+                        log.format(message['To'], str(exc)),
+                        exc_info=True,
+                    )
+                    failed_messages.append(message)
+        finally:
+            self.disconnect()
+        if not failed_messages:
+            return
+        if len(failed_messages) < len(messages) \
+                and self.config.EMAIL_PROCESSING_MODE == self.config.CST.ASYNC:  # nopep8
+            log = '{} of {} emails not sent, sending them again'
+            logger.info(self, log.format(len(failed_messages), len(messages)))
+            send_emails_through(self.config, self.send_mails, failed_messages)
+            return
+        raise EmailsSendingFailed(
+            '{} of {} emails not sent'.format(
+                len(failed_messages),
+                len(messages),
+            ),
+            failed_messages,
+        )
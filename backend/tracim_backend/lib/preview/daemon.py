@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from tracim_backend.lib.preview.generator import PREVIEW_GENERATOR_QUEUE_NAME
+from tracim_backend.lib.utils.daemon import RQWorkerDaemon
+
+
+class PreviewGeneratorDaemon(RQWorkerDaemon):
+    """
+    Daemon generating previews of new file revisions, see
+    RevisionPreviewGenerator.
+    """
+    def __init__(self, config: 'CFG', burst=True, *args, **kwargs):
+        """
+        :param config: tracim config
+        :param burst: if true, run one time, if false, run continously
+        """
+        super().__init__(config, PREVIEW_GENERATOR_QUEUE_NAME, burst, *args, **kwargs)  # nopep8
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import threading
+import typing
+
+from rq.job import JobStatus
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from tracim_backend.config import CFG
+from tracim_backend.lib.utils.logger import logger
+from tracim_backend.lib.utils.utils import DatabaseJob
+from tracim_backend.lib.utils.utils import LocalJobQueue
+from tracim_backend.lib.utils.utils import call_after_commit
+from tracim_backend.lib.utils.utils import get_redis_connection
+from tracim_backend.lib.utils.utils import get_rq_queue
+from tracim_backend.models import get_session_factory
+from tracim_backend.models.data import ContentRevisionRO
+from tracim_backend.models.data import RevisionPreviewMetadata
+
+PREVIEW_GENERATOR_QUEUE_NAME = 'preview_generator'
+PREVIEW_GENERATOR_JOB_ID = 'revision_previews_{revision_id}'
+
+
+class RevisionPreviewGenerator(DatabaseJob):
+    """
+    Generate previews of a revision file out of http requests, see
+    ContentApi.generate_revision_previews().
+    """
+
+    def __init__(self, config: CFG, engine: Engine) -> None:
+        super().__init__(engine)
+        self.config = config
+
+    def generate(self, revision_id: int) -> None:
+        # TODO - G.M - 2018-12-11 - Fix circular import better
+        from tracim_backend.lib.core.content import ContentApi
+        session = get_session_factory(self._get_engine())()
+        try:
+            revision = session.query(ContentRevisionRO).get(revision_id)
+            if not revision or not revision.depot_file:
+                return
+            # INFO - G.M - 2018-12-11 - preview metadata are stored once
+            # previews are generated, so they mark previews as ready.
+            if session.query(RevisionPreviewMetadata).get(revision_id):
+                return
+            content_api = ContentApi(
+                current_user=None,
+                session=session,
+                config=self.config,
+                show_archived=True,
+                show_deleted=True,
+                show_temporary=True,
+            )
+            content_api.generate_revision_previews(revision)
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            logger.error(
+                self,
+                'Preview generation of revision {} failed: {}'.format(
+                    revision_id,
+                    str(exc),
+                ),
+                exc_info=True,
+            )
+        finally:
+            session.close()
+
+
+class LocalPreviewGeneratorQueue(LocalJobQueue):
+    """
+    In-process queue of preview generations, consumed by a background
+    thread. Used when no preview generator daemon is available.
+    """
+
+    def __init__(self) -> None:
+        super().__init__('preview_generator')
+        self._pending_revision_ids = set()  # type: typing.Set[int]
+        self._pending_lock = threading.Lock()
+
+    def enqueue_revision(
+            self,
+            generator: RevisionPreviewGenerator,
+            revision_id: int,
+    ) -> None:
+        """
+        Enqueue previews generation of revision, unless it is already
+        pending.
+        """
+        with self._pending_lock:
+            if revision_id in self._pending_revision_ids:
+                return
+            self._pending_revision_ids.add(revision_id)
+        self.enqueue(self._generate, generator, revision_id)
+
+    def _generate(
+            self,
+            generator: RevisionPreviewGenerator,
+            revision_id: int,
+    ) -> None:
+        try:
+            generator.generate(revision_id)
+        finally:
+            with self._pending_lock:
+                self._pending_revision_ids.discard(revision_id)
+
+
+local_preview_queue = LocalPreviewGeneratorQueue()
+
+
+def generate_revision_previews_in_background(
+        config: CFG,
+        engine: Engine,
+        revision_id: int,
+) -> None:
+    """
+    Send revision previews generation to local queue or to preview generator
+    daemon queue according to preview processing mode. Nothing is sent if
+    generation of revision previews is already pending.
+    """
+    generator = RevisionPreviewGenerator(config, engine)
+    if config.PREVIEW_PROCESSING_MODE == config.CST.LOCAL:
+        local_preview_queue.enqueue_revision(generator, revision_id)
+    elif config.PREVIEW_PROCESSING_MODE == config.CST.ASYNC:
+        redis_connection = get_redis_connection(config)
+        rq_queue = get_rq_queue(redis_connection, PREVIEW_GENERATOR_QUEUE_NAME)
+        # INFO - G.M - 2018-12-26 - Job id is deterministic, so a revision
+        # polled again while its job is waiting is not enqueued twice.
+        job_id = PREVIEW_GENERATOR_JOB_ID.format(revision_id=revision_id)
+        job = rq_queue.fetch_job(job_id)
+        if job and job.get_status() in (JobStatus.QUEUED, JobStatus.STARTED):
+            return
+        rq_queue.enqueue(generator.generate, revision_id, job_id=job_id)
+    else:
+        raise NotImplementedError(
+            'Preview processing mode {} is not implemented'.format(
+                config.PREVIEW_PROCESSING_MODE,
+            )
+        )
+
+
+def schedule_revision_previews(
+        config: CFG,
+        session: Session,
+        revision_id: int,
+) -> None:
+    """
+    Generate revisions previews in background once current transaction of
+    session is committed: revision has to be visible for the worker.
+    """
+    call_after_commit(
+        session,
+        generate_revision_previews_in_background,
+        config,
+        session.bind,
+        revision_id,
+    )
@@ -1,7 +1,84 @@
+# -*- coding: utf-8 -*-
+import typing
+
+from rq import Connection as RQConnection
+from rq import Worker as BaseRQWorker
+from rq.dummy import do_nothing
+from rq.worker import StopRequested
+
+from tracim_backend.lib.utils.logger import logger
+from tracim_backend.lib.utils.utils import get_redis_connection
+from tracim_backend.lib.utils.utils import get_rq_queue
+
+
 class FakeDaemon(object):
     """
     Temporary class for transition between tracim 1 and tracim 2
     """
     def __init__(self, *args, **kwargs):
         pass
-    
+
+
+class RQWorker(BaseRQWorker):
+    def _install_signal_handlers(self):
+        # RQ Worker is designed to work in main thread
+        # So we have to disable these signals (we implement server stop in
+        # daemon stop method, see RQWorkerDaemon.stop for example).
+        pass
+
+    def dequeue_job_and_maintain_ttl(self, timeout):
+        # RQ Worker is designed to work in main thread, so we add behaviour
+        # here: if _stop_requested has been set to True, raise the standard way
+        # StopRequested exception to stop worker.
+        if self._stop_requested:
+            raise StopRequested()
+        return super().dequeue_job_and_maintain_ttl(timeout)
+
+
+class RQWorkerDaemon(FakeDaemon):
+    """
+    Daemon running a RQWorker on one queue of redis server configured in
+    tracim config.
+    """
+    # NOTE: use *args and **kwargs because parent __init__ use strange
+    # * parameter
+    def __init__(
+            self,
+            config: 'CFG',
+            queue_name: str,
+            burst=True,
+            *args,
+            **kwargs
+    ):
+        """
+        :param config: tracim config
+        :param queue_name: name of rq queue jobs are taken from
+        :param burst: if true, run one time, if false, run continously
+        """
+        super().__init__(*args, **kwargs)
+        self.config = config
+        self.queue_name = queue_name
+        self.worker = None  # type: RQWorker
+        self.burst = burst
+
+    def append_thread_callback(self, callback: typing.Callable) -> None:
+        logger.warning(
+            self,
+            '{} not implement append_thread_callback'.format(
+                self.__class__.__name__
+            )
+        )
+
+    def stop(self) -> None:
+        # When _stop_requested at False, tracim.lib.daemons.RQWorker
+        # will raise StopRequested exception in worker thread after receive a
+        # job.
+        self.worker._stop_requested = True
+        redis_connection = get_redis_connection(self.config)
+        queue = get_rq_queue(redis_connection, self.queue_name)
+        queue.enqueue(do_nothing)
+
+    def run(self) -> None:
+        with RQConnection(get_redis_connection(self.config)):
+            self.worker = RQWorker([self.queue_name])
+            self.worker.work(burst=self.burst)
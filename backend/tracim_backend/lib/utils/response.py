@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import os
+import typing
+from datetime import datetime
+
+from depot.io.interfaces import StoredFile
+from hapic.data import HapicFile
+from pyramid.request import Request
+from pyramid.response import FileIter
+from pyramid.response import Response
+from webob.static import FileIter as SeekableFileIter
+
+# INFO - G.M - 2018-12-10 - Same block size as pyramid FileResponse
+FILE_RESPONSE_BLOCK_SIZE = 4096 * 64
+
+
+def get_revision_file_etag(revision_id: int) -> str:
+    """
+    Strong etag of revision file: revision file content never change,
+    a new revision is created for each file update.
+    """
+    return 'revision-{}'.format(revision_id)
+
+
+def get_stored_file_path(stored_file: StoredFile) -> typing.Optional[str]:
+    """
+    Return path of file on local filesystem if stored file come from a
+    local depot storage, None otherwise.
+    """
+    # INFO - G.M - 2018-12-10 - only LocalFileStorage stored file have a
+    # file path, see also ContentApi.get_one_revision_filepath
+    return getattr(stored_file, '_file_path', None)
+
+
+def get_stored_file_response(
+    request: Request,
+    stored_file: StoredFile,
+    etag: str,
+    last_modified: datetime,
+    filename: str,
+    as_attachment: bool = False,
+    content_type: typing.Optional[str] = None,
+) -> Response:
+    """
+    Build a streamed response of depot stored file supporting conditional
+    GET (If-None-Match/If-Modified-Since, 304) and byte ranges (206).
+    File content is never loaded in memory: local depot files are
+    sent with wsgi.file_wrapper (sendfile where server support it) or
+    read by block for ranged requests.
+    :param request: current request
+    :param stored_file: depot stored file to send
+    :param etag: strong etag of file, should be unique for file content
+    :param last_modified: last modification date of file content
+    :param filename: filename of content-disposition header
+    :param as_attachment: send file as attachment instead of inline
+    :param content_type: content type of file, default to content type
+    stored in depot. Depot files are shared by all revisions with same file
+    content: stored content type is the one of first revision.
+    :return: pyramid response
+    """
+    response = Response(
+        request=request,
+        content_type=content_type or stored_file.content_type,
+        conditional_response=True,
+    )
+    file_path = get_stored_file_path(stored_file)
+    if file_path:
+        # INFO - G.M - 2018-12-10 - depot LocalStoredFile is not seekable,
+        # open file directly to allow range request without reading
+        # unneeded bytes.
+        stored_file.close()
+        file_ = open(file_path, 'rb')
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if file_wrapper and not request.range:
+            response.app_iter = file_wrapper(file_, FILE_RESPONSE_BLOCK_SIZE)
+        else:
+            response.app_iter = SeekableFileIter(file_)
+        # INFO - G.M - 2018-12-10 - setting app_iter reset content_length,
+        # it should be set afterward.
+        response.content_length = os.fstat(file_.fileno()).st_size
+    else:
+        # INFO - G.M - 2018-12-10 - Other depot storage: stream content,
+        # range are served by webob skipping unneeded bytes.
+        response.app_iter = FileIter(stored_file, FILE_RESPONSE_BLOCK_SIZE)
+        response.content_length = stored_file.content_length
+    response.etag = etag
+    response.last_modified = last_modified
+    response.accept_ranges = 'bytes'
+    response.content_disposition = HapicFile(
+        filename=filename,
+        as_attachment=as_attachment,
+    ).get_content_disposition_header_value()
+    return response
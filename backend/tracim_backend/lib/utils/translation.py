@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import json
 import os
+import threading
+from types import MappingProxyType
 
 from babel.core import default_locale
 import typing
@@ -10,6 +12,66 @@ if typing.TYPE_CHECKING:
 TRANSLATION_FILENAME = 'backend.json'
 DEFAULT_FALLBACK_LANG = 'en'
 
+EMPTY_CATALOG = MappingProxyType({})  # type: typing.Mapping[str, str]
+
+
+class TranslationCatalogCache(object):
+    """
+    Process wide cache of translation catalogs: each json translation file
+    is loaded once into an immutable mapping. With mtime check, catalogs
+    are reloaded when translation file change.
+    """
+
+    def __init__(self) -> None:
+        # INFO - G.M - 2018-12-12 - filepath -> (file mtime, catalog)
+        self._catalogs = {}  # type: typing.Dict[str, typing.Tuple[typing.Optional[float], typing.Mapping[str, str]]]  # nopep8
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_mtime(filepath: str) -> typing.Optional[float]:
+        try:
+            return os.stat(filepath).st_mtime
+        except OSError:
+            return None
+
+    @staticmethod
+    def _load_catalog(filepath: str) -> typing.Mapping[str, str]:
+        try:
+            with open(filepath) as file:
+                return MappingProxyType(json.load(file))
+        except Exception:
+            return EMPTY_CATALOG
+
+    def get_catalog(
+            self,
+            filepath: str,
+            check_mtime: bool = False,
+    ) -> typing.Mapping[str, str]:
+        """
+        Return catalog of translation file, empty catalog if file does not
+        exist or is not valid.
+        :param filepath: json translation file path
+        :param check_mtime: reload catalog if translation file changed
+        since it was loaded.
+        """
+        cached = self._catalogs.get(filepath)
+        if cached and not check_mtime:
+            return cached[1]
+        mtime = self._get_mtime(filepath)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            catalog = self._load_catalog(filepath)
+            self._catalogs[filepath] = (mtime, catalog)
+        return catalog
+
+    def clear(self) -> None:
+        with self._lock:
+            self._catalogs.clear()
+
+
+translation_catalog_cache = TranslationCatalogCache()
+
 
 class Translator(object):
     """
@@ -33,22 +95,19 @@ class Translator(object):
         else:
             return lang_filepath
 
-    def _get_translation_from_file(self, filepath: str) -> typing.Optional[typing.Dict[str, str]]:  # nopep8
-        try:
-            with open(filepath) as file:
-                trads = json.load(file)
-                return trads
-        except Exception:
-            return None
+    def _get_translation_from_file(self, filepath: str) -> typing.Mapping[str, str]:  # nopep8
+        return translation_catalog_cache.get_catalog(
+            filepath,
+            check_mtime=self.config.BACKEND_I18N_RELOAD,
+        )
 
     def _get_translation(self, lang: str, message: str) -> typing.Tuple[str, bool]:
-        try:
-            translation_filepath = self._get_json_translation_lang_filepath(lang)  # nopep8
-            translation = self._get_translation_from_file(translation_filepath)
-            if message in translation and translation[message]:
-                return translation[message], True
-        except Exception:
-            pass
+        translation_filepath = self._get_json_translation_lang_filepath(lang)  # nopep8
+        if not translation_filepath:
+            return message, False
+        translation = self._get_translation_from_file(translation_filepath)
+        if translation.get(message):
+            return translation[message], True
         return message, False
 
     def get_translation(self, message: str, lang: str = None) -> str:
@@ -67,6 +126,19 @@ class Translator(object):
         return message
 
 
+def load_translation_catalogs(app_config: 'CFG') -> None:
+    """
+    Load translation catalogs of all available languages, to avoid loading
+    them during first requests.
+    """
+    if not os.path.isdir(app_config.BACKEND_I18N_FOLDER):
+        return
+    translator = Translator(app_config)
+    for lang in os.listdir(app_config.BACKEND_I18N_FOLDER):
+        lang_filepath = translator._get_json_translation_lang_filepath(lang)
+        translator._get_translation_from_file(lang_filepath)
+
+
 def get_locale():
     # TODO - G.M - 27-03-2018 - [i18n] Reconnect true internationalization
     return default_locale('LC_TIME')
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
 import datetime
+import os
+import queue
 import random
 import string
+import threading
 from urllib.parse import urljoin
 from urllib.parse import urlencode
 
@@ -9,8 +13,15 @@ from colour import Color
 import pytz
 from redis import Redis
 from rq import Queue
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import URL
+from sqlalchemy.orm import Session
 import typing
 
+from tracim_backend.lib.utils.logger import logger
+
 if typing.TYPE_CHECKING:
     from tracim_backend.config import CFG
 
@@ -22,6 +33,7 @@ WORKSPACE_FRONTEND_URL_SCHEMA = 'workspaces/{workspace_id}'  # nopep8
 FRONTEND_UI_SUBPATH = 'ui'
 LOGIN_SUBPATH = 'login'
 RESET_PASSWORD_SUBPATH = 'reset-password'
+AFTER_COMMIT_CALLS_SESSION_KEY = 'tracim_after_commit_calls'
 
 def generate_documentation_swagger_tag(*sections: str) -> str:
     """
@@ -240,3 +252,185 @@ def deprecated(func: typing.Callable):
     """ Dummy deprecated function"""
     # TODO - G.M - 2018-12-04 - Replace this with a true deprecated function ?
     return func
+
+
+class LRUCache(object):
+    """
+    Simple thread safe Least Recently Used cache: when maxsize is reached,
+    least recently used items are removed.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._items = OrderedDict()  # type: typing.Dict[typing.Any, typing.Any]
+        self._lock = threading.Lock()
+
+    def get(self, key: typing.Hashable, default: typing.Any=None) -> typing.Any:
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key: typing.Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def delete_values(
+            self,
+            predicate: typing.Callable[[typing.Any], bool],
+    ) -> None:
+        """
+        Delete items whose value match predicate.
+        """
+        with self._lock:
+            keys = [
+                key for key, value in self._items.items() if predicate(value)
+            ]
+            for key in keys:
+                del self._items[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class LocalJobQueue(object):
+    """
+    In-process queue of jobs, consumed by a background thread. Used when no
+    daemon is available to run jobs out of http requests.
+    """
+
+    def __init__(self, thread_name: str) -> None:
+        """
+        :param thread_name: name of background thread, used in logs
+        """
+        self.thread_name = thread_name
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._thread = None  # type: threading.Thread
+        self._lock = threading.Lock()
+
+    def enqueue(self, callable_: typing.Callable, *args) -> None:
+        with self._lock:
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._work,
+                    name=self.thread_name,
+                    daemon=True,
+                )
+                self._thread.start()
+        self._queue.put((callable_, args))
+
+    def _work(self) -> None:
+        while True:
+            callable_, args = self._queue.get()
+            try:
+                callable_(*args)
+            except Exception as exc:
+                logger.error(
+                    self,
+                    'Job of {} failed: {}'.format(self.thread_name, str(exc)),
+                    exc_info=True,
+                )
+            finally:
+                self._queue.task_done()
+
+
+# INFO - G.M - 2018-12-26 - Engines used by background jobs of current
+# process, by database url: jobs unpickled in a worker process share one
+# engine (and its connection pool) instead of creating one each.
+_process_engines = {}  # type: typing.Dict[typing.Tuple[int, str], Engine]
+_process_engines_lock = threading.Lock()
+
+
+def get_process_engine(url: URL) -> Engine:
+    """
+    Get engine of current process for database url, create it if needed.
+    Engines are never shared with forked processes.
+    """
+    key = (os.getpid(), str(url))
+    with _process_engines_lock:
+        if key not in _process_engines:
+            _process_engines[key] = create_engine(url)
+        return _process_engines[key]
+
+
+class DatabaseJob(object):
+    """
+    Base class of jobs using database out of http requests.
+
+    To allow their use in a rq worker, jobs can be pickled: only the
+    database url is kept, then the engine of the worker process for this
+    url is used, see get_process_engine().
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self._engine = engine
+        self._engine_url = engine.url
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        state = self.__dict__.copy()
+        state['_engine'] = None
+        return state
+
+    def _get_engine(self) -> Engine:
+        if not self._engine:
+            self._engine = get_process_engine(self._engine_url)
+        return self._engine
+
+
+def call_after_commit(
+        session: Session,
+        callable_: typing.Callable,
+        *args
+) -> None:
+    """
+    Call callable_(*args) once current transaction of session is committed,
+    forget it if transaction is rolled back. Used to send jobs to background
+    workers: data of the transaction has to be visible for them.
+    Errors of calls are logged, they can't change a committed transaction.
+    """
+    if AFTER_COMMIT_CALLS_SESSION_KEY not in session.info:
+        session.info[AFTER_COMMIT_CALLS_SESSION_KEY] = []
+        event.listen(session, 'after_commit', _do_after_commit_calls)
+        event.listen(
+            session,
+            'after_soft_rollback',
+            _clear_after_commit_calls,
+        )
+    session.info[AFTER_COMMIT_CALLS_SESSION_KEY].append((callable_, args))
+
+
+def _do_after_commit_calls(session: Session) -> None:
+    calls = session.info.get(AFTER_COMMIT_CALLS_SESSION_KEY, [])
+    session.info[AFTER_COMMIT_CALLS_SESSION_KEY] = []
+    for callable_, args in calls:
+        try:
+            callable_(*args)
+        except Exception as exc:
+            logger.error(
+                session,
+                'Call of {} after commit failed: {}'.format(
+                    getattr(callable_, '__qualname__', callable_),
+                    str(exc),
+                ),
+                exc_info=True,
+            )
+
+
+def _clear_after_commit_calls(session: Session, previous_transaction) -> None:  # nopep8
+    if not session.is_active:
+        return
+    session.info[AFTER_COMMIT_CALLS_SESSION_KEY] = []
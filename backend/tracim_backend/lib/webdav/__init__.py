@@ -15,8 +15,11 @@ from wsgidav.xml_tools import useLxml
 
 from tracim_backend import CFG
 from tracim_backend.lib.utils.utils import DEFAULT_TRACIM_CONFIG_FILE
+from tracim_backend.models import get_engine
+from tracim_backend.models import get_session_factory
 from tracim_backend.lib.webdav.authentification import TracimDomainController
 from tracim_backend.lib.webdav.dav_provider import Provider
+from tracim_backend.lib.webdav.lock_storage import LockStorage
 from tracim_backend.lib.webdav.middlewares import TracimEnforceHTTPS
 from tracim_backend.lib.webdav.middlewares import TracimEnv
 from tracim_backend.lib.webdav.middlewares import TracimUserSession
@@ -80,8 +83,20 @@ class WebdavAppFactory(object):
                 show_deleted=False,  # config['show_deleted'],
                 show_history=False,  # config['show_history'],
                 app_config=app_config,
+                # INFO - G.M - 2018-12-12 - lock manager is set by wsgidav
+                # app from locksmanager config.
+                manage_locks=False,
             )
         }
+        # INFO - G.M - 2018-12-12 - Locks are stored in database to be
+        # shared by all webdav processes.
+        if config.get('manager_locks', True):
+            config['locksmanager'] = LockStorage(
+                session_factory=get_session_factory(get_engine(settings)),
+                sweep_interval=app_config.WSGIDAV_LOCK_SWEEP_INTERVAL,
+            )
+        else:
+            config['locksmanager'] = False
 
         config['domaincontroller'] = TracimDomainController(
             presetdomain=None,
@@ -1,8 +1,16 @@
 # coding: utf8
+from tracim_backend.exceptions import AuthenticationFailed
 from tracim_backend.exceptions import DigestAuthNotImplemented
+from tracim_backend.exceptions import UserAuthenticatedIsNotActive
+from tracim_backend.exceptions import UserDoesNotExist
 from tracim_backend.lib.core.user import UserApi
+from tracim_backend.lib.core.user import credential_cache
+from tracim_backend.models.auth import User
 
 DEFAULT_TRACIM_WEBDAV_REALM = '/'
+# INFO - G.M - 2018-12-11 - environ key of user authenticated by domain
+# controller, see TracimUserSession middleware.
+TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY = 'tracim_authenticated_user'
 
 
 class TracimDomainController(object):
@@ -34,16 +42,47 @@ class TracimDomainController(object):
         """
         api = UserApi(None, environ['tracim_dbsession'], self.app_config)
         try:
-             api.get_one_by_email(username)
-             return True
-        except:
-             return False
+            api.get_one_by_email(username)
+            return True
+        except UserDoesNotExist:
+            return False
 
     def authDomainUser(self, realmname, username, password, environ):
         """
         If you ever feel the need to send a request al-mano with a curl, this is the function that'll be called by
-        http_authenticator to validate the password sent
+        http_authenticator to validate the password sent.
+        Authenticated user is put in environ, so that it is loaded only once
+        by request. Valid credentials are cached, see CredentialCache:
+        password is not checked again until they expire.
         """
-        api = UserApi(None, environ['tracim_dbsession'], self.app_config)
-        return self.isRealmUser(realmname, username, environ) and \
-             api.get_one_by_email(username).validate_password(password)
+        session = environ['tracim_dbsession']
+        ttl = self.app_config.WSGIDAV_AUTH_CACHE_TTL
+        user = None
+        user_id = credential_cache.get_user_id(username, password) \
+            if ttl > 0 else None
+        if user_id is not None:
+            user = session.query(User).get(user_id)
+            # INFO - G.M - 2018-12-26 - User may be changed by other
+            # processes: its state is checked again, it costs nothing once
+            # user is loaded.
+            if not user \
+                    or user.is_deleted \
+                    or not user.is_active \
+                    or user.email != username:
+                credential_cache.invalidate_user(user_id)
+                user = None
+        if not user:
+            api = UserApi(None, session, self.app_config)
+            try:
+                user = api.authenticate_user(username, password)
+            except (AuthenticationFailed, UserAuthenticatedIsNotActive):
+                return False
+            if ttl > 0:
+                credential_cache.set_user_id(
+                    username,
+                    password,
+                    user.user_id,
+                    ttl,
+                )
+        environ[TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY] = user
+        return True
@@ -1,28 +1,36 @@
 # coding: utf8
 
 import re
+import typing
 from os.path import basename, dirname
 
 from sqlalchemy.orm.exc import NoResultFound
 
 from tracim_backend import CFG
+from tracim_backend.exceptions import ContentNotFound
 from tracim_backend.lib.webdav.utils import transform_to_bdd, HistoryType, \
     SpecialFolderExtension
 from tracim_backend.app_models.contents import content_type_list
 
 from wsgidav.dav_provider import DAVProvider
 from wsgidav.lock_manager import LockManager
+from wsgidav.lock_storage import LockStorageDict
 
-
-from tracim_backend.lib.webdav.lock_storage import LockStorage
 from tracim_backend.lib.core.content import ContentApi
 from tracim_backend.lib.core.content import ContentRevisionRO
 from tracim_backend.lib.core.workspace import WorkspaceApi
+from tracim_backend.lib.utils.utils import LRUCache
 from tracim_backend.lib.webdav import resources
 from tracim_backend.lib.webdav.utils import normpath
 from tracim_backend.models.data import Content
 from tracim_backend.models.data import Workspace
 
+# INFO - G.M - 2018-12-11 - Process wide cache of path resolution:
+# (workspace_id, workspace content_tree_generation, path) -> content_id
+CONTENT_PATH_CACHE_SIZE = 10000
+content_path_cache = LRUCache(CONTENT_PATH_CACHE_SIZE)
+REQUEST_PATH_CACHE_ENVIRON_KEY = 'tracim_webdav_path_cache'
+
 
 class Provider(DAVProvider):
     """
@@ -40,8 +48,10 @@ class Provider(DAVProvider):
     ):
         super(Provider, self).__init__()
 
+        # INFO - G.M - 2018-12-12 - in-memory locks of standalone provider,
+        # webdav app use database lock storage, see WebdavAppFactory.
         if manage_locks:
-            self.lockManager = LockManager(LockStorage())
+            self.lockManager = LockManager(LockStorageDict())
 
         self.app_config = app_config
         self._show_archive = show_archived
@@ -84,7 +94,7 @@ class Provider(DAVProvider):
             session=session,
             config=self.app_config,
         )
-        workspace = self.get_workspace_from_path(path, workspace_api)
+        workspace = self.get_workspace_from_path(path, workspace_api, environ)
 
         # If the request path is in the form root/name, then we return a WorkspaceResource resource
         parent_path = dirname(path)
@@ -112,7 +122,8 @@ class Provider(DAVProvider):
         content = self.get_content_from_path(
             path=path,
             content_api=content_api,
-            workspace=workspace
+            workspace=workspace,
+            environ=environ,
         )
 
 
@@ -246,7 +257,8 @@ class Provider(DAVProvider):
                 current_user=user,
                 session=session,
                 config=self.app_config,
-            )
+            ),
+            environ,
         )
 
         if parent_path == root_path or workspace is None:
@@ -272,7 +284,12 @@ class Provider(DAVProvider):
             revision_id = revision_id.group(1)
             content = content_api.get_one_revision(revision_id)
         else:
-            content = self.get_content_from_path(working_path, content_api, workspace)
+            content = self.get_content_from_path(
+                working_path,
+                content_api,
+                workspace,
+                environ,
+            )
 
         return content is not None \
             and content.is_deleted == is_deleted \
@@ -331,11 +348,70 @@ class Provider(DAVProvider):
 
         return path
 
-    def get_content_from_path(self, path, content_api: ContentApi, workspace: Workspace) -> Content:
+    def _get_request_cache(self, environ: typing.Optional[dict]) -> dict:
+        """
+        Return cache of path resolution of current request: wsgidav resolve
+        same path many times for one request (exists, getResourceInst...)
+        """
+        if environ is None:
+            return {}
+        return environ.setdefault(REQUEST_PATH_CACHE_ENVIRON_KEY, {})
+
+    def get_content_from_path(
+            self,
+            path,
+            content_api: ContentApi,
+            workspace: Workspace,
+            environ: typing.Optional[dict]=None,
+    ) -> Content:
         """
         Called whenever we want to get the Content item from the database for a given path
         """
         path = self.reduce_path(path)
+        # INFO - G.M - 2018-12-11 - content_tree_generation of workspace
+        # change each time a content path may change in workspace, so cached
+        # path of previous generations are never used.
+        cache_key = (
+            workspace.workspace_id,
+            workspace.content_tree_generation,
+            path,
+        )
+        request_cache = self._get_request_cache(environ)
+        content = request_cache.get(cache_key)
+        if content is not None:
+            return content
+
+        content_id = content_path_cache.get(cache_key)
+        if content_id is not None:
+            try:
+                content = content_api.get_one(
+                    content_id,
+                    content_type_list.Any_SLUG,
+                    workspace,
+                )
+            except ContentNotFound:
+                content = None
+        if content is None:
+            content = self._get_content_from_path_labels(
+                path,
+                content_api,
+                workspace,
+            )
+        if content is not None:
+            content_path_cache.set(cache_key, content.content_id)
+            request_cache[cache_key] = content
+        return content
+
+    def _get_content_from_path_labels(
+            self,
+            path,
+            content_api: ContentApi,
+            workspace: Workspace,
+    ) -> typing.Optional[Content]:
+        """
+        Get Content item from database using labels of reduced path, one
+        query is needed for each path item.
+        """
         parent_path = dirname(path)
 
         relative_parents_path = parent_path[len(workspace.label)+1:]
@@ -362,11 +438,35 @@ class Provider(DAVProvider):
         except NoResultFound:
             return None
 
-    def get_parent_from_path(self, path, api: ContentApi, workspace) -> Content:
-        return self.get_content_from_path(dirname(path), api, workspace)
+    def get_parent_from_path(
+            self,
+            path,
+            api: ContentApi,
+            workspace,
+            environ: typing.Optional[dict]=None,
+    ) -> Content:
+        return self.get_content_from_path(
+            dirname(path),
+            api,
+            workspace,
+            environ,
+        )
 
-    def get_workspace_from_path(self, path: str, api: WorkspaceApi) -> Workspace:
+    def get_workspace_from_path(
+            self,
+            path: str,
+            api: WorkspaceApi,
+            environ: typing.Optional[dict]=None,
+    ) -> Workspace:
+        workspace_label = transform_to_bdd(path.split('/')[1])
+        request_cache = self._get_request_cache(environ)
+        cache_key = ('workspace', workspace_label)
+        workspace = request_cache.get(cache_key)
+        if workspace is not None:
+            return workspace
         try:
-            return api.get_one_by_label(transform_to_bdd(path.split('/')[1]))
+            workspace = api.get_one_by_label(workspace_label)
         except NoResultFound:
             return None
+        request_cache[cache_key] = workspace
+        return workspace
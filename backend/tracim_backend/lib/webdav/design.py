@@ -148,12 +148,21 @@ def create_readable_date(created, delta_from_datetime: datetime = None):
 
     return aff
 
+
+def format_event_date(created: datetime) -> str:
+    """
+    Format date of history events and comments. Dates are absolute: html is
+    stored with its length by revision, it must not change with time.
+    """
+    return created.strftime('%B %d, %Y at %H:%M')
+
+
 def designPage(content: data.Content, content_revision: data.ContentRevisionRO) -> str:
     hist = content.get_history(drop_empty_revision=False)
     histHTML = '<table class="table table-striped table-hover">'
     for event in hist:
         if isinstance(event, VirtualEvent):
-            date = event.create_readable_date()
+            date = format_event_date(event.created)
             label = _LABELS[event.type.id]
 
             histHTML += '''
@@ -261,7 +270,7 @@ def designThread(content: data.Content, content_revision: data.ContentRevisionRO
                             %s
                         </div>
                     </div>
-                    ''' % (t.owner.display_name, create_readable_date(t.created), t.description)
+                    ''' % (t.owner.display_name, format_event_date(t.created), t.description)
 
                 if t.owner.display_name not in participants:
                     participants[t.owner.display_name] = [1, t.created]
@@ -285,7 +294,7 @@ def designThread(content: data.Content, content_revision: data.ContentRevisionRO
                     ''' % ('warning' if t.id == content_revision.revision_id else '',
                            t.type.fa_icon,
                            t.owner.display_name,
-                           t.create_readable_date(),
+                           format_event_date(t.created),
                            label,
                             # NOTE: (WABDAV_HIST_DEL_DISABLED) Disabled for beta 1.0
                             '<i class="fa fa-caret-left"></i> shown' if t.id == content_revision.revision_id else '' # else '''<span><a class="revision-link" href="/.history/%s/%s-%s">(View revision)</a></span>''' % (
@@ -1,81 +1,271 @@
+import threading
 import time
-
-from tracim_backend.lib.webdav.model import Lock, Url2Token
+import typing
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from sqlalchemy import and_
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker
+from wsgidav import compat
 from wsgidav import util
-from wsgidav.lock_manager import normalizeLockRoot, lockString, generateLockToken, validateLock
-from wsgidav.rw_lock import ReadWriteLock
+from wsgidav.dav_error import DAVError
+from wsgidav.dav_error import DAVErrorCondition
+from wsgidav.dav_error import HTTP_LOCKED
+from wsgidav.dav_error import PRECONDITION_CODE_LockConflict
+from wsgidav.lock_manager import lockString
+from wsgidav.lock_manager import normalizeLockRoot
+from wsgidav.lock_manager import generateLockToken
+from wsgidav.lock_manager import validateLock
+
+from tracim_backend.models.data import WebdavLock
+from tracim_backend.models.data import WebdavLockGeneration
 
 _logger = util.getModuleLogger(__name__)
 
-
-def from_dict_to_base(lock):
-    return Lock(
-        token=lock["token"],
-        depth=lock["depth"],
-        root=lock["root"],
-        type=lock["type"],
-        scopre=lock["scope"],
-        owner=lock["owner"],
-        timeout=lock["timeout"],
-        principal=lock["principal"],
-        expire=lock["expire"]
+# INFO - G.M - 2018-12-12 - Expired locks are purged from database every
+# DEFAULT_LOCK_SWEEP_INTERVAL seconds.
+DEFAULT_LOCK_SWEEP_INTERVAL = 300
+
+
+def from_dict_to_base(lock: typing.Dict[str, typing.Any]) -> WebdavLock:
+    return WebdavLock(
+        token=lock['token'],
+        root=lock['root'],
+        depth=lock['depth'],
+        type=lock['type'],
+        scope=lock['scope'],
+        # INFO - G.M - 2018-12-12 - owner is a xml bytestring
+        owner=compat.to_unicode(lock['owner']),
+        principal=lock['principal'],
+        timeout=lock['timeout'],
+        expire=lock['expire'],
     )
 
 
-def from_base_to_dict(lock):
+def from_base_to_dict(lock: WebdavLock) -> typing.Dict[str, typing.Any]:
     return {
         'token': lock.token,
-        'depth': lock.depth,
         'root': lock.root,
+        'depth': lock.depth,
         'type': lock.type,
         'scope': lock.scope,
-        'owner': lock.owner,
-        'timeout': lock.timeout,
+        'owner': compat.to_bytes(lock.owner),
         'principal': lock.principal,
-        'expire': lock.expire
+        'timeout': lock.timeout,
+        'expire': lock.expire,
     }
 
 
+class LockIndex(object):
+    """
+    Immutable in-memory copy of all locks of database, valid as long as
+    generation of lock table does not change.
+    """
+
+    def __init__(
+            self,
+            generation: int,
+            locks: typing.List[typing.Dict[str, typing.Any]],
+    ) -> None:
+        self.generation = generation
+        self.locks_by_token = {lock['token']: lock for lock in locks}
+        self.locks_by_root = {}  # type: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]]  # nopep8
+        for lock in locks:
+            self.locks_by_root.setdefault(lock['root'], []).append(lock)
+        self.roots = sorted(self.locks_by_root.keys())
+
+
+def is_lock_expired(lock: typing.Dict[str, typing.Any]) -> bool:
+    return 0 <= lock['expire'] < time.time()
+
+
 class LockStorage(object):
+    """
+    wsgidav lock storage keeping locks in database, so that all webdav
+    processes using same database share locks.
+
+    Reads are served from an in-memory index of all locks, reloaded only
+    when lock table changed: each write (create, refresh, delete, purge)
+    increments generation of lock table in same transaction (see
+    WebdavLockGeneration). Lock creation is serialized by this increment,
+    then checked against locks of database: an exclusive lock can not be
+    granted twice, even by different processes.
+
+    Expired locks are never returned, and are purged from database by a
+    background thread started by open().
+    """
     LOCK_TIME_OUT_DEFAULT = 604800  # 1 week, in seconds
     LOCK_TIME_OUT_MAX = 4 * 604800  # 1 month, in seconds
 
-    def __init__(self):
-        self._session = None# todo Session()
-        self._lock = ReadWriteLock()
+    def __init__(
+            self,
+            session_factory: sessionmaker,
+            sweep_interval: int=DEFAULT_LOCK_SWEEP_INTERVAL,
+    ) -> None:
+        """
+        :param session_factory: factory of database sessions, sessions are
+        not bound to any transaction manager: each operation is committed
+        immediately.
+        :param sweep_interval: interval (in seconds) between each purge of
+        expired locks, 0 to disable background purge.
+        """
+        self._session_factory = session_factory
+        self.sweep_interval = sweep_interval
+        self._index = None  # type: typing.Optional[LockIndex]
+        self._sweeper = None  # type: typing.Optional[threading.Thread]
+        self._sweeper_stop = threading.Event()
 
     def __repr__(self):
-        return "C'est bien mon verrou..."
-
-    def __del__(self):
-        pass
+        return "{}()".format(self.__class__.__name__)
 
-    def get_lock_db_from_token(self, token):
-        return self._session.query(Lock).filter(Lock.token == token).one_or_none()
+    @contextmanager
+    def _session_scope(self) -> typing.Generator[Session, None, None]:
+        session = self._session_factory()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
-    def _flush(self):
-        """Overloaded by Shelve implementation."""
-        pass
+    def _get_index(self) -> LockIndex:
+        """
+        Return index of all locks, reloaded from database only if lock table
+        changed since last load.
+        """
+        with self._session_scope() as session:
+            generation = session.query(
+                WebdavLockGeneration.generation
+            ).filter(
+                WebdavLockGeneration.id == WebdavLockGeneration.SINGLE_ROW_ID
+            ).scalar()
+            index = self._index
+            if index is None or index.generation != generation:
+                # INFO - G.M - 2018-12-12 - generation is read before locks:
+                # index can only be newer than its generation, never older.
+                index = LockIndex(
+                    generation,
+                    [
+                        from_base_to_dict(lock)
+                        for lock in session.query(WebdavLock)
+                    ],
+                )
+                self._index = index
+        return index
+
+    def _increment_generation(self, session: Session) -> None:
+        """
+        Mark lock table as changed for in-memory index of all processes.
+        Generation row is locked until commit of session transaction: other
+        lock writes wait for it.
+        """
+        session.query(WebdavLockGeneration).filter(
+            WebdavLockGeneration.id == WebdavLockGeneration.SINGLE_ROW_ID
+        ).update(
+            {WebdavLockGeneration.generation: WebdavLockGeneration.generation + 1},  # nopep8
+            synchronize_session=False,
+        )
+
+    def _check_lock_conflicts(
+            self,
+            session: Session,
+            lock: typing.Dict[str, typing.Any],
+    ) -> None:
+        """
+        Check new lock against valid locks of database, with rules of
+        wsgidav.lock_manager.LockManager._checkLockPermission(), and raise
+        DAVError(HTTP_LOCKED) on conflict.
+        """
+        path = lock['root']
+        parents = []
+        parent = util.getUriParent(path)
+        while parent:
+            parents.append(normalizeLockRoot(parent))
+            parent = util.getUriParent(parent)
+
+        # INFO - G.M - 2018-12-27 - locks of path and depth-infinity locks
+        # of parents are conflicting, except shared ones for a shared lock.
+        # If new lock is depth-infinity, any lock of children is.
+        conflicts = and_(
+            or_(
+                WebdavLock.root == path,
+                and_(
+                    WebdavLock.root.in_(parents),
+                    WebdavLock.depth == 'infinity',
+                ),
+            ),
+            or_(
+                WebdavLock.scope != 'shared',
+                lock['scope'] != 'shared',
+            ),
+        )
+        if lock['depth'] == 'infinity':
+            conflicts = or_(
+                conflicts,
+                WebdavLock.root.startswith(
+                    path.rstrip('/') + '/',
+                    autoescape=True,
+                ),
+            )
+        conflicting_roots = session.query(WebdavLock.root)\
+            .filter(conflicts)\
+            .filter(or_(
+                WebdavLock.expire < 0,
+                WebdavLock.expire >= time.time(),
+            ))\
+            .all()
+        if conflicting_roots:
+            errcond = DAVErrorCondition(PRECONDITION_CODE_LockConflict)
+            for root, in conflicting_roots:
+                errcond.add_href(root)
+            raise DAVError(HTTP_LOCKED, errcondition=errcond)
+
+    def _sweep(self) -> None:
+        while not self._sweeper_stop.wait(self.sweep_interval):
+            try:
+                self.cleanup()
+            except Exception:
+                _logger.exception('Unable to purge expired webdav locks')
 
     def open(self):
-        """Called before first use.
-
-        May be implemented to initialize a storage.
-        """
-        pass
+        """Called before first use: start expired locks purge."""
+        if self.sweep_interval <= 0 or self._sweeper:
+            return
+        self._sweeper_stop.clear()
+        self._sweeper = threading.Thread(
+            target=self._sweep,
+            name='webdav-lock-sweeper',
+            daemon=True,
+        )
+        self._sweeper.start()
 
     def close(self):
         """Called on shutdown."""
-        pass
+        self._sweeper_stop.set()
+        self._sweeper = None
 
     def cleanup(self):
-        """Purge expired locks (optional)."""
-        pass
+        """Purge expired locks."""
+        with self._session_scope() as session:
+            deleted = session.query(WebdavLock).filter(
+                WebdavLock.expire >= 0,
+                WebdavLock.expire < time.time(),
+            ).delete(synchronize_session=False)
+            if deleted:
+                self._increment_generation(session)
+        if deleted:
+            _logger.debug("Purged {} expired locks".format(deleted))
 
     def clear(self):
         """Delete all entries."""
-        self._session.query(Lock).all().delete(synchronize_session=False)
-        self._session.commit()
+        with self._session_scope() as session:
+            session.query(WebdavLock).delete(synchronize_session=False)
+            self._increment_generation(session)
+        self._index = None
 
     def get(self, token):
         """Return a lock dictionary for a token.
@@ -89,22 +279,14 @@ class LockStorage(object):
 
         Side effect: if lock is expired, it will be purged and None is returned.
         """
-        self._lock.acquireRead()
-        try:
-            lock_base = self._session.query(Lock).filter(Lock.token == token).one_or_none()
-            if lock_base is None:
-                # Lock not found: purge dangling URL2TOKEN entries
-                _logger.debug("Lock purged dangling: %s" % token)
-                self.delete(token)
-                return None
-            expire = float(lock_base.expire)
-            if 0 <= expire < time.time():
-                _logger.debug("Lock timed-out(%s): %s" % (expire, lockString(from_base_to_dict(lock_base))))
-                self.delete(token)
-                return None
-            return from_base_to_dict(lock_base)
-        finally:
-            self._lock.release()
+        lock = self._get_index().locks_by_token.get(token)
+        if lock is None:
+            return None
+        if is_lock_expired(lock):
+            _logger.debug("Lock timed-out(%s): %s" % (lock['expire'], lockString(lock)))  # nopep8
+            self.delete(token)
+            return None
+        return lock.copy()
 
     def create(self, path, lock):
         """Create a direct lock for a resource path.
@@ -122,53 +304,40 @@ class LockStorage(object):
         - lock['timeout'] may be normalized and shorter than requested
         - lock['token'] is added
         """
-        self._lock.acquireWrite()
-        try:
-            # We expect only a lock definition, not an existing lock
-            assert lock.get("token") is None
-            assert lock.get("expire") is None, "Use timeout instead of expire"
-            assert path and "/" in path
-
-            # Normalize root: /foo/bar
-            org_path = path
-            path = normalizeLockRoot(path)
-            lock["root"] = path
-
-            # Normalize timeout from ttl to expire-date
-            timeout = float(lock.get("timeout"))
-            if timeout is None:
-                timeout = LockStorage.LOCK_TIME_OUT_DEFAULT
-            elif timeout < 0 or timeout > LockStorage.LOCK_TIME_OUT_MAX:
-                timeout = LockStorage.LOCK_TIME_OUT_MAX
+        # We expect only a lock definition, not an existing lock
+        assert lock.get("token") is None
+        assert lock.get("expire") is None, "Use timeout instead of expire"
+        assert path and "/" in path
 
-            lock["timeout"] = timeout
-            lock["expire"] = time.time() + timeout
-
-            validateLock(lock)
-
-            token = generateLockToken()
-            lock["token"] = token
+        # Normalize root: /foo/bar
+        org_path = path
+        path = normalizeLockRoot(path)
+        lock["root"] = path
 
-            # Store lock
-            lock_db = from_dict_to_base(lock)
+        # Normalize timeout from ttl to expire-date
+        timeout = lock.get("timeout")
+        if timeout is None:
+            timeout = LockStorage.LOCK_TIME_OUT_DEFAULT
+        timeout = float(timeout)
+        if timeout < 0 or timeout > LockStorage.LOCK_TIME_OUT_MAX:
+            timeout = LockStorage.LOCK_TIME_OUT_MAX
 
-            self._session.add(lock_db)
+        lock["timeout"] = timeout
+        lock["expire"] = time.time() + timeout
 
-            # Store locked path reference
-            url2token = Url2Token(
-                path=path,
-                token=token
-            )
+        validateLock(lock)
 
-            self._session.add(url2token)
-            self._session.commit()
+        lock["token"] = generateLockToken()
 
-            self._flush()
-            _logger.debug("LockStorageDict.set(%r): %s" % (org_path, lockString(lock)))
-            #            print("LockStorageDict.set(%r): %s" % (org_path, lockString(lock)))
-            return lock
-        finally:
-            self._lock.release()
+        with self._session_scope() as session:
+            # INFO - G.M - 2018-12-27 - wsgidav checked conflicts with a
+            # process lock only: check again after generation row is
+            # locked, until lock is inserted.
+            self._increment_generation(session)
+            self._check_lock_conflicts(session, lock)
+            session.add(from_dict_to_base(lock))
+        _logger.debug("LockStorage.set(%r): %s" % (org_path, lockString(lock)))  # nopep8
+        return lock
 
     def refresh(self, token, timeout):
         """Modify an existing lock's timeout.
@@ -182,48 +351,35 @@ class LockStorage(object):
             Lock dictionary.
             Raises ValueError, if token is invalid.
         """
-        lock_db = self._session.query(Lock).filter(Lock.token == token).one_or_none()
-        assert lock_db is not None, "Lock must exist"
         assert timeout == -1 or timeout > 0
         if timeout < 0 or timeout > LockStorage.LOCK_TIME_OUT_MAX:
             timeout = LockStorage.LOCK_TIME_OUT_MAX
 
-        self._lock.acquireWrite()
-        try:
-            # Note: shelve dictionary returns copies, so we must reassign values:
+        with self._session_scope() as session:
+            lock_db = session.query(WebdavLock)\
+                .filter(WebdavLock.token == token)\
+                .one_or_none()
+            if lock_db is None:
+                raise ValueError("Lock {} does not exist".format(token))
             lock_db.timeout = timeout
             lock_db.expire = time.time() + timeout
-            self._session.commit()
-            self._flush()
-        finally:
-            self._lock.release()
-        return from_base_to_dict(lock_db)
+            self._increment_generation(session)
+            lock = from_base_to_dict(lock_db)
+        return lock
 
     def delete(self, token):
         """Delete lock.
 
         Returns True on success. False, if token does not exist, or is expired.
         """
-        self._lock.acquireWrite()
-        try:
-            lock_db = self._session.query(Lock).filter(Lock.token == token).one_or_none()
-            _logger.debug("delete %s" % lockString(from_base_to_dict(lock_db)))
-            if lock_db is None:
-                return False
-            # Remove url to lock mapping
-            url2token = self._session.query(Url2Token).filter(
-                Url2Token.path == lock_db.root,
-                Url2Token.token == token).one_or_none()
-            if url2token is not None:
-                self._session.delete(url2token)
-            # Remove the lock
-            self._session.delete(lock_db)
-            self._session.commit()
-
-            self._flush()
-        finally:
-            self._lock.release()
-        return True
+        with self._session_scope() as session:
+            deleted = session.query(WebdavLock)\
+                .filter(WebdavLock.token == token)\
+                .delete(synchronize_session=False)
+            if deleted:
+                self._increment_generation(session)
+        _logger.debug("delete %s" % token)
+        return bool(deleted)
 
     def getLockList(self, path, includeRoot, includeChildren, tokenOnly):
         """Return a list of direct locks for <path>.
@@ -246,30 +402,29 @@ class LockStorage(object):
         assert path and path.startswith("/")
         assert includeRoot or includeChildren
 
-        def __appendLocks(toklist):
-            # Since we can do this quickly, we use self.get() even if
-            # tokenOnly is set, so expired locks are purged.
-            for token in toklist:
-                lock_db = self.get_lock_db_from_token(token)
-                if lock_db:
-                    if tokenOnly:
-                        lockList.append(lock_db.token)
-                    else:
-                        lockList.append(from_base_to_dict(lock_db))
-
         path = normalizeLockRoot(path)
-        self._lock.acquireRead()
-        try:
-            tokList = self._session.query(Url2Token.token).filter(Url2Token.path == path).all()
-            lockList = []
-            if includeRoot:
-                __appendLocks(tokList)
-
-            if includeChildren:
-                for url, in self._session.query(Url2Token.path).group_by(Url2Token.path):
-                    if util.isChildUri(path, url):
-                        __appendLocks(self._session.query(Url2Token.token).filter(Url2Token.path == url))
-
-            return lockList
-        finally:
-            self._lock.release()
\ No newline at end of file
+        index = self._get_index()
+        roots = []
+        if includeRoot and path in index.locks_by_root:
+            roots.append(path)
+        if includeChildren:
+            # INFO - G.M - 2018-12-12 - roots are sorted, children of path
+            # are all roots starting with "path/".
+            children_prefix = path.rstrip('/') + '/'
+            position = bisect_left(index.roots, children_prefix)
+            while position < len(index.roots) \
+                    and index.roots[position].startswith(children_prefix):
+                if index.roots[position] != path:
+                    roots.append(index.roots[position])
+                position += 1
+
+        lock_list = []
+        for root in roots:
+            for lock in index.locks_by_root[root]:
+                if is_lock_expired(lock):
+                    continue
+                if tokenOnly:
+                    lock_list.append(lock['token'])
+                else:
+                    lock_list.append(lock.copy())
+        return lock_list
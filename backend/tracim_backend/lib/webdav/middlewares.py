@@ -13,6 +13,8 @@ from wsgidav.middleware import BaseMiddleware
 
 from tracim_backend import CFG
 from tracim_backend.lib.core.user import UserApi
+from tracim_backend.lib.webdav.authentification import \
+    TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY
 from tracim_backend.models import get_engine, get_session_factory, get_tm_session
 
 
@@ -287,9 +289,14 @@ class TracimUserSession(BaseMiddleware):
         self._config = config
 
     def __call__(self, environ, start_response):
-        environ['tracim_user'] = UserApi(
-            None,
-            session=environ['tracim_dbsession'],
-            config=environ['tracim_cfg'],
-        ).get_one_by_email(environ['http_authenticator.username'])
+        # INFO - G.M - 2018-12-11 - user is already loaded by domain
+        # controller when authenticated, do not load it again.
+        user = environ.get(TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY)
+        if not user or user.email != environ['http_authenticator.username']:
+            user = UserApi(
+                None,
+                session=environ['tracim_dbsession'],
+                config=environ['tracim_cfg'],
+            ).get_one_by_email(environ['http_authenticator.username'])
+        environ['tracim_user'] = user
         return self._application(environ, start_response)
@@ -10,11 +10,19 @@ from datetime import datetime
 from time import mktime
 from os.path import dirname, basename
 
+from depot.fields.upload import UploadedFile
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from tracim_backend.config import CFG
 from tracim_backend.lib.core.content import ContentApi
 from tracim_backend.lib.core.user import UserApi
+from tracim_backend.lib.utils.response import get_stored_file_path
+from tracim_backend.lib.utils.utils import LRUCache
+from tracim_backend.lib.webdav.utils import open_depot_file
 from tracim_backend.lib.webdav.utils import transform_to_display, HistoryType, \
     FakeFileStream
 from tracim_backend.lib.webdav.utils import transform_to_bdd
@@ -24,6 +32,8 @@ from tracim_backend.models.data import User, ContentRevisionRO
 from tracim_backend.models.data import Workspace
 from tracim_backend.models.data import Content
 from tracim_backend.models.data import ActionDescription
+from tracim_backend.models.data import WebdavRenderedRevision
+from tracim_backend.models.meta import has_upsert
 from tracim_backend.lib.webdav.design import designThread, designPage
 
 from wsgidav import compat
@@ -38,6 +48,86 @@ from tracim_backend.models.revision_protection import new_revision
 
 logger = logging.getLogger()
 
+# INFO - G.M - 2018-12-12 - Rendered html of page and thread, by
+# (content_id, revision_id, last comment revision_id), see OtherFileResource.
+# It is also stored in database, see WebdavRenderedRevision.
+designed_content_cache = LRUCache(1000)
+
+
+def get_rendered_revision_lengths(
+        session: Session,
+        last_comment_revision_ids: typing.Dict[int, int],
+) -> typing.Dict[int, int]:
+    """
+    Get length of stored rendered html of revisions, in one query, without
+    loading html.
+    :param last_comment_revision_ids: last comment revision_id of content
+    (0 if content has no comment) by revision_id
+    :return: length by revision_id, only for revisions rendered with same
+    last comment revision
+    """
+    if not last_comment_revision_ids:
+        return {}
+    rows = session.query(
+        WebdavRenderedRevision.revision_id,
+        WebdavRenderedRevision.last_comment_revision_id,
+        WebdavRenderedRevision.length,
+    ).filter(
+        WebdavRenderedRevision.revision_id.in_(last_comment_revision_ids)
+    )
+    return {
+        revision_id: length
+        for revision_id, last_comment_revision_id, length in rows
+        if last_comment_revision_ids[revision_id] == last_comment_revision_id
+    }
+
+
+def store_rendered_revision(
+        engine: Engine,
+        revision_id: int,
+        last_comment_revision_id: int,
+        html: bytes,
+) -> None:
+    """
+    Store rendered html of revision in its own transaction: WebDAV reading
+    requests are never committed. Html can always be rendered again, so
+    errors are only logged.
+    """
+    table = WebdavRenderedRevision.__table__
+    values = {
+        'revision_id': revision_id,
+        'last_comment_revision_id': last_comment_revision_id,
+        'length': len(html),
+        'html': html,
+    }
+    try:
+        with engine.begin() as connection:
+            if has_upsert(connection.dialect):
+                insert = postgresql_insert(table).values(**values)
+                connection.execute(insert.on_conflict_do_update(
+                    index_elements=['revision_id'],
+                    set_={
+                        'last_comment_revision_id': insert.excluded.last_comment_revision_id,  # nopep8
+                        'length': insert.excluded.length,
+                        'html': insert.excluded.html,
+                    },
+                ))
+            else:
+                result = connection.execute(
+                    table.update()
+                    .where(table.c.revision_id == revision_id)
+                    .values(**values)
+                )
+                if not result.rowcount:
+                    connection.execute(table.insert().values(**values))
+    except SQLAlchemyError as exc:
+        logger.warning(
+            'Unable to store rendered html of revision {}: {}'.format(
+                revision_id,
+                str(exc),
+            )
+        )
+
 
 class ManageActions(object):
     """
@@ -274,7 +364,8 @@ class WorkspaceResource(DAVCollection):
             workspace=self.workspace,
             content=content,
             parent=self.content,
-            path=self.path + '/' + file_name
+            path=self.path + '/' + file_name,
+            spool_max_size=self.provider.app_config.WSGIDAV_UPLOAD_SPOOL_MAX_SIZE,  # nopep8
         )
 
     def createCollection(self, label: str) -> 'FolderResource':
@@ -324,9 +415,35 @@ class WorkspaceResource(DAVCollection):
     def getMemberList(self) -> [_DAVResource]:
         members = []
 
-        children = self.content_api.get_all(False, content_type_list.Any_SLUG, self.workspace)
+        # INFO - G.M - 2018-12-11 - Load all children data needed by
+        # PROPFIND in one query.
+        children = self.content_api.get_all_with_file_size(
+            False,
+            content_type_list.Any_SLUG,
+            self.workspace,
+        )
+        last_comment_revision_ids = self.content_api.get_last_comment_revision_ids(  # nopep8
+            [
+                content.content_id for content, file_size in children
+                if content.type == content_type_list.Thread.slug
+            ]
+        )
+        rendered_lengths = get_rendered_revision_lengths(
+            self.session,
+            {
+                content.revision_id: last_comment_revision_ids.get(
+                    content.content_id,
+                    0,
+                )
+                for content, file_size in children
+                if content.type not in (
+                    content_type_list.Folder.slug,
+                    content_type_list.File.slug,
+                )
+            },
+        )
 
-        for content in children:
+        for content, file_size in children:
             content_path = '%s/%s' % (self.path, transform_to_display(content.file_name))
 
             if content.type == content_type_list.Folder.slug:
@@ -349,6 +466,7 @@ class WorkspaceResource(DAVCollection):
                         content=content,
                         user=self.user,
                         session=self.session,
+                        content_length=file_size,
                     )
                 )
             else:
@@ -360,6 +478,13 @@ class WorkspaceResource(DAVCollection):
                         content,
                         session=self.session,
                         user=self.user,
+                        last_comment_revision_id=last_comment_revision_ids.get(
+                            content.content_id,
+                            0,
+                        ),
+                        content_length=rendered_lengths.get(
+                            content.revision_id
+                        ),
                     ))
 
         if self._file_count > 0 and self.provider.show_history():
@@ -521,19 +646,22 @@ class FolderResource(WorkspaceResource):
             workspace
         )
 
-        with new_revision(
-            content=self.content,
-            tm=transaction.manager,
-            session=self.session,
-        ):
-            if basename(destpath) != self.getDisplayName():
-                self.content_api.update_content(self.content, transform_to_bdd(basename(destpath)))
-                self.content_api.save(self.content)
-            else:
-                if workspace.workspace_id == self.content.workspace.workspace_id:
-                    self.content_api.move(self.content, parent)
+        if basename(destpath) == self.getDisplayName() \
+                and workspace.workspace_id != self.content.workspace.workspace_id:  # nopep8
+            # INFO - G.M - 2018-12-27 - move_recursively() create revisions
+            # itself: moves of large trees are done later, all at once.
+            self.content_api.move_recursively(self.content, parent, workspace)
+        else:
+            with new_revision(
+                content=self.content,
+                tm=transaction.manager,
+                session=self.session,
+            ):
+                if basename(destpath) != self.getDisplayName():
+                    self.content_api.update_content(self.content, transform_to_bdd(basename(destpath)))
+                    self.content_api.save(self.content)
                 else:
-                    self.content_api.move_recursively(self.content, parent, workspace)
+                    self.content_api.move(self.content, parent)
 
         transaction.commit()
 
@@ -544,13 +672,35 @@ class FolderResource(WorkspaceResource):
             config=self.provider.app_config,
             session=self.session,
         )
-        visible_children = content_api.get_all(
+        # INFO - G.M - 2018-12-11 - Load all children data needed by
+        # PROPFIND in one query.
+        visible_children = content_api.get_all_with_file_size(
             [self.content.content_id],
             content_type_list.Any_SLUG,
             self.workspace,
         )
+        last_comment_revision_ids = content_api.get_last_comment_revision_ids(
+            [
+                content.content_id for content, file_size in visible_children
+                if content.type == content_type_list.Thread.slug
+            ]
+        )
+        rendered_lengths = get_rendered_revision_lengths(
+            self.session,
+            {
+                content.revision_id: last_comment_revision_ids.get(
+                    content.content_id,
+                    0,
+                )
+                for content, file_size in visible_children
+                if content.type not in (
+                    content_type_list.Folder.slug,
+                    content_type_list.File.slug,
+                )
+            },
+        )
 
-        for content in visible_children:
+        for content, file_size in visible_children:
             content_path = '%s/%s' % (self.path, transform_to_display(content.file_name))
 
             try:
@@ -574,6 +724,7 @@ class FolderResource(WorkspaceResource):
                             content=content,
                             user=self.user,
                             session=self.session,
+                            content_length=file_size,
                         ))
                 else:
                     self._file_count += 1
@@ -584,6 +735,13 @@ class FolderResource(WorkspaceResource):
                             content=content,
                             user=self.user,
                             session=self.session,
+                            last_comment_revision_id=last_comment_revision_ids.get(  # nopep8
+                                content.content_id,
+                                0,
+                            ),
+                            content_length=rendered_lengths.get(
+                                content.revision_id
+                            ),
                         ))
             except NotImplementedError as exc:
                 pass
@@ -1109,10 +1267,16 @@ class FileResource(DAVNonCollection):
             content: Content,
             user: User,
             session: Session,
+            content_length: typing.Optional[int]=None,
     ) -> None:
+        """
+        :param content_length: size of file if already known, avoid
+        opening depot file to get it.
+        """
         super(FileResource, self).__init__(path, environ)
 
         self.content = content
+        self._content_length = content_length
         self.user = user
         self.session = session
         self.content_api = ContentApi(
@@ -1128,8 +1292,13 @@ class FileResource(DAVNonCollection):
     def __repr__(self) -> str:
         return "<DAVNonCollection: FileResource (%d)>" % self.content.revision_id
 
+    def _get_depot_file(self) -> UploadedFile:
+        return self.content.depot_file
+
     def getContentLength(self) -> int:
-        return self.content.depot_file.file.content_length
+        if self._content_length is not None:
+            return self._content_length
+        return self._get_depot_file().file.content_length
 
     def getContentType(self) -> str:
         return self.content.file_mimetype
@@ -1144,11 +1313,15 @@ class FileResource(DAVNonCollection):
         return mktime(self.content.updated.timetuple())
 
     def getContent(self) -> typing.BinaryIO:
-        filestream = compat.BytesIO()
-        filestream.write(self.content.depot_file.file.read())
-        filestream.seek(0)
+        # INFO - G.M - 2018-12-10 - Return file stream directly, wsgidav
+        # read it by block: memory usage does not depend on file size.
+        return open_depot_file(self._get_depot_file())
 
-        return filestream
+    def supportRanges(self) -> bool:
+        # INFO - G.M - 2018-12-10 - wsgidav seek in content stream to serve
+        # range, only local depot files streams are seekable.
+        stored_file = self._get_depot_file().file
+        return get_stored_file_path(stored_file) is not None
 
     def beginWrite(self, contentType: str=None) -> FakeFileStream:
         return FakeFileStream(
@@ -1158,6 +1331,7 @@ class FileResource(DAVNonCollection):
             workspace=self.content.workspace,
             path=self.path,
             session=self.session,
+            spool_max_size=self.provider.app_config.WSGIDAV_UPLOAD_SPOOL_MAX_SIZE,  # nopep8
         )
 
     def moveRecursive(self, destpath):
@@ -1357,15 +1531,8 @@ class HistoryFileResource(FileResource):
         left_side = '(%d - %s) ' % (self.content_revision.revision_id, self.content_revision.revision_type)
         return '%s%s' % (left_side, transform_to_display(self.content_revision.file_name))
 
-    def getContent(self):
-        filestream = compat.BytesIO()
-        filestream.write(self.content_revision.depot_file.file.read())
-        filestream.seek(0)
-
-        return filestream
-
-    def getContentLength(self):
-        return self.content_revision.depot_file.file.content_length
+    def _get_depot_file(self) -> UploadedFile:
+        return self.content_revision.depot_file
 
     def getContentType(self) -> str:
         return self.content_revision.file_mimetype
@@ -1382,14 +1549,34 @@ class HistoryFileResource(FileResource):
 
 class OtherFileResource(FileResource):
     """
-    FileResource resource corresponding to tracim's page and thread
+    FileResource resource corresponding to tracim's page and thread.
+    Html is rendered lazily, only when content is needed, then stored with
+    its length in database and cached in designed_content_cache: length is
+    read without rendering html again.
     """
-    def __init__(self, path: str, environ: dict, content: Content, user:User, session: Session):
+    def __init__(
+            self,
+            path: str,
+            environ: dict,
+            content: Content,
+            user:User,
+            session: Session,
+            last_comment_revision_id: typing.Optional[int]=None,
+            content_length: typing.Optional[int]=None,
+    ):
+        """
+        :param last_comment_revision_id: revision_id of most recent comment
+        of content, 0 if content has no comment, None if unknown: it will be
+        loaded when needed.
+        :param content_length: length of stored rendered html of content
+        revision, see get_rendered_revision_lengths(), None if unknown.
+        """
         super(OtherFileResource, self).__init__(path, environ, content, user=user, session=session)
 
         self.content_revision = self.content.revision
-
-        self.content_designed = self.design()
+        self._last_comment_revision_id = last_comment_revision_id
+        self._content_designed = None  # type: typing.Optional[bytes]
+        self._designed_content_length = content_length
 
         # workaround for consistent request as we have to return a resource with a path ending with .html
         # when entering folder for windows, but only once because when we select it again it would have .html.html
@@ -1407,17 +1594,93 @@ class OtherFileResource(FileResource):
         return "<DAVNonCollection: OtherFileResource (%s)" % self.content.file_name
 
     def getContentLength(self) -> int:
-        return len(self.content_designed)
+        # INFO - G.M - 2018-12-10 - content length is a number of bytes,
+        # not of characters: needed for range requests on non-ascii content.
+        if self._designed_content_length is None:
+            self._designed_content_length = self._get_designed_content_length()  # nopep8
+        return self._designed_content_length
 
     def getContentType(self) -> str:
         return 'text/html'
 
     def getContent(self):
-        filestream = compat.BytesIO()
+        return compat.BytesIO(self._get_designed_content())
+
+    def supportRanges(self) -> bool:
+        return True
+
+    def _get_last_comment_revision_id(self) -> int:
+        if self.content.type != content_type_list.Thread.slug:
+            return 0
+        if self._last_comment_revision_id is None:
+            self._last_comment_revision_id = \
+                self.content_api.get_last_comment_revision_ids(
+                    [self.content.content_id]
+                ).get(self.content.content_id, 0)
+        return self._last_comment_revision_id
+
+    def _get_designed_content_cache_key(self) -> typing.Tuple[int, int, int]:  # nopep8
+        """
+        Key of rendered html, it change with each new revision of content and
+        each new or updated comment.
+        """
+        return (
+            self.content.content_id,
+            self.content_revision.revision_id,
+            self._get_last_comment_revision_id(),
+        )
+
+    def _get_designed_content_length(self) -> int:
+        """
+        Return length of rendered html, rendering it only if it is neither
+        cached nor stored.
+        """
+        if self._content_designed is not None:
+            return len(self._content_designed)
+        cached = designed_content_cache.get(
+            self._get_designed_content_cache_key()
+        )
+        if cached is not None:
+            return len(cached)
+        revision_id = self.content_revision.revision_id
+        lengths = get_rendered_revision_lengths(
+            self.session,
+            {revision_id: self._get_last_comment_revision_id()},
+        )
+        if revision_id in lengths:
+            return lengths[revision_id]
+        return len(self._get_designed_content())
 
-        filestream.write(bytes(self.content_designed, 'utf-8'))
-        filestream.seek(0)
-        return filestream
+    def _get_designed_content(self) -> bytes:
+        """
+        Return rendered html of content revision as utf-8 bytes, from cache,
+        else from database, else rendering and storing it.
+        """
+        if self._content_designed is not None:
+            return self._content_designed
+        cache_key = self._get_designed_content_cache_key()
+        designed = designed_content_cache.get(cache_key)
+        if designed is None:
+            revision_id = self.content_revision.revision_id
+            last_comment_revision_id = self._get_last_comment_revision_id()
+            table = WebdavRenderedRevision.__table__
+            stored = self.session.execute(
+                select([table.c.last_comment_revision_id, table.c.html])
+                .where(table.c.revision_id == revision_id)
+            ).first()
+            if stored and stored.last_comment_revision_id == last_comment_revision_id:  # nopep8
+                designed = bytes(stored.html)
+            else:
+                designed = bytes(self.design(), 'utf-8')
+                store_rendered_revision(
+                    self.session.bind,
+                    revision_id,
+                    last_comment_revision_id,
+                    designed,
+                )
+            designed_content_cache.set(cache_key, designed)
+        self._content_designed = designed
+        return self._content_designed
 
     def design(self):
         if self.content.type == content_type_list.Page.slug:
@@ -1449,7 +1712,6 @@ class HistoryOtherFile(OtherFileResource):
             session=session
         )
         self.content_revision = content_revision
-        self.content_designed = self.design()
 
     def __repr__(self) -> str:
         return "<DAVNonCollection: HistoryOtherFile (%s-%s)" % (self.content.file_name, self.content.id)
@@ -1458,14 +1720,6 @@ class HistoryOtherFile(OtherFileResource):
         left_side = '(%d - %s) ' % (self.content_revision.revision_id, self.content_revision.revision_type)
         return '%s%s' % (left_side, transform_to_display(self.content_revision.file_name))
 
-    def getContent(self):
-        filestream = compat.BytesIO()
-
-        filestream.write(bytes(self.content_designed, 'utf-8'))
-        filestream.seek(0)
-
-        return filestream
-
     def delete(self):
         raise DAVError(HTTP_FORBIDDEN)
 
@@ -1,19 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import typing
+from tempfile import SpooledTemporaryFile
+
 import transaction
+from depot.fields.upload import UploadedFile
 from os.path import normpath as base_normpath
 
 from sqlalchemy.orm import Session
 from tracim_backend.app_models.contents import content_type_list
 from wsgidav import util
-from wsgidav import compat
 
 from tracim_backend.lib.core.content import ContentApi
+from tracim_backend.lib.utils.response import get_stored_file_path
 from tracim_backend.models.data import Workspace
 from tracim_backend.models.data import Content
 from tracim_backend.models.data import ActionDescription
 from tracim_backend.models.revision_protection import new_revision
 
+# INFO - G.M - 2018-12-10 - default value of wsgidav.upload.spool_max_size
+DEFAULT_UPLOAD_SPOOL_MAX_SIZE = 1024 * 1024
+
 
 def transform_to_display(string: str) -> str:
     """
@@ -63,6 +71,20 @@ def transform_to_bdd(string: str) -> str:
     return string
 
 
+def open_depot_file(depot_file: UploadedFile) -> typing.BinaryIO:
+    """
+    Open depot file content as a readable stream without loading it in
+    memory. Local depot files are opened directly from filesystem to get a
+    seekable stream (depot LocalStoredFile is not seekable).
+    """
+    stored_file = depot_file.file
+    file_path = get_stored_file_path(stored_file)
+    if file_path:
+        stored_file.close()
+        return open(file_path, 'rb')
+    return stored_file
+
+
 def normpath(path):
     if path == b'':
         path = b'/'
@@ -107,7 +129,8 @@ class FakeFileStream(object):
             path: str,
             file_name: str='',
             content: Content=None,
-            parent: Content=None
+            parent: Content=None,
+            spool_max_size: int=DEFAULT_UPLOAD_SPOOL_MAX_SIZE,
     ):
         """
 
@@ -117,8 +140,13 @@ class FakeFileStream(object):
         :param file_name:
         :param content:
         :param parent:
+        :param spool_max_size: max size of uploaded file kept in memory,
+        bigger file are spooled to a temporary file on disk.
         """
-        self._file_stream = compat.BytesIO()
+        self._file_stream = SpooledTemporaryFile(max_size=spool_max_size)
+        # INFO - G.M - 2018-12-10 - sha256 is computed while receiving data
+        # to detect identical re-upload without reading any file again.
+        self._file_sha256 = hashlib.sha256()
         self._session = session
         self._file_name = file_name if file_name != '' else self._content.file_name
         self._content = content
@@ -149,11 +177,12 @@ class FakeFileStream(object):
         """
         pass
 
-    def write(self, s: str):
+    def write(self, s: bytes):
         """
         Called by request_server when writing content to files, we put it inside a filestream
         """
         self._file_stream.write(s)
+        self._file_sha256.update(s)
 
     def close(self):
         """
@@ -163,12 +192,27 @@ class FakeFileStream(object):
 
         self._file_stream.seek(0)
 
-        if self._content is None:
-            self.create_file()
-        else:
-            self.update_file()
+        try:
+            if self._content is None:
+                self.create_file()
+            elif not self._is_same_file_content():
+                self.update_file()
+            transaction.commit()
+        finally:
+            self._file_stream.close()
 
-        transaction.commit()
+    def _is_same_file_content(self) -> bool:
+        """
+        Check if uploaded file is same as current file of content, in this
+        case no new revision is needed. Content addressed depot files know
+        their sha256, see ContentAddressedFile: current file is never read.
+        Files stored before content addressing are considered different,
+        their new revision make them content addressed.
+        """
+        if not self._content.depot_file:
+            return False
+        current_file_sha256 = self._content.depot_file.get('sha256')
+        return current_file_sha256 == self._file_sha256.hexdigest()
 
     def create_file(self):
         """
@@ -189,7 +233,7 @@ class FakeFileStream(object):
                 file,
                 self._file_name,
                 util.guessMimeType(self._file_name),
-                self._file_stream.read()
+                self._file_stream,
             )
         self._api.save(file, ActionDescription.CREATION)
 
@@ -207,7 +251,7 @@ class FakeFileStream(object):
                 self._content,
                 self._file_name,
                 util.guessMimeType(self._content.file_name),
-                self._file_stream.read()
+                self._file_stream,
             )
 
             self._api.save(self._content, ActionDescription.REVISION)
\ No newline at end of file
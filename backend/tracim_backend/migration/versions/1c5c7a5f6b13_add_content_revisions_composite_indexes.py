@@ -0,0 +1,52 @@
+"""add content_revisions composite indexes
+
+Revision ID: 1c5c7a5f6b13
+Revises: e5ea3d1c4c8e
+Create Date: 2018-12-04 14:23:05.108614
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1c5c7a5f6b13'
+down_revision = 'e5ea3d1c4c8e'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index(
+        'idx__content_revisions__content_id__revision_id',
+        'content_revisions',
+        ['content_id', 'revision_id'],
+    )
+    op.create_index(
+        'idx__content_revisions__workspace_id__parent_id__label',
+        'content_revisions',
+        ['workspace_id', 'parent_id', 'label', 'file_extension'],
+    )
+    op.create_index(
+        'idx__content_revisions__workspace_id__updated',
+        'content_revisions',
+        ['workspace_id', 'updated'],
+    )
+    op.create_index(
+        'idx__content__cached_revision_id',
+        'content',
+        ['cached_revision_id'],
+    )
+
+
+def downgrade():
+    op.drop_index('idx__content__cached_revision_id', 'content')
+    op.drop_index(
+        'idx__content_revisions__workspace_id__updated',
+        'content_revisions',
+    )
+    op.drop_index(
+        'idx__content_revisions__workspace_id__parent_id__label',
+        'content_revisions',
+    )
+    op.drop_index(
+        'idx__content_revisions__content_id__revision_id',
+        'content_revisions',
+    )
@@ -0,0 +1,42 @@
+"""add revision_preview_metadata table
+
+Revision ID: 3d7a7c1f2b4e
+Revises: 1c5c7a5f6b13
+Create Date: 2018-12-10 10:42:17.503212
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3d7a7c1f2b4e'
+down_revision = '1c5c7a5f6b13'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'revision_preview_metadata',
+        sa.Column('revision_id', sa.Integer(), nullable=False),
+        sa.Column('page_nb', sa.Integer(), nullable=True),
+        sa.Column('has_pdf_preview', sa.Boolean(), nullable=False),
+        sa.Column('has_jpeg_preview', sa.Boolean(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('mimetype', sa.Unicode(length=255), nullable=True),
+        sa.Column('created', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['revision_id'],
+            ['content_revisions.revision_id'],
+            name=op.f('fk_revision_preview_metadata_revision_id_content_revisions'),  # nopep8
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+        ),
+        sa.PrimaryKeyConstraint(
+            'revision_id',
+            name=op.f('pk_revision_preview_metadata'),
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table('revision_preview_metadata')
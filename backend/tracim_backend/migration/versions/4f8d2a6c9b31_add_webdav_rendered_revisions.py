@@ -0,0 +1,39 @@
+"""add webdav_rendered_revisions table
+
+Revision ID: 4f8d2a6c9b31
+Revises: 6c2e9f4a1d58
+Create Date: 2018-12-28 10:21:53.614802
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4f8d2a6c9b31'
+down_revision = '6c2e9f4a1d58'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'webdav_rendered_revisions',
+        sa.Column('revision_id', sa.Integer(), autoincrement=False, nullable=False),  # nopep8
+        sa.Column('last_comment_revision_id', sa.Integer(), nullable=False),
+        sa.Column('length', sa.BigInteger(), nullable=False),
+        sa.Column('html', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['revision_id'],
+            ['content_revisions.revision_id'],
+            name=op.f('fk_webdav_rendered_revisions_revision_id_content_revisions'),  # nopep8
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+        ),
+        sa.PrimaryKeyConstraint(
+            'revision_id',
+            name=op.f('pk_webdav_rendered_revisions'),
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table('webdav_rendered_revisions')
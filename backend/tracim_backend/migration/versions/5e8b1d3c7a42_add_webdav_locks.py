@@ -0,0 +1,44 @@
+"""add webdav_locks table
+
+Revision ID: 5e8b1d3c7a42
+Revises: 8a3f5c2d9e17
+Create Date: 2018-12-12 10:05:31.842196
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5e8b1d3c7a42'
+down_revision = '8a3f5c2d9e17'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'webdav_locks',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('token', sa.Unicode(length=255), nullable=False),
+        sa.Column('root', sa.Text(), nullable=False),
+        sa.Column('depth', sa.Unicode(length=32), nullable=False),
+        sa.Column('type', sa.Unicode(length=32), nullable=False),
+        sa.Column('scope', sa.Unicode(length=32), nullable=False),
+        sa.Column('owner', sa.Text(), nullable=False),
+        sa.Column('principal', sa.Unicode(length=255), nullable=True),
+        sa.Column('timeout', sa.Float(), nullable=False),
+        sa.Column('expire', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_webdav_locks')),
+        sa.UniqueConstraint('token', name=op.f('uq__webdav_locks__token')),
+        sqlite_autoincrement=True,
+    )
+    op.create_index(
+        'idx__webdav_locks__root',
+        'webdav_locks',
+        ['root'],
+        mysql_length=255,
+    )
+
+
+def downgrade():
+    op.drop_index('idx__webdav_locks__root', 'webdav_locks')
+    op.drop_table('webdav_locks')
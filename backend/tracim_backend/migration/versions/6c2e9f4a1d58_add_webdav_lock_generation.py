@@ -0,0 +1,28 @@
+"""add webdav_lock_generation table
+
+Revision ID: 6c2e9f4a1d58
+Revises: f3c1b7a2d964
+Create Date: 2018-12-27 11:12:40.518273
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6c2e9f4a1d58'
+down_revision = 'f3c1b7a2d964'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    webdav_lock_generation = op.create_table(
+        'webdav_lock_generation',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('generation', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_webdav_lock_generation')),
+    )
+    op.bulk_insert(webdav_lock_generation, [{'id': 1, 'generation': 0}])
+
+
+def downgrade():
+    op.drop_table('webdav_lock_generation')
@@ -0,0 +1,31 @@
+"""add content_tree_generation to workspaces
+
+Revision ID: 8a3f5c2d9e17
+Revises: 3d7a7c1f2b4e
+Create Date: 2018-12-11 09:21:45.128412
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8a3f5c2d9e17'
+down_revision = '3d7a7c1f2b4e'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    with op.batch_alter_table('workspaces') as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                'content_tree_generation',
+                sa.Integer(),
+                nullable=False,
+                server_default='0',
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('workspaces') as batch_op:
+        batch_op.drop_column('content_tree_generation')
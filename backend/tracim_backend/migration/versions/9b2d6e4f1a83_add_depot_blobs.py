@@ -0,0 +1,32 @@
+"""add depot_blobs table
+
+Revision ID: 9b2d6e4f1a83
+Revises: 5e8b1d3c7a42
+Create Date: 2018-12-14 11:22:07.513260
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9b2d6e4f1a83'
+down_revision = '5e8b1d3c7a42'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    # INFO - G.M - 2018-12-14 - Files stored before this migration are
+    # registered as blobs when a new revision first share them.
+    op.create_table(
+        'depot_blobs',
+        sa.Column('sha256', sa.Unicode(length=64), nullable=False),
+        sa.Column('depot_name', sa.Unicode(length=255), nullable=False),
+        sa.Column('file_id', sa.Unicode(length=255), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256', name=op.f('pk_depot_blobs')),
+    )
+
+
+def downgrade():
+    op.drop_table('depot_blobs')
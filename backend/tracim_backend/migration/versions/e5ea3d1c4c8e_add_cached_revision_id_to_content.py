@@ -0,0 +1,59 @@
+"""add cached_revision_id to content
+
+Revision ID: e5ea3d1c4c8e
+Revises: 47b6cb15db5a
+Create Date: 2018-12-03 10:12:41.327163
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e5ea3d1c4c8e'
+down_revision = '47b6cb15db5a'
+
+from alembic import op
+import sqlalchemy as sa
+
+content = sa.Table(
+    'content',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('cached_revision_id', sa.Integer, nullable=True),
+)
+
+revisions = sa.Table(
+    'content_revisions',
+    sa.MetaData(),
+    sa.Column('revision_id', sa.Integer, primary_key=True),
+    sa.Column('content_id', sa.Integer, nullable=False),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.add_column(
+            sa.Column('cached_revision_id', sa.Integer(), nullable=True)
+        )
+        batch_op.create_foreign_key(
+            'fk_content_cached_revision_id_content_revisions',
+            'content_revisions',
+            ['cached_revision_id'],
+            ['revision_id'],
+        )
+    # INFO - G.M - 2018-12-03 - Backfill pointer with last revision of each
+    # content.
+    connection = op.get_bind()
+    last_revision_id = sa.select([sa.func.max(revisions.c.revision_id)])\
+        .where(revisions.c.content_id == content.c.id)\
+        .as_scalar()
+    connection.execute(
+        content.update().values(cached_revision_id=last_revision_id)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_constraint(
+            'fk_content_cached_revision_id_content_revisions',
+            type_='foreignkey',
+        )
+        batch_op.drop_column('cached_revision_id')
@@ -0,0 +1,97 @@
+"""add content search index
+
+Revision ID: f3c1b7a2d964
+Revises: 9b2d6e4f1a83
+Create Date: 2018-12-21 10:05:43.118204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f3c1b7a2d964'
+down_revision = '9b2d6e4f1a83'
+
+from alembic import op
+import sqlalchemy as sa
+
+from tracim_backend.models.search import get_content_search_index
+from tracim_backend.models.search import get_raw_text
+
+BACKFILL_BATCH_SIZE = 500
+
+content = sa.Table(
+    'content',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('cached_revision_id', sa.Integer, nullable=True),
+)
+
+revisions = sa.Table(
+    'content_revisions',
+    sa.MetaData(),
+    sa.Column('revision_id', sa.Integer, primary_key=True),
+    sa.Column('label', sa.Unicode(1024)),
+    sa.Column('description', sa.Text()),
+)
+
+
+def upgrade():
+    op.create_table(
+        'content_search_terms',
+        sa.Column('term', sa.Unicode(length=64), nullable=False),
+        sa.Column('content_id', sa.Integer(), nullable=False),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['content_id'],
+            ['content.id'],
+            name=op.f('fk_content_search_terms_content_id_content'),
+        ),
+        sa.PrimaryKeyConstraint(
+            'term',
+            'content_id',
+            name=op.f('pk_content_search_terms'),
+        ),
+    )
+    op.create_index(
+        'idx__content_search_terms__content_id',
+        'content_search_terms',
+        ['content_id'],
+        unique=False,
+    )
+    # INFO - G.M - 2018-12-21 - Create database specific index storage and
+    # index current revision of all existing contents.
+    connection = op.get_bind()
+    search_index = get_content_search_index(connection)
+    search_index.create_storage(connection)
+    last_content_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select([
+                content.c.id,
+                revisions.c.label,
+                revisions.c.description,
+            ]).select_from(content.join(
+                revisions,
+                content.c.cached_revision_id == revisions.c.revision_id,
+            )).where(
+                content.c.id > last_content_id,
+            ).order_by(content.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        search_index.index_contents(
+            connection,
+            [
+                (content_id, label, get_raw_text(description))
+                for content_id, label, description in rows
+            ],
+        )
+        last_content_id = rows[-1][0]
+
+
+def downgrade():
+    get_content_search_index(op.get_bind()).drop_storage(op.get_bind())
+    op.drop_index(
+        'idx__content_search_terms__content_id',
+        table_name='content_search_terms',
+    )
+    op.drop_table('content_search_terms')
@@ -5,7 +5,10 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import configure_mappers
 import zope.sqlalchemy
 from .meta import DeclarativeBase
+from tracim_backend.models.depot import update_depot_blobs
 from tracim_backend.models.revision_protection import prevent_content_revision_delete
+from tracim_backend.models.revision_protection import update_workspace_content_tree_generation  # nopep8
+from tracim_backend.models.search import update_content_search_index
 # import or define all models here to ensure they are attached to the
 # Base.metadata prior to any initialization routines
 from tracim_backend.models.auth import User, Group, Permission
@@ -64,6 +67,9 @@ def get_tm_session(session_factory, transaction_manager):
         keep_session=True,
     )
     listen(dbsession, 'before_flush', prevent_content_revision_delete)
+    listen(dbsession, 'before_flush', update_workspace_content_tree_generation)
+    listen(dbsession, 'before_flush', update_depot_blobs)
+    listen(dbsession, 'after_flush', update_content_search_index)
     return dbsession
 
 
@@ -1,6 +1,5 @@
 # coding=utf-8
 import cgi
-import traceback
 import typing
 from datetime import datetime
 from enum import Enum
@@ -14,7 +13,6 @@ from tracim_backend.config import CFG
 from tracim_backend.config import PreviewDim
 from tracim_backend.extensions import app_list
 from tracim_backend.lib.core.application import ApplicationApi
-from tracim_backend.lib.utils.logger import logger
 from tracim_backend.lib.utils.utils import CONTENT_FRONTEND_URL_SCHEMA
 from tracim_backend.lib.utils.utils import string_to_list
 from tracim_backend.lib.utils.utils import WORKSPACE_FRONTEND_URL_SCHEMA
@@ -25,6 +23,7 @@ from tracim_backend.models.auth import Group
 from tracim_backend.models.auth import Profile
 from tracim_backend.models.data import Content
 from tracim_backend.models.data import ContentRevisionRO
+from tracim_backend.models.data import RevisionPreviewMetadata
 from tracim_backend.models.data import UserRoleInWorkspace
 from tracim_backend.models.data import Workspace
 from tracim_backend.models.roles import WorkspaceRoles
@@ -380,6 +379,31 @@ class ActiveContentFilter(object):
         self.before_content_id = before_content_id
 
 
+class RevisionFilter(object):
+    def __init__(
+            self,
+            limit: int = None,
+            after_revision_id: int = None,
+    ) -> None:
+        self.limit = limit
+        self.after_revision_id = after_revision_id
+
+
+class ContentSearchQuery(object):
+    """
+    Content full-text search query model
+    """
+    def __init__(
+            self,
+            keywords: str,
+            limit: int = None,
+            offset: int = None,
+    ) -> None:
+        self.keywords = keywords
+        self.limit = limit
+        self.offset = offset
+
+
 class ContentIdsQuery(object):
     def __init__(
             self,
@@ -745,11 +769,22 @@ class ContentInContext(object):
     Interface to get Content data and Content data related to context.
     """
 
-    def __init__(self, content: Content, dbsession: Session, config: CFG, user: User=None) -> None:  # nopep8
+    def __init__(
+            self,
+            content: Content,
+            dbsession: Session,
+            config: CFG,
+            user: User=None,
+            # Extended params
+            read_by_user: typing.Optional[bool] = None,
+    ) -> None:
         self.content = content
         self.dbsession = dbsession
         self.config = config
         self._user = user
+        self._cached_preview_metadata = None  # type: RevisionPreviewMetadata
+        # Extended params
+        self._read_by_user = read_by_user
 
     # Default
     @property
@@ -859,6 +894,10 @@ class ContentInContext(object):
     @property
     def read_by_user(self) -> bool:
         assert self._user
+        # INFO - G.M - 2018-12-06 - read status may be precomputed in bulk,
+        # see ContentApi.get_read_status_map()
+        if self._read_by_user is not None:
+            return self._read_by_user
         return not self.content.has_new_information_for(self._user)
 
     @property
@@ -877,23 +916,9 @@ class ContentInContext(object):
         """
         :return: page_nb of content if available, None if unavailable
         """
-        if self.content.depot_file:
-            from tracim_backend.lib.core.content import ContentApi
-            content_api = ContentApi(
-                current_user=self._user,
-                session=self.dbsession,
-                config=self.config,
-                show_deleted=True,
-                show_archived=True,
-                show_active=True,
-                show_temporary=True,
-            )
-            return content_api.get_preview_page_nb(
-                self.content.revision_id,
-                file_extension=self.content.file_extension
-            )
-        else:
+        if not self.content.depot_file:
             return None
+        return self._preview_metadata.page_nb
 
     @property
     def mimetype(self) -> str:
@@ -909,22 +934,7 @@ class ContentInContext(object):
         """
         if not self.content.depot_file:
             return None
-        try:
-            return self.content.depot_file.file.content_length
-        except IOError as e:
-            logger.warning(
-                self,
-                "IO Exception Occured when trying to get content size  : {}".format(str(e))
-            )
-            logger.warning(self, traceback.format_exc())
-        except Exception as e:
-            logger.warning(
-                self,
-                "Unknown Exception Occured when trying to get content size  : {}".format(str(e))
-            )
-            logger.warning(self, traceback.format_exc())
-        return None
-
+        return self._preview_metadata.size
 
     @property
     def has_pdf_preview(self) -> bool:
@@ -933,21 +943,7 @@ class ContentInContext(object):
         """
         if not self.content.depot_file:
             return False
-
-        from tracim_backend.lib.core.content import ContentApi
-        content_api = ContentApi(
-            current_user=self._user,
-            session=self.dbsession,
-            config=self.config,
-            show_deleted=True,
-            show_archived=True,
-            show_active=True,
-            show_temporary=True,
-        )
-        return content_api.has_pdf_preview(
-            self.content.revision_id,
-            file_extension=self.content.file_extension
-            )
+        return self._preview_metadata.has_pdf_preview
 
     @property
     def has_jpeg_preview(self) -> bool:
@@ -956,22 +952,29 @@ class ContentInContext(object):
         """
         if not self.content.depot_file:
             return False
+        return self._preview_metadata.has_jpeg_preview
 
-        from tracim_backend.lib.core.content import ContentApi
-        content_api = ContentApi(
-            current_user=self._user,
-            session=self.dbsession,
-            config=self.config,
-            show_deleted=True,
-            show_archived=True,
-            show_active=True,
-            show_temporary=True,
-        )
-        return content_api.has_jpeg_preview(
-            self.content.revision_id,
-            file_extension=self.content.file_extension
-        )
-
+    @property
+    def _preview_metadata(self) -> RevisionPreviewMetadata:
+        """
+        :return: preview metadata of content file, see
+        ContentApi.get_revision_preview_metadata()
+        """
+        if not self._cached_preview_metadata:
+            # TODO - G.M - 2018-09-05 - Fix circular import better
+            from tracim_backend.lib.core.content import ContentApi
+            content_api = ContentApi(
+                current_user=self._user,
+                session=self.dbsession,
+                config=self.config,
+                show_deleted=True,
+                show_archived=True,
+                show_active=True,
+                show_temporary=True,
+            )
+            self._cached_preview_metadata = \
+                content_api.get_revision_preview_metadata(self.content.revision)
+        return self._cached_preview_metadata
 
     @property
     def file_extension(self) -> str:
@@ -993,12 +996,31 @@ class RevisionInContext(object):
     Interface to get Content data and Content data related to context.
     """
 
-    def __init__(self, content_revision: ContentRevisionRO, dbsession: Session, config: CFG,  user: User=None) -> None:  # nopep8
+    def __init__(
+            self,
+            content_revision: ContentRevisionRO,
+            dbsession: Session,
+            config: CFG,
+            user: User=None,
+            # Extended params
+            comment_ids: typing.Optional[typing.List[int]] = None,
+            is_editable: typing.Optional[bool] = None,
+            preview_metadata: typing.Optional[RevisionPreviewMetadata] = None,
+    ) -> None:
+        """
+        Extended params are values already computed for many revisions at
+        once, see ContentApi.get_revisions_in_context(). If not given, they
+        are computed for this revision only when needed.
+        """
         assert content_revision is not None
         self.revision = content_revision
         self.dbsession = dbsession
         self.config = config
         self._user = user
+        self._cached_preview_metadata = preview_metadata  # type: RevisionPreviewMetadata  # nopep8
+        # Extended params
+        self._comment_ids = comment_ids
+        self._is_editable = is_editable
 
     # Default
     @property
@@ -1047,6 +1069,8 @@ class RevisionInContext(object):
 
     @property
     def is_editable(self) -> bool:
+        if self._is_editable is not None:
+            return self._is_editable
         from tracim_backend.lib.core.content import ContentApi
         content_api = ContentApi(
             current_user=self._user,
@@ -1127,6 +1151,8 @@ class RevisionInContext(object):
         Get list of ids of all current revision related comments
         :return: list of comments ids
         """
+        if self._comment_ids is not None:
+            return self._comment_ids
         comments = self.revision.node.get_comments()
         # INFO - G.M - 2018-06-177 - Get comments more recent than revision.
         revision_comments = [
@@ -1172,24 +1198,9 @@ class RevisionInContext(object):
         """
         :return: page_nb of content if available, None if unavailable
         """
-        if self.revision.depot_file:
-            # TODO - G.M - 2018-09-05 - Fix circular import better
-            from tracim_backend.lib.core.content import ContentApi
-            content_api = ContentApi(
-                current_user=self._user,
-                session=self.dbsession,
-                config=self.config,
-                show_deleted=True,
-                show_archived=True,
-                show_active=True,
-                show_temporary=True,
-            )
-            return content_api.get_preview_page_nb(
-                self.revision.revision_id,
-                file_extension=self.revision.file_extension
-            )
-        else:
+        if not self.revision.depot_file:
             return None
+        return self._preview_metadata.page_nb
 
     @property
     def mimetype(self) -> str:
@@ -1205,21 +1216,7 @@ class RevisionInContext(object):
         """
         if not self.revision.depot_file:
             return None
-        try:
-            return self.revision.depot_file.file.content_length
-        except IOError as e:
-            logger.warning(
-                self,
-                "IO Exception Occured when trying to get content size  : {}".format(str(e))
-            )
-            logger.warning(self, traceback.format_exc())
-        except Exception as e:
-            logger.warning(
-                self,
-                "Unknown Exception Occured when trying to get content size  : {}".format(str(e))
-            )
-            logger.warning(self, traceback.format_exc())
-        return None
+        return self._preview_metadata.size
 
     @property
     def has_pdf_preview(self) -> bool:
@@ -1228,21 +1225,7 @@ class RevisionInContext(object):
         """
         if not self.revision.depot_file:
             return False
-
-        from tracim_backend.lib.core.content import ContentApi
-        content_api = ContentApi(
-            current_user=self._user,
-            session=self.dbsession,
-            config=self.config,
-            show_deleted=True,
-            show_archived=True,
-            show_active=True,
-            show_temporary=True,
-        )
-        return content_api.has_pdf_preview(
-            self.revision.revision_id,
-            file_extension=self.revision.file_extension,
-        )
+        return self._preview_metadata.has_pdf_preview
 
     @property
     def has_jpeg_preview(self) -> bool:
@@ -1251,21 +1234,29 @@ class RevisionInContext(object):
         """
         if not self.revision.depot_file:
             return False
+        return self._preview_metadata.has_jpeg_preview
 
-        from tracim_backend.lib.core.content import ContentApi
-        content_api = ContentApi(
-            current_user=self._user,
-            session=self.dbsession,
-            config=self.config,
-            show_deleted=True,
-            show_archived=True,
-            show_active=True,
-            show_temporary=True,
-        )
-        return content_api.has_jpeg_preview(
-            self.revision.revision_id,
-            file_extension=self.revision.file_extension
-        )
+    @property
+    def _preview_metadata(self) -> RevisionPreviewMetadata:
+        """
+        :return: preview metadata of revision file, see
+        ContentApi.get_revision_preview_metadata()
+        """
+        if not self._cached_preview_metadata:
+            # TODO - G.M - 2018-09-05 - Fix circular import better
+            from tracim_backend.lib.core.content import ContentApi
+            content_api = ContentApi(
+                current_user=self._user,
+                session=self.dbsession,
+                config=self.config,
+                show_deleted=True,
+                show_archived=True,
+                show_active=True,
+                show_temporary=True,
+            )
+            self._cached_preview_metadata = \
+                content_api.get_revision_preview_metadata(self.revision)
+        return self._cached_preview_metadata
 
     @property
     def file_extension(self) -> str:
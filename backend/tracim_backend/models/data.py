@@ -9,21 +9,29 @@ from babel.dates import format_timedelta
 from bs4 import BeautifulSoup
 from depot.fields.sqlalchemy import UploadedFileField
 from depot.fields.upload import UploadedFile
-from depot.io.utils import FileIntent
 from sqlalchemy import Column
 from sqlalchemy import ForeignKey
 from sqlalchemy import Index
 from sqlalchemy import Sequence
+from sqlalchemy import event
+from sqlalchemy import func
 from sqlalchemy import inspect
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Query
 from sqlalchemy.orm import backref
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import deferred
+from sqlalchemy.orm import object_session
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.orm.collections import attribute_mapped_collection
+from sqlalchemy.types import BigInteger
 from sqlalchemy.types import Boolean
 from sqlalchemy.types import DateTime
+from sqlalchemy.types import Float
 from sqlalchemy.types import Integer
+from sqlalchemy.types import LargeBinary
 from sqlalchemy.types import Text
 from sqlalchemy.types import Unicode
 
@@ -37,6 +45,8 @@ from tracim_backend.exceptions import NewRevisionAbortedDepotCorrupted
 from tracim_backend.lib.utils.translation import Translator
 from tracim_backend.lib.utils.translation import get_locale
 from tracim_backend.models.auth import User
+from tracim_backend.models.depot import ContentAddressedFile
+from tracim_backend.models.depot import get_shared_depot_file
 from tracim_backend.models.meta import DeclarativeBase
 from tracim_backend.models.roles import WorkspaceRoles
 
@@ -65,6 +75,18 @@ class Workspace(DeclarativeBase):
 
     is_deleted = Column(Boolean, unique=False, nullable=False, default=False)
 
+    # INFO - G.M - 2018-12-11 - Incremented each time path of a content of
+    # workspace may change (creation, rename, move, deletion...). It allows
+    # to cache content path resolution, see
+    # tracim_backend.models.revision_protection.update_workspace_content_tree_generation
+    content_tree_generation = Column(
+        Integer,
+        unique=False,
+        nullable=False,
+        default=0,
+        server_default='0',
+    )
+
     revisions = relationship("ContentRevisionRO")
 
     @hybrid_property
@@ -594,7 +616,13 @@ class ContentRevisionRO(DeclarativeBase):
     # INFO - A.P - 2017-07-03 - Depot Doc
     # http://depot.readthedocs.io/en/latest/#attaching-files-to-models
     # http://depot.readthedocs.io/en/latest/api.html#module-depot.fields
-    depot_file = Column(UploadedFileField, unique=False, nullable=True)
+    # INFO - G.M - 2018-12-14 - Files are content addressed: revisions with
+    # same file content share same depot file, see models.depot.DepotBlob
+    depot_file = Column(
+        UploadedFileField(upload_type=ContentAddressedFile),
+        unique=False,
+        nullable=True,
+    )
     properties = Column('properties', Text(), unique=False, nullable=False, default='')
 
     type = Column(Unicode(32), unique=False, nullable=False)
@@ -688,12 +716,10 @@ class ContentRevisionRO(DeclarativeBase):
 
         new_rev.updated = datetime.utcnow()
         if revision.depot_file:
+            # INFO - G.M - 2018-12-14 - new revision share file of revision,
+            # file is replaced if new revision update it.
             try:
-                new_rev.depot_file = FileIntent(
-                    revision.depot_file.file.read(),
-                    revision.file_name,
-                    revision.file_mimetype,
-                )
+                new_rev.depot_file = get_shared_depot_file(revision.depot_file)  # nopep8
             except IOError as exc:
                 raise NewRevisionAbortedDepotCorrupted(
                     "IOError. Can't create new revision by copying another one "
@@ -727,11 +753,7 @@ class ContentRevisionRO(DeclarativeBase):
         # copy attached_file
         if revision.depot_file:
             try:
-                copy_rev.depot_file = FileIntent(
-                    revision.depot_file.file.read(),
-                    revision.file_name,
-                    revision.file_mimetype,
-                )
+                copy_rev.depot_file = get_shared_depot_file(revision.depot_file)  # nopep8
             except IOError as exc:
                 raise CopyRevisionAbortedDepotCorrupted(
                     "IOError. Can't create new revision by copying another one"
@@ -799,6 +821,27 @@ class ContentRevisionRO(DeclarativeBase):
 # TODO - G.M - 2018-06-177 - [author] Owner should be renamed "author"
 Index('idx__content_revisions__owner_id', ContentRevisionRO.owner_id)
 Index('idx__content_revisions__parent_id', ContentRevisionRO.parent_id)
+# INFO - G.M - 2018-12-04 - Composite indexes for ContentApi hot queries:
+# revisions of a content (mark_read, history), filename availability and
+# path resolution (workspace/parent/label/extension) and last active
+# contents of a workspace (workspace/updated).
+Index(
+    'idx__content_revisions__content_id__revision_id',
+    ContentRevisionRO.content_id,
+    ContentRevisionRO.revision_id,
+)
+Index(
+    'idx__content_revisions__workspace_id__parent_id__label',
+    ContentRevisionRO.workspace_id,
+    ContentRevisionRO.parent_id,
+    ContentRevisionRO.label,
+    ContentRevisionRO.file_extension,
+)
+Index(
+    'idx__content_revisions__workspace_id__updated',
+    ContentRevisionRO.workspace_id,
+    ContentRevisionRO.updated,
+)
 
 
 class Content(DeclarativeBase):
@@ -817,8 +860,9 @@ class Content(DeclarativeBase):
 
     # QUERY CONTENTS
 
-    To query contents you will need to join your content query with ContentRevisionRO. Join
-    condition is available at tracim.lib.content.ContentApi#_get_revision_join:
+    To query contents you will need to join your content query with ContentRevisionRO on
+    current revision (content.cached_revision_id). Join condition is available at
+    tracim.lib.content.ContentApi#_get_revision_join:
 
     content = DBSession.query(Content).join(ContentRevisionRO, ContentApi._get_revision_join())
                   .filter(Content.label == 'foo')
@@ -836,6 +880,18 @@ class Content(DeclarativeBase):
     revision_to_serialize = -0  # This flag allow to serialize a given revision if required by the user
 
     id = Column(Integer, primary_key=True)
+    # INFO - G.M - 2018-12-03 - Materialized pointer to the most recent
+    # revision of content. It allows to join content and content_revisions
+    # on current revision without a correlated subquery.
+    # see ContentApi._get_revision_join()
+    cached_revision_id = Column(
+        Integer,
+        ForeignKey(
+            'content_revisions.revision_id',
+            use_alter=True,
+        ),
+        nullable=True,
+    )
     # TODO - A.P - 2017-09-05 - revisions default sorting
     # The only sorting that makes sens is ordering by "updated" field. But:
     # - its content will soon replace the one of "created",
@@ -855,6 +911,13 @@ class Content(DeclarativeBase):
         back_populates="parent",
         order_by='ContentRevisionRO.revision_id',
     )
+    # INFO - G.M - 2018-12-03 - post_update is needed as content and
+    # content_revisions reference each other.
+    current_revision = relationship(
+        "ContentRevisionRO",
+        foreign_keys=[cached_revision_id],
+        post_update=True,
+    )
 
     @hybrid_property
     def content_id(self) -> int:
@@ -1144,13 +1207,51 @@ class Content(DeclarativeBase):
         :return: list of children Content
         :rtype Content
         """
-        # Return a list of unique revisions parent content
-        # TODO - G.M - 2018-10-24 - Set is just here to avoid distinct object,
-        # check if possible to do this better, probably using database sorting
-        # and sql distinct.
-        revisions = set([revision.node for revision in self.children_revisions])
-        revisions = sorted(revisions, key=lambda r: r.revision_id)
-        return revisions
+        return self._get_children()
+
+    def get_children_query(
+            self,
+            content_types: typing.Optional[typing.List[str]] = None,
+            only_valid: bool = False,
+    ) -> Query:
+        """
+        Query direct children of content: contents whose current revision
+        has this content as parent. Current revision (and its owner) of
+        children are loaded by the same query.
+        Unlike children_revisions, old revisions of children (and contents
+        moved elsewhere since) are not loaded.
+        :param content_types: filter by content type slugs
+        :param only_valid: exclude deleted and archived children
+        :return: Query of Content ordered by current revision
+        """
+        query = object_session(self).query(Content).join(
+            ContentRevisionRO,
+            Content.cached_revision_id == ContentRevisionRO.revision_id,
+        ).options(
+            contains_eager(Content.current_revision)
+            .joinedload(ContentRevisionRO.owner),
+        ).filter(
+            ContentRevisionRO.parent_id == self.id,
+        )
+        if content_types:
+            query = query.filter(ContentRevisionRO.type.in_(content_types))
+        if only_valid:
+            query = query.filter(
+                ContentRevisionRO.is_deleted == False,
+                ContentRevisionRO.is_archived == False,
+            )
+        return query.order_by(ContentRevisionRO.revision_id)
+
+    def _get_children(
+            self,
+            content_types: typing.Optional[typing.List[str]] = None,
+            only_valid: bool = False,
+    ) -> typing.List['Content']:
+        # INFO - G.M - 2018-12-20 - not yet persisted content can't have
+        # persisted children.
+        if self.id is None or object_session(self) is None:
+            return []
+        return self.get_children_query(content_types, only_valid).all()
 
     @property
     def revision(self) -> ContentRevisionRO:
@@ -1181,6 +1282,9 @@ class Content(DeclarativeBase):
         self.revision.depot_file = value
 
     def get_current_revision(self) -> ContentRevisionRO:
+        if self.current_revision:
+            return self.current_revision
+
         if not self.revisions:
             return self.new_revision()
 
@@ -1199,19 +1303,23 @@ class Content(DeclarativeBase):
         If this content already own revision, revision is build from last revision.
         :return:
         """
-        if not self.revisions:
-            self.revisions.append(ContentRevisionRO())
-            return self.revisions[0]
-
-        new_rev = ContentRevisionRO.new_from(self.get_current_revision())
-        self.revisions.append(new_rev)
+        # INFO - G.M - 2018-12-28 - revisions are not loaded when current
+        # revision is known: history of content may be long.
+        current_revision = self.current_revision
+        if current_revision is None and self.revisions:
+            current_revision = self.get_current_revision()
+        if current_revision is None:
+            new_rev = ContentRevisionRO()
+        else:
+            new_rev = ContentRevisionRO.new_from(current_revision)
+        # INFO - G.M - 2018-12-28 - backref appends new revision to
+        # revisions only if they are already loaded.
+        new_rev.node = self
+        self.current_revision = new_rev
         return new_rev
 
     def get_valid_children(self, content_types: list=None) -> ['Content']:
-        for child in self.children:
-            if not child.is_deleted and not child.is_archived:
-                if not content_types or child.type in content_types:
-                    yield child.node
+        return self._get_children(content_types, only_valid=True)
 
     @hybrid_property
     def properties(self) -> dict:
@@ -1247,14 +1355,15 @@ class Content(DeclarativeBase):
                                 locale=get_locale())
 
     def get_child_nb(self, content_type: str, content_status = ''):
-        child_nb = 0
-        for child in self.get_valid_children():
-            if child.type == content_type or content_type.slug == content_type_list.Any_SLUG:
-                if not content_status:
-                    child_nb = child_nb+1
-                elif content_status==child.status:
-                    child_nb = child_nb+1
-        return child_nb
+        if self.id is None or object_session(self) is None:
+            return 0
+        content_types = None
+        if content_type != content_type_list.Any_SLUG:
+            content_types = [content_type]
+        query = self.get_children_query(content_types, only_valid=True)
+        if content_status:
+            query = query.filter(ContentRevisionRO.status == content_status)
+        return query.order_by(None).count()
 
     def get_label(self):
         return self.label or self.file_name or ''
@@ -1272,9 +1381,12 @@ class Content(DeclarativeBase):
         :return:
         """
         last_revision_date = self.updated
-        for comment in self.get_comments():
-            if comment.updated > last_revision_date:
-                last_revision_date = comment.updated
+        last_comment_date = self._get_children_last_updated(
+            content_types=[content_type_list.Comment.slug],
+            only_valid=True,
+        )
+        if last_comment_date and last_comment_date > last_revision_date:
+            last_revision_date = last_comment_date
         return last_revision_date
 
     def get_last_activity_date(self) -> datetime_root.datetime:
@@ -1287,11 +1399,23 @@ class Content(DeclarativeBase):
             if revision.updated > last_revision_date:
                 last_revision_date = revision.updated
 
-        for child in self.children:
-            if child.updated > last_revision_date:
-                last_revision_date = child.updated
+        last_child_date = self._get_children_last_updated()
+        if last_child_date and last_child_date > last_revision_date:
+            last_revision_date = last_child_date
         return last_revision_date
 
+    def _get_children_last_updated(
+            self,
+            content_types: typing.Optional[typing.List[str]] = None,
+            only_valid: bool = False,
+    ) -> typing.Optional[datetime]:
+        if self.id is None or object_session(self) is None:
+            return None
+        return self.get_children_query(content_types, only_valid)\
+            .order_by(None)\
+            .with_entities(func.max(ContentRevisionRO.updated))\
+            .scalar()
+
     def has_new_information_for(self, user: User) -> bool:
         """
         :param user: the _session current user
@@ -1314,24 +1438,23 @@ class Content(DeclarativeBase):
         return False
 
     def get_comments(self):
-        children = []
-        for child in self.children:
-            if content_type_list.Comment.slug == child.type and not child.is_deleted and not child.is_archived:
-                children.append(child.node)
-        return children
+        return self._get_children(
+            content_types=[content_type_list.Comment.slug],
+            only_valid=True,
+        )
 
     def get_last_comment_from(self, user: User) -> 'Content':
-        # TODO - Make this more efficient
-        last_comment_updated = None
-        last_comment = None
-        for comment in self.get_comments():
-            if user.user_id == comment.owner.user_id:
-                if not last_comment or last_comment_updated<comment.updated:
-                    # take only the latest comment !
-                    last_comment = comment
-                    last_comment_updated = comment.updated
-
-        return last_comment
+        if self.id is None or object_session(self) is None:
+            return None
+        return self.get_children_query(
+            content_types=[content_type_list.Comment.slug],
+            only_valid=True,
+        ).filter(
+            ContentRevisionRO.owner_id == user.user_id,
+        ).order_by(None).order_by(
+            ContentRevisionRO.updated.desc(),
+            ContentRevisionRO.revision_id.desc(),
+        ).first()
 
     def get_previous_revision(self) -> 'ContentRevisionRO':
         rev_ids = [revision.revision_id for revision in self.revisions]
@@ -1406,9 +1529,13 @@ class Content(DeclarativeBase):
         for rev in self.revisions:
             cpy_rev = ContentRevisionRO.copy(rev, parent)
             cpy_content.revisions.append(cpy_rev)
+            cpy_content.current_revision = cpy_rev
         return cpy_content
 
 
+Index('idx__content__cached_revision_id', Content.cached_revision_id)
+
+
 class RevisionReadStatus(DeclarativeBase):
 
     __tablename__ = 'revision_read_status'
@@ -1433,6 +1560,109 @@ class RevisionReadStatus(DeclarativeBase):
     ))
 
 
+class RevisionPreviewMetadata(DeclarativeBase):
+    """
+    Preview related metadata of a revision file. As file of a revision never
+    change, theses metadata are computed once and then served from database
+    instead of asking depot and preview generator each time.
+    """
+
+    __tablename__ = 'revision_preview_metadata'
+
+    revision_id = Column(Integer, ForeignKey('content_revisions.revision_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True)  # nopep8
+    page_nb = Column(Integer, unique=False, nullable=True)
+    has_pdf_preview = Column(Boolean, unique=False, nullable=False, default=False)  # nopep8
+    has_jpeg_preview = Column(Boolean, unique=False, nullable=False, default=False)  # nopep8
+    size = Column(BigInteger, unique=False, nullable=True)
+    mimetype = Column(Unicode(255), unique=False, nullable=True)
+    created = Column(DateTime, unique=False, nullable=False, default=datetime.utcnow)  # nopep8
+
+    def copy(self) -> 'RevisionPreviewMetadata':
+        """
+        :return: new transient object with same metadata, usable out of any
+        session.
+        """
+        return RevisionPreviewMetadata(
+            revision_id=self.revision_id,
+            page_nb=self.page_nb,
+            has_pdf_preview=self.has_pdf_preview,
+            has_jpeg_preview=self.has_jpeg_preview,
+            size=self.size,
+            mimetype=self.mimetype,
+            created=self.created,
+        )
+
+
+class WebdavRenderedRevision(DeclarativeBase):
+    """
+    Html of page or thread revision rendered for WebDAV, see
+    tracim_backend.lib.webdav.resources.OtherFileResource. Thread html
+    change with its comments: it is rendered again when last comment
+    revision change. Html is deferred: listings only load its length.
+    """
+
+    __tablename__ = 'webdav_rendered_revisions'
+
+    revision_id = Column(Integer, ForeignKey('content_revisions.revision_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True, autoincrement=False)  # nopep8
+    last_comment_revision_id = Column(Integer, unique=False, nullable=False)
+    length = Column(BigInteger, unique=False, nullable=False)
+    html = deferred(Column(LargeBinary, unique=False, nullable=False))
+
+
+class WebdavLock(DeclarativeBase):
+    """
+    WebDAV lock, see tracim_backend.lib.webdav.lock_storage.LockStorage.
+    Locks are stored in database to be shared by all webdav processes.
+    """
+
+    __tablename__ = 'webdav_locks'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = Column(Integer, autoincrement=True, primary_key=True)
+    token = Column(Unicode(255), unique=True, nullable=False)
+    root = Column(Text, unique=False, nullable=False)
+    depth = Column(Unicode(32), unique=False, nullable=False, default='infinity')  # nopep8
+    type = Column(Unicode(32), unique=False, nullable=False, default='write')  # nopep8
+    scope = Column(Unicode(32), unique=False, nullable=False, default='exclusive')  # nopep8
+    owner = Column(Text, unique=False, nullable=False, default='')
+    principal = Column(Unicode(255), unique=False, nullable=True)
+    timeout = Column(Float, unique=False, nullable=False)
+    expire = Column(Float, unique=False, nullable=False)
+
+
+Index('idx__webdav_locks__root', WebdavLock.root, mysql_length=255)
+
+
+class WebdavLockGeneration(DeclarativeBase):
+    """
+    Generation of webdav locks table: one row, incremented by each write of
+    webdav_locks (see LockStorage). Updating it first locks the row until
+    commit, which serializes lock writes of all webdav processes.
+    """
+
+    __tablename__ = 'webdav_lock_generation'
+
+    # INFO - G.M - 2018-12-27 - table has only one row, with this id
+    SINGLE_ROW_ID = 1
+
+    id = Column(Integer, autoincrement=False, primary_key=True)
+    generation = Column(BigInteger, unique=False, nullable=False, default=0)
+
+
+def _create_webdav_lock_generation_row(target, connection, **kw) -> None:
+    connection.execute(target.insert().values(
+        id=WebdavLockGeneration.SINGLE_ROW_ID,
+        generation=0,
+    ))
+
+
+event.listen(
+    WebdavLockGeneration.__table__,
+    'after_create',
+    _create_webdav_lock_generation_row,
+)
+
+
 class NodeTreeItem(object):
     """
         This class implements a model that allow to simply represents
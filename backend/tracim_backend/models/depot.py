@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import typing
+from collections import Counter
+from datetime import datetime
+
+from depot.fields.sqlalchemy import UploadedFileField
+from depot.fields.upload import UploadedFile
+from depot.io.interfaces import FileStorage
+from depot.io.utils import FileIntent
+from depot.manager import DepotManager
+from sqlalchemy import Column
+from sqlalchemy import bindparam
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.event import listen
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from sqlalchemy.orm.unitofwork import UOWTransaction
+from sqlalchemy.types import DateTime
+from sqlalchemy.types import Integer
+from sqlalchemy.types import Unicode
+
+from tracim_backend.lib.utils.logger import logger
+from tracim_backend.models.meta import DeclarativeBase
+from tracim_backend.models.meta import has_upsert
+
+PENDING_DEPOT_FILES_DELETION_SESSION_KEY = 'tracim_pending_depot_files_deletion'  # nopep8
+# INFO - G.M - 2018-12-14 - Same block size as shutil.copyfileobj
+HASH_BLOCK_SIZE = 16 * 1024
+
+
+class DepotBlob(DeclarativeBase):
+    """
+    Content addressed file of depot: one depot file by file content (sha256),
+    shared by all revisions with this file content. ref_count is the number
+    of revisions referencing it, see update_depot_blobs.
+    """
+
+    __tablename__ = 'depot_blobs'
+
+    sha256 = Column(Unicode(64), primary_key=True)
+    depot_name = Column(Unicode(255), unique=False, nullable=False)
+    file_id = Column(Unicode(255), unique=False, nullable=False)
+    ref_count = Column(Integer, unique=False, nullable=False, default=0)
+    created = Column(DateTime, unique=False, nullable=False, default=datetime.utcnow)  # nopep8
+
+
+class _HashingReader(object):
+    """
+    File-like wrapper computing sha256 of content while depot storage read
+    it, so that content is read only once.
+    """
+
+    def __init__(self, fileobj: typing.BinaryIO, sha256) -> None:
+        self._fileobj = fileobj
+        self._sha256 = sha256
+
+    def read(self, n: int=-1) -> bytes:
+        data = self._fileobj.read(n)
+        self._sha256.update(data)
+        return data
+
+
+class ContentAddressedFile(UploadedFile):
+    """
+    UploadedFile knowing sha256 of its content.
+
+    Files stored by content addressed file are tracked by depot only until
+    first flush: update_depot_blobs then give them to DepotBlob, or drop them
+    if a blob with same content already exist. Shared references (see
+    get_shared_depot_file) are never tracked by depot, so depot never delete
+    a file used by another revision.
+    """
+
+    def store_content(self, content, filename=None, content_type=None):
+        content, filename, content_type = FileStorage.fileinfo(
+            content,
+            filename,
+            content_type,
+        )
+        sha256 = hashlib.sha256()
+        if hasattr(content, 'read'):
+            content = _HashingReader(content, sha256)
+        else:
+            sha256.update(content)
+        stored = super().store_content(
+            FileIntent(content, filename, content_type),
+        )
+        self['sha256'] = sha256.hexdigest()
+        return stored
+
+
+def compute_depot_file_sha256(depot_file: UploadedFile) -> str:
+    """
+    Compute sha256 of depot file content, reading it by blocks.
+    :raise IOError: if file is not available in depot
+    """
+    sha256 = hashlib.sha256()
+    stored_file = depot_file.file
+    try:
+        for block in iter(lambda: stored_file.read(HASH_BLOCK_SIZE), b''):
+            sha256.update(block)
+    finally:
+        stored_file.close()
+    return sha256.hexdigest()
+
+
+def get_shared_depot_file(depot_file: UploadedFile) -> ContentAddressedFile:
+    """
+    Return a new reference to depot file, to be used by another revision
+    without copying file content.
+    Files stored before content addressing have no known sha256: it is
+    computed once here, next references of new revision are free.
+    :raise IOError: if file is not available in depot
+    """
+    sha256 = depot_file.get('sha256')
+    if not sha256:
+        sha256 = compute_depot_file_sha256(depot_file)
+    shared_file = dict(depot_file)
+    shared_file['files'] = []
+    shared_file['sha256'] = sha256
+    return ContentAddressedFile(shared_file)
+
+
+def _get_depot_file_keys(instance: DeclarativeBase) -> typing.List[str]:
+    mapper = inspect(instance).mapper
+    if mapper not in _depot_file_keys_by_mapper:
+        _depot_file_keys_by_mapper[mapper] = [
+            column_property.key
+            for column_property in mapper.column_attrs
+            if isinstance(column_property.columns[0].type, UploadedFileField)
+        ]
+    return _depot_file_keys_by_mapper[mapper]
+
+
+_depot_file_keys_by_mapper = {}  # type: typing.Dict[typing.Any, typing.List[str]]  # nopep8
+
+
+def _get_depot_blob(
+        session: Session,
+        sha256: str,
+) -> typing.Optional[DepotBlob]:
+    with session.no_autoflush:
+        return session.query(DepotBlob).get(sha256)
+
+
+def _insert_depot_blob(session: Session, **values) -> None:
+    """
+    Insert depot blob row, or do nothing if a blob with same sha256 exists:
+    a concurrent transaction may have stored same content since blob was
+    looked for.
+    """
+    blob_table = DepotBlob.__table__
+    dialect = session.bind.dialect
+    if has_upsert(dialect):
+        session.execute(
+            postgresql_insert(blob_table)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=['sha256'])
+        )
+    elif dialect.name == 'mysql':
+        session.execute(blob_table.insert().prefix_with('IGNORE').values(**values))  # nopep8
+    elif dialect.name == 'sqlite':
+        session.execute(blob_table.insert().prefix_with('OR IGNORE').values(**values))  # nopep8
+    else:
+        # INFO - G.M - 2018-12-27 - No upsert available (PostgreSQL < 9.5):
+        # insert in a savepoint, so that a duplicate does not abort current
+        # transaction.
+        connection = session.connection()
+        savepoint = connection.begin_nested()
+        try:
+            connection.execute(blob_table.insert().values(**values))
+            savepoint.commit()
+        except IntegrityError:
+            savepoint.rollback()
+
+
+def update_depot_blobs(
+        session: Session,
+        flush_context: UOWTransaction,
+        instances: [DeclarativeBase]
+) -> None:
+    """
+    Register depot files of flushed objects as content addressed blobs:
+    - newly stored file with an unknown content become a blob,
+    - newly stored file with an already known content is replaced by a
+    reference to existing blob, and deleted once transaction is committed,
+    - blob ref_count is incremented for each new reference and decremented
+    for each removed reference.
+    Unreferenced blobs (ref_count 0) are kept: content revisions are never
+    deleted (see prevent_content_revision_delete).
+    """
+    blobs = {}  # type: typing.Dict[str, DepotBlob]
+    ref_count_deltas = {}  # type: typing.Dict[str, int]
+
+    def get_blob(sha256: str) -> typing.Optional[DepotBlob]:
+        if sha256 not in blobs:
+            blobs[sha256] = _get_depot_blob(session, sha256)
+        return blobs[sha256]
+
+    changed_files = []  # type: typing.List[typing.Tuple[DeclarativeBase, str, typing.Sequence[UploadedFile], typing.Sequence[UploadedFile]]]  # nopep8
+    for instance in session.new.union(session.dirty):
+        for key in _get_depot_file_keys(instance):
+            history = get_history(instance, key)
+            changed_files.append(
+                (instance, key, history.added, history.deleted)
+            )
+    for instance in session.deleted:
+        for key in _get_depot_file_keys(instance):
+            changed_files.append(
+                (instance, key, (), (getattr(instance, key),))
+            )
+
+    for instance, key, added_files, removed_files in changed_files:
+        for depot_file in removed_files:
+            if not depot_file or not depot_file.get('sha256'):
+                continue
+            if get_blob(depot_file['sha256']):
+                ref_count_deltas[depot_file['sha256']] = \
+                    ref_count_deltas.get(depot_file['sha256'], 0) - 1
+
+        for depot_file in added_files:
+            if not depot_file or not depot_file.get('sha256'):
+                continue
+            blob = get_blob(depot_file['sha256'])
+            if blob is None:
+                # INFO - G.M - 2018-12-14 - a shared file without blob is a
+                # file stored before content addressing, already referenced
+                # by its original revision.
+                # INFO - G.M - 2018-12-27 - blob is inserted right now, not
+                # at flush: if a concurrent upload of same content inserted
+                # it first, its blob is used instead of failing on sha256
+                # primary key.
+                _insert_depot_blob(
+                    session,
+                    sha256=depot_file['sha256'],
+                    depot_name=depot_file['depot_name'],
+                    file_id=depot_file['file_id'],
+                    ref_count=0 if depot_file['files'] else 1,
+                )
+                with session.no_autoflush:
+                    blob = session.query(DepotBlob).get(depot_file['sha256'])  # nopep8
+                blobs[blob.sha256] = blob
+            if depot_file['files'] \
+                    and depot_file['file_id'] != blob.file_id:
+                # INFO - G.M - 2018-12-14 - same content already stored:
+                # newly stored file is a useless duplicate.
+                schedule_depot_files_deletion(session, depot_file['files'])
+            if depot_file['files'] or depot_file['file_id'] != blob.file_id:  # nopep8
+                shared_file = dict(depot_file)
+                shared_file['files'] = []
+                shared_file['depot_name'] = blob.depot_name
+                shared_file['file_id'] = blob.file_id
+                shared_file['path'] = '{}/{}'.format(
+                    blob.depot_name,
+                    blob.file_id,
+                )
+                setattr(instance, key, ContentAddressedFile(shared_file))
+            ref_count_deltas[blob.sha256] = \
+                ref_count_deltas.get(blob.sha256, 0) + 1
+
+    for sha256, delta in ref_count_deltas.items():
+        if not delta:
+            continue
+        # INFO - G.M - 2018-12-14 - increment in database to not lose
+        # concurrent references.
+        blobs[sha256].ref_count = DepotBlob.ref_count + delta
+
+
+def increment_depot_blobs_ref_count(
+        session: Session,
+        depot_files: typing.Iterable[typing.Optional[UploadedFile]],
+) -> None:
+    """
+    Increment ref_count of blobs referenced by depot files of revisions
+    inserted with sql statements instead of orm objects (which are counted
+    by update_depot_blobs), with one executemany update.
+    Files stored before content addressing have no blob: they are ignored.
+    """
+    ref_count_deltas = Counter(
+        depot_file['sha256'] for depot_file in depot_files
+        if depot_file and depot_file.get('sha256')
+    )
+    if not ref_count_deltas:
+        return
+    blob_table = DepotBlob.__table__
+    session.execute(
+        blob_table.update()
+        .where(blob_table.c.sha256 == bindparam('b_sha256'))
+        .values(ref_count=blob_table.c.ref_count + bindparam('b_delta')),
+        [
+            {'b_sha256': sha256, 'b_delta': delta}
+            for sha256, delta in ref_count_deltas.items()
+        ],
+    )
+    for sha256 in ref_count_deltas:
+        blob = session.identity_map.get(session.identity_key(DepotBlob, sha256))  # nopep8
+        if blob is not None:
+            session.expire(blob, ['ref_count'])
+
+
+def schedule_depot_files_deletion(
+        session: Session,
+        files: typing.List[str],
+) -> None:
+    """
+    Delete depot files (as "depot_name/file_id" paths) once current
+    transaction of session is committed.
+    """
+    if PENDING_DEPOT_FILES_DELETION_SESSION_KEY not in session.info:
+        session.info[PENDING_DEPOT_FILES_DELETION_SESSION_KEY] = []
+        listen(session, 'after_commit', _delete_pending_depot_files)
+        listen(
+            session,
+            'after_soft_rollback',
+            _clear_pending_depot_files,
+        )
+    session.info[PENDING_DEPOT_FILES_DELETION_SESSION_KEY].extend(files)
+
+
+def _delete_pending_depot_files(session: Session) -> None:
+    pending_files = session.info.get(PENDING_DEPOT_FILES_DELETION_SESSION_KEY, [])  # nopep8
+    session.info[PENDING_DEPOT_FILES_DELETION_SESSION_KEY] = []
+    for file_path in pending_files:
+        depot_name, file_id = file_path.split('/', 1)
+        try:
+            DepotManager.get(depot_name).delete(file_id)
+        except Exception as exc:
+            logger.error(
+                session,
+                'Unable to delete duplicated depot file {}: {}'.format(
+                    file_path,
+                    str(exc),
+                ),
+            )
+
+
+def _clear_pending_depot_files(
+        session: Session,
+        previous_transaction,
+) -> None:
+    if not session.is_active:
+        return
+    # INFO - G.M - 2018-12-14 - files stored in rolled back transaction are
+    # deleted by depot itself.
+    session.info[PENDING_DEPOT_FILES_DELETION_SESSION_KEY] = []
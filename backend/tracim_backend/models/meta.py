@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import sqlite3
+import typing
+
+from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.schema import MetaData
 
@@ -17,3 +21,63 @@ NAMING_CONVENTION = {
 
 metadata = MetaData(naming_convention=NAMING_CONVENTION)
 DeclarativeBase = declarative_base(metadata=metadata)
+
+
+# INFO - G.M - 2018-12-26 - Some statements are not available on all
+# supported database versions (PostgreSQL >= 9.3, MySQL >= 5.5, SQLite),
+# code using them must check these before and provide a fallback.
+def has_recursive_cte(dialect: Dialect) -> bool:
+    """
+    Check if database supports (recursive) common table expressions
+    (WITH [RECURSIVE] ... queries).
+    """
+    if dialect.name == 'mysql':
+        if _is_mariadb(dialect):
+            return _get_mysql_version(dialect) >= (10, 2, 2)
+        return _get_mysql_version(dialect) >= (8, 0)
+    if dialect.name == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 8, 3)
+    return dialect.name == 'postgresql'
+
+
+def has_upsert(dialect: Dialect) -> bool:
+    """
+    Check if database supports PostgreSQL INSERT ... ON CONFLICT upsert.
+    """
+    return dialect.name == 'postgresql' \
+        and (dialect.server_version_info or (0,)) >= (9, 5)
+
+
+def has_insert_returning(dialect: Dialect) -> bool:
+    """
+    Check if database can return columns of inserted rows
+    (INSERT ... RETURNING) with SQLAlchemy.
+    """
+    return dialect.name == 'postgresql'
+
+
+def has_window_functions(dialect: Dialect) -> bool:
+    """
+    Check if database supports window functions (... OVER (...)).
+    """
+    if dialect.name == 'mysql':
+        if _is_mariadb(dialect):
+            return _get_mysql_version(dialect) >= (10, 2)
+        return _get_mysql_version(dialect) >= (8, 0)
+    if dialect.name == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25)
+    return dialect.name == 'postgresql'
+
+
+def _is_mariadb(dialect: Dialect) -> bool:
+    return 'MariaDB' in (dialect.server_version_info or ())
+
+
+def _get_mysql_version(dialect: Dialect) -> typing.Tuple[int, ...]:
+    version = dialect.server_version_info or ()
+    if _is_mariadb(dialect):
+        # INFO - G.M - 2018-12-26 - MariaDB version may be prefixed by
+        # "5.5.5-", real version are the 3 numbers before "MariaDB".
+        index = version.index('MariaDB')
+        return version[index - 3:index]
+    return version
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import typing
+
 from sqlalchemy.orm import Session
 from sqlalchemy import inspect
 from sqlalchemy.orm.unitofwork import UOWTransaction
@@ -11,6 +13,7 @@ from tracim_backend.exceptions import SameValueError
 
 from tracim_backend.models.data import ContentRevisionRO
 from tracim_backend.models.data import Content
+from tracim_backend.models.data import Workspace
 from tracim_backend.models.meta import DeclarativeBase
 
 
@@ -31,6 +34,115 @@ def prevent_content_revision_delete(
             )
 
 
+# INFO - G.M - 2018-12-11 - ContentRevisionRO attributes used to build
+# content path (webdav path for example)
+CONTENT_PATH_REVISION_ATTRIBUTES = (
+    'label',
+    'file_extension',
+    'type',
+    'parent',
+    'workspace',
+    'is_deleted',
+    'is_archived',
+    'is_temporary',
+)
+
+
+def _get_revision_workspace(
+        session: Session,
+        revision: ContentRevisionRO,
+) -> typing.Optional[Workspace]:
+    if revision.workspace is None and revision.workspace_id is not None:
+        with session.no_autoflush:
+            return session.query(Workspace).get(revision.workspace_id)
+    return revision.workspace
+
+
+def _get_previous_revision(
+        session: Session,
+        revision: ContentRevisionRO,
+) -> typing.Optional[ContentRevisionRO]:
+    """
+    Get current revision of content of new revision, as stored in database.
+    Content.current_revision is a post update relationship: until flush is
+    done, Content.cached_revision_id is still the id of previous current
+    revision, which is loaded alone, without content history.
+    """
+    content = revision.node
+    if content is None:
+        return None
+    with session.no_autoflush:
+        previous_revision_id = content.cached_revision_id
+        if previous_revision_id is None \
+                or previous_revision_id == revision.revision_id:
+            return None
+        return session.query(ContentRevisionRO).get(previous_revision_id)
+
+
+def update_workspace_content_tree_generation(
+        session: Session,
+        flush_context: UOWTransaction,
+        instances: [DeclarativeBase]
+) -> None:
+    """
+    Increment content_tree_generation of workspaces where a content was
+    created or where a new revision change content path.
+    """
+    workspaces = set()
+    for instance in session.new:
+        if not isinstance(instance, ContentRevisionRO):
+            continue
+        previous_revision = _get_previous_revision(session, instance)
+        if previous_revision is None:
+            workspaces.add(_get_revision_workspace(session, instance))
+            continue
+        for attribute in CONTENT_PATH_REVISION_ATTRIBUTES:
+            if getattr(instance, attribute) != getattr(previous_revision, attribute):  # nopep8
+                workspaces.add(_get_revision_workspace(session, instance))
+                workspaces.add(_get_revision_workspace(session, previous_revision))  # nopep8
+                break
+
+    # INFO - G.M - 2018-12-11 - new workspace does not need any increment.
+    # An sql update is used to avoid lost increment with concurrent
+    # transactions.
+    increment_workspaces_content_tree_generation(
+        session,
+        [
+            workspace.workspace_id for workspace in workspaces
+            if workspace is not None and inspect(workspace).has_identity
+        ],
+    )
+
+
+def increment_workspaces_content_tree_generation(
+        session: Session,
+        workspace_ids: typing.Iterable[int],
+) -> None:
+    """
+    Increment content_tree_generation of given workspaces. Must be called
+    by code changing content paths with sql statements instead of new
+    revisions, as update_workspace_content_tree_generation() does not see
+    them.
+    """
+    workspace_ids = set(workspace_ids)
+    if not workspace_ids:
+        return
+    workspace_table = Workspace.__table__
+    session.execute(
+        workspace_table.update()
+        .where(workspace_table.c.workspace_id.in_(workspace_ids))
+        .values(
+            content_tree_generation=workspace_table.c.content_tree_generation + 1  # nopep8
+        )
+    )
+    for workspace_id in workspace_ids:
+        workspace = session.identity_map.get(
+            session.identity_key(Workspace, workspace_id)
+        )
+        if workspace is not None:
+            session.expire(workspace, ['content_tree_generation'])
+
+
 class RevisionsIntegrity(object):
     """
     Simple static used class to manage a list with list of ContentRevisionRO
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+import re
+import typing
+import unicodedata
+import weakref
+from collections import Counter
+
+from bs4 import BeautifulSoup
+from sqlalchemy import Column
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.engine import Connectable
+from sqlalchemy.event import listen
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.unitofwork import UOWTransaction
+from sqlalchemy.sql import Alias
+from sqlalchemy.types import Float
+from sqlalchemy.types import Integer
+from sqlalchemy.types import Unicode
+
+from tracim_backend.models.data import Content
+from tracim_backend.models.data import ContentRevisionRO
+from tracim_backend.models.meta import DeclarativeBase
+
+SEARCH_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+SEARCH_TERM_MAX_LENGTH = 64
+# INFO - G.M - 2018-12-21 - label matches are worth more than description
+# matches for ranking.
+LABEL_SEARCH_WEIGHT = 10
+DESCRIPTION_SEARCH_WEIGHT = 1
+REINDEX_BATCH_SIZE = 500
+
+# (content_id, label, description as raw text)
+ContentSearchDocument = typing.Tuple[int, str, str]
+
+
+class ContentSearchTerm(DeclarativeBase):
+    """
+    Inverted index of contents current revision: one row by term of content
+    label or description. Used by PythonContentSearchIndex, the search
+    index of databases without full-text search support.
+    """
+
+    __tablename__ = 'content_search_terms'
+
+    term = Column(Unicode(SEARCH_TERM_MAX_LENGTH), primary_key=True)
+    content_id = Column(Integer, ForeignKey('content.id'), primary_key=True)
+    weight = Column(Integer, unique=False, nullable=False, default=0)
+
+
+Index('idx__content_search_terms__content_id', ContentSearchTerm.content_id)
+
+
+def get_search_terms(text_: typing.Optional[str]) -> typing.List[str]:
+    """
+    Split text into search terms: lower case words without diacritics, so
+    that every search index match the same way.
+    """
+    if not text_:
+        return []
+    text_ = unicodedata.normalize('NFKD', text_.lower())
+    text_ = ''.join(char for char in text_ if not unicodedata.combining(char))
+    return [
+        term[:SEARCH_TERM_MAX_LENGTH]
+        for term in SEARCH_TERM_PATTERN.findall(text_)
+    ]
+
+
+def get_raw_text(html: typing.Optional[str]) -> str:
+    if not html:
+        return ''
+    if '<' not in html:
+        return html
+    # 'html.parser' fixes a hanging bug, see
+    # Content.description_as_raw_text()
+    return BeautifulSoup(html, 'html.parser').get_text(' ')
+
+
+class ContentSearchIndex(object):
+    """
+    Full-text index of contents current revision label and description.
+    Index is updated when revisions are inserted (see
+    update_content_search_index) and queried by ContentApi.search().
+    """
+
+    @classmethod
+    def is_available(cls, connection: Connectable) -> bool:
+        raise NotImplementedError()
+
+    def create_storage(self, connection: Connectable) -> None:
+        """
+        Create index storage not declared in models metadata.
+        """
+        pass
+
+    def drop_storage(self, connection: Connectable) -> None:
+        pass
+
+    def index_contents(
+            self,
+            connection: Connectable,
+            documents: typing.List[ContentSearchDocument],
+    ) -> None:
+        """
+        Replace indexed text of given contents.
+        """
+        raise NotImplementedError()
+
+    def get_matches(self, terms: typing.List[str]) -> Alias:
+        """
+        :param terms: search terms (see get_search_terms), content matches
+        if one of its words starts with one of terms
+        :return: selectable of content_id and rank (greater is better) of
+        matching contents
+        """
+        raise NotImplementedError()
+
+
+class PostgresqlContentSearchIndex(ContentSearchIndex):
+    """
+    Weighted tsvector of each content with a GIN index.
+    """
+
+    @classmethod
+    def is_available(cls, connection: Connectable) -> bool:
+        return connection.dialect.name == 'postgresql'
+
+    def create_storage(self, connection: Connectable) -> None:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS content_search_vectors ('
+            'content_id INTEGER NOT NULL PRIMARY KEY REFERENCES content (id), '
+            'search_vector TSVECTOR NOT NULL)'
+        )
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS '
+            'idx__content_search_vectors__search_vector '
+            'ON content_search_vectors USING gin (search_vector)'
+        )
+
+    def drop_storage(self, connection: Connectable) -> None:
+        connection.execute('DROP TABLE IF EXISTS content_search_vectors')
+
+    def index_contents(
+            self,
+            connection: Connectable,
+            documents: typing.List[ContentSearchDocument],
+    ) -> None:
+        if not documents:
+            return
+        connection.execute(
+            text(
+                'DELETE FROM content_search_vectors '
+                'WHERE content_id IN :content_ids'
+            ).bindparams(bindparam('content_ids', expanding=True)),
+            {'content_ids': [document[0] for document in documents]},
+        )
+        connection.execute(
+            text(
+                'INSERT INTO content_search_vectors '
+                '(content_id, search_vector) VALUES (:content_id, '
+                "setweight(to_tsvector('simple', :label), 'A') || "
+                "setweight(to_tsvector('simple', :description), 'B'))"
+            ),
+            [
+                {
+                    'content_id': content_id,
+                    'label': ' '.join(get_search_terms(label)),
+                    'description': ' '.join(get_search_terms(description)),
+                }
+                for content_id, label, description in documents
+            ],
+        )
+
+    def get_matches(self, terms: typing.List[str]) -> Alias:
+        return text(
+            'SELECT content_id, '
+            "ts_rank(search_vector, to_tsquery('simple', :ts_query)) AS rank "
+            'FROM content_search_vectors '
+            "WHERE search_vector @@ to_tsquery('simple', :ts_query)"
+        ).bindparams(
+            ts_query=' | '.join('{}:*'.format(term) for term in terms),
+        ).columns(
+            content_id=Integer,
+            rank=Float,
+        ).alias('content_search_matches')
+
+
+class SqliteContentSearchIndex(ContentSearchIndex):
+    """
+    FTS5 virtual table, content_id is the rowid of table.
+    """
+
+    @classmethod
+    def is_available(cls, connection: Connectable) -> bool:
+        if connection.dialect.name != 'sqlite':
+            return False
+        compile_options = [
+            row[0] for row in connection.execute('PRAGMA compile_options')
+        ]
+        return 'ENABLE_FTS5' in compile_options
+
+    def create_storage(self, connection: Connectable) -> None:
+        connection.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS content_search_fts '
+            "USING fts5(label, description, tokenize='unicode61')"
+        )
+
+    def drop_storage(self, connection: Connectable) -> None:
+        connection.execute('DROP TABLE IF EXISTS content_search_fts')
+
+    def index_contents(
+            self,
+            connection: Connectable,
+            documents: typing.List[ContentSearchDocument],
+    ) -> None:
+        if not documents:
+            return
+        connection.execute(
+            text(
+                'DELETE FROM content_search_fts WHERE rowid IN :content_ids'
+            ).bindparams(bindparam('content_ids', expanding=True)),
+            {'content_ids': [document[0] for document in documents]},
+        )
+        connection.execute(
+            text(
+                'INSERT INTO content_search_fts (rowid, label, description) '
+                'VALUES (:content_id, :label, :description)'
+            ),
+            [
+                {
+                    'content_id': content_id,
+                    'label': ' '.join(get_search_terms(label)),
+                    'description': ' '.join(get_search_terms(description)),
+                }
+                for content_id, label, description in documents
+            ],
+        )
+
+    def get_matches(self, terms: typing.List[str]) -> Alias:
+        # INFO - G.M - 2018-12-21 - bm25() is lower for better matches.
+        return text(
+            'SELECT rowid AS content_id, '
+            '-bm25(content_search_fts, {}, {}) AS rank '
+            'FROM content_search_fts '
+            'WHERE content_search_fts MATCH :fts_query'.format(
+                float(LABEL_SEARCH_WEIGHT),
+                float(DESCRIPTION_SEARCH_WEIGHT),
+            )
+        ).bindparams(
+            fts_query=' OR '.join('"{}"*'.format(term) for term in terms),
+        ).columns(
+            content_id=Integer,
+            rank=Float,
+        ).alias('content_search_matches')
+
+
+class PythonContentSearchIndex(ContentSearchIndex):
+    """
+    Inverted index computed in python and stored in content_search_terms
+    table, available with any database.
+    """
+
+    @classmethod
+    def is_available(cls, connection: Connectable) -> bool:
+        return True
+
+    def index_contents(
+            self,
+            connection: Connectable,
+            documents: typing.List[ContentSearchDocument],
+    ) -> None:
+        if not documents:
+            return
+        term_table = ContentSearchTerm.__table__
+        connection.execute(
+            term_table.delete().where(
+                term_table.c.content_id.in_(
+                    [document[0] for document in documents]
+                )
+            )
+        )
+        term_rows = []
+        for content_id, label, description in documents:
+            weights = Counter()  # type: typing.Dict[str, int]
+            for term in get_search_terms(label):
+                weights[term] += LABEL_SEARCH_WEIGHT
+            for term in get_search_terms(description):
+                weights[term] += DESCRIPTION_SEARCH_WEIGHT
+            term_rows.extend(
+                {'term': term, 'content_id': content_id, 'weight': weight}
+                for term, weight in weights.items()
+            )
+        if term_rows:
+            connection.execute(term_table.insert(), term_rows)
+
+    def get_matches(self, terms: typing.List[str]) -> Alias:
+        term_table = ContentSearchTerm.__table__
+        return select([
+            term_table.c.content_id,
+            func.sum(term_table.c.weight).label('rank'),
+        ]).where(
+            or_(*[
+                # INFO - G.M - 2018-12-21 - prefix match as a range of
+                # terms, so that term index is used (LIKE can't use it with
+                # case insensitive databases).
+                and_(
+                    term_table.c.term >= term,
+                    term_table.c.term < term[:-1] + chr(ord(term[-1]) + 1),
+                )
+                for term in terms
+            ])
+        ).group_by(
+            term_table.c.content_id,
+        ).alias('content_search_matches')
+
+
+# INFO - G.M - 2018-12-21 - First available index is used: add index
+# classes here to support other databases.
+CONTENT_SEARCH_INDEX_CLASSES = [
+    PostgresqlContentSearchIndex,
+    SqliteContentSearchIndex,
+    PythonContentSearchIndex,
+]  # type: typing.List[typing.Type[ContentSearchIndex]]
+_content_search_index_by_dialect = weakref.WeakKeyDictionary()  # type: typing.MutableMapping[typing.Any, ContentSearchIndex]  # nopep8
+
+
+def get_content_search_index(connection: Connectable) -> ContentSearchIndex:
+    """
+    Return search index used with database of connection.
+    """
+    dialect = connection.dialect
+    if dialect not in _content_search_index_by_dialect:
+        for index_class in CONTENT_SEARCH_INDEX_CLASSES:
+            if index_class.is_available(connection):
+                _content_search_index_by_dialect[dialect] = index_class()
+                break
+    return _content_search_index_by_dialect[dialect]
+
+
+def reindex_contents(session: Session, content_ids: typing.List[int]) -> None:
+    """
+    Index current revision of given contents, for revisions inserted with
+    sql statements instead of orm objects (which are indexed by
+    update_content_search_index).
+    """
+    connection = session.connection()
+    search_index = get_content_search_index(connection)
+    for batch_start in range(0, len(content_ids), REINDEX_BATCH_SIZE):
+        batch_ids = content_ids[batch_start:batch_start + REINDEX_BATCH_SIZE]
+        rows = session.query(
+            Content.id,
+            ContentRevisionRO.label,
+            ContentRevisionRO.description,
+        ).join(
+            ContentRevisionRO,
+            and_(
+                Content.id == ContentRevisionRO.content_id,
+                Content.cached_revision_id == ContentRevisionRO.revision_id,
+            )
+        ).filter(Content.id.in_(batch_ids))
+        search_index.index_contents(
+            connection,
+            [
+                (content_id, label, get_raw_text(description))
+                for content_id, label, description in rows
+            ],
+        )
+
+
+def update_content_search_index(
+        session: Session,
+        flush_context: UOWTransaction,
+) -> None:
+    """
+    Index label and description of flushed new revisions: new revision is
+    always the current revision of its content.
+    """
+    last_revisions = {}  # type: typing.Dict[int, ContentRevisionRO]
+    for instance in session.new:
+        if not isinstance(instance, ContentRevisionRO):
+            continue
+        last_revision = last_revisions.get(instance.content_id)
+        if not last_revision \
+                or last_revision.revision_id < instance.revision_id:
+            last_revisions[instance.content_id] = instance
+    if not last_revisions:
+        return
+    connection = session.connection()
+    get_content_search_index(connection).index_contents(
+        connection,
+        [
+            (
+                revision.content_id,
+                revision.label,
+                get_raw_text(revision.description),
+            )
+            for revision in last_revisions.values()
+        ],
+    )
+
+
+def _create_content_search_index_storage(target, connection, **kw) -> None:
+    get_content_search_index(connection).create_storage(connection)
+
+
+def _drop_content_search_index_storage(target, connection, **kw) -> None:
+    get_content_search_index(connection).drop_storage(connection)
+
+
+listen(
+    ContentSearchTerm.__table__,
+    'after_create',
+    _create_content_search_index_storage,
+)
+listen(
+    ContentSearchTerm.__table__,
+    'before_drop',
+    _drop_content_search_index_storage,
+)
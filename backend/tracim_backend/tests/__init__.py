@@ -11,6 +11,10 @@ from pyramid import testing
 from sqlalchemy.exc import IntegrityError
 
 from tracim_backend.lib.core.content import ContentApi
+from tracim_backend.lib.core.content import preview_metadata_cache
+from tracim_backend.lib.core.user import credential_cache
+from tracim_backend.lib.webdav.dav_provider import content_path_cache
+from tracim_backend.lib.webdav.resources import designed_content_cache
 from tracim_backend.lib.core.workspace import WorkspaceApi
 from tracim_backend.models import get_engine
 from tracim_backend.models import DeclarativeBase
@@ -87,6 +91,10 @@ class FunctionalTest(unittest.TestCase):
     def setUp(self) -> None:
         self._set_logger()
         DepotManager._clear()
+        preview_metadata_cache.clear()
+        content_path_cache.clear()
+        designed_content_cache.clear()
+        credential_cache.clear()
         settings = plaster.get_settings(
             self.config_uri,
             self.config_section
@@ -230,6 +238,10 @@ class BaseTest(unittest.TestCase):
         DepotManager.configure(
             'test', {'depot.backend': 'depot.io.memory.MemoryFileStorage'}
         )
+        preview_metadata_cache.clear()
+        content_path_cache.clear()
+        designed_content_cache.clear()
+        credential_cache.clear()
         settings = self.config.get_settings()
         self.app_config = CFG(settings)
         from tracim_backend.models import (
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import typing
+from unittest.mock import patch
 from urllib.parse import quote
 
 import transaction
@@ -3195,6 +3197,157 @@ class TestFiles(FunctionalTest):
         assert res.content_type == 'text/plain'
         assert res.content_length == len(b'Test file')
 
+    def test_api__get_file_raw__ok_206__range_request(self) -> None:
+        """
+        Get part of one file of a content with http range header
+        """
+        dbsession = get_tm_session(self.session_factory, transaction.manager)
+        admin = dbsession.query(models.User) \
+            .filter(models.User.email == 'admin@admin.admin') \
+            .one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        content_api = ContentApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        business_workspace = workspace_api.get_one(1)
+        tool_folder = content_api.get_one(1, content_type=content_type_list.Any_SLUG)
+        test_file = content_api.create(
+            content_type_slug=content_type_list.File.slug,
+            workspace=business_workspace,
+            parent=tool_folder,
+            label='Test file',
+            do_save=False,
+            do_notify=False,
+        )
+        with new_revision(
+            session=dbsession,
+            tm=transaction.manager,
+            content=test_file,
+        ):
+            content_api.update_file_data(
+                test_file,
+                new_content=b'Test file',
+                new_filename='Test_file.txt',
+                new_mimetype='text/plain',
+            )
+            content_api.update_content(test_file, 'Test_file', '<p>description</p>')  # nopep8
+        dbsession.flush()
+        transaction.commit()
+        content_id = int(test_file.content_id)
+        revision_id = int(test_file.revision_id)
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'admin@admin.admin',
+                'admin@admin.admin'
+            )
+        )
+        filename = 'Test_file.txt'
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/raw/{}'.format(content_id, filename),
+            status=206,
+            headers={'Range': 'bytes=5-8'},
+        )
+        assert res.body == b'file'
+        assert res.content_length == len(b'file')
+        assert res.headers['Content-Range'] == 'bytes 5-8/9'
+        assert res.headers['Accept-Ranges'] == 'bytes'
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/revisions/{}/raw/{}'.format(
+                content_id,
+                revision_id,
+                filename,
+            ),
+            status=206,
+            headers={'Range': 'bytes=0-3'},
+        )
+        assert res.body == b'Test'
+        assert res.headers['Content-Range'] == 'bytes 0-3/9'
+
+    def test_api__get_file_raw__ok_304__conditional_request(self) -> None:
+        """
+        Get one file of a content with conditional request headers
+        """
+        dbsession = get_tm_session(self.session_factory, transaction.manager)
+        admin = dbsession.query(models.User) \
+            .filter(models.User.email == 'admin@admin.admin') \
+            .one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        content_api = ContentApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        business_workspace = workspace_api.get_one(1)
+        tool_folder = content_api.get_one(1, content_type=content_type_list.Any_SLUG)
+        test_file = content_api.create(
+            content_type_slug=content_type_list.File.slug,
+            workspace=business_workspace,
+            parent=tool_folder,
+            label='Test file',
+            do_save=False,
+            do_notify=False,
+        )
+        with new_revision(
+            session=dbsession,
+            tm=transaction.manager,
+            content=test_file,
+        ):
+            content_api.update_file_data(
+                test_file,
+                new_content=b'Test file',
+                new_filename='Test_file.txt',
+                new_mimetype='text/plain',
+            )
+            content_api.update_content(test_file, 'Test_file', '<p>description</p>')  # nopep8
+        dbsession.flush()
+        transaction.commit()
+        content_id = int(test_file.content_id)
+        revision_id = int(test_file.revision_id)
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'admin@admin.admin',
+                'admin@admin.admin'
+            )
+        )
+        filename = 'Test_file.txt'
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/raw/{}'.format(content_id, filename),
+            status=200,
+        )
+        etag = res.headers['ETag']
+        last_modified = res.headers['Last-Modified']
+        assert etag == '"revision-{}"'.format(revision_id)
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/raw/{}'.format(content_id, filename),
+            status=304,
+            headers={'If-None-Match': etag},
+        )
+        assert res.body == b''
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/raw/{}'.format(content_id, filename),
+            status=304,
+            headers={'If-Modified-Since': last_modified},
+        )
+        assert res.body == b''
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/raw/{}'.format(content_id, filename),
+            status=200,
+            headers={'If-None-Match': '"revision-0"'},
+        )
+        assert res.body == b'Test file'
+
     def test_api__create_file__ok__200__nominal_case(self) -> None:
         """
         create one file of a content at workspace root
@@ -5318,6 +5471,99 @@ class TestFiles(FunctionalTest):
         assert res.content_type == 'application/pdf'
 
 
+class TestFilesPreviewInBackground(FunctionalTest):
+    """
+    Tests for /api/v2/workspaces/{workspace_id}/files/{content_id}/preview
+    endpoints when previews are generated in background
+    """
+    fixtures = [BaseFixture, ContentFixtures]
+
+    def override_settings(self, settings: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:  # nopep8
+        settings['preview.processing_mode'] = 'local'
+        return settings
+
+    def test_api__get_jpeg_preview__ok__202__preview_not_ready(self) -> None:
+        dbsession = get_tm_session(self.session_factory, transaction.manager)
+        admin = dbsession.query(models.User) \
+            .filter(models.User.email == 'admin@admin.admin') \
+            .one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        content_api = ContentApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        business_workspace = workspace_api.get_one(1)
+        tool_folder = content_api.get_one(1, content_type=content_type_list.Any_SLUG)  # nopep8
+        test_file = content_api.create(
+            content_type_slug=content_type_list.File.slug,
+            workspace=business_workspace,
+            parent=tool_folder,
+            label='Test file',
+            do_save=False,
+            do_notify=False,
+        )
+        test_file.file_extension = '.txt'
+        test_file.depot_file = FileIntent(
+            b'Test file',
+            'Test_file.txt',
+            'text/plain',
+        )
+        dbsession.flush()
+        transaction.commit()
+        content_id = int(test_file.content_id)
+        image = create_1000px_png_test_image()
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'admin@admin.admin',
+                'admin@admin.admin'
+            )
+        )
+        with patch(
+            'tracim_backend.lib.preview.generator.local_preview_queue'
+        ) as local_preview_queue:
+            self.testapp.put(
+                '/api/v2/workspaces/1/files/{}/raw/{}'.format(content_id, image.name),  # nopep8
+                upload_files=[
+                    ('files', image.name, image.getvalue())
+                ],
+                status=204,
+            )
+            assert local_preview_queue.enqueue_revision.call_count == 1
+            res = self.testapp.get(
+                '/api/v2/workspaces/1/files/{}/preview/jpg/'.format(content_id),  # nopep8
+                status=202
+            )
+            assert isinstance(res.json, dict)
+            assert 'code' in res.json.keys()
+            assert res.json_body['code'] == error.PREVIEW_NOT_READY
+
+        # INFO - G.M - 2018-12-11 - Generate previews like preview generator
+        # would do.
+        dbsession = get_tm_session(self.session_factory, transaction.manager)
+        content_api = ContentApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config
+        )
+        test_file = content_api.get_one(content_id, content_type=content_type_list.Any_SLUG)  # nopep8
+        content_api.generate_revision_previews(test_file.revision)
+        dbsession.flush()
+        transaction.commit()
+
+        res = self.testapp.get(
+            '/api/v2/workspaces/1/files/{}/preview/jpg/'.format(content_id),
+            status=200
+        )
+        assert res.body != image.getvalue()
+        assert res.content_type == 'image/jpeg'
+
+
 class TestThreads(FunctionalTest):
     """
     Tests for /api/v2/workspaces/{workspace_id}/threads/{content_id}
@@ -5734,6 +5980,43 @@ class TestThreads(FunctionalTest):
         assert revision['file_extension'] == '.thread.html'
         assert revision['filename'] == 'Best Cakes?.thread.html'
 
+    def test_api__get_thread_revisions__ok_200__paginated(
+            self
+    ) -> None:
+        """
+        Get threads revisions page by page
+        """
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'admin@admin.admin',
+                'admin@admin.admin'
+            )
+        )
+        res = self.testapp.get(
+            '/api/v2/workspaces/2/threads/7/revisions?limit=1',
+            status=200
+        )
+        revisions = res.json_body
+        assert len(revisions) == 1
+        assert revisions[0]['revision_id'] == 8
+        assert revisions[0]['comment_ids'] == [18, 19, 20]
+        assert revisions[0]['is_editable'] is False
+        res = self.testapp.get(
+            '/api/v2/workspaces/2/threads/7/revisions?limit=1&after_revision_id=8',  # nopep8
+            status=200
+        )
+        revisions = res.json_body
+        assert len(revisions) == 1
+        assert revisions[0]['revision_id'] == 26
+        assert revisions[0]['comment_ids'] == []
+        assert revisions[0]['is_editable'] is True
+        res = self.testapp.get(
+            '/api/v2/workspaces/2/threads/7/revisions?limit=1&after_revision_id=26',  # nopep8
+            status=200
+        )
+        assert res.json_body == []
+
     def test_api__get_thread_revisions__ok_200__most_revision_type(self) -> None:
         """
         get threads revisions
@@ -668,6 +668,187 @@ class TestUserRecentlyActiveContentEndpoint(FunctionalTest):
         assert res.json_body['code'] == error.CONTENT_NOT_FOUND
 
 
+class TestUserSearchContentEndpoint(FunctionalTest):
+    """
+    Tests for /api/v2/users/{user_id}/contents/search
+    """
+    fixtures = [BaseFixture]
+
+    def test_api__search_content__ok__200__ranked_and_paginated(self):
+        dbsession = get_tm_session(self.session_factory, transaction.manager)
+        admin = dbsession.query(models.User) \
+            .filter(models.User.email == 'admin@admin.admin') \
+            .one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        ).create_workspace(
+            'test workspace',
+            save_now=True
+        )
+        other_workspace = WorkspaceApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        ).create_workspace(
+            'other workspace',
+            save_now=True
+        )
+        uapi = UserApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        )
+        gapi = GroupApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        )
+        groups = [gapi.get_one_with_name('users')]
+        test_user = uapi.create_user(
+            email='test@test.test',
+            password='password',
+            name='bob',
+            groups=groups,
+            timezone='Europe/Paris',
+            lang='fr',
+            do_save=True,
+            do_notify=False,
+        )
+        rapi = RoleApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        )
+        rapi.create_one(test_user, workspace, UserRoleInWorkspace.READER, False)  # nopep8
+        api = ContentApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        )
+        folder = api.create(content_type_list.Folder.slug, workspace, None, 'folder', '', True)  # nopep8
+        other_folder = api.create(content_type_list.Folder.slug, other_workspace, None, 'folder', '', True)  # nopep8
+        described_page = api.create(content_type_list.Page.slug, workspace, folder, 'meeting', '', True)  # nopep8
+        with new_revision(
+            session=dbsession,
+            tm=transaction.manager,
+            content=described_page,
+        ):
+            described_page.description = '<p>Intervention reports</p>'
+        api.save(described_page)
+        labelled_page = api.create(content_type_list.Page.slug, workspace, folder, 'intervention report', '', True)  # nopep8
+        api.create(content_type_list.Page.slug, other_workspace, other_folder, 'intervention report', '', True)  # nopep8
+        dbsession.flush()
+        transaction.commit()
+
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'test@test.test',
+                'password'
+            )
+        )
+        res = self.testapp.get(
+            '/api/v2/users/{}/contents/search'.format(test_user.user_id),
+            params={'keywords': 'interv'},
+            status=200,
+        )
+        # INFO - G.M - 2018-12-21 - label matches first, content of
+        # workspace of which user is not member is not returned.
+        assert [content['content_id'] for content in res.json_body] == [
+            labelled_page.content_id,
+            described_page.content_id,
+        ]
+        assert res.json_body[0]['label'] == 'intervention report'
+
+        res = self.testapp.get(
+            '/api/v2/users/{}/contents/search'.format(test_user.user_id),
+            params={'keywords': 'intervention,report', 'limit': 1, 'offset': 1},  # nopep8
+            status=200,
+        )
+        assert [content['content_id'] for content in res.json_body] == [
+            described_page.content_id,
+        ]
+
+        res = self.testapp.get(
+            '/api/v2/users/{}/contents/search'.format(test_user.user_id),
+            params={'keywords': 'unknown'},
+            status=200,
+        )
+        assert res.json_body == []
+
+    def test_api__search_content__ok__200__root_and_unavailable_folders(self):
+        dbsession = get_tm_session(self.session_factory, transaction.manager)
+        admin = dbsession.query(models.User) \
+            .filter(models.User.email == 'admin@admin.admin') \
+            .one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        ).create_workspace(
+            'test workspace',
+            save_now=True
+        )
+        api = ContentApi(
+            current_user=admin,
+            session=dbsession,
+            config=self.app_config,
+        )
+        root_page = api.create(content_type_list.Page.slug, workspace, None, 'report at root', '', True)  # nopep8
+        deleted_folder = api.create(content_type_list.Folder.slug, workspace, None, 'deleted', '', True)  # nopep8
+        archived_folder = api.create(content_type_list.Folder.slug, workspace, None, 'archived', '', True)  # nopep8
+        subfolder = api.create(content_type_list.Folder.slug, workspace, archived_folder, 'subfolder', '', True)  # nopep8
+        api.create(content_type_list.Page.slug, workspace, deleted_folder, 'report in deleted folder', '', True)  # nopep8
+        api.create(content_type_list.Page.slug, workspace, subfolder, 'report in archived folder', '', True)  # nopep8
+        with new_revision(
+            session=dbsession,
+            tm=transaction.manager,
+            content=deleted_folder,
+        ):
+            api.delete(deleted_folder)
+        with new_revision(
+            session=dbsession,
+            tm=transaction.manager,
+            content=archived_folder,
+        ):
+            api.archive(archived_folder)
+        dbsession.flush()
+        transaction.commit()
+
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'admin@admin.admin',
+                'admin@admin.admin'
+            )
+        )
+        res = self.testapp.get(
+            '/api/v2/users/{}/contents/search'.format(admin.user_id),
+            params={'keywords': 'report'},
+            status=200,
+        )
+        # INFO - G.M - 2018-12-27 - content at workspace root is returned,
+        # contents in (sub)folders of deleted or archived folders are not.
+        assert [content['content_id'] for content in res.json_body] == [
+            root_page.content_id,
+        ]
+
+    def test_api__search_content__err_400__no_keywords(self):
+        self.testapp.authorization = (
+            'Basic',
+            (
+                'admin@admin.admin',
+                'admin@admin.admin'
+            )
+        )
+        self.testapp.get(
+            '/api/v2/users/1/contents/search',
+            status=400,
+        )
+
+
 class TestUserReadStatusEndpoint(FunctionalTest):
     """
     Tests for /api/v2/users/{user_id}/workspaces/{workspace_id}/contents/read_status # nopep8
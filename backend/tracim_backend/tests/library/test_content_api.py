@@ -1,32 +1,47 @@
 # -*- coding: utf-8 -*-
+import pickle
+import typing
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+from unittest.mock import PropertyMock
+from unittest.mock import patch
+
 import pytest
 import transaction
+from sqlalchemy import event
+from sqlalchemy import inspect
 
 from tracim_backend.app_models.contents import content_status_list
 from tracim_backend.app_models.contents import content_type_list
 from tracim_backend.exceptions import ContentInNotEditableState
 from tracim_backend.exceptions import ContentFilenameAlreadyUsedInFolder
 from tracim_backend.exceptions import EmptyLabelNotAllowed
+from tracim_backend.exceptions import PreviewNotReady
 from tracim_backend.exceptions import SameValueError
 from tracim_backend.exceptions import UnallowedSubContent
 from tracim_backend.fixtures.users_and_groups import Test as FixtureTest
 from tracim_backend.lib.core.content import ContentApi
+from tracim_backend.lib.core.content import preview_metadata_cache
 from tracim_backend.lib.core.content import \
     compare_content_for_sorting_by_type_and_name  # nopep8
 # TODO - G.M - 28-03-2018 - [GroupApi] Re-enable GroupApi
+from tracim_backend.lib.core.content_tree import ContentTreeOperationRunner  # nopep8
 from tracim_backend.lib.core.group import GroupApi
 from tracim_backend.lib.core.user import UserApi
 # TODO - G.M - 28-03-2018 - [WorkspaceApi] Re-enable WorkspaceApi
 # TODO - G.M - 28-03-2018 - [RoleApi] Re-enable RoleApi
 from tracim_backend.lib.core.workspace import RoleApi
 from tracim_backend.lib.core.workspace import WorkspaceApi
+from tracim_backend.models import get_tm_session
 from tracim_backend.models.auth import Group
 from tracim_backend.models.auth import User
 from tracim_backend.models.data import ActionDescription
 from tracim_backend.models.data import Content
 from tracim_backend.models.data import ContentRevisionRO
+from tracim_backend.models.data import RevisionPreviewMetadata
 from tracim_backend.models.data import UserRoleInWorkspace
 from tracim_backend.models.data import Workspace
+from tracim_backend.models.depot import DepotBlob
 from tracim_backend.models.revision_protection import new_revision
 from tracim_backend.tests import DefaultTest
 from tracim_backend.tests import eq_
@@ -1236,7 +1251,8 @@ class TestContentApi(DefaultTest):
         assert text_file_copy.content_id != text_file.content_id
         assert text_file_copy.workspace_id == workspace2.workspace_id
         assert text_file_copy.depot_file.file.read() == text_file.depot_file.file.read()   # nopep8
-        assert text_file_copy.depot_file.path != text_file.depot_file.path
+        # INFO - G.M - 2018-12-14 - copy share file of original content
+        assert text_file_copy.depot_file.path == text_file.depot_file.path
         assert text_file_copy.label == 'test_file_copy'
         assert text_file_copy.type == text_file.type
         assert text_file_copy.parent.content_id == folderb.content_id
@@ -1355,7 +1371,8 @@ class TestContentApi(DefaultTest):
         assert text_file_copy.content_id != text_file.content_id
         assert text_file_copy.workspace_id == workspace2.workspace_id
         assert text_file_copy.depot_file.file.read() == text_file.depot_file.file.read()  # nopep8
-        assert text_file_copy.depot_file.path != text_file.depot_file.path
+        # INFO - G.M - 2018-12-14 - copy share file of original content
+        assert text_file_copy.depot_file.path == text_file.depot_file.path
         assert text_file_copy.label == text_file.label
         assert text_file_copy.type == text_file.type
         assert text_file_copy.parent.content_id == folderb.content_id
@@ -1461,7 +1478,8 @@ class TestContentApi(DefaultTest):
         assert text_file_copy.content_id != text_file.content_id
         assert text_file_copy.workspace_id == workspace.workspace_id
         assert text_file_copy.depot_file.file.read() == text_file.depot_file.file.read()  # nopep8
-        assert text_file_copy.depot_file.path != text_file.depot_file.path
+        # INFO - G.M - 2018-12-14 - copy share file of original content
+        assert text_file_copy.depot_file.path == text_file.depot_file.path
         assert text_file_copy.label == 'test_file_copy'
         assert text_file_copy.type == text_file.type
         assert text_file_copy.parent.content_id == foldera.content_id
@@ -1574,7 +1592,977 @@ class TestContentApi(DefaultTest):
         # file has no changed
         assert new_already_exist.content_id == already_exist.content_id
 
-    def test_mark_read__workspace(self):
+    def _create_content_tree(
+            self,
+            api: ContentApi,
+            workspace: Workspace,
+            parent: Content=None,
+    ) -> typing.Tuple[Content, Content, Content, Content]:
+        """
+        Create folder a > subfolder > file (2 revisions) > comment.
+        """
+        foldera = api.create(
+            content_type_list.Folder.slug,
+            workspace,
+            parent,
+            'folder a',
+            '',
+            True
+        )
+        subfolder = api.create(
+            content_type_list.Folder.slug,
+            workspace,
+            foldera,
+            'subfolder',
+            '',
+            True
+        )
+        with self.session.no_autoflush:
+            text_file = api.create(
+                content_type_slug=content_type_list.File.slug,
+                workspace=workspace,
+                parent=subfolder,
+                label='test_file',
+                do_save=False,
+            )
+            api.update_file_data(
+                text_file,
+                'test_file.txt',
+                'text/plain',
+                b'test_content'
+            )
+        api.save(text_file, ActionDescription.CREATION)
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=text_file,
+        ):
+            api.update_file_data(
+                text_file,
+                'test_file.txt',
+                'text/plain',
+                b'test_content_updated'
+            )
+        api.save(text_file)
+        comment = api.create_comment(
+            workspace,
+            text_file,
+            'a comment',
+            do_save=True,
+        )
+        return foldera, subfolder, text_file, comment
+
+    def test_unit__move_recursively__ok__descendants_moved(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace = workspace_api.create_workspace(
+            'test workspace',
+            save_now=True
+        )
+        workspace2 = workspace_api.create_workspace(
+            'test workspace2',
+            save_now=True
+        )
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        foldera, subfolder, text_file, comment = self._create_content_tree(
+            api,
+            workspace,
+        )
+        file_revisions_count = len(text_file.revisions)
+        file_path = text_file.depot_file.path
+        blob = self.session.query(DepotBlob)\
+            .get(text_file.depot_file['sha256'])
+        ref_count = blob.ref_count
+        generation = workspace2.content_tree_generation
+        assert api.get_descendants_count(foldera) == 3
+
+        api.move_recursively(foldera, None, workspace2)
+        transaction.commit()
+
+        foldera = api.get_one(foldera.content_id, content_type_list.Any_SLUG)
+        subfolder = api.get_one(subfolder.content_id, content_type_list.Any_SLUG)  # nopep8
+        text_file = api.get_one(text_file.content_id, content_type_list.Any_SLUG)  # nopep8
+        comment = api.get_one(comment.content_id, content_type_list.Any_SLUG)
+        for content in (foldera, subfolder, text_file, comment):
+            assert content.workspace_id == workspace2.workspace_id
+            assert content.revision_type == ActionDescription.MOVE
+        assert subfolder.parent_id == foldera.content_id
+        assert text_file.parent_id == subfolder.content_id
+        assert comment.parent_id == text_file.content_id
+        assert len(text_file.revisions) == file_revisions_count + 1
+        assert text_file.revision.revision_id == text_file.cached_revision_id
+        # INFO - G.M - 2018-12-17 - moved file share file of previous revision
+        assert text_file.depot_file.path == file_path
+        assert text_file.depot_file.file.read() == b'test_content_updated'
+        assert self.session.query(DepotBlob)\
+            .get(text_file.depot_file['sha256']).ref_count == ref_count + 1
+        assert workspace2.content_tree_generation > generation
+        assert api.get_read_status_map(admin, [foldera.content_id])[foldera.content_id]  # nopep8
+        assert [
+            content.content_id for content in api.get_all(
+                parent_ids=[subfolder.content_id],
+                workspace=workspace2,
+            )
+        ] == [text_file.content_id]
+
+    def test_unit__move_recursively__ok__without_recursive_cte(self):
+        with patch(
+            'tracim_backend.lib.core.content.has_recursive_cte',
+            return_value=False,
+        ):
+            self.test_unit__move_recursively__ok__descendants_moved()
+
+    def test_unit__copy_children__ok__descendants_copied(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace = workspace_api.create_workspace(
+            'test workspace',
+            save_now=True
+        )
+        workspace2 = workspace_api.create_workspace(
+            'test workspace2',
+            save_now=True
+        )
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        # INFO - G.M - 2018-12-17 - copy() need a parent
+        root_folder = api.create(
+            content_type_list.Folder.slug,
+            workspace,
+            None,
+            'root folder',
+            '',
+            True
+        )
+        foldera, subfolder, text_file, comment = self._create_content_tree(
+            api,
+            workspace,
+            root_folder,
+        )
+        blob = self.session.query(DepotBlob)\
+            .get(text_file.depot_file['sha256'])
+        ref_count = blob.ref_count
+
+        foldera_copy = api.copy(foldera, new_label='folder a copy')
+        api.copy_children(foldera, foldera_copy)
+        folderb = api.create(
+            content_type_list.Folder.slug,
+            workspace2,
+            None,
+            'folder b',
+            '',
+            True
+        )
+        foldera_copy2 = api.copy(foldera, new_parent=folderb)
+        api.copy_children(foldera, foldera_copy2)
+        transaction.commit()
+
+        for folder_copy, copy_workspace in (
+                (foldera_copy, workspace),
+                (foldera_copy2, workspace2),
+        ):
+            assert folder_copy.properties['origin'] == {
+                'content': foldera.content_id,
+                'revision': foldera.revision_id,
+            }
+            subfolder_copy = api.get_one_by_label_and_parent(
+                'subfolder',
+                folder_copy,
+            )
+            text_file_copy = api.get_one_by_label_and_parent(
+                'test_file.txt',
+                subfolder_copy,
+            )
+            comment_copy = api.get_all(
+                parent_ids=[text_file_copy.content_id],
+                content_type=content_type_list.Comment.slug,
+            )[0]
+            for copy, origin in (
+                    (subfolder_copy, subfolder),
+                    (text_file_copy, text_file),
+                    (comment_copy, comment),
+            ):
+                assert copy.content_id != origin.content_id
+                assert copy.workspace_id == copy_workspace.workspace_id
+                assert copy.revision_type == ActionDescription.COPY
+                assert copy.label == origin.label
+                assert copy.description == origin.description
+                assert copy.owner_id == origin.owner_id
+                assert copy.properties['origin'] == {
+                    'content': origin.content_id,
+                    'revision': origin.revision_id,
+                }
+                assert 'origin' not in copy.revisions[-2].properties
+                assert len(copy.revisions) == len(origin.revisions) + 1
+                assert [
+                    revision.revision_type for revision in copy.revisions[:-1]
+                ] == [
+                    revision.revision_type for revision in origin.revisions
+                ]
+            assert text_file_copy.depot_file.path == text_file.depot_file.path
+            assert text_file_copy.revisions[0].depot_file.file.read() \
+                == b'test_content'
+            assert text_file_copy.depot_file.file.read() \
+                == b'test_content_updated'
+            assert comment_copy.parent_id == text_file_copy.content_id
+            assert all(
+                revision.parent_id == subfolder_copy.content_id
+                for revision in text_file_copy.revisions
+            )
+
+        # INFO - G.M - 2018-12-21 - copies are added to search index
+        assert sorted(
+            content.content_id for content in api.search(['comment'])
+        ) == sorted(
+            api.get_all(
+                parent_ids=[text_file.content_id],
+                content_type=content_type_list.Comment.slug,
+            )[0].content_id
+            for text_file in api.search(['test_file'])
+        )
+        assert len(api.search(['test_file']).all()) == 3
+
+        # INFO - G.M - 2018-12-17 - origins are unchanged
+        subfolder = api.get_one(subfolder.content_id, content_type_list.Any_SLUG)  # nopep8
+        assert subfolder.parent_id == foldera.content_id
+        assert subfolder.workspace_id == workspace.workspace_id
+        assert len(api.get_all(parent_ids=[subfolder.content_id])) == 1
+        # INFO - G.M - 2018-12-17 - 2 copies of the revision with updated
+        # file and of its copy revision
+        assert self.session.query(DepotBlob)\
+            .get(text_file.depot_file['sha256']).ref_count == ref_count + 4
+
+    def test_unit__copy_children__ok__copies_mapped_to_their_origin(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        # INFO - G.M - 2018-12-17 - copy() need a parent
+        root_folder = api.create(
+            content_type_list.Folder.slug,
+            workspace,
+            None,
+            'root folder',
+            '',
+            True
+        )
+        foldera, subfolder, text_file, comment = self._create_content_tree(
+            api,
+            workspace,
+            root_folder,
+        )
+        # INFO - G.M - 2018-12-27 - other content pointing to revision of a
+        # copied content (like copies of a pending copy) is not a copy.
+        other_content_id = self.session.execute(
+            Content.__table__.insert().values(
+                cached_revision_id=subfolder.revision_id,
+            )
+        ).inserted_primary_key[0]
+        foldera_copy = api.copy(foldera, new_label='folder a copy')
+        api.copy_children(foldera, foldera_copy)
+        transaction.commit()
+
+        subfolder_copy = api.get_one_by_label_and_parent(
+            'subfolder',
+            foldera_copy,
+        )
+        assert subfolder_copy.content_id != other_content_id
+        assert len(api.get_all(parent_ids=[foldera_copy.content_id])) == 1
+        assert len(api.get_all(parent_ids=[subfolder_copy.content_id])) == 1
+        other_content = self.session.query(Content).get(other_content_id)
+        assert other_content.cached_revision_id == subfolder.revision_id
+        assert self.session.query(ContentRevisionRO)\
+            .filter(ContentRevisionRO.content_id == other_content_id)\
+            .count() == 0
+
+    def test_unit__move_recursively__ok__descendants_moved_in_background(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace = workspace_api.create_workspace(
+            'test workspace',
+            save_now=True
+        )
+        workspace2 = workspace_api.create_workspace(
+            'test workspace2',
+            save_now=True
+        )
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        foldera, subfolder, text_file, comment = self._create_content_tree(
+            api,
+            workspace,
+        )
+        ref_count = self.session.query(DepotBlob)\
+            .get(text_file.depot_file['sha256']).ref_count
+        transaction.commit()
+        self.app_config.CONTENT_TREE_OPERATION_BACKGROUND_THRESHOLD = 2
+        self.app_config.CONTENT_TREE_OPERATION_PROCESSING_MODE = 'ASYNC'
+        try:
+            with patch(
+                'tracim_backend.lib.core.content_tree.get_redis_connection'
+            ), patch(
+                'tracim_backend.lib.core.content_tree.get_rq_queue'
+            ) as get_rq_queue:
+                foldera = api.get_one(foldera.content_id, content_type_list.Any_SLUG)  # nopep8
+                foldera_revision_id = foldera.revision_id
+                api.move_recursively(foldera, None, workspace2)
+                # INFO - G.M - 2018-12-17 - tree is moved only once
+                # transaction is committed
+                assert not get_rq_queue.return_value.enqueue.called
+                transaction.commit()
+                assert get_rq_queue.return_value.enqueue.call_count == 1
+                job_args = get_rq_queue.return_value.enqueue.call_args[0]
+        finally:
+            self.app_config.CONTENT_TREE_OPERATION_BACKGROUND_THRESHOLD = 1000  # nopep8
+            self.app_config.CONTENT_TREE_OPERATION_PROCESSING_MODE = 'SYNC'
+        assert job_args[1:] == (
+            'move_tree',
+            admin.user_id,
+            [foldera.content_id, None],
+            workspace2.workspace_id,
+        )
+        # INFO - G.M - 2018-12-27 - until job is run, folder and its
+        # descendants stay in place.
+        foldera = api.get_one(foldera.content_id, content_type_list.Any_SLUG)  # nopep8
+        assert foldera.revision_id == foldera_revision_id
+        assert foldera.workspace_id == workspace.workspace_id
+        text_file = api.get_one(text_file.content_id, content_type_list.Any_SLUG)  # nopep8
+        assert text_file.workspace_id == workspace.workspace_id
+        # INFO - G.M - 2018-12-27 - job is run by content tree operation
+        # daemon: it must be picklable.
+        assert isinstance(job_args[0].__self__, ContentTreeOperationRunner)
+        pickle.dumps(job_args[0].__self__)
+
+        with patch(
+            'tracim_backend.lib.core.content_tree.get_tm_session',
+            wraps=get_tm_session,
+        ) as get_tm_session_mock:
+            job_args[0](*job_args[1:])
+        assert get_tm_session_mock.call_count == 1
+        self.session.expire_all()
+        for content in (foldera, subfolder, text_file, comment):
+            content = api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+            assert content.workspace_id == workspace2.workspace_id
+            assert content.revision_type == ActionDescription.MOVE
+        # INFO - G.M - 2018-12-27 - moved file share blob of previous
+        # revision
+        assert self.session.query(DepotBlob)\
+            .get(text_file.depot_file['sha256']).ref_count == ref_count + 1
+
+    def test_unit__move_recursively__err__background_failure_rolled_back(self):  # nopep8
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace_api = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace = workspace_api.create_workspace(
+            'test workspace',
+            save_now=True
+        )
+        workspace2 = workspace_api.create_workspace(
+            'test workspace2',
+            save_now=True
+        )
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        foldera, subfolder, text_file, comment = self._create_content_tree(
+            api,
+            workspace,
+        )
+        transaction.commit()
+        runner = ContentTreeOperationRunner(self.app_config, self.engine)
+        job_args = (
+            'move_tree',
+            admin.user_id,
+            [foldera.content_id, None],
+            workspace2.workspace_id,
+        )
+        with patch.object(
+            ContentApi,
+            '_update_cached_revision_ids',
+            side_effect=ValueError('failure'),
+        ):
+            with pytest.raises(ValueError):
+                runner.run(*job_args)
+        # INFO - G.M - 2018-12-27 - failed job is kept by rq and can be
+        # requeued: nothing was done.
+        self.session.expire_all()
+        for content in (foldera, text_file):
+            content = api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+            assert content.workspace_id == workspace.workspace_id
+            assert content.revision_type != ActionDescription.MOVE
+        runner.run(*job_args)
+        self.session.expire_all()
+        for content in (foldera, text_file):
+            content = api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+            assert content.workspace_id == workspace2.workspace_id
+
+    def test_unit__get_revisions_in_context__ok__same_as_revision_in_context(self):  # nopep8
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        thread = api.create(
+            content_type_list.Thread.slug,
+            workspace,
+            None,
+            'thread',
+            do_save=True,
+        )
+        for revision_nb in range(3):
+            for comment_nb in range(revision_nb + 1):
+                api.create_comment(
+                    workspace,
+                    thread,
+                    'comment {}-{}'.format(revision_nb, comment_nb),
+                    do_save=True,
+                )
+            with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=thread,
+            ):
+                api.update_content(thread, 'thread {}'.format(revision_nb))
+            api.save(thread)
+        transaction.commit()
+        thread = api.get_one(thread.content_id, content_type_list.Any_SLUG)
+        expected_revisions = [
+            api.get_revision_in_context(revision)
+            for revision in thread.revisions
+        ]
+        assert len(expected_revisions) == 4
+
+        statements = []
+
+        def count_statement(*args, **kwargs):
+            statements.append(args)
+
+        event.listen(
+            self.session.bind,
+            'before_cursor_execute',
+            count_statement,
+        )
+        try:
+            revisions = api.get_revisions_in_context(thread)
+            statements_count = len(statements)
+            for revision in revisions:
+                revision.comment_ids
+                revision.is_editable
+                revision.author.user_id
+            assert len(statements) == statements_count
+        finally:
+            event.remove(
+                self.session.bind,
+                'before_cursor_execute',
+                count_statement,
+            )
+
+        assert [
+            (
+                revision.revision_id,
+                revision.comment_ids,
+                revision.is_editable,
+                revision.author.user_id,
+            ) for revision in revisions
+        ] == [
+            (
+                revision.revision_id,
+                revision.comment_ids,
+                revision.is_editable,
+                revision.author.user_id,
+            ) for revision in expected_revisions
+        ]
+        assert [len(revision.comment_ids) for revision in revisions] == \
+            [1, 2, 3, 0]
+
+        first_page = api.get_revisions_in_context(thread, limit=3)
+        assert [revision.revision_id for revision in first_page] == \
+            [revision.revision_id for revision in expected_revisions[:3]]
+        assert first_page[-1].comment_ids == expected_revisions[2].comment_ids  # nopep8
+        second_page = api.get_revisions_in_context(
+            thread,
+            limit=3,
+            after_revision_id=first_page[-1].revision_id,
+        )
+        assert [revision.revision_id for revision in second_page] == \
+            [expected_revisions[3].revision_id]
+        assert second_page[0].is_editable is True
+
+    def test_unit__get_revisions_in_context__ok__without_window_functions(self):  # nopep8
+        with patch(
+            'tracim_backend.lib.core.content.has_window_functions',
+            return_value=False,
+        ):
+            self.test_unit__get_revisions_in_context__ok__same_as_revision_in_context()  # nopep8
+
+    def test_unit__get_children__ok__current_revision_only(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+            show_deleted=True,
+        )
+        folder = api.create(
+            content_type_list.Folder.slug,
+            workspace,
+            None,
+            'folder',
+            do_save=True,
+        )
+        other_folder = api.create(
+            content_type_list.Folder.slug,
+            workspace,
+            None,
+            'other folder',
+            do_save=True,
+        )
+        thread = api.create(
+            content_type_list.Thread.slug,
+            workspace,
+            folder,
+            'thread',
+            do_save=True,
+        )
+        comments = [
+            api.create_comment(
+                workspace,
+                thread,
+                'comment {}'.format(comment_nb),
+                do_save=True,
+            )
+            for comment_nb in range(3)
+        ]
+        for comment in comments:
+            with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=comment,
+            ):
+                comment.description = 'updated'
+            api.save(comment)
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=comments[2],
+        ):
+            api.delete(comments[2])
+        api.save(comments[2])
+        page = api.create(
+            content_type_list.Page.slug,
+            workspace,
+            folder,
+            'page',
+            do_save=True,
+        )
+        moved_page = api.create(
+            content_type_list.Page.slug,
+            workspace,
+            folder,
+            'moved page',
+            do_save=True,
+        )
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=moved_page,
+        ):
+            api.move(moved_page, other_folder)
+        api.save(moved_page)
+        transaction.commit()
+
+        folder = api.get_one(folder.content_id, content_type_list.Any_SLUG)
+        thread = api.get_one(thread.content_id, content_type_list.Any_SLUG)
+        # INFO - G.M - 2018-12-20 - content moved elsewhere is not a child
+        # anymore, even if one of its revisions is.
+        assert [child.content_id for child in folder.children] == \
+            [thread.content_id, page.content_id]
+        assert [child.content_id for child in thread.children] == \
+            [comment.content_id for comment in comments]
+        assert [comment.content_id for comment in thread.get_comments()] == \
+            [comment.content_id for comment in comments[:2]]
+        assert [
+            child.content_id for child in folder.get_valid_children(
+                [content_type_list.Page.slug]
+            )
+        ] == [page.content_id]
+        assert folder.get_child_nb(content_type_list.Any_SLUG) == 2
+        assert folder.get_child_nb(content_type_list.Page.slug) == 1
+        assert thread.get_child_nb(content_type_list.Comment.slug, 'open') == 2  # nopep8
+        assert thread.get_last_comment_from(admin).content_id == \
+            comments[1].content_id
+        assert thread.get_simple_last_activity_date() == comments[1].updated
+        assert thread.get_last_activity_date() == comments[2].updated
+        assert other_folder.get_child_nb(content_type_list.Any_SLUG) == 1
+
+        statements = []
+
+        def count_statement(*args, **kwargs):
+            statements.append(args)
+
+        event.listen(
+            self.session.bind,
+            'before_cursor_execute',
+            count_statement,
+        )
+        try:
+            children = api.get_children(
+                [thread.content_id, folder.content_id],
+                only_active=True,
+            )
+            assert len(statements) == 1
+            for child in children:
+                child.current_revision.owner.display_name
+            assert len(statements) == 1
+        finally:
+            event.remove(
+                self.session.bind,
+                'before_cursor_execute',
+                count_statement,
+            )
+        assert [child.content_id for child in children] == [
+            thread.content_id,
+            comments[0].content_id,
+            comments[1].content_id,
+            page.content_id,
+        ]
+        children = api.get_children(
+            [thread.content_id],
+            content_types=[content_type_list.Comment.slug],
+            order_by_properties=[Content.created, Content.id],
+        )
+        assert [child.content_id for child in children] == \
+            [comment.content_id for comment in comments]
+        assert api.get_children(
+            [folder.content_id],
+            content_statuses=['closed-validated'],
+        ) == []
+
+    def test_mark_read__workspace(self):
+        uapi = UserApi(
+            session=self.session,
+            config=self.app_config,
+            current_user=None,
+        )
+        group_api = GroupApi(
+            current_user=None,
+            session=self.session,
+            config=self.app_config,
+        )
+        groups = [group_api.get_one(Group.TIM_USER),
+                  group_api.get_one(Group.TIM_MANAGER),
+                  group_api.get_one(Group.TIM_ADMIN)]
+
+        user_a = uapi.create_minimal_user(email='this.is@user',
+                                          groups=groups, save_now=True)
+        user_b = uapi.create_minimal_user(email='this.is@another.user',
+                                          groups=groups, save_now=True)
+
+        wapi = WorkspaceApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace1 = wapi.create_workspace(
+            'test workspace n°1',
+            save_now=True)
+        workspace2 = wapi.create_workspace(
+            'test workspace n°2',
+            save_now=True)
+
+        role_api1 = RoleApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        role_api1.create_one(
+            user_b,
+            workspace1,
+            UserRoleInWorkspace.READER,
+            False
+        )
+
+        role_api2 = RoleApi(
+            current_user=user_b,
+            session=self.session,
+            config=self.app_config,
+        )
+        role_api2.create_one(user_b, workspace2, UserRoleInWorkspace.READER,
+                             False)
+
+        cont_api_a = ContentApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        cont_api_b = ContentApi(
+            current_user=user_b,
+            session=self.session,
+            config=self.app_config,
+        )
+
+        # Creates page_1 & page_2 in workspace 1
+        #     and page_3 & page_4 in workspace 2
+        page_1 = cont_api_a.create(content_type_list.Page.slug, workspace1, None,
+                                   'this is a page', do_save=True)
+        page_2 = cont_api_a.create(content_type_list.Page.slug, workspace1, None,
+                                   'this is page1', do_save=True)
+        page_3 = cont_api_a.create(content_type_list.Thread.slug, workspace2, None,
+                                   'this is page2', do_save=True)
+        page_4 = cont_api_a.create(content_type_list.File.slug, workspace2, None,
+                                   'this is page3', do_save=True)
+
+        for rev in page_1.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+        for rev in page_2.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+        for rev in page_3.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+        for rev in page_4.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+
+        # Set as read the workspace n°1
+        cont_api_b.mark_read__workspace(workspace=workspace1)
+
+        for rev in page_1.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+        for rev in page_2.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+        for rev in page_3.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+        for rev in page_4.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+
+        # Set as read the workspace n°2
+        cont_api_b.mark_read__workspace(workspace=workspace2)
+
+        for rev in page_1.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+        for rev in page_2.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+        for rev in page_3.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+        for rev in page_4.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+
+    def test_mark_read(self):
+        uapi = UserApi(
+            session=self.session,
+            config=self.app_config,
+            current_user=None,
+        )
+        group_api = GroupApi(
+            current_user=None,
+            session=self.session,
+            config = self.app_config,
+        )
+        groups = [group_api.get_one(Group.TIM_USER),
+                  group_api.get_one(Group.TIM_MANAGER),
+                  group_api.get_one(Group.TIM_ADMIN)]
+
+        user_a = uapi.create_minimal_user(
+            email='this.is@user',
+            groups=groups,
+            save_now=True
+        )
+        user_b = uapi.create_minimal_user(
+            email='this.is@another.user',
+            groups=groups,
+            save_now=True
+        )
+
+        wapi = WorkspaceApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace_api = WorkspaceApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        workspace = wapi.create_workspace(
+            'test workspace',
+            save_now=True)
+
+        role_api = RoleApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        role_api.create_one(
+            user_b,
+            workspace,
+            UserRoleInWorkspace.READER,
+            False
+        )
+        cont_api_a = ContentApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        cont_api_b = ContentApi(
+            current_user=user_b,
+            session=self.session,
+            config=self.app_config,
+        )
+
+        page_1 = cont_api_a.create(content_type_list.Page.slug, workspace, None,
+                                   'this is a page', do_save=True)
+
+        for rev in page_1.revisions:
+            eq_(user_b not in rev.read_by.keys(), True)
+
+        cont_api_b.mark_read(page_1)
+
+        for rev in page_1.revisions:
+            eq_(user_b in rev.read_by.keys(), True)
+
+    def test_unit__get_read_status_map__ok__nominal_case(self):
+        uapi = UserApi(
+            session=self.session,
+            config=self.app_config,
+            current_user=None,
+        )
+        group_api = GroupApi(
+            current_user=None,
+            session=self.session,
+            config=self.app_config,
+        )
+        groups = [group_api.get_one(Group.TIM_USER),
+                  group_api.get_one(Group.TIM_MANAGER),
+                  group_api.get_one(Group.TIM_ADMIN)]
+        user_a = uapi.create_minimal_user(
+            email='this.is@user',
+            groups=groups,
+            save_now=True
+        )
+        user_b = uapi.create_minimal_user(
+            email='this.is@another.user',
+            groups=groups,
+            save_now=True
+        )
+        workspace = WorkspaceApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        RoleApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        ).create_one(user_b, workspace, UserRoleInWorkspace.READER, False)
+        cont_api_a = ContentApi(
+            current_user=user_a,
+            session=self.session,
+            config=self.app_config,
+        )
+        cont_api_b = ContentApi(
+            current_user=user_b,
+            session=self.session,
+            config=self.app_config,
+        )
+        folder = cont_api_a.create(content_type_list.Folder.slug, workspace,
+                                   None, 'folder', do_save=True)
+        page_1 = cont_api_a.create(content_type_list.Page.slug, workspace,
+                                   folder, 'page 1', do_save=True)
+        page_2 = cont_api_a.create(content_type_list.Page.slug, workspace,
+                                   None, 'page 2', do_save=True)
+        page_3 = cont_api_a.create(content_type_list.Page.slug, workspace,
+                                   None, 'page 3', do_save=True)
+        comment = cont_api_a.create_comment(workspace, page_2, 'comment',
+                                            do_save=True)
+        cont_api_b.mark_read(folder, recursive=False)
+        cont_api_b.mark_read(page_2, recursive=False)
+        cont_api_b.mark_read(page_3, recursive=False)
+        content_ids = [
+            folder.content_id,
+            page_1.content_id,
+            page_2.content_id,
+            page_3.content_id,
+        ]
+
+        read_status_map = cont_api_b.get_read_status_map(user_b, content_ids)
+        # INFO - G.M - 2018-12-06 - unread descendants (page 1 in folder,
+        # comment of page 2) make parent unread
+        assert read_status_map == {
+            folder.content_id: False,
+            page_1.content_id: False,
+            page_2.content_id: False,
+            page_3.content_id: True,
+        }
+        for content in (folder, page_1, page_2, page_3):
+            assert read_status_map[content.content_id] == \
+                (not content.has_new_information_for(user_b))
+
+        cont_api_b.mark_read(page_1)
+        cont_api_b.mark_read(comment)
+        read_status_map = cont_api_b.get_read_status_map(user_b, content_ids)
+        assert all(read_status_map.values())
+        assert cont_api_b.get_read_status_map(user_b, []) == {}
+
+    def test_unit__get_read_status_map__ok__without_recursive_cte(self):
+        # INFO - G.M - 2018-12-26 - MySQL < 8.0 has no recursive common
+        # table expressions, content tree is then read level by level.
+        with patch(
+            'tracim_backend.lib.core.content.has_recursive_cte',
+            return_value=False,
+        ):
+            self.test_unit__get_read_status_map__ok__nominal_case()
+
+    def test_unit__mark_read__ok__comment_read_parent_and_siblings(self):
         uapi = UserApi(
             session=self.session,
             config=self.app_config,
@@ -1588,44 +2576,26 @@ class TestContentApi(DefaultTest):
         groups = [group_api.get_one(Group.TIM_USER),
                   group_api.get_one(Group.TIM_MANAGER),
                   group_api.get_one(Group.TIM_ADMIN)]
-
-        user_a = uapi.create_minimal_user(email='this.is@user',
-                                          groups=groups, save_now=True)
-        user_b = uapi.create_minimal_user(email='this.is@another.user',
-                                          groups=groups, save_now=True)
-
-        wapi = WorkspaceApi(
-            current_user=user_a,
-            session=self.session,
-            config=self.app_config,
+        user_a = uapi.create_minimal_user(
+            email='this.is@user',
+            groups=groups,
+            save_now=True
         )
-        workspace1 = wapi.create_workspace(
-            'test workspace n°1',
-            save_now=True)
-        workspace2 = wapi.create_workspace(
-            'test workspace n°2',
-            save_now=True)
-
-        role_api1 = RoleApi(
+        user_b = uapi.create_minimal_user(
+            email='this.is@another.user',
+            groups=groups,
+            save_now=True
+        )
+        workspace = WorkspaceApi(
             current_user=user_a,
             session=self.session,
             config=self.app_config,
-        )
-        role_api1.create_one(
-            user_b,
-            workspace1,
-            UserRoleInWorkspace.READER,
-            False
-        )
-
-        role_api2 = RoleApi(
-            current_user=user_b,
+        ).create_workspace('test workspace', save_now=True)
+        RoleApi(
+            current_user=user_a,
             session=self.session,
             config=self.app_config,
-        )
-        role_api2.create_one(user_b, workspace2, UserRoleInWorkspace.READER,
-                             False)
-
+        ).create_one(user_b, workspace, UserRoleInWorkspace.READER, False)
         cont_api_a = ContentApi(
             current_user=user_a,
             session=self.session,
@@ -1636,52 +2606,40 @@ class TestContentApi(DefaultTest):
             session=self.session,
             config=self.app_config,
         )
-
-        # Creates page_1 & page_2 in workspace 1
-        #     and page_3 & page_4 in workspace 2
-        page_1 = cont_api_a.create(content_type_list.Page.slug, workspace1, None,
-                                   'this is a page', do_save=True)
-        page_2 = cont_api_a.create(content_type_list.Page.slug, workspace1, None,
-                                   'this is page1', do_save=True)
-        page_3 = cont_api_a.create(content_type_list.Thread.slug, workspace2, None,
-                                   'this is page2', do_save=True)
-        page_4 = cont_api_a.create(content_type_list.File.slug, workspace2, None,
-                                   'this is page3', do_save=True)
-
-        for rev in page_1.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-        for rev in page_2.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-        for rev in page_3.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-        for rev in page_4.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-
-        # Set as read the workspace n°1
-        cont_api_b.mark_read__workspace(workspace=workspace1)
-
-        for rev in page_1.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
-        for rev in page_2.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
-        for rev in page_3.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-        for rev in page_4.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-
-        # Set as read the workspace n°2
-        cont_api_b.mark_read__workspace(workspace=workspace2)
-
-        for rev in page_1.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
-        for rev in page_2.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
-        for rev in page_3.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
-        for rev in page_4.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
-
-    def test_mark_read(self):
+        page = cont_api_a.create(content_type_list.Page.slug, workspace,
+                                 None, 'page', do_save=True)
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=page,
+        ):
+            cont_api_a.update_content(page, 'page', 'new content')
+        cont_api_a.save(page)
+        comment_1 = cont_api_a.create_comment(workspace, page, 'comment 1',
+                                              do_save=True)
+        comment_2 = cont_api_a.create_comment(workspace, page, 'comment 2',
+                                              do_save=True)
+        other_page = cont_api_a.create(content_type_list.Page.slug, workspace,
+                                       None, 'other page', do_save=True)
+
+        cont_api_b.mark_read(comment_1)
+
+        assert len(page.revisions) == 2
+        for content in (page, comment_1, comment_2):
+            for rev in content.revisions:
+                assert user_b in rev.read_by.keys()
+        for rev in other_page.revisions:
+            assert user_b not in rev.read_by.keys()
+
+        cont_api_b.mark_unread(page)
+
+        for content in (page, comment_1, comment_2):
+            for rev in content.revisions:
+                assert user_b not in rev.read_by.keys()
+            # INFO - G.M - 2018-12-07 - author did not lost his read status
+            assert user_a in content.revision.read_by.keys()
+
+    def test_unit__expire_read_statuses__ok__no_statement(self):
         uapi = UserApi(
             session=self.session,
             config=self.app_config,
@@ -1690,12 +2648,11 @@ class TestContentApi(DefaultTest):
         group_api = GroupApi(
             current_user=None,
             session=self.session,
-            config = self.app_config,
+            config=self.app_config,
         )
         groups = [group_api.get_one(Group.TIM_USER),
                   group_api.get_one(Group.TIM_MANAGER),
                   group_api.get_one(Group.TIM_ADMIN)]
-
         user_a = uapi.create_minimal_user(
             email='this.is@user',
             groups=groups,
@@ -1706,53 +2663,259 @@ class TestContentApi(DefaultTest):
             groups=groups,
             save_now=True
         )
-
-        wapi = WorkspaceApi(
+        workspace = WorkspaceApi(
             current_user=user_a,
             session=self.session,
             config=self.app_config,
-        )
-        workspace_api = WorkspaceApi(
+        ).create_workspace('test workspace', save_now=True)
+        cont_api_a = ContentApi(
             current_user=user_a,
             session=self.session,
             config=self.app_config,
         )
-        workspace = wapi.create_workspace(
-            'test workspace',
-            save_now=True)
-
-        role_api = RoleApi(
-            current_user=user_a,
+        cont_api_b = ContentApi(
+            current_user=user_b,
             session=self.session,
             config=self.app_config,
         )
-        role_api.create_one(
-            user_b,
+        page = cont_api_a.create(content_type_list.Page.slug, workspace,
+                                 None, 'page', do_save=True)
+        cont_api_b.mark_read(page)
+        read_statuses = page.revision.revision_read_statuses
+        status_a = read_statuses[user_a]
+        status_b = read_statuses[user_b]
+        other_revision = cont_api_a.create(
+            content_type_list.Page.slug,
             workspace,
-            UserRoleInWorkspace.READER,
-            False
+            None,
+            'other page',
+            do_save=True,
+        ).revision
+        assert 'revision_read_statuses' in inspect(other_revision).unloaded
+        assert status_a.view_datetime
+        assert status_b.view_datetime
+
+        statements = []
+
+        def count_statement(*args, **kwargs):
+            statements.append(args)
+
+        event.listen(
+            self.session.bind,
+            'before_cursor_execute',
+            count_statement,
+        )
+        try:
+            cont_api_b._expire_read_statuses()
+            assert not statements
+        finally:
+            event.remove(
+                self.session.bind,
+                'before_cursor_execute',
+                count_statement,
+            )
+        assert 'view_datetime' in inspect(status_b).unloaded
+        assert 'view_datetime' not in inspect(status_a).unloaded
+        assert 'revision_read_statuses' in inspect(page.revision).unloaded
+        assert user_b in page.revision.read_by.keys()
+
+    @contextmanager
+    def _patch_preview_manager(self) -> typing.Generator[MagicMock, None, None]:  # nopep8
+        """
+        Memory depot of tests has no file path for preview generator, fake
+        preview generator answers.
+        """
+        preview_manager = MagicMock()
+        with patch.object(
+            ContentApi,
+            'get_one_revision_filepath',
+            return_value='/tmp/test_file.txt',
+        ), patch.object(
+            ContentApi,
+            'preview_manager',
+            new_callable=PropertyMock,
+            return_value=preview_manager,
+        ):
+            preview_manager.get_page_nb.return_value = 1
+            preview_manager.has_pdf_preview.return_value = True
+            preview_manager.has_jpeg_preview.return_value = True
+            yield preview_manager
+
+    def test_unit__save__ok__preview_metadata_computed_once(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
         )
-        cont_api_a = ContentApi(
-            current_user=user_a,
+        with self.session.no_autoflush:
+            text_file = api.create(
+                content_type_slug=content_type_list.File.slug,
+                workspace=workspace,
+                label='test_file',
+                do_save=False,
+            )
+            api.update_file_data(
+                text_file,
+                'test_file.txt',
+                'text/plain',
+                b'test_content'
+            )
+        # INFO - G.M - 2018-12-28 - in sync mode, metadata are computed and
+        # stored when revision is saved, cached once committed.
+        with self._patch_preview_manager() as preview_manager:
+            api.save(text_file, ActionDescription.CREATION)
+            assert preview_manager.get_page_nb.call_count == 1
+        revision_id = text_file.revision_id
+        assert not preview_metadata_cache.get(revision_id)
+        transaction.commit()
+        assert preview_metadata_cache.get(revision_id)
+        metadata = self.session.query(RevisionPreviewMetadata)\
+            .get(revision_id)
+        assert metadata
+        assert metadata.size == len(b'test_content')
+        assert metadata.mimetype == 'text/plain'
+        assert metadata.page_nb == 1
+        assert metadata.has_pdf_preview is True
+
+        # INFO - G.M - 2018-12-10 - then listing never use depot or preview
+        # generator anymore
+        text_file = api.get_one(text_file.content_id, content_type_list.Any_SLUG)  # nopep8
+        with patch.object(ContentApi, 'get_one_revision_filepath') as get_path:
+            get_path.side_effect = AssertionError('depot should not be used')
+            content = api.get_content_in_context(text_file)
+            assert content.size == len(b'test_content')
+            assert content.mimetype == 'text/plain'
+            assert content.page_nb == metadata.page_nb
+            assert content.has_pdf_preview == metadata.has_pdf_preview
+            assert content.has_jpeg_preview == metadata.has_jpeg_preview
+            revision = api.get_revision_in_context(text_file.revision)
+            assert revision.size == len(b'test_content')
+            assert not get_path.called
+
+    def test_unit__get_revision_preview_metadata__ok__failure_not_stored(self):  # nopep8
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        api = ContentApi(
+            current_user=admin,
             session=self.session,
             config=self.app_config,
         )
-        cont_api_b = ContentApi(
-            current_user=user_b,
+        with self.session.no_autoflush:
+            text_file = api.create(
+                content_type_slug=content_type_list.File.slug,
+                workspace=workspace,
+                label='test_file',
+                do_save=False,
+            )
+            api.update_file_data(
+                text_file,
+                'test_file.txt',
+                'text/plain',
+                b'test_content'
+            )
+        with self._patch_preview_manager() as preview_manager:
+            preview_manager.get_page_nb.side_effect = Exception(
+                'preview generator failure'
+            )
+            api.save(text_file, ActionDescription.CREATION)
+            transaction.commit()
+            revision_id = text_file.revision_id
+            assert not self.session.query(RevisionPreviewMetadata).get(revision_id)  # nopep8
+            metadata = api.get_revision_preview_metadata(text_file.revision)
+        assert metadata.page_nb is None
+        assert metadata.size == len(b'test_content')
+        transaction.commit()
+        assert not preview_metadata_cache.get(revision_id)
+        assert not self.session.query(RevisionPreviewMetadata).get(revision_id)  # nopep8
+
+        # INFO - G.M - 2018-12-26 - computed on read as a backfill once
+        # failure is gone, but not cached if transaction is rolled back.
+        text_file = api.get_one(text_file.content_id, content_type_list.Any_SLUG)  # nopep8
+        with self._patch_preview_manager():
+            metadata = api.get_revision_preview_metadata(text_file.revision)
+        assert metadata.page_nb == 1
+        self.session.rollback()
+        assert not preview_metadata_cache.get(revision_id)
+        assert not self.session.query(RevisionPreviewMetadata).get(revision_id)  # nopep8
+
+    def test_unit__get_jpg_preview_path__err__preview_not_ready(self):
+        self.app_config.PREVIEW_PROCESSING_MODE = self.app_config.CST.LOCAL
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = WorkspaceApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        ).create_workspace('test workspace', save_now=True)
+        api = ContentApi(
+            current_user=admin,
             session=self.session,
             config=self.app_config,
         )
+        with patch(
+            'tracim_backend.lib.preview.generator.local_preview_queue'
+        ) as local_preview_queue:
+            with self.session.no_autoflush:
+                text_file = api.create(
+                    content_type_slug=content_type_list.File.slug,
+                    workspace=workspace,
+                    label='test_file',
+                    do_save=False,
+                )
+                api.update_file_data(
+                    text_file,
+                    'test_file.txt',
+                    'text/plain',
+                    b'test_content'
+                )
+            api.save(text_file, ActionDescription.CREATION)
+            revision_id = text_file.revision_id
+            # INFO - G.M - 2018-12-11 - generation is sent to preview
+            # generator only once revision is committed
+            assert not local_preview_queue.enqueue_revision.called
+            transaction.commit()
+            assert local_preview_queue.enqueue_revision.call_count == 1
+            assert local_preview_queue.enqueue_revision.call_args[0][1] == revision_id  # nopep8
+
+            text_file = api.get_one(text_file.content_id, content_type_list.Any_SLUG)  # nopep8
+            content = api.get_content_in_context(text_file)
+            assert content.size == len(b'test_content')
+            assert content.has_jpeg_preview is False
+            with pytest.raises(PreviewNotReady):
+                api.get_jpg_preview_path(
+                    content_id=text_file.content_id,
+                    revision_id=revision_id,
+                    page_number=1,
+                    file_extension=text_file.file_extension,
+                )
 
-        page_1 = cont_api_a.create(content_type_list.Page.slug, workspace, None,
-                                   'this is a page', do_save=True)
-
-        for rev in page_1.revisions:
-            eq_(user_b not in rev.read_by.keys(), True)
-
-        cont_api_b.mark_read(page_1)
-
-        for rev in page_1.revisions:
-            eq_(user_b in rev.read_by.keys(), True)
+        with self._patch_preview_manager():
+            api.generate_revision_previews(text_file.revision)
+        self.session.flush()
+        assert self.session.query(RevisionPreviewMetadata).get(revision_id)
+        api._check_revision_preview_ready(revision_id)
+
+    def test_unit__mark_read__ok__without_recursive_cte_nor_upsert(self):
+        with patch(
+            'tracim_backend.lib.core.content.has_recursive_cte',
+            return_value=False,
+        ), patch(
+            'tracim_backend.lib.core.content.has_upsert',
+            return_value=False,
+        ):
+            self.test_unit__mark_read__ok__comment_read_parent_and_siblings()
 
     def test_mark_read__all(self):
         uapi = UserApi(
@@ -3829,9 +4992,11 @@ class TestContentApi(DefaultTest):
         original_id = p.content_id
 
         res = api.search(['randomized'])
-        eq_(1, len(res.all()))
-        item = res.all()[0]
-        eq_(original_id, item.content_id)
+        eq_(2, len(res.all()))
+        eq_(
+            {a.content_id, original_id},
+            {item.content_id for item in res.all()},
+        )
 
     def test_search_in_description(self):
         # HACK - D.A. - 2015-03-09
@@ -4033,23 +5198,81 @@ class TestContentApi(DefaultTest):
         ):
             api.archive(folder_2)
 
-        # Actually ContentApi.search don't filter it
+        # INFO - G.M - 2018-12-27 - ContentApi.search filter them in sql
         foo_result = api.search(['foo']).all()
-        eq_(1, len(foo_result))
-        assert page_1 in foo_result
+        eq_(0, len(foo_result))
 
         bar_result = api.search(['bar']).all()
-        eq_(1, len(bar_result))
-        assert page_2 in bar_result
+        eq_(0, len(bar_result))
 
-        # ContentApi offer exclude_unavailable method to do it
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+            show_deleted=True,
+        )
         foo_result = api.search(['foo']).all()
-        api.exclude_unavailable(foo_result)
-        eq_(0, len(foo_result))
+        eq_(1, len(foo_result))
+        assert page_1 in foo_result
+        eq_(0, len(api.search(['bar']).all()))
 
-        bar_result = api.search(['bar']).all()
-        api.exclude_unavailable(bar_result)
-        eq_(0, len(bar_result))
+    def test_unit__search_exclude_content_under_deleted_or_archived_parents__ok__without_recursive_cte(self):  # nopep8
+        with patch(
+            'tracim_backend.lib.core.content.has_recursive_cte',
+            return_value=False,
+        ):
+            self.test_unit__search_exclude_content_under_deleted_or_archived_parents__ok()  # nopep8
+
+    def test_unit__search__ok__workspace_root_and_nested_contents(self):
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = self._create_workspace_and_test(
+            'workspace_1',
+            admin
+        )
+        root_page = self._create_content_and_test(
+            'foo root',
+            workspace=workspace,
+            type=content_type_list.Page.slug,
+        )
+        folder = self._create_content_and_test(
+            'folder',
+            workspace=workspace,
+            type=content_type_list.Folder.slug
+        )
+        subfolder = self._create_content_and_test(
+            'subfolder',
+            workspace=workspace,
+            type=content_type_list.Folder.slug,
+            parent=folder,
+        )
+        nested_page = self._create_content_and_test(
+            'foo nested',
+            workspace=workspace,
+            type=content_type_list.Page.slug,
+            parent=subfolder,
+        )
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        eq_(
+            {root_page.content_id, nested_page.content_id},
+            {content.content_id for content in api.search(['foo'])},
+        )
+
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=folder,
+        ):
+            api.delete(folder)
+        # INFO - G.M - 2018-12-27 - deleted grand parent excludes content
+        eq_(
+            [root_page.content_id],
+            [content.content_id for content in api.search(['foo'])],
+        )
 
 
 class TestContentApiSecurity(DefaultTest):
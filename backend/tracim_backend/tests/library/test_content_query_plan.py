@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import re
+import typing
+
+from sqlalchemy import event
+from sqlalchemy.orm import Query
+
+from tracim_backend.app_models.contents import content_type_list
+from tracim_backend.lib.core.content import ContentApi
+from tracim_backend.models.auth import User
+from tracim_backend.models.data import ActionDescription
+from tracim_backend.models.data import Content
+from tracim_backend.models.data import ContentRevisionRO
+from tracim_backend.models.data import Workspace
+from tracim_backend.models.meta import DeclarativeBase
+from tracim_backend.tests import StandardTest
+
+
+class TestContentApiQueryPlan(StandardTest):
+    """
+    Check ContentApi hot queries are served by indexes: query plan of each
+    query should not contain any sequential scan.
+    """
+    SEEDED_WORKSPACE_NB = 10
+    SEEDED_FOLDER_NB = 10
+    SEEDED_FILE_BY_FOLDER_NB = 10
+
+    # INFO - G.M - 2018-12-04 - SQLite full table scan are shown as
+    # "SCAN TABLE content" (or "SCAN content" with recent SQLite),
+    # index based full scans are shown with "USING (COVERING) INDEX".
+    # Scans of common table expressions (walk of content trees) are shown
+    # the same way, only scans of tables are checked.
+    SQLITE_SEQ_SCAN_PATTERN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')  # nopep8
+    POSTGRESQL_SEQ_SCAN_PATTERN = re.compile(r'Seq Scan on (?P<table>\w+)')
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        self._seed_contents()
+
+    def _seed_contents(self) -> None:
+        """
+        Insert a workspace/folder/file tree big enough to make database
+        prefer indexes over sequential scans.
+        """
+        for workspace_index in range(self.SEEDED_WORKSPACE_NB):
+            workspace = Workspace(label='workspace_{}'.format(workspace_index))
+            self.session.add(workspace)
+            for folder_index in range(self.SEEDED_FOLDER_NB):
+                folder = Content(
+                    owner=self.admin,
+                    workspace=workspace,
+                    type=content_type_list.Folder.slug,
+                    label='folder_{}'.format(folder_index),
+                    revision_type=ActionDescription.CREATION,
+                )
+                self.session.add(folder)
+                for file_index in range(self.SEEDED_FILE_BY_FOLDER_NB):
+                    self.session.add(Content(
+                        owner=self.admin,
+                        workspace=workspace,
+                        parent=folder,
+                        type=content_type_list.File.slug,
+                        label='file_{}'.format(file_index),
+                        file_extension='.txt',
+                        revision_type=ActionDescription.CREATION,
+                    ))
+            self.session.flush()
+        self.session.execute('ANALYZE')
+        self.workspace = self.session.query(Workspace)\
+            .filter(Workspace.label == 'workspace_0').one()
+        self.folder = self.session.query(Content)\
+            .join(ContentRevisionRO, Content.cached_revision_id == ContentRevisionRO.revision_id)\
+            .filter(ContentRevisionRO.workspace_id == self.workspace.workspace_id)\
+            .filter(ContentRevisionRO.label == 'folder_0')\
+            .one()
+
+    def _get_query_plan(
+            self,
+            statement: str,
+            parameters: typing.Any=(),
+    ) -> typing.List[str]:
+        if self.session.bind.dialect.name == 'postgresql':
+            explain = 'EXPLAIN {}'
+        else:
+            explain = 'EXPLAIN QUERY PLAN {}'
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.execute(explain.format(statement), parameters)
+            # INFO - G.M - 2018-12-04 - Query plan detail is the last column
+            # in SQLite and the only one in PostgreSQL.
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def _assert_no_seq_scan_in_statement(
+            self,
+            statement: str,
+            parameters: typing.Any=(),
+    ) -> None:
+        if self.session.bind.dialect.name == 'postgresql':
+            pattern = self.POSTGRESQL_SEQ_SCAN_PATTERN
+        else:
+            pattern = self.SQLITE_SEQ_SCAN_PATTERN
+        query_plan = self._get_query_plan(statement, parameters)
+        for line in query_plan:
+            match = pattern.search(line.strip())
+            assert not (
+                match and match.group('table') in DeclarativeBase.metadata.tables  # nopep8
+            ), \
+                'Sequential scan found in query plan of {}: {}'.format(
+                    statement,
+                    query_plan,
+                )
+
+    def _assert_no_seq_scan(self, query: Query) -> None:
+        compiled_query = query.statement.compile(
+            dialect=self.session.bind.dialect,
+            compile_kwargs={'literal_binds': True},
+        )
+        self._assert_no_seq_scan_in_statement(str(compiled_query))
+
+    def _capture_select_statements(
+            self,
+            function: typing.Callable,
+            *args,
+            **kwargs
+    ) -> typing.List[typing.Tuple[str, typing.Any]]:
+        """
+        Call function and return SELECT statements it emitted, with their
+        parameters, as sent to database.
+        """
+        statements = []
+
+        def capture_statement(conn, cursor, statement, parameters, context, executemany):  # nopep8
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                statements.append((statement, parameters))
+
+        event.listen(
+            self.session.bind,
+            'before_cursor_execute',
+            capture_statement,
+        )
+        try:
+            function(*args, **kwargs)
+        finally:
+            event.remove(
+                self.session.bind,
+                'before_cursor_execute',
+                capture_statement,
+            )
+        return statements
+
+    def _get_content_api(self) -> ContentApi:
+        return ContentApi(
+            current_user=self.admin,
+            session=self.session,
+            config=self.app_config,
+        )
+
+    def test_unit__query_plan__ok__get_one(self):
+        api = self._get_content_api()
+        query = api._base_query(self.workspace)\
+            .filter(Content.content_id == self.folder.content_id)
+        self._assert_no_seq_scan(query)
+
+    def test_unit__query_plan__ok__get_all_by_parent(self):
+        api = self._get_content_api()
+        query = api._get_all_query(
+            parent_ids=[self.folder.content_id],
+            workspace=self.workspace,
+        )
+        self._assert_no_seq_scan(query)
+
+    def test_unit__query_plan__ok__is_filename_available(self):
+        api = self._get_content_api()
+        query = api.get_base_query(self.workspace)\
+            .filter(Content.parent_id == self.folder.content_id)\
+            .filter(Content.workspace_id == self.workspace.workspace_id)\
+            .filter(Content.label == 'file_0')\
+            .filter(Content.file_extension == '.txt')
+        self._assert_no_seq_scan(query)
+
+    def test_unit__query_plan__ok__get_folder_with_workspace_path_labels(self):
+        api = self._get_content_api()
+        query = api._base_query(self.workspace).filter(
+            Content.type == content_type_list.Folder.slug,
+            Content.label == 'folder_0',
+            Content.workspace_id == self.workspace.workspace_id,
+            Content.parent_id == None,
+        )
+        self._assert_no_seq_scan(query)
+
+    def test_unit__query_plan__ok__get_last_active(self):
+        api = self._get_content_api()
+        # INFO - G.M - 2018-12-28 - Check statements really emitted by
+        # get_last_active(), not a rebuilt query.
+        statements = self._capture_select_statements(
+            api.get_last_active,
+            workspace=self.workspace,
+            limit=10,
+        )
+        assert statements
+        for statement, parameters in statements:
+            self._assert_no_seq_scan_in_statement(statement, parameters)
+
+    def test_unit__query_plan__ok__search(self):
+        api = self._get_content_api()
+        query = api.search(['file_0'], limit=20)
+        self._assert_no_seq_scan(query)
@@ -1,14 +1,47 @@
 # -*- coding: utf-8 -*-
 import os
+import pickle
 import re
+import shutil
+import smtplib
+import tempfile
+import typing
+from email.mime.text import MIMEText
+from unittest.mock import patch
 
+import pytest
+import transaction
 
+from mako.template import Template
+
+from tracim_backend.app_models.contents import content_type_list
+from tracim_backend.exceptions import EmailsSendingFailed
+from tracim_backend.fixtures.content import Content as ContentFixture
+from tracim_backend.fixtures.users_and_groups import Base as BaseFixture
+from tracim_backend.lib.core.content import ContentApi
 from tracim_backend.lib.core.notifications import DummyNotifier
+from tracim_backend.lib.core.user import UserApi
+from tracim_backend.lib.core.userworkspace import RoleApi
+from tracim_backend.lib.core.workspace import WorkspaceApi
 
 from tracim_backend.lib.core.notifications import NotifierFactory
+from tracim_backend.lib.mail_notifier.notifier import ContentUpdateNotificationSender  # nopep8
+from tracim_backend.lib.mail_notifier.notifier import EmailManager
 from tracim_backend.lib.mail_notifier.notifier import EmailNotifier
+from tracim_backend.lib.mail_notifier.notifier import compiled_template_cache
+from tracim_backend.lib.mail_notifier.notifier import get_email_manager
+from tracim_backend.lib.mail_notifier.sender import DataTrackingSMTP
+from tracim_backend.lib.mail_notifier.sender import EmailSender
+from tracim_backend.lib.mail_notifier.sender import SmtpConnection
+from tracim_backend.lib.mail_notifier.sender import SmtpConnectionPool
+from tracim_backend.lib.mail_notifier.sender import clear_smtp_connection_pools
+from tracim_backend.lib.mail_notifier.utils import SmtpConfiguration
+from tracim_backend.lib.utils.translation import Translator
 from tracim_backend.models.auth import User
+from tracim_backend.models.data import ActionDescription
 from tracim_backend.models.data import Content
+from tracim_backend.models.data import UserRoleInWorkspace
+from tracim_backend.models.revision_protection import new_revision
 from tracim_backend.tests import DefaultTest
 from tracim_backend.tests import eq_
 
@@ -37,5 +70,517 @@ class TestNotifierFactory(DefaultTest):
 
 
 class TestEmailNotifier(DefaultTest):
-    # TODO - G.M - 04-03-2017 -  [emailNotif] - Restore test for email Notif
-    pass
+    fixtures = [BaseFixture, ContentFixture]
+    config_section = 'mail_test'
+
+    def setUp(self) -> None:
+        super().setUp()
+        uapi = UserApi(
+            current_user=None,
+            session=self.session,
+            config=self.app_config,
+        )
+        self.admin = uapi.get_one_by_email('admin@admin.admin')
+        self.bob = uapi.get_one_by_email('bob@fsf.local')
+        wapi = WorkspaceApi(
+            current_user=self.admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        self.workspace = wapi.get_one_by_label('Recipes')
+        wapi.enable_notifications(self.bob, self.workspace)
+        transaction.commit()
+
+    def _create_thread(self, do_notify: bool) -> Content:
+        api = ContentApi(
+            current_user=self.admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        return api.create(
+            content_type_list.Thread.slug,
+            self.workspace,
+            None,
+            'Best pies',
+            do_save=True,
+            do_notify=do_notify,
+        )
+
+    def test_unit__notify_content_update__ok__async_send_ids_once_committed(self):  # nopep8
+        self.app_config.EMAIL_NOTIFICATION_PROCESSING_MODE = 'async'
+        with patch('tracim_backend.lib.mail_notifier.notifier.get_redis_connection'), \
+                patch('tracim_backend.lib.mail_notifier.notifier.get_rq_queue') as get_rq_queue, \
+                patch.object(EmailSender, '_send_message') as send_mail:  # nopep8
+            thread = self._create_thread(do_notify=True)
+            thread_id = thread.content_id
+            thread_revision_id = thread.revision_id
+            # INFO - G.M - 2018-12-12 - nothing is built nor sent in request
+            assert not get_rq_queue.return_value.enqueue.called
+            transaction.commit()
+            assert not send_mail.called
+        eq_(1, get_rq_queue.return_value.enqueue.call_count)
+        args = get_rq_queue.return_value.enqueue.call_args[0]
+        eq_(
+            (
+                self.admin.user_id,
+                thread_id,
+                ActionDescription.CREATION,
+                thread_revision_id,
+                None,
+            ),
+            args[1:],
+        )
+        notify = args[0]
+        assert isinstance(notify.__self__, ContentUpdateNotificationSender)
+        pickle.dumps(notify.__self__)
+
+    def test_unit__content_update_notification_sender__ok__send_all_emails(self):  # nopep8
+        thread = self._create_thread(do_notify=False)
+        thread_id = thread.content_id
+        transaction.commit()
+        notification_sender = ContentUpdateNotificationSender(
+            self.app_config,
+            self.engine,
+        )
+        with patch.object(EmailSender, '_send_message') as send_mail, \
+                patch.object(EmailSender, 'disconnect') as disconnect:
+            notification_sender.notify(
+                self.admin.user_id,
+                thread_id,
+                ActionDescription.CREATION,
+            )
+        eq_(1, send_mail.call_count)
+        message = send_mail.call_args[0][0]
+        assert 'bob@fsf.local' in message['To']
+        assert 'Best pies' in message['Subject']
+        eq_(1, disconnect.call_count)
+
+    def test_unit__content_update_notification_sender__err__job_failed(self):  # nopep8
+        thread = self._create_thread(do_notify=False)
+        thread_id = thread.content_id
+        transaction.commit()
+        notification_sender = ContentUpdateNotificationSender(
+            self.app_config,
+            self.engine,
+        )
+        with patch.object(
+            EmailSender,
+            'send_mails',
+            side_effect=EmailsSendingFailed('1 of 1 emails not sent', []),
+        ):
+            with pytest.raises(EmailsSendingFailed):
+                notification_sender.notify(
+                    self.admin.user_id,
+                    thread_id,
+                    ActionDescription.CREATION,
+                )
+
+    def test_unit__content_update_notification_sender__ok__render_event_revision(self):  # nopep8
+        api = ContentApi(
+            current_user=self.admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        thread = self._create_thread(do_notify=False)
+        thread_id = thread.content_id
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=thread,
+        ):
+            api.update_content(thread, 'Best pies', 'Apple pie')
+        api.save(thread, do_notify=False)
+        edition_revision_id = thread.revision_id
+        creation_revision_id = thread.revisions[0].revision_id
+        transaction.commit()
+        thread = api.get_one(thread_id, content_type_list.Any_SLUG)
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=thread,
+        ):
+            api.update_content(thread, 'Best cakes', 'Chocolate cake')
+        api.save(thread, do_notify=False)
+        transaction.commit()
+        notification_sender = ContentUpdateNotificationSender(
+            self.app_config,
+            self.engine,
+        )
+        with patch.object(EmailSender, '_send_message') as send_mail:
+            notification_sender.notify(
+                self.admin.user_id,
+                thread_id,
+                ActionDescription.EDITION,
+                edition_revision_id,
+                creation_revision_id,
+            )
+        eq_(1, send_mail.call_count)
+        message = send_mail.call_args[0][0]
+        assert 'Best pies' in message['Subject']
+        html_part = message.get_payload()[1]
+        body = html_part.get_payload(decode=True).decode('utf-8')
+        assert 'Apple pie' in body
+        assert 'Chocolate cake' not in body
+
+    def test_unit__content_update_notification_sender__ok__render_once_by_lang(self):  # nopep8
+        uapi = UserApi(
+            current_user=None,
+            session=self.session,
+            config=self.app_config,
+        )
+        rapi = RoleApi(
+            current_user=self.admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        for number, lang, role_level in (
+            (1, 'fr', UserRoleInWorkspace.READER),
+            (2, 'fr', UserRoleInWorkspace.CONTRIBUTOR),
+            (3, 'en', UserRoleInWorkspace.CONTENT_MANAGER),
+        ):
+            notified_user = uapi.create_user(
+                email='user{}@fsf.local'.format(number),
+                name='User {}'.format(number),
+                lang=lang,
+                do_notify=False,
+            )
+            rapi.create_one(
+                notified_user,
+                self.workspace,
+                role_level,
+                with_notif=True,
+            )
+        recipients = {
+            role.user.email: (role.user.display_name, role.role_as_label())
+            for role in self.workspace.roles
+            if role.do_notify and role.user != self.admin
+        }
+        eq_(4, len(recipients))
+        thread = self._create_thread(do_notify=False)
+        thread_id = thread.content_id
+        transaction.commit()
+        notification_sender = ContentUpdateNotificationSender(
+            self.app_config,
+            self.engine,
+        )
+        with patch.object(EmailSender, '_send_message') as send_mail, \
+                patch.object(
+                    EmailManager,
+                    '_render_template',
+                    autospec=True,
+                    side_effect=EmailManager._render_template,
+                ) as render_template, \
+                patch(
+                    'tracim_backend.lib.mail_notifier.notifier.Translator',
+                    wraps=Translator,
+                ) as translator_class:
+            notification_sender.notify(
+                self.admin.user_id,
+                thread_id,
+                ActionDescription.CREATION,
+            )
+        # INFO - G.M - 2018-12-14 - bob use default lang, users 1 and 2 'fr'
+        # and user 3 'en': 3 languages, text and html bodies for each one.
+        eq_(3, translator_class.call_count)
+        eq_(6, render_template.call_count)
+        eq_(4, send_mail.call_count)
+        for call in send_mail.call_args_list:
+            message = call[0][0]
+            display_name, role_label = [
+                recipient
+                for email, recipient in recipients.items()
+                if email in message['To']
+            ][0]
+            for part in message.get_payload():
+                body = part.get_payload(decode=True).decode('utf-8')
+                assert 'tracim_recipient' not in body
+                assert display_name in body
+                assert role_label in body
+
+
+class TestEmailManagerTemplateCache(DefaultTest):
+    RECIPIENT_NB = 50
+
+    def setUp(self) -> None:
+        super().setUp()
+        compiled_template_cache.clear()
+        self.email_manager = get_email_manager(self.app_config, self.session)
+        self.user = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        self.template_filepath = \
+            self.app_config.EMAIL_NOTIFICATION_CREATED_ACCOUNT_TEMPLATE_HTML
+        self.context = {
+            'user': self.user,
+            'password': 'password',
+            'logo_url': 'http://localhost/logo.png',
+            'login_url': 'http://localhost/login',
+        }
+        self.translator = Translator(self.app_config)
+
+    def _render(self) -> str:
+        return self.email_manager._render_template(
+            mako_template_filepath=self.template_filepath,
+            context=self.context,
+            translator=self.translator,
+        )
+
+    def test_unit__render_template__ok__compiled_once(self):
+        with patch(
+            'tracim_backend.lib.mail_notifier.notifier.Template',
+            wraps=Template,
+        ) as template_class:
+            bodies = {self._render() for _ in range(self.RECIPIENT_NB)}
+        eq_(1, template_class.call_count)
+        eq_(1, len(bodies))
+        assert self.user.email in bodies.pop()
+
+    def test_unit__render_template__ok__recompiled_on_file_change(self):
+        with tempfile.TemporaryDirectory() as template_dir:
+            template_filepath = os.path.join(template_dir, 'template.mak')
+            shutil.copyfile(self.template_filepath, template_filepath)
+            self.template_filepath = template_filepath
+            self._render()
+            mtime = os.stat(template_filepath).st_mtime
+            with patch(
+                'tracim_backend.lib.mail_notifier.notifier.Template',
+                wraps=Template,
+            ) as template_class:
+                self._render()
+                eq_(0, template_class.call_count)
+                with open(template_filepath, 'a') as template_file:
+                    template_file.write('template changed')
+                os.utime(template_filepath, (mtime + 1, mtime + 1))
+                assert 'template changed' in self._render()
+                eq_(1, template_class.call_count)
+                self._render()
+                eq_(1, template_class.call_count)
+
+
+class MockSmtpServer(object):
+    """
+    In-process smtp server stand-in: network commands of smtplib.SMTP
+    clients are answered without any socket, received messages and client
+    connections are kept.
+    """
+    port = 25
+
+    def __init__(self) -> None:
+        self.messages = []  # type: typing.List[str]
+        self.connection_nb = 0
+        self._clients = []  # type: typing.List[smtplib.SMTP]
+        self._patcher = None
+
+    def _check_connected(self, client: smtplib.SMTP) -> None:
+        if client not in self._clients:
+            raise smtplib.SMTPServerDisconnected(
+                'Connection unexpectedly closed'
+            )
+
+    def _connect(self, client, host='localhost', port=0, source_address=None):  # nopep8
+        self.connection_nb += 1
+        self._clients.append(client)
+        return 220, b'localhost ready'
+
+    def _ehlo(self, client, name=''):
+        self._check_connected(client)
+        client.ehlo_resp = b'localhost'
+        client.does_esmtp = True
+        client.esmtp_features = {}
+        return 250, b'localhost'
+
+    def _ok(self, client, *args, **kwargs):
+        self._check_connected(client)
+        return 250, b'OK'
+
+    def _data(self, client, msg):
+        self._check_connected(client)
+        self.messages.append(msg.decode('utf-8', 'replace'))
+        return 250, b'OK'
+
+    def _quit(self, client):
+        self._check_connected(client)
+        self._close(client)
+        return 221, b'Bye'
+
+    def _close(self, client):
+        if client in self._clients:
+            self._clients.remove(client)
+
+    def close_client_connections(self) -> None:
+        self._clients = []
+
+    def start(self) -> None:
+        self._patcher = patch.multiple(
+            smtplib.SMTP,
+            connect=lambda client, *args, **kwargs: self._connect(client, *args, **kwargs),  # nopep8
+            ehlo=lambda client, *args: self._ehlo(client, *args),
+            noop=lambda client: self._ok(client),
+            rset=lambda client: self._ok(client),
+            mail=lambda client, *args, **kwargs: self._ok(client),
+            rcpt=lambda client, *args, **kwargs: self._ok(client),
+            data=lambda client, msg: self._data(client, msg),
+            quit=lambda client: self._quit(client),
+            close=lambda client: self._close(client),
+        )
+        self._patcher.start()
+
+    def stop(self) -> None:
+        self._patcher.stop()
+        self.close_client_connections()
+
+
+class TestEmailSenderConnectionPool(DefaultTest):
+    config_section = 'mail_test'
+
+    def setUp(self) -> None:
+        super().setUp()
+        clear_smtp_connection_pools()
+        self.smtp_server = MockSmtpServer()
+        self.smtp_server.start()
+        self.smtp_config = SmtpConfiguration(
+            '127.0.0.1',
+            self.smtp_server.port,
+            None,
+            None,
+        )
+
+    def tearDown(self) -> None:
+        clear_smtp_connection_pools()
+        self.smtp_server.stop()
+        super().tearDown()
+
+    def _get_message(self, number: int) -> MIMEText:
+        message = MIMEText('body {}'.format(number))
+        message['Subject'] = 'subject {}'.format(number)
+        message['From'] = 'tracim@localhost'
+        message['To'] = 'bob{}@localhost'.format(number)
+        return message
+
+    def _check_messages(self, message_nb: int) -> None:
+        eq_(message_nb, len(self.smtp_server.messages))
+
+    def test_unit__send_mails__ok__one_connection_for_all_senders(self):
+        EmailSender(self.app_config, self.smtp_config, True).send_mails(
+            [self._get_message(number) for number in range(3)]
+        )
+        EmailSender(self.app_config, self.smtp_config, True).send_mail(
+            self._get_message(3)
+        )
+        self._check_messages(4)
+        eq_(1, self.smtp_server.connection_nb)
+
+    def test_unit__send_mails__ok__max_messages_per_connection(self):
+        self.app_config.EMAIL_NOTIFICATION_SMTP_MAX_MESSAGES_PER_CONNECTION = 2  # nopep8
+        EmailSender(self.app_config, self.smtp_config, True).send_mails(
+            [self._get_message(number) for number in range(5)]
+        )
+        self._check_messages(5)
+        eq_(3, self.smtp_server.connection_nb)
+
+    def test_unit__send_mail__ok__reconnect_on_closed_connection(self):
+        email_sender = EmailSender(self.app_config, self.smtp_config, True)
+        email_sender.send_mail(self._get_message(0))
+        self._check_messages(1)
+        self.smtp_server.close_client_connections()
+        email_sender.send_mail(self._get_message(1))
+        self._check_messages(2)
+        eq_(2, self.smtp_server.connection_nb)
+
+    def test_unit__send_mails__ok__acquire_connection_once_by_batch(self):
+        with patch.object(
+            SmtpConnectionPool,
+            'acquire',
+            autospec=True,
+            side_effect=SmtpConnectionPool.acquire,
+        ) as acquire:
+            EmailSender(self.app_config, self.smtp_config, True).send_mails(
+                [self._get_message(number) for number in range(3)]
+            )
+        self._check_messages(3)
+        eq_(1, acquire.call_count)
+
+    def _refuse_bob1(self):
+        send_message = SmtpConnection.send_message
+
+        def refuse_bob1(connection, message):
+            if message['To'] == 'bob1@localhost':
+                raise smtplib.SMTPRecipientsRefused(
+                    {'bob1@localhost': (550, b'User unknown')}
+                )
+            send_message(connection, message)
+
+        return patch.object(
+            SmtpConnection,
+            'send_message',
+            autospec=True,
+            side_effect=refuse_bob1,
+        )
+
+    def test_unit__send_mails__err__refused_recipient_raised(self):
+        self.app_config.EMAIL_PROCESSING_MODE = self.app_config.CST.SYNC
+        messages = [self._get_message(number) for number in range(3)]
+        with self._refuse_bob1():
+            with pytest.raises(EmailsSendingFailed) as exc_info:
+                EmailSender(
+                    self.app_config,
+                    self.smtp_config,
+                    True,
+                ).send_mails(messages)
+        eq_([messages[1]], exc_info.value.failed_messages)
+        self._check_messages(2)
+        assert 'bob1@localhost' not in ''.join(self.smtp_server.messages)
+        eq_(1, self.smtp_server.connection_nb)
+
+    def test_unit__send_mails__ok__async_refused_recipient_sent_again(self):
+        self.app_config.EMAIL_PROCESSING_MODE = self.app_config.CST.ASYNC
+        messages = [self._get_message(number) for number in range(3)]
+        email_sender = EmailSender(self.app_config, self.smtp_config, True)
+        with self._refuse_bob1(), patch(
+            'tracim_backend.lib.mail_notifier.sender.send_emails_through',
+        ) as send_emails_through:
+            email_sender.send_mails(messages)
+        self._check_messages(2)
+        # INFO - G.M - 2018-12-28 - only failed message is sent again, by
+        # its own job.
+        send_emails_through.assert_called_once_with(
+            self.app_config,
+            email_sender.send_mails,
+            [messages[1]],
+        )
+
+    def test_unit__send_mails__err__async_all_messages_failed(self):
+        self.app_config.EMAIL_PROCESSING_MODE = self.app_config.CST.ASYNC
+        messages = [self._get_message(1)]
+        with self._refuse_bob1(), patch(
+            'tracim_backend.lib.mail_notifier.sender.send_emails_through',
+        ) as send_emails_through:
+            with pytest.raises(EmailsSendingFailed) as exc_info:
+                EmailSender(
+                    self.app_config,
+                    self.smtp_config,
+                    True,
+                ).send_mails(messages)
+        eq_(messages, exc_info.value.failed_messages)
+        assert not send_emails_through.called
+
+    def test_unit__send_mail__err__no_retry_after_data(self):
+        def lose_connection(smtp, *args, **kwargs):
+            smtp.data_sent = True
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')  # nopep8
+
+        email_sender = EmailSender(self.app_config, self.smtp_config, True)
+        with patch.object(
+            DataTrackingSMTP,
+            'data',
+            autospec=True,
+            side_effect=lose_connection,
+        ) as data:
+            with pytest.raises(smtplib.SMTPServerDisconnected):
+                email_sender.send_mail(self._get_message(0))
+            with pytest.raises(EmailsSendingFailed):
+                email_sender.send_mails(
+                    [self._get_message(number) for number in range(1, 3)]
+                )
+        # INFO - G.M - 2018-12-20 - no message is sent again once DATA is
+        # reached: server may have accepted it.
+        eq_(3, data.call_count)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from rq.job import JobStatus
+from sqlalchemy import create_engine
+
+from tracim_backend.lib.preview.generator import LocalPreviewGeneratorQueue
+from tracim_backend.lib.preview.generator import RevisionPreviewGenerator
+from tracim_backend.lib.preview.generator import generate_revision_previews_in_background  # nopep8
+from tracim_backend.tests import StandardTest
+from tracim_backend.tests import eq_
+
+
+class TestRevisionPreviewGenerator(StandardTest):
+
+    def test_unit__pickle__ok__engine_recreated_from_url(self):
+        engine = create_engine('sqlite:///:memory:')
+        generator = RevisionPreviewGenerator(self.app_config, engine)
+
+        unpickled_generator = pickle.loads(pickle.dumps(generator))
+
+        assert unpickled_generator._engine is None
+        assert str(unpickled_generator._get_engine().url) == str(engine.url)
+        assert unpickled_generator.config.PREVIEW_CACHE_DIR == \
+            self.app_config.PREVIEW_CACHE_DIR
+        # INFO - G.M - 2018-12-26 - unpickled jobs of a worker process share
+        # one engine
+        other_generator = pickle.loads(pickle.dumps(generator))
+        assert other_generator._get_engine() is unpickled_generator._get_engine()  # nopep8
+
+    def test_unit__generate_in_background__ok__async_job_not_duplicated(self):
+        self.app_config.PREVIEW_PROCESSING_MODE = self.app_config.CST.ASYNC
+        with patch('tracim_backend.lib.preview.generator.get_redis_connection'), \
+                patch('tracim_backend.lib.preview.generator.get_rq_queue') as get_rq_queue:  # nopep8
+            rq_queue = get_rq_queue.return_value
+            rq_queue.fetch_job.return_value = None
+            generate_revision_previews_in_background(
+                self.app_config,
+                self.engine,
+                42,
+            )
+            eq_(1, rq_queue.enqueue.call_count)
+            eq_('revision_previews_42', rq_queue.enqueue.call_args[1]['job_id'])  # nopep8
+            rq_queue.fetch_job.assert_called_with('revision_previews_42')
+
+            rq_queue.fetch_job.return_value = MagicMock()
+            rq_queue.fetch_job.return_value.get_status.return_value = \
+                JobStatus.QUEUED
+            generate_revision_previews_in_background(
+                self.app_config,
+                self.engine,
+                42,
+            )
+            eq_(1, rq_queue.enqueue.call_count)
+
+
+class TestLocalPreviewGeneratorQueue(object):
+
+    def test_unit__enqueue__ok__run_in_background_thread(self):
+        preview_queue = LocalPreviewGeneratorQueue()
+        done = threading.Event()
+        results = []
+
+        def failing_job():
+            raise Exception('job failure should not stop worker')
+
+        def job(value: int):
+            results.append((value, threading.current_thread().name))
+            done.set()
+
+        preview_queue.enqueue(failing_job)
+        preview_queue.enqueue(job, 42)
+
+        assert done.wait(timeout=5)
+        assert results == [(42, 'preview_generator')]
+
+    def test_unit__enqueue_revision__ok__pending_revision_not_enqueued_twice(self):  # nopep8
+        preview_queue = LocalPreviewGeneratorQueue()
+        started = threading.Event()
+        release = threading.Event()
+        generated = []
+
+        class FakeGenerator(object):
+            def generate(self, revision_id: int) -> None:
+                started.set()
+                release.wait(timeout=5)
+                generated.append(revision_id)
+
+        generator = FakeGenerator()
+        preview_queue.enqueue_revision(generator, 42)
+        assert started.wait(timeout=5)
+        preview_queue.enqueue_revision(generator, 42)
+        release.set()
+        preview_queue._queue.join()
+        assert generated == [42]
+
+        # INFO - G.M - 2018-12-26 - once done, revision can be enqueued again
+        started.clear()
+        preview_queue.enqueue_revision(generator, 42)
+        preview_queue._queue.join()
+        assert generated == [42, 42]
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import pytest
 import transaction
+from unittest.mock import patch
 from marshmallow import ValidationError
 
 from tracim_backend import models
@@ -11,6 +12,7 @@ from tracim_backend.exceptions import TracimValidationFailed
 from tracim_backend.exceptions import UserAuthenticatedIsNotActive
 from tracim_backend.exceptions import UserDoesNotExist
 from tracim_backend.lib.core.group import GroupApi
+from tracim_backend.lib.core.user import CredentialCache
 from tracim_backend.lib.core.user import UserApi
 from tracim_backend.lib.core.userworkspace import RoleApi
 from tracim_backend.lib.core.workspace import WorkspaceApi
@@ -862,6 +864,19 @@ class TestUserApi(DefaultTest):
         with pytest.raises(UserAuthenticatedIsNotActive):
             api.authenticate_user('test@test.test', 'test@test.test')
 
+    def test_unit__authenticate_user___err__user_deleted(self):
+        api = UserApi(
+            current_user=None,
+            session=self.session,
+            config=self.config,
+            show_deleted=True,
+        )
+        user = api.get_one_by_email('admin@admin.admin')
+        user.is_deleted = True
+        self.session.flush()
+        with pytest.raises(AuthenticationFailed):
+            api.authenticate_user('admin@admin.admin', 'admin@admin.admin')
+
     def test_unit__authenticate_user___err__wrong_password(self):
         api = UserApi(
             current_user=None,
@@ -945,3 +960,30 @@ class TestUserApi(DefaultTest):
         from tracim_backend.exceptions import UserCantDisableHimself
         with pytest.raises(UserCantDisableHimself):
             api2.disable(user)
+
+
+class TestCredentialCache(object):
+
+    def test_unit__get_user_id__ok__nominal_case(self):
+        cache = CredentialCache(maxsize=10)
+        cache.set_user_id('bob@bob', 'password', 1, ttl=60)
+        assert cache.get_user_id('bob@bob', 'password') == 1
+        assert cache.get_user_id('bob@bob', 'other_password') is None
+        assert cache.get_user_id('other@bob', 'password') is None
+
+    def test_unit__get_user_id__ok__expired(self):
+        cache = CredentialCache(maxsize=10)
+        with patch('time.monotonic', return_value=1000):
+            cache.set_user_id('bob@bob', 'password', 1, ttl=60)
+        with patch('time.monotonic', return_value=1061):
+            assert cache.get_user_id('bob@bob', 'password') is None
+
+    def test_unit__invalidate_user__ok__all_user_credentials(self):
+        cache = CredentialCache(maxsize=10)
+        cache.set_user_id('bob@bob', 'password', 1, ttl=60)
+        cache.set_user_id('bob@bob', 'password2', 1, ttl=60)
+        cache.set_user_id('alice@alice', 'password', 2, ttl=60)
+        cache.invalidate_user(1)
+        assert cache.get_user_id('bob@bob', 'password') is None
+        assert cache.get_user_id('bob@bob', 'password2') is None
+        assert cache.get_user_id('alice@alice', 'password') == 2
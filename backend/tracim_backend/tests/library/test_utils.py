@@ -1,8 +1,27 @@
+import json
+import os
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
 import pytest
 
+from rq.dummy import do_nothing
+
+from tracim_backend.lib.core.content_tree import CONTENT_TREE_OPERATION_QUEUE_NAME  # nopep8
+from tracim_backend.lib.core.content_tree_daemon import ContentTreeOperationDaemon  # nopep8
+from tracim_backend.lib.mail_notifier.daemon import MailSenderDaemon
+from tracim_backend.lib.mail_notifier.sender import MAIL_SENDER_QUEUE_NAME
+from tracim_backend.lib.preview.daemon import PreviewGeneratorDaemon
+from tracim_backend.lib.preview.generator import PREVIEW_GENERATOR_QUEUE_NAME
+from tracim_backend.lib.utils.daemon import RQWorker
+from tracim_backend.lib.utils.translation import TRANSLATION_FILENAME
+from tracim_backend.lib.utils.translation import Translator
+from tracim_backend.lib.utils.translation import load_translation_catalogs
+from tracim_backend.lib.utils.translation import translation_catalog_cache
 from tracim_backend.lib.utils.utils import ALLOWED_AUTOGEN_PASSWORD_CHAR
 from tracim_backend.lib.utils.utils import DEFAULT_PASSWORD_GEN_CHAR_LENGTH
 from tracim_backend.lib.utils.utils import ExtendedColor
+from tracim_backend.lib.utils.utils import LRUCache
 from tracim_backend.lib.utils.utils import clamp
 from tracim_backend.lib.utils.utils import password_generator
 
@@ -67,3 +86,102 @@ class TestExtendedColor(object):
         # add X% more light to something already dark.
         assert color_darken == color_lighten
         assert color_darken.web == color.web
+
+
+class TestLRUCache(object):
+
+    def test_lru_cache__ok__nominal_case(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        # INFO - G.M - 2018-12-10 - 'b' is the least recently used item
+        cache.set('c', 3)
+        assert len(cache) == 2
+        assert cache.get('b') is None
+        assert cache.get('b', 'default') == 'default'
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        cache.delete('a')
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestTranslator(object):
+
+    def _get_config(self, i18n_folder: str, reload: bool=False) -> MagicMock:
+        config = MagicMock()
+        config.BACKEND_I18N_FOLDER = i18n_folder
+        config.BACKEND_I18N_RELOAD = reload
+        return config
+
+    def _write_catalog(self, i18n_folder, lang: str, catalog: dict) -> str:
+        lang_folder = i18n_folder.join(lang)
+        lang_folder.ensure(dir=True)
+        filepath = lang_folder.join(TRANSLATION_FILENAME)
+        filepath.write(json.dumps(catalog))
+        return str(filepath)
+
+    def setup_method(self):
+        translation_catalog_cache.clear()
+
+    def teardown_method(self):
+        translation_catalog_cache.clear()
+
+    def test_translator__get_translation__ok__catalog_loaded_once(self, tmpdir):  # nopep8
+        self._write_catalog(tmpdir, 'en', {'Hello': 'Hello'})
+        self._write_catalog(tmpdir, 'fr', {'Hello': 'Bonjour'})
+        config = self._get_config(str(tmpdir))
+        load_translation_catalogs(config)
+        translator = Translator(config, default_lang='fr')
+        with patch('builtins.open') as open_:
+            assert translator.get_translation('Hello') == 'Bonjour'
+            assert translator.get_translation('Hello', lang='en') == 'Hello'
+            assert translator.get_translation('Bye') == 'Bye'
+            assert not open_.called
+
+    def test_translator__get_translation__ok__reload_changed_catalog(self, tmpdir):  # nopep8
+        filepath = self._write_catalog(tmpdir, 'fr', {'Hello': 'Bonjour'})
+        translator = Translator(
+            self._get_config(str(tmpdir), reload=True),
+            default_lang='fr',
+        )
+        assert translator.get_translation('Hello') == 'Bonjour'
+        self._write_catalog(tmpdir, 'fr', {'Hello': 'Salut'})
+        mtime = os.stat(filepath).st_mtime
+        os.utime(filepath, (mtime + 1, mtime + 1))
+        assert translator.get_translation('Hello') == 'Salut'
+
+        translator = Translator(
+            self._get_config(str(tmpdir), reload=False),
+            default_lang='fr',
+        )
+        self._write_catalog(tmpdir, 'fr', {'Hello': 'Coucou'})
+        os.utime(filepath, (mtime + 2, mtime + 2))
+        assert translator.get_translation('Hello') == 'Salut'
+
+
+class TestRQWorkerDaemon(object):
+
+    @pytest.mark.parametrize('daemon_class,queue_name', [
+        (MailSenderDaemon, MAIL_SENDER_QUEUE_NAME),
+        (PreviewGeneratorDaemon, PREVIEW_GENERATOR_QUEUE_NAME),
+        (ContentTreeOperationDaemon, CONTENT_TREE_OPERATION_QUEUE_NAME),
+    ])
+    def test_rq_worker_daemon__stop__ok__wake_up_own_queue(
+            self,
+            daemon_class,
+            queue_name,
+    ):
+        daemon = daemon_class(MagicMock(), burst=False)
+        assert daemon.queue_name == queue_name
+        assert daemon.burst is False
+        daemon.worker = MagicMock(spec=RQWorker)
+        daemon.worker._stop_requested = False
+        with patch('tracim_backend.lib.utils.daemon.get_redis_connection'), \
+                patch('tracim_backend.lib.utils.daemon.get_rq_queue') as get_rq_queue:  # nopep8
+            daemon.stop()
+        assert daemon.worker._stop_requested is True
+        assert get_rq_queue.call_args[0][1] == queue_name
+        get_rq_queue.return_value.enqueue.assert_called_once_with(do_nothing)
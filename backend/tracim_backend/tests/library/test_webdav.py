@@ -3,22 +3,40 @@ import io
 import os
 
 import pytest
+from sqlalchemy import event
 from sqlalchemy.exc import InvalidRequestError
+from wsgidav.dav_error import DAVError
+from wsgidav.dav_error import HTTP_LOCKED
 from wsgidav.wsgidav_app import DEFAULT_CONFIG
 from tracim_backend import WebdavAppFactory
+from tracim_backend.app_models.contents import content_type_list
+from tracim_backend.lib.core.content import ContentApi
 from tracim_backend.lib.core.user import UserApi
+from tracim_backend.lib.core.user import credential_cache
 from tracim_backend.lib.webdav import TracimDomainController
+from tracim_backend.lib.webdav.authentification import \
+    TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY
 from tracim_backend.tests import eq_
 from tracim_backend.lib.core.notifications import DummyNotifier
 from tracim_backend.lib.webdav.dav_provider import Provider
+from tracim_backend.lib.webdav.dav_provider import content_path_cache
+from tracim_backend.lib.webdav.lock_storage import LockStorage
+from tracim_backend.lib.webdav.resources import FileResource
+from tracim_backend.lib.webdav.resources import OtherFileResource
 from tracim_backend.lib.webdav.resources import RootResource
+from tracim_backend.lib.webdav.resources import designed_content_cache
 from tracim_backend.models import Content
 from tracim_backend.models import ContentRevisionRO
+from tracim_backend.models import User
+from tracim_backend.models.data import RevisionPreviewMetadata
+from tracim_backend.models.data import WebdavLock
 from tracim_backend.tests import StandardTest
 from tracim_backend.fixtures.content import Content as ContentFixtures
 from tracim_backend.fixtures.users_and_groups import Base as BaseFixture
 from wsgidav import util
 from unittest.mock import MagicMock
+from unittest.mock import PropertyMock
+from unittest.mock import patch
 
 
 class TestWebdavFactory(StandardTest):
@@ -57,6 +75,7 @@ class TestWebdavFactory(StandardTest):
         assert 'provider_mapping' in config
         assert config['root_path'] in config['provider_mapping']
         assert isinstance(config['provider_mapping'][config['root_path']], Provider)  # nopep8
+        assert isinstance(config['locksmanager'], LockStorage)
         assert 'domaincontroller' in config
         assert isinstance(config['domaincontroller'], TracimDomainController)
 
@@ -82,6 +101,254 @@ class TestWebdavFactory(StandardTest):
         assert webdav_config_file['defaultdigest'] is False
 
 
+class TestWebdavLockStorage(StandardTest):
+    fixtures = [BaseFixture]
+
+    def _get_lock_storage(self) -> LockStorage:
+        lock_storage = LockStorage(
+            session_factory=self.session_factory,
+            sweep_interval=0,
+        )
+        lock_storage.open()
+        return lock_storage
+
+    def _get_lock(self, timeout: int=60) -> dict:
+        return {
+            'type': 'write',
+            'scope': 'exclusive',
+            'depth': 'infinity',
+            'owner': b'<owner>bob</owner>',
+            'principal': 'bob@fsf.local',
+            'timeout': timeout,
+        }
+
+    def test_unit__create_lock__ok__shared_between_storages(self):
+        lock_storage = self._get_lock_storage()
+        # INFO - G.M - 2018-12-12 - other storage simulate another webdav
+        # process using same database.
+        other_lock_storage = self._get_lock_storage()
+        eq_([], other_lock_storage.getLockList('/', True, True, False))
+
+        lock = lock_storage.create('/Recipes/Desserts', self._get_lock())
+        other_lock = other_lock_storage.get(lock['token'])
+        eq_(lock, other_lock)
+        eq_(b'<owner>bob</owner>', other_lock['owner'])
+        eq_(
+            [lock['token']],
+            other_lock_storage.getLockList('/Recipes', False, True, True),
+        )
+        eq_(
+            [lock['token']],
+            other_lock_storage.getLockList('/Recipes/Desserts', True, False, True),  # nopep8
+        )
+        eq_([], other_lock_storage.getLockList('/Recipes', True, False, True))
+        eq_([], other_lock_storage.getLockList('/Recipes/Dess', True, True, True))  # nopep8
+
+        assert other_lock_storage.delete(lock['token'])
+        assert lock_storage.get(lock['token']) is None
+        eq_([], lock_storage.getLockList('/', True, True, True))
+        assert not lock_storage.delete(lock['token'])
+
+    def test_unit__refresh_lock__ok__shared_between_storages(self):
+        lock_storage = self._get_lock_storage()
+        other_lock_storage = self._get_lock_storage()
+        lock = lock_storage.create('/Recipes/Desserts', self._get_lock())
+        eq_(lock, other_lock_storage.get(lock['token']))
+
+        refreshed_lock = lock_storage.refresh(lock['token'], 3600)
+        eq_(3600, refreshed_lock['timeout'])
+        assert refreshed_lock['expire'] > lock['expire']
+        eq_(refreshed_lock, other_lock_storage.get(lock['token']))
+
+    def test_unit__create_lock__err__conflict_with_other_storage(self):
+        lock_storage = self._get_lock_storage()
+        other_lock_storage = self._get_lock_storage()
+        lock_storage.create('/Recipes/Desserts', self._get_lock())
+        # INFO - G.M - 2018-12-27 - other storage index is loaded before
+        # lock creation, conflict is found in database.
+        for path in ('/Recipes/Desserts', '/Recipes', '/Recipes/Desserts/Pie'):  # nopep8
+            with pytest.raises(DAVError) as exc_info:
+                other_lock_storage.create(path, self._get_lock())
+            eq_(HTTP_LOCKED, exc_info.value.value)
+            eq_(
+                ['/Recipes/Desserts'],
+                exc_info.value.errcondition.hrefs,
+            )
+        depth_0_lock = self._get_lock()
+        depth_0_lock['depth'] = '0'
+        other_lock_storage.create('/Recipes', depth_0_lock)
+        other_lock_storage.create('/Recipes/Salads', self._get_lock())
+        eq_(3, self.session.query(WebdavLock).count())
+
+    def test_unit__create_lock__ok__shared_locks(self):
+        lock_storage = self._get_lock_storage()
+        other_lock_storage = self._get_lock_storage()
+        shared_lock = self._get_lock()
+        shared_lock['scope'] = 'shared'
+        lock_storage.create('/Recipes/Desserts', dict(shared_lock))
+        other_lock_storage.create('/Recipes/Desserts', dict(shared_lock))
+        with pytest.raises(DAVError):
+            other_lock_storage.create('/Recipes/Desserts', self._get_lock())
+        eq_(2, self.session.query(WebdavLock).count())
+
+    def test_unit__get_lock__ok__index_reloaded_only_on_change(self):
+        lock_storage = self._get_lock_storage()
+        other_lock_storage = self._get_lock_storage()
+        lock = lock_storage.create('/Recipes/Desserts', self._get_lock())
+        lock_storage.get(lock['token'])
+        index = lock_storage._index
+        lock_storage.getLockList('/', True, True, True)
+        assert lock_storage._index is index
+        lock_id = self.session.query(WebdavLock.id).scalar()
+
+        other_lock_storage.refresh(lock['token'], 3600)
+        eq_(3600, lock_storage.get(lock['token'])['timeout'])
+        assert lock_storage._index is not index
+        # INFO - G.M - 2018-12-27 - lock is updated in place
+        eq_(lock_id, self.session.query(WebdavLock.id).scalar())
+
+    def test_unit__cleanup__ok__purge_expired_locks(self):
+        lock_storage = self._get_lock_storage()
+        other_lock_storage = self._get_lock_storage()
+        lock = lock_storage.create('/Recipes/Desserts', self._get_lock())
+        valid_lock = lock_storage.create('/Recipes/Salads', self._get_lock())
+        with patch('time.time', return_value=lock['expire'] + 1):
+            eq_([], lock_storage.getLockList('/', True, True, False))
+            # INFO - G.M - 2018-12-12 - valid lock is refreshed, then
+            # expired lock only remains expired.
+            lock_storage.refresh(valid_lock['token'], 60)
+            other_lock_storage.cleanup()
+            eq_(
+                [valid_lock['token']],
+                lock_storage.getLockList('/', True, True, True),
+            )
+        assert lock_storage.get(lock['token']) is None
+        eq_(1, self.session.query(WebdavLock).count())
+
+
+class TestWebdavDomainController(StandardTest):
+    fixtures = [BaseFixture]
+
+    def _get_environ(self) -> dict:
+        return {
+            'tracim_dbsession': self.session,
+        }
+
+    def test_unit__auth_domain_user__ok__nominal_case(self):
+        domain_controller = TracimDomainController(app_config=self.app_config)
+        environ = self._get_environ()
+        assert domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'admin@admin.admin',
+            environ,
+        )
+        user = environ[TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY]
+        eq_('admin@admin.admin', user.email)
+
+    def test_unit__auth_domain_user__err__wrong_password(self):
+        domain_controller = TracimDomainController(app_config=self.app_config)
+        environ = self._get_environ()
+        assert not domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'wrong_password',
+            environ,
+        )
+        assert TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY not in environ
+        assert not domain_controller.authDomainUser(
+            '/',
+            'unknown@admin.admin',
+            'admin@admin.admin',
+            environ,
+        )
+
+    def test_unit__auth_domain_user__err__deleted_user(self):
+        domain_controller = TracimDomainController(app_config=self.app_config)
+        user = UserApi(
+            current_user=None,
+            session=self.session,
+            config=self.app_config,
+        ).get_one_by_email('admin@admin.admin')
+        user.is_deleted = True
+        self.session.flush()
+        environ = self._get_environ()
+        assert not domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'admin@admin.admin',
+            environ,
+        )
+        assert TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY not in environ
+
+    def test_unit__auth_domain_user__ok__credential_cache(self):
+        domain_controller = TracimDomainController(app_config=self.app_config)
+        assert domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'admin@admin.admin',
+            self._get_environ(),
+        )
+        with patch.object(User, 'validate_password') as validate_password:
+            environ = self._get_environ()
+            assert domain_controller.authDomainUser(
+                '/',
+                'admin@admin.admin',
+                'admin@admin.admin',
+                environ,
+            )
+            assert not validate_password.called
+        user = environ[TRACIM_WEBDAV_AUTHENTICATED_USER_ENVIRON_KEY]
+        eq_('admin@admin.admin', user.email)
+
+        # Password change invalidate cached credentials
+        api = UserApi(
+            current_user=None,
+            session=self.session,
+            config=self.app_config,
+        )
+        api.update(user, password='new_password', do_save=True)
+        assert not domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'admin@admin.admin',
+            self._get_environ(),
+        )
+        assert domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'new_password',
+            self._get_environ(),
+        )
+
+        # Disabled user credentials are invalidated
+        api.disable(user, do_save=True)
+        assert credential_cache.get_user_id(
+            'admin@admin.admin',
+            'new_password',
+        ) is None
+        assert not domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'new_password',
+            self._get_environ(),
+        )
+
+    def test_unit__auth_domain_user__ok__no_credential_cache(self):
+        self.app_config.WSGIDAV_AUTH_CACHE_TTL = 0
+        domain_controller = TracimDomainController(app_config=self.app_config)
+        assert domain_controller.authDomainUser(
+            '/',
+            'admin@admin.admin',
+            'admin@admin.admin',
+            self._get_environ(),
+        )
+        assert credential_cache.get_user_id(
+            'admin@admin.admin',
+            'admin@admin.admin',
+        ) is None
+
+
 class TestWebDav(StandardTest):
     fixtures = [BaseFixture, ContentFixtures]
 
@@ -377,6 +644,29 @@ class TestWebDav(StandardTest):
             )
         )
 
+    def test_unit__get_content__ok__stream_depot_file(self):
+        provider = self._get_provider(self.app_config)
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        result = self._put_new_text_file(
+            provider,
+            environ,
+            '/Recipes/Salads/greek_salad.txt',
+            b'Greek Salad\n',
+        )
+        content_stream = result.getContent()
+        # INFO - G.M - 2018-12-10 - content should be streamed from depot,
+        # not copied in memory.
+        assert not isinstance(content_stream, io.BytesIO)
+        assert content_stream.read() == b'Greek Salad\n'
+        content_stream.close()
+        assert result.getContentLength() == len(b'Greek Salad\n')
+        # INFO - G.M - 2018-12-10 - memory depot storage stream is not
+        # seekable
+        assert result.supportRanges() is False
+
     def test_unit__create_delete_and_create_file__ok(self):
         provider = self._get_provider(self.app_config)
         environ = self._get_environ(
@@ -674,3 +964,222 @@ class TestWebDav(StandardTest):
                 DummyNotifier.send_count
             ),
         )
+
+    def test_unit__update_content__ok__same_content_no_new_revision(self):
+        provider = self._get_provider(self.app_config)
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        result = self._put_new_text_file(
+            provider,
+            environ,
+            '/Recipes/Salads/greek_salad.txt',
+            b'hello\n',
+        )
+        revisions_nb = len(result.content.revisions)
+
+        # Re-upload same file content: sha256 of stored file is known,
+        # stored file is not read.
+        write_object = result.beginWrite(
+            contentType='application/octet-stream',
+        )
+        write_object.write(b'hello\n')
+        with patch.object(
+            type(result.content.depot_file),
+            'file',
+            new_callable=PropertyMock,
+        ) as stored_file:
+            write_object.close()
+            assert not stored_file.called
+        result.endWrite(withErrors=False)
+
+        result = provider.getResourceInst(
+            '/Recipes/Salads/greek_salad.txt',
+            environ,
+        )
+        eq_(revisions_nb, len(result.content.revisions))
+
+        # Upload other file content with same size
+        write_object = result.beginWrite(
+            contentType='application/octet-stream',
+        )
+        write_object.write(b'world\n')
+        write_object.close()
+        result.endWrite(withErrors=False)
+
+        result = provider.getResourceInst(
+            '/Recipes/Salads/greek_salad.txt',
+            environ,
+        )
+        eq_(revisions_nb + 1, len(result.content.revisions))
+        eq_(b'world\n', result.content.depot_file.file.read())
+
+    def test_unit__update_content__ok__spooled_to_disk(self):
+        self.app_config.WSGIDAV_UPLOAD_SPOOL_MAX_SIZE = 10
+        provider = self._get_provider(self.app_config)
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        file_content = b'a' * 1000
+        result = self._put_new_text_file(
+            provider,
+            environ,
+            '/Recipes/Salads/greek_salad.txt',
+            file_content,
+        )
+        eq_(file_content, result.content.depot_file.file.read())
+
+    def test_unit__get_content__ok__path_cache(self):
+        provider = self._get_provider(self.app_config)
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        pie = provider.getResourceInst(
+            '/Recipes/Desserts/Apple_Pie.txt',
+            environ,
+        )
+        assert pie
+        pie_content_id = pie.content.content_id
+        assert len(content_path_cache) > 0
+
+        # New request use process wide path cache
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        with patch.object(
+            provider,
+            '_get_content_from_path_labels',
+        ) as get_content_from_path_labels:
+            pie = provider.getResourceInst(
+                '/Recipes/Desserts/Apple_Pie.txt',
+                environ,
+            )
+            assert not get_content_from_path_labels.called
+        assert pie.content.content_id == pie_content_id
+
+        # Rename content invalidate path cache
+        pie.moveRecursive('/Recipes/Desserts/Apple_Pie_RENAMED.txt')
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        assert provider.getResourceInst(
+            '/Recipes/Desserts/Apple_Pie.txt',
+            environ,
+        ) is None
+        pie = provider.getResourceInst(
+            '/Recipes/Desserts/Apple_Pie_RENAMED.txt',
+            environ,
+        )
+        assert pie.content.content_id == pie_content_id
+
+    def test_unit__list_content__ok__no_query_by_member(self):
+        provider = self._get_provider(self.app_config)
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        folder = provider.getResourceInst(
+            '/Recipes/Desserts',
+            environ,
+        )
+        # INFO - G.M - 2018-12-11 - file size is known from preview metadata.
+        # INFO - G.M - 2018-12-27 - Files of memory depot of tests have no
+        # path, previews can not be computed: store metadata as computed.
+        content_api = ContentApi(
+            current_user=environ['tracim_user'],
+            session=self.session,
+            config=self.app_config,
+        )
+        for content in content_api.get_all([folder.content.content_id]):
+            if content.type == content_type_list.File.slug:
+                self.session.add(RevisionPreviewMetadata(
+                    revision_id=content.revision_id,
+                    page_nb=None,
+                    has_pdf_preview=False,
+                    has_jpeg_preview=False,
+                    size=content.depot_file.file.content_length,
+                    mimetype=content.file_mimetype,
+                ))
+        self.session.flush()
+        # INFO - G.M - 2018-12-28 - page and thread length is known from
+        # their stored rendered html.
+        for member in folder.getMemberList():
+            if isinstance(member, OtherFileResource):
+                member.getContent()
+        designed_content_cache.clear()
+        self.session.expire_all()
+        members = folder.getMemberList()
+        statements = []
+
+        def count_statements(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.session.bind, 'before_cursor_execute', count_statements)  # nopep8
+        try:
+            with patch.object(FileResource, '_get_depot_file') as get_depot_file, \
+                    patch.object(OtherFileResource, 'design') as design:  # nopep8
+                for member in members:
+                    member.getDisplayName()
+                    member.getCreationDate()
+                    member.getLastModified()
+                    if not member.isCollection:
+                        member.getContentType()
+                        member.getContentLength()
+                assert not get_depot_file.called
+                assert not design.called
+        finally:
+            event.remove(self.session.bind, 'before_cursor_execute', count_statements)  # nopep8
+        eq_([], statements)
+
+    def test_unit__get_thread_content__ok__rendered_once_by_comment(self):
+        provider = self._get_provider(self.app_config)
+        environ = self._get_environ(
+            provider,
+            'bob@fsf.local',
+        )
+        folder = provider.getResourceInst(
+            '/Recipes/Desserts',
+            environ,
+        )
+
+        def get_thread():
+            return [
+                member for member in folder.getMemberList()
+                if member.name == 'Best Cakesʔ.thread.html'
+            ][0]
+
+        thread = get_thread()
+        assert isinstance(thread, OtherFileResource)
+        with patch.object(OtherFileResource, 'design', autospec=True, side_effect=OtherFileResource.design) as design:  # nopep8
+            content = thread.getContent().read()
+            eq_(len(content), thread.getContentLength())
+            # INFO - G.M - 2018-12-12 - new resource of same content
+            # revision use cached html
+            eq_(content, get_thread().getContent().read())
+            eq_(1, design.call_count)
+            # INFO - G.M - 2018-12-28 - html is stored with its length: it
+            # is not rendered again once cache is cold.
+            designed_content_cache.clear()
+            eq_(len(content), get_thread().getContentLength())
+            eq_(content, get_thread().getContent().read())
+            eq_(1, design.call_count)
+
+        content_api = ContentApi(
+            current_user=environ['tracim_user'],
+            session=self.session,
+            config=self.app_config,
+        )
+        content_api.create_comment(
+            parent=thread.content,
+            content='Chocolate cake is the best',
+            do_save=True,
+            do_notify=False,
+        )
+        self.session.flush()
+        assert 'Chocolate cake is the best' in \
+            get_thread().getContent().read().decode('utf-8')
@@ -2,6 +2,7 @@
 import time
 
 from depot.fields.upload import UploadedFile
+from sqlalchemy import inspect
 from sqlalchemy.sql.elements import and_
 from sqlalchemy.testing import eq_
 import transaction
@@ -17,6 +18,7 @@ from tracim_backend.models.data import ActionDescription
 from tracim_backend.models.data import ContentRevisionRO
 from tracim_backend.app_models.contents import content_type_list
 from tracim_backend.models.data import Workspace
+from tracim_backend.models.depot import ContentAddressedFile
 from tracim_backend.tests import StandardTest
 
 
@@ -326,7 +328,86 @@ class TestContent(StandardTest):
         # tests initialized depot file
         assert content.depot_file
         # tests type of initialized depot file
-        eq_(type(content.depot_file), UploadedFile)
+        eq_(type(content.depot_file), ContentAddressedFile)
+        assert isinstance(content.depot_file, UploadedFile)
         # tests content of initialized depot file
         # using depot_file.file of type StoredFile to fetch content back
         eq_(content.depot_file.file.read(), b'test')
+
+    def test_unit__cached_revision_id__ok__follow_last_revision(self):
+        content = self.test_create()
+        first_revision_id = content.revision.revision_id
+        eq_(content.cached_revision_id, first_revision_id)
+
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            content.description = 'TEST_CONTENT_DESCRIPTION_1_UPDATED'
+        self.session.flush()
+
+        last_revision = self.session.query(ContentRevisionRO).filter(
+            ContentRevisionRO.content_id == content.id
+        ).order_by(ContentRevisionRO.revision_id.desc()).first()
+        assert last_revision.revision_id != first_revision_id
+        eq_(content.cached_revision_id, last_revision.revision_id)
+        eq_(content.current_revision, last_revision)
+        eq_(content.revision, last_revision)
+
+    def test_unit__new_revision__ok__history_not_loaded(self):
+        content = self.test_create()
+        workspace = content.workspace
+        generation = workspace.content_tree_generation
+        first_revision_id = content.revision.revision_id
+        self.session.expire(content, ['revisions'])
+
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            content.label = 'TEST_CONTENT_1_RENAMED'
+        self.session.flush()
+        assert 'revisions' in inspect(content).unloaded
+        eq_(generation + 1, workspace.content_tree_generation)
+        assert content.revision.revision_id != first_revision_id
+        eq_(
+            [first_revision_id, content.revision.revision_id],
+            [revision.revision_id for revision in content.revisions],
+        )
+
+    def test_unit__workspace_content_tree_generation__ok__path_changes(self):
+        content = self.test_create()
+        workspace = content.workspace
+        generation = workspace.content_tree_generation
+
+        # description does not change content path
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            content.description = 'TEST_CONTENT_DESCRIPTION_1_UPDATED'
+        self.session.flush()
+        eq_(generation, workspace.content_tree_generation)
+
+        # label is part of content path
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            content.label = 'TEST_CONTENT_1_RENAMED'
+        self.session.flush()
+        eq_(generation + 1, workspace.content_tree_generation)
+
+        # new content change workspace content tree
+        self._create_content(
+            owner=self._get_user(),
+            workspace=workspace,
+            type=content_type_list.Page.slug,
+            label='TEST_CONTENT_2',
+            revision_type=ActionDescription.CREATION
+        )
+        eq_(generation + 2, workspace.content_tree_generation)
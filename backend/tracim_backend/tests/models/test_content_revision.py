@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
 from collections import OrderedDict
+from unittest.mock import patch
 
+import transaction
+from depot.fields.upload import UploadedFile
+from depot.manager import DepotManager
 from sqlalchemy import inspect
 
+from tracim_backend.lib.core.content import ContentApi
 from tracim_backend.models import ContentRevisionRO
 from tracim_backend.models import User
+from tracim_backend.models.data import Content
+from tracim_backend.models.depot import ContentAddressedFile
+from tracim_backend.models.depot import DepotBlob
+from tracim_backend.models.revision_protection import new_revision
 from tracim_backend.app_models.contents import content_type_list
 from tracim_backend.tests import DefaultTest
 from tracim_backend.tests import eq_
@@ -76,3 +85,166 @@ class TestContentRevision(DefaultTest):
 
         # They must be identical
         eq_(new_revision_by_model_dict, new_revision_by_test_dict)
+
+
+class TestContentRevisionDepotFile(DefaultTest):
+    """
+    Revisions depot files are content addressed and shared between revisions
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.admin = self.session.query(User).filter(
+            User.email == 'admin@admin.admin'
+        ).one()
+        self.workspace = self._create_workspace_and_test(
+            name='workspace_1',
+            user=self.admin
+        )
+        self.api = ContentApi(
+            current_user=self.admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        self.depot = DepotManager.get()
+
+    def _create_file(self, filename: str, file_content: bytes) -> Content:
+        content = self.api.create(
+            content_type_list.File.slug,
+            self.workspace,
+            None,
+            filename=filename,
+            do_save=True,
+            do_notify=False,
+        )
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            self.api.update_file_data(
+                content,
+                filename,
+                'text/plain',
+                file_content,
+            )
+        self.api.save(content, do_notify=False)
+        return content
+
+    def _get_blob(self, content: Content) -> DepotBlob:
+        return self.session.query(DepotBlob).get(
+            content.depot_file['sha256']
+        )
+
+    def test_unit__new_revision__ok__share_file(self):
+        content = self._create_file('file.txt', b'file content')
+        transaction.commit()
+        content = self.api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+        stored_file_nb = len(self.depot.list())
+        first_file_path = content.depot_file.path
+        for number in range(5):
+            with new_revision(
+                    session=self.session,
+                    tm=transaction.manager,
+                    content=content,
+            ):
+                self.api.update_content(
+                    content,
+                    'file{}'.format(number),
+                    'new description',
+                )
+            self.api.save(content, do_notify=False)
+        transaction.commit()
+
+        content = self.api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+        eq_(stored_file_nb, len(self.depot.list()))
+        revision_file_paths = {
+            revision.depot_file.path
+            for revision in content.revisions
+            if revision.depot_file
+        }
+        eq_({first_file_path}, revision_file_paths)
+        eq_(b'file content', content.depot_file.file.read())
+        eq_(6, self._get_blob(content).ref_count)
+
+    def test_unit__create__ok__deduplicate_same_content(self):
+        content1 = self._create_file('file1.txt', b'same content')
+        content2 = self._create_file('file2.txt', b'same content')
+        content3 = self._create_file('file3.txt', b'other content')
+        transaction.commit()
+
+        content1 = self.api.get_one(content1.content_id, content_type_list.Any_SLUG)  # nopep8
+        content2 = self.api.get_one(content2.content_id, content_type_list.Any_SLUG)  # nopep8
+        content3 = self.api.get_one(content3.content_id, content_type_list.Any_SLUG)  # nopep8
+        eq_(content1.depot_file.path, content2.depot_file.path)
+        assert content1.depot_file.path != content3.depot_file.path
+        eq_(2, self._get_blob(content1).ref_count)
+        eq_(1, self._get_blob(content3).ref_count)
+        # INFO - G.M - 2018-12-14 - duplicated file is deleted from depot
+        eq_(2, len(self.depot.list()))
+
+    def test_unit__create__ok__same_content_stored_concurrently(self):
+        content1 = self._create_file('file1.txt', b'same content')
+        transaction.commit()
+        # INFO - G.M - 2018-12-27 - blob of content1 is not found by lookup,
+        # as if it was inserted by a concurrent upload after it.
+        with patch(
+            'tracim_backend.models.depot._get_depot_blob',
+            return_value=None,
+        ):
+            content2 = self._create_file('file2.txt', b'same content')
+            transaction.commit()
+
+        content1 = self.api.get_one(content1.content_id, content_type_list.Any_SLUG)  # nopep8
+        content2 = self.api.get_one(content2.content_id, content_type_list.Any_SLUG)  # nopep8
+        eq_(content1.depot_file.path, content2.depot_file.path)
+        eq_(b'same content', content2.depot_file.file.read())
+        eq_(2, self._get_blob(content1).ref_count)
+        eq_(1, len(self.depot.list()))
+
+    def test_unit__new_revision__ok__register_file_without_sha256(self):
+        content = self._create_file('file.txt', b'file content')
+        # INFO - G.M - 2018-12-14 - file stored before content addressing,
+        # as loaded from database
+        content.revision.depot_file = ContentAddressedFile(
+            dict(UploadedFile(b'legacy content'))
+        )
+        self.session.flush()
+        transaction.commit()
+        content = self.api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+        assert not content.depot_file.get('sha256')
+        legacy_file_path = content.depot_file.path
+        stored_file_nb = len(self.depot.list())
+
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            self.api.update_content(content, 'renamed', 'new description')
+        self.api.save(content, do_notify=False)
+        transaction.commit()
+
+        content = self.api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+        eq_(legacy_file_path, content.depot_file.path)
+        eq_(stored_file_nb, len(self.depot.list()))
+        eq_(2, self._get_blob(content).ref_count)
+
+    def test_unit__new_revision__ok__rollback_keep_shared_file(self):
+        content = self._create_file('file.txt', b'file content')
+        transaction.commit()
+        content = self.api.get_one(content.content_id, content_type_list.Any_SLUG)  # nopep8
+        content_id = content.content_id
+        with new_revision(
+                session=self.session,
+                tm=transaction.manager,
+                content=content,
+        ):
+            self.api.update_content(content, 'renamed', 'new description')
+        self.api.save(content, do_notify=False)
+        self.session.rollback()
+        transaction.abort()
+
+        content = self.api.get_one(content_id, content_type_list.Any_SLUG)
+        eq_(b'file content', content.depot_file.file.read())
+        eq_(1, self._get_blob(content).ref_count)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy.dialects.mysql.pymysql import MySQLDialect_pymysql
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+
+from tracim_backend.models.meta import has_insert_returning
+from tracim_backend.models.meta import has_recursive_cte
+from tracim_backend.models.meta import has_upsert
+from tracim_backend.models.meta import has_window_functions
+
+
+class TestDialectFeatures(object):
+
+    def _get_dialect(self, dialect_class, server_version_info):
+        dialect = dialect_class()
+        dialect.server_version_info = server_version_info
+        return dialect
+
+    def test_unit__has_recursive_cte__ok__mysql_versions(self):
+        assert not has_recursive_cte(
+            self._get_dialect(MySQLDialect_pymysql, (5, 7, 24))
+        )
+        assert has_recursive_cte(
+            self._get_dialect(MySQLDialect_pymysql, (8, 0, 13))
+        )
+        assert not has_recursive_cte(self._get_dialect(
+            MySQLDialect_pymysql,
+            (5, 5, 5, 10, 1, 37, 'MariaDB'),
+        ))
+        assert has_recursive_cte(self._get_dialect(
+            MySQLDialect_pymysql,
+            (5, 5, 5, 10, 3, 11, 'MariaDB'),
+        ))
+
+    def test_unit__has_upsert__ok__postgresql_versions(self):
+        assert not has_upsert(self._get_dialect(PGDialect_psycopg2, (9, 3)))
+        assert has_upsert(self._get_dialect(PGDialect_psycopg2, (9, 5)))
+        assert has_upsert(self._get_dialect(PGDialect_psycopg2, (10, 6)))
+        assert not has_upsert(
+            self._get_dialect(MySQLDialect_pymysql, (8, 0, 13))
+        )
+
+    def test_unit__has_insert_returning__ok__dialects(self):
+        assert has_insert_returning(
+            self._get_dialect(PGDialect_psycopg2, (9, 3))
+        )
+        assert not has_insert_returning(
+            self._get_dialect(MySQLDialect_pymysql, (8, 0, 13))
+        )
+
+    def test_unit__has_window_functions__ok__mysql_versions(self):
+        assert not has_window_functions(
+            self._get_dialect(MySQLDialect_pymysql, (5, 7, 24))
+        )
+        assert has_window_functions(
+            self._get_dialect(MySQLDialect_pymysql, (8, 0, 13))
+        )
+        assert not has_window_functions(self._get_dialect(
+            MySQLDialect_pymysql,
+            (5, 5, 5, 10, 1, 37, 'MariaDB'),
+        ))
+        assert has_window_functions(self._get_dialect(
+            MySQLDialect_pymysql,
+            (5, 5, 5, 10, 2, 19, 'MariaDB'),
+        ))
+        assert has_window_functions(
+            self._get_dialect(PGDialect_psycopg2, (9, 3))
+        )
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import typing
+
+import pytest
+import transaction
+
+from tracim_backend.app_models.contents import content_type_list
+from tracim_backend.lib.core.content import ContentApi
+from tracim_backend.models import User
+from tracim_backend.models.revision_protection import new_revision
+from tracim_backend.models.search import ContentSearchIndex
+from tracim_backend.models.search import PythonContentSearchIndex
+from tracim_backend.models.search import SqliteContentSearchIndex
+from tracim_backend.models.search import get_content_search_index
+from tracim_backend.models.search import get_raw_text
+from tracim_backend.models.search import get_search_terms
+from tracim_backend.tests import DefaultTest
+from tracim_backend.tests import eq_
+
+
+class TestContentSearchIndex(DefaultTest):
+
+    def _create_pages(self, labels: typing.List[str]) -> typing.List[int]:
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        workspace = self._create_workspace_and_test('workspace_1', admin)
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        return [
+            api.create(
+                content_type_list.Page.slug,
+                workspace,
+                None,
+                label,
+                do_save=True,
+            ).content_id
+            for label in labels
+        ]
+
+    def _check_search_index(self, search_index: ContentSearchIndex) -> None:
+        content_ids = self._create_pages(['page 1', 'page 2', 'page 3'])
+        connection = self.session.connection()
+        search_index.index_contents(
+            connection,
+            [
+                (content_ids[0], 'Intervention report', ''),
+                (content_ids[1], 'Meeting', 'report of last intervention'),
+                (content_ids[2], 'Meeting', 'nothing to say'),
+            ]
+        )
+        matches = search_index.get_matches(['interv'])
+        result = self.session.query(matches.c.content_id)\
+            .order_by(matches.c.rank.desc())\
+            .all()
+        eq_([content_ids[0], content_ids[1]], [row[0] for row in result])
+
+        # INFO - G.M - 2018-12-21 - indexing again replace indexed text
+        search_index.index_contents(
+            connection,
+            [(content_ids[0], 'Meeting', '')],
+        )
+        matches = search_index.get_matches(['meeting', 'nothing'])
+        result = self.session.query(matches.c.content_id)\
+            .order_by(matches.c.rank.desc(), matches.c.content_id)\
+            .all()
+        eq_(
+            [content_ids[2], content_ids[0], content_ids[1]],
+            [row[0] for row in result]
+        )
+        matches = search_index.get_matches(['intervention'])
+        result = self.session.query(matches.c.content_id).all()
+        eq_([content_ids[1]], [row[0] for row in result])
+
+    def test_unit__get_search_terms__ok__normalized(self):
+        eq_(
+            ['ete', 'a', 'l', 'ecole', 'n_42'],
+            get_search_terms("Été à l'École, n_42 !")
+        )
+        eq_([], get_search_terms(None))
+        eq_(['hello', 'world'], get_search_terms(get_raw_text('<p>Hello<br/>world</p>')))  # nopep8
+
+    def test_unit__python_search_index__ok__nominal_case(self):
+        self._check_search_index(PythonContentSearchIndex())
+
+    def test_unit__sqlite_search_index__ok__nominal_case(self):
+        if not SqliteContentSearchIndex.is_available(self.session.connection()):  # nopep8
+            pytest.skip('SQLite is built without FTS5')
+        self._check_search_index(SqliteContentSearchIndex())
+
+    def test_unit__search_index__ok__updated_on_new_revision(self):
+        content_id = self._create_pages(['Intervention report'])[0]
+        admin = self.session.query(User)\
+            .filter(User.email == 'admin@admin.admin').one()
+        api = ContentApi(
+            current_user=admin,
+            session=self.session,
+            config=self.app_config,
+        )
+        search_index = get_content_search_index(self.session.connection())
+
+        def search(keyword: str) -> typing.List[int]:
+            matches = search_index.get_matches(get_search_terms(keyword))
+            return [row[0] for row in self.session.query(matches.c.content_id)]  # nopep8
+
+        eq_([content_id], search('report'))
+        content = api.get_one(content_id, content_type_list.Any_SLUG)
+        with new_revision(
+            session=self.session,
+            tm=transaction.manager,
+            content=content,
+        ):
+            content.label = 'Meeting'
+            content.description = '<p>Café</p>'
+        api.save(content)
+        eq_([], search('report'))
+        eq_([content_id], search('meeting'))
+        eq_([content_id], search('cafe'))
@@ -13,6 +13,7 @@ from tracim_backend.lib.utils.authorization import is_contributor
 from tracim_backend.lib.utils.authorization import is_reader
 from tracim_backend.lib.utils.request import TracimRequest
 from tracim_backend.lib.utils.utils import generate_documentation_swagger_tag
+from tracim_backend.models.data import Content
 from tracim_backend.models.revision_protection import new_revision
 from tracim_backend.views.controllers import Controller
 from tracim_backend.views.core_api.schemas import CommentSchema
@@ -61,8 +62,12 @@ class CommentController(Controller):
             hapic_data.path.content_id,
             content_type=content_type_list.Any_SLUG
         )
-        comments = content.get_comments()
-        comments.sort(key=lambda comment: comment.created)
+        comments = api.get_children(
+            parent_ids=[content.content_id],
+            content_types=[content_type_list.Comment.slug],
+            only_active=True,
+            order_by_properties=[Content.created, Content.id],
+        )
         return [api.get_content_in_context(comment)
                 for comment in comments
         ]
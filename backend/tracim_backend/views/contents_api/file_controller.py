@@ -15,6 +15,7 @@ from tracim_backend.exceptions import EmptyLabelNotAllowed
 from tracim_backend.exceptions import PageOfPreviewNotFound
 from tracim_backend.exceptions import ParentNotFound
 from tracim_backend.exceptions import PreviewDimNotAllowed
+from tracim_backend.exceptions import PreviewNotReady
 from tracim_backend.exceptions import TracimFileNotFound
 from tracim_backend.exceptions import TracimUnavailablePreviewType
 from tracim_backend.exceptions import UnallowedSubContent
@@ -26,6 +27,8 @@ from tracim_backend.lib.utils.authorization import check_right
 from tracim_backend.lib.utils.authorization import is_contributor
 from tracim_backend.lib.utils.authorization import is_reader
 from tracim_backend.lib.utils.request import TracimRequest
+from tracim_backend.lib.utils.response import get_revision_file_etag
+from tracim_backend.lib.utils.response import get_stored_file_response
 from tracim_backend.lib.utils.utils import generate_documentation_swagger_tag
 from tracim_backend.models.context_models import ContentInContext
 from tracim_backend.models.context_models import RevisionInContext
@@ -46,6 +49,7 @@ from tracim_backend.views.core_api.schemas import \
 from tracim_backend.views.core_api.schemas import FileRevisionSchema
 from tracim_backend.views.core_api.schemas import NoContentSchema
 from tracim_backend.views.core_api.schemas import PageQuerySchema
+from tracim_backend.views.core_api.schemas import RevisionFilterQuerySchema
 from tracim_backend.views.core_api.schemas import SetContentStatusSchema
 from tracim_backend.views.core_api.schemas import SimpleFileSchema
 from tracim_backend.views.core_api.schemas import \
@@ -182,6 +186,7 @@ class FileController(Controller):
     def download_file(self, context, request: TracimRequest, hapic_data=None):
         """
         Download raw file of last revision of content.
+        Support conditional requests (ETag/Last-Modified) and byte ranges.
         Good pratice for filename is filename is `{label}{file_extension}` or `{filename}`.
         Default filename value is 'raw' (without file extension) or nothing.
         """
@@ -209,11 +214,14 @@ class FileController(Controller):
         filename = hapic_data.path.filename
         if not filename or filename == 'raw':
             filename = content.file_name
-        return HapicFile(
-            file_object=file,
-            mimetype=file.content_type,
+        return get_stored_file_response(
+            request=request,
+            stored_file=file,
+            etag=get_revision_file_etag(content.revision_id),
+            last_modified=content.updated,
             filename=filename,
-            as_attachment=hapic_data.query.force_download
+            as_attachment=hapic_data.query.force_download,
+            content_type=content.file_mimetype,
         )
 
     @hapic.with_api_doc(tags=[SWAGGER_TAG__CONTENT_FILE_ENDPOINTS])
@@ -225,6 +233,7 @@ class FileController(Controller):
     def download_revisions_file(self, context, request: TracimRequest, hapic_data=None):  # nopep8
         """
         Download raw file for specific revision of content.
+        Support conditional requests (ETag/Last-Modified) and byte ranges.
         Good pratice for filename is filename is `{label}_r{revision_id}{file_extension}`.
         Default filename value is 'raw' (without file extension) or nothing.
         """
@@ -261,11 +270,14 @@ class FileController(Controller):
                 revision_id=revision.revision_id,
                 file_extension=revision.file_extension
             )
-        return HapicFile(
-            file_object=file,
-            mimetype=file.content_type,
+        return get_stored_file_response(
+            request=request,
+            stored_file=file,
+            etag=get_revision_file_etag(revision.revision_id),
+            last_modified=revision.updated,
             filename=filename,
-            as_attachment=hapic_data.query.force_download
+            as_attachment=hapic_data.query.force_download,
+            content_type=revision.file_mimetype,
         )
 
     # preview
@@ -275,6 +287,7 @@ class FileController(Controller):
     @check_right(is_file_content)
     @hapic.handle_exception(TracimUnavailablePreviewType, HTTPStatus.BAD_REQUEST)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.handle_exception(PageOfPreviewNotFound, HTTPStatus.BAD_REQUEST)
     @hapic.input_query(PageQuerySchema())
     @hapic.input_path(FilePathSchema())
@@ -320,6 +333,7 @@ class FileController(Controller):
     @check_right(is_file_content)
     @hapic.handle_exception(TracimUnavailablePreviewType, HTTPStatus.BAD_REQUEST)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.input_query(FileQuerySchema())
     @hapic.input_path(FilePathSchema())
     @hapic.output_file([])
@@ -359,6 +373,7 @@ class FileController(Controller):
     @check_right(is_file_content)
     @hapic.handle_exception(TracimUnavailablePreviewType, HTTPStatus.BAD_REQUEST)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.input_path(FileRevisionPathSchema())
     @hapic.input_query(FileQuerySchema())
     @hapic.output_file([])
@@ -405,6 +420,7 @@ class FileController(Controller):
     @check_right(is_file_content)
     @hapic.handle_exception(TracimUnavailablePreviewType, HTTPStatus.BAD_REQUEST)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.input_path(FileRevisionPathSchema())
     @hapic.input_query(PageQuerySchema())
     @hapic.output_file([])
@@ -453,6 +469,7 @@ class FileController(Controller):
     @check_right(is_reader)
     @check_right(is_file_content)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.handle_exception(PageOfPreviewNotFound, HTTPStatus.BAD_REQUEST)
     @hapic.input_path(FilePathSchema())
     @hapic.input_query(PageQuerySchema())
@@ -500,6 +517,7 @@ class FileController(Controller):
     @check_right(is_reader)
     @check_right(is_file_content)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.handle_exception(PageOfPreviewNotFound, HTTPStatus.BAD_REQUEST)
     @hapic.handle_exception(PreviewDimNotAllowed, HTTPStatus.BAD_REQUEST)
     @hapic.input_query(PageQuerySchema())
@@ -549,6 +567,7 @@ class FileController(Controller):
     @check_right(is_reader)
     @check_right(is_file_content)
     @hapic.handle_exception(UnavailablePreview, HTTPStatus.BAD_REQUEST)
+    @hapic.handle_exception(PreviewNotReady, HTTPStatus.ACCEPTED)
     @hapic.handle_exception(PageOfPreviewNotFound, HTTPStatus.BAD_REQUEST)
     @hapic.handle_exception(PreviewDimNotAllowed, HTTPStatus.BAD_REQUEST)
     @hapic.input_path(FileRevisionPreviewSizedPathSchema())
@@ -685,6 +704,7 @@ class FileController(Controller):
     @check_right(is_reader)
     @check_right(is_file_content)
     @hapic.input_path(WorkspaceAndContentIdPathSchema())
+    @hapic.input_query(RevisionFilterQuerySchema())
     @hapic.output_body(FileRevisionSchema(many=True))
     def get_file_revisions(
             self,
@@ -707,11 +727,11 @@ class FileController(Controller):
             hapic_data.path.content_id,
             content_type=content_type_list.Any_SLUG
         )
-        revisions = content.revisions
-        return [
-            api.get_revision_in_context(revision)
-            for revision in revisions
-        ]
+        return api.get_revisions_in_context(
+            content,
+            limit=hapic_data.query.limit,
+            after_revision_id=hapic_data.query.after_revision_id,
+        )
 
     @hapic.with_api_doc(tags=[SWAGGER_TAG__CONTENT_FILE_ENDPOINTS])
     @hapic.handle_exception(EmptyLabelNotAllowed, HTTPStatus.BAD_REQUEST)
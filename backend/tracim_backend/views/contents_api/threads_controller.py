@@ -21,6 +21,7 @@ from tracim_backend.models.context_models import RevisionInContext
 from tracim_backend.models.revision_protection import new_revision
 from tracim_backend.views.controllers import Controller
 from tracim_backend.views.core_api.schemas import NoContentSchema
+from tracim_backend.views.core_api.schemas import RevisionFilterQuerySchema
 from tracim_backend.views.core_api.schemas import SetContentStatusSchema
 from tracim_backend.views.core_api.schemas import TextBasedContentModifySchema
 from tracim_backend.views.core_api.schemas import TextBasedContentSchema
@@ -110,6 +111,7 @@ class ThreadController(Controller):
     @check_right(is_reader)
     @check_right(is_thread_content)
     @hapic.input_path(WorkspaceAndContentIdPathSchema())
+    @hapic.input_query(RevisionFilterQuerySchema())
     @hapic.output_body(TextBasedRevisionSchema(many=True))
     def get_thread_revisions(
             self,
@@ -132,11 +134,11 @@ class ThreadController(Controller):
             hapic_data.path.content_id,
             content_type=content_type_list.Any_SLUG
         )
-        revisions = content.revisions
-        return [
-            api.get_revision_in_context(revision)
-            for revision in revisions
-        ]
+        return api.get_revisions_in_context(
+            content,
+            limit=hapic_data.query.limit,
+            after_revision_id=hapic_data.query.after_revision_id,
+        )
 
     @hapic.with_api_doc(tags=[SWAGGER_TAG__CONTENT_THREAD_ENDPOINTS])
     @check_right(is_contributor)
@@ -259,10 +259,7 @@ class AccountController(Controller):
             before_content=None,
             content_ids=hapic_data.query.content_ids or None
         )
-        return [
-            api.get_content_in_context(content)
-            for content in last_actives
-        ]
+        return api.get_contents_in_context_with_read_status(last_actives)
 
     @hapic.with_api_doc(tags=[SWAGGER_TAG__ACCOUNT_CONTENT_ENDPOINTS])
     @check_right(is_user)
@@ -19,6 +19,7 @@ from tracim_backend.models.context_models import CommentPath
 from tracim_backend.models.context_models import ContentCreation
 from tracim_backend.models.context_models import ContentFilter
 from tracim_backend.models.context_models import ContentIdsQuery
+from tracim_backend.models.context_models import ContentSearchQuery
 from tracim_backend.models.context_models import FileCreation
 from tracim_backend.models.context_models import FilePath
 from tracim_backend.models.context_models import FilePreviewSizedPath
@@ -32,6 +33,7 @@ from tracim_backend.models.context_models import PageQuery
 from tracim_backend.models.context_models import ResetPasswordCheckToken
 from tracim_backend.models.context_models import ResetPasswordModify
 from tracim_backend.models.context_models import ResetPasswordRequest
+from tracim_backend.models.context_models import RevisionFilter
 from tracim_backend.models.context_models import RevisionPreviewSizedPath
 from tracim_backend.models.context_models import RoleUpdate
 from tracim_backend.models.context_models import SetContentStatus
@@ -586,6 +588,56 @@ class ActiveContentFilterQuerySchema(marshmallow.Schema):
         return ActiveContentFilter(**data)
 
 
+class RevisionFilterQuerySchema(marshmallow.Schema):
+    limit = marshmallow.fields.Int(
+        example=20,
+        default=0,
+        description='if 0 or not set, return all revisions, else return only '
+                    'the first limit revisions (according to '
+                    'after_revision_id)',
+        validate=positive_int_validator,
+    )
+    after_revision_id = marshmallow.fields.Int(
+        example=12,
+        default=None,
+        allow_none=True,
+        description='return only revisions after this revision, '
+                    'use revision_id of last revision of previous page',
+    )
+
+    @post_load
+    def make_revision_filter(self, data: typing.Dict[str, typing.Any]) -> object:  # nopep8
+        return RevisionFilter(**data)
+
+
+class ContentSearchQuerySchema(marshmallow.Schema):
+    keywords = marshmallow.fields.Str(
+        example='intervention report',
+        description='space or comma separated keywords, contents with a '
+                    'word starting with one of keywords are returned, '
+                    'best match first',
+        required=True,
+    )
+    limit = marshmallow.fields.Int(
+        example=20,
+        default=0,
+        description='if 0 or not set, return all matching contents, else '
+                    'return only the first limit contents (according to '
+                    'offset)',
+        validate=positive_int_validator,
+    )
+    offset = marshmallow.fields.Int(
+        example=0,
+        default=0,
+        description='number of best matching contents to skip',
+        validate=positive_int_validator,
+    )
+
+    @post_load
+    def make_query_object(self, data: typing.Dict[str, typing.Any]) -> object:
+        return ContentSearchQuery(**data)
+
+
 class ContentIdsQuerySchema(marshmallow.Schema):
 
     content_ids = marshmallow.fields.String(
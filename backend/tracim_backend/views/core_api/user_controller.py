@@ -23,6 +23,7 @@ from tracim_backend.views.core_api.schemas import \
     ActiveContentFilterQuerySchema
 from tracim_backend.views.core_api.schemas import ContentDigestSchema
 from tracim_backend.views.core_api.schemas import ContentIdsQuerySchema
+from tracim_backend.views.core_api.schemas import ContentSearchQuerySchema
 from tracim_backend.views.core_api.schemas import KnownMemberQuerySchema
 from tracim_backend.views.core_api.schemas import NoContentSchema
 from tracim_backend.views.core_api.schemas import ReadStatusSchema
@@ -436,9 +437,34 @@ class UserController(Controller):
             before_content=None,
             content_ids=hapic_data.query.content_ids or None
         )
+        return api.get_contents_in_context_with_read_status(last_actives)
+
+    @hapic.with_api_doc(tags=[SWAGGER_TAG__USER_CONTENT_ENDPOINTS])
+    @check_right(has_personal_access)
+    @hapic.input_path(UserIdPathSchema())
+    @hapic.input_query(ContentSearchQuerySchema())
+    @hapic.output_body(ContentDigestSchema(many=True))
+    def search_content(self, context, request: TracimRequest, hapic_data=None):  # nopep8
+        """
+        Search contents of user workspaces by label and description
+        """
+        app_config = request.registry.settings['CFG']
+        content_query = hapic_data.query
+        api = ContentApi(
+            current_user=request.candidate_user,  # User
+            session=request.dbsession,
+            config=app_config,
+        )
+        contents = api.search(
+            api.get_keywords(content_query.keywords),
+            limit=content_query.limit or None,
+            offset=content_query.offset or None,
+        )
+        if contents is None:
+            return []
         return [
             api.get_content_in_context(content)
-            for content in last_actives
+            for content in contents
         ]
 
     @hapic.with_api_doc(tags=[SWAGGER_TAG__USER_CONTENT_ENDPOINTS])
@@ -617,6 +643,10 @@ class UserController(Controller):
         configurator.add_route('last_active_content', '/users/{user_id:\d+}/workspaces/{workspace_id}/contents/recently_active', request_method='GET')  # nopep8
         configurator.add_view(self.last_active_content, route_name='last_active_content')  # nopep8
 
+        # search content
+        configurator.add_route('search_content', '/users/{user_id:\d+}/contents/search', request_method='GET')  # nopep8
+        configurator.add_view(self.search_content, route_name='search_content')  # nopep8
+
         # set content as read/unread
         configurator.add_route('read_content', '/users/{user_id:\d+}/workspaces/{workspace_id}/contents/{content_id}/read', request_method='PUT')  # nopep8
         configurator.add_view(self.set_content_as_read, route_name='read_content')  # nopep8